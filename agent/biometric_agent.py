@@ -61,7 +61,8 @@ class ConfigManager:
             'poll_interval': 60,  # seconds
             'heartbeat_interval': 60,  # seconds
             'agent_name': 'Agent-1',
-            'last_sync': {}  # {device_ip: timestamp}
+            'last_sync': {},  # {device_ip: timestamp}
+            'log_cursor': {}  # {device_ip: {'count': records read, 'last_timestamp': timestamp}}
         }
     
     @staticmethod
@@ -248,6 +249,9 @@ class AgentWorker(QObject):
             # First sync - get records from last 24 hours
             last_sync = datetime.now() - timedelta(hours=24)
         
+        # Log cursor for this device (records already pushed)
+        log_cursor = self.config.setdefault('log_cursor', {}).get(device_ip)
+        
         logger.info(f"Polling device {device_name} ({device_ip}) since {last_sync}")
         self.log_message.emit(f"[{datetime.now().strftime('%H:%M:%S')}] Polling {device_name}...")
         
@@ -259,33 +263,46 @@ class AgentWorker(QObject):
                 self.status_update.emit(f"Cannot connect to {device_name}", "warning")
                 return
             
-            # Get new attendance records
-            records = zk_device.get_new_attendance_records(last_sync)
-            zk_device.disconnect()
-            
-            logger.info(f"Retrieved {len(records)} records from {device_name} (after {last_sync})")
-            
-            if records:
-                logger.info(f"Found {len(records)} new records from {device_name}")
-                self.log_message.emit(f"Found {len(records)} new records from {device_name}")
+            try:
+                # Get attendance records logged after the cursor
+                records, new_cursor = zk_device.get_attendance_records_incremental(log_cursor, since_timestamp=last_sync)
+                
+                logger.info(f"Retrieved {len(records)} records from {device_name} (cursor {log_cursor})")
                 
-                # Push records to server
-                if self.push_attendance_logs(device, records):
-                    # Update last sync time to now
-                    new_sync_time = datetime.now().isoformat()
-                    self.config['last_sync'][device_ip] = new_sync_time
-                    ConfigManager.save_config(self.config)
-                    logger.info(f"Updated last_sync for {device_ip} to {new_sync_time}")
-                    self.status_update.emit(f"✓ Synced {len(records)} records from {device_name}", "success")
+                if records:
+                    logger.info(f"Found {len(records)} new records from {device_name}")
+                    self.log_message.emit(f"Found {len(records)} new records from {device_name}")
+                    
+                    # Push records to server
+                    if self.push_attendance_logs(device, records):
+                        # Update last sync time to now
+                        new_sync_time = datetime.now().isoformat()
+                        self.config['last_sync'][device_ip] = new_sync_time
+                        self.save_log_cursor(device_ip, zk_device.clear_log_after_confirmed_sync(new_cursor))
+                        logger.info(f"Updated last_sync for {device_ip} to {new_sync_time}")
+                        self.status_update.emit(f"✓ Synced {len(records)} records from {device_name}", "success")
+                    else:
+                        self.status_update.emit(f"✗ Failed to push records from {device_name}", "error")
                 else:
-                    self.status_update.emit(f"✗ Failed to push records from {device_name}", "error")
-            else:
-                self.log_message.emit(f"No new records from {device_name}")
+                    new_cursor = zk_device.clear_log_after_confirmed_sync(new_cursor)
+                    if new_cursor != log_cursor:
+                        self.save_log_cursor(device_ip, new_cursor)
+                    self.log_message.emit(f"No new records from {device_name}")
+            finally:
+                zk_device.disconnect()
                 
         except Exception as e:
             logger.error(f"Error polling device {device_ip}: {e}")
             raise
     
+    def save_log_cursor(self, device_ip, log_cursor):
+        """Persist a device's log cursor (timestamps stored as ISO strings)"""
+        last_timestamp = log_cursor.get('last_timestamp')
+        if isinstance(last_timestamp, datetime):
+            last_timestamp = last_timestamp.isoformat()
+        self.config['log_cursor'][device_ip] = {'count': log_cursor.get('count'), 'last_timestamp': last_timestamp}
+        ConfigManager.save_config(self.config)
+    
     def push_attendance_logs(self, device, records):
         """Push attendance logs to server"""
         try:
@@ -8,14 +8,15 @@ import re
 import calendar
 import time
 import logging
-from database import get_db, init_db
+from database import get_db, init_db, get_table_columns, has_column, get_holiday_index, invalidate_shift_registry
+from database import refresh_attendance_daily_summary, refresh_attendance_daily_summary_range
+from database import day_range, month_range, year_range, date_span_range, range_predicate
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-from zk_biometric import sync_attendance_from_device, ZKBiometricDevice, verify_staff_biometric, process_device_attendance_automatically
+from zk_biometric import sync_attendance_from_device, ZKBiometricDevice, verify_staff_biometric, process_device_attendance_automatically, DeviceSyncScheduler
 from shift_management import ShiftManager
-from excel_reports import ExcelReportGenerator
 from staff_management_enhanced import StaffManager
 from attendance_advanced import AdvancedAttendanceManager
 from reporting_dashboard import ReportingDashboard
@@ -84,15 +85,22 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 # Initialize CSRF protection
 csrf = CSRFProtect(app)
 
-# Initialize database with the app
-init_db(app)
+# Payroll worker processes (spawn start method, see salary_calculator) re-import
+# this module as __mp_main__ when the app runs as `python app.py`; they only
+# need its definitions, not the schema bootstrap, scheduler or auto-sync job.
+_IS_WORKER_PROCESS = __name__ == '__mp_main__'
+
+# Create/migrate the schema (skipped when the database's schema_version stamp is current)
+if not _IS_WORKER_PROCESS:
+    init_db(app)
 
 # Initialize APScheduler for automatic sync
 scheduler = BackgroundScheduler()
-scheduler.start()
+if not _IS_WORKER_PROCESS:
+    scheduler.start()
 
-# Shut down the scheduler when exiting the app
-atexit.register(lambda: scheduler.shutdown())
+    # Shut down the scheduler when exiting the app
+    atexit.register(lambda: scheduler.shutdown())
 
 # Auto-sync configuration (interval in minutes) - Load from database
 from database import (
@@ -364,6 +372,10 @@ try:
 except ImportError:
     print("Timetable API routes module not found - timetable features may be unavailable")
 
+# Staff photo files (see photo_store.py)
+from photo_store import photo_bp
+app.register_blueprint(photo_bp)
+
 # Register hierarchical timetable API blueprint
 try:
     from hierarchical_timetable_routes import register_hierarchical_timetable_routes
@@ -372,65 +384,6 @@ try:
 except ImportError:
     print("Hierarchical Timetable API routes module not found - hierarchical timetable features may be unavailable")
 
-# Ensure on_duty_permissions table exists
-def ensure_on_duty_permission_table():
-    db = get_db()
-    table_exists = db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='on_duty_permissions'").fetchone()
-    if not table_exists:
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS on_duty_permissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                staff_id INTEGER,
-                school_id INTEGER,
-                permission_type TEXT,
-                start_datetime TEXT,
-                end_datetime TEXT,
-                reason TEXT,
-                status TEXT DEFAULT 'pending',
-                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        db.commit()
-
-
-def ensure_system_settings_capacity():
-    """Ensure system_settings columns can hold JSON payloads (MySQL legacy fix)."""
-    try:
-        if not str(DATABASE_URL).startswith('mysql'):
-            return
-
-        db = get_db()
-        # Older deployments use varchar(255), which truncates JSON settings.
-        db.execute('ALTER TABLE system_settings MODIFY setting_value TEXT NULL')
-        db.execute('ALTER TABLE system_settings MODIFY description TEXT NULL')
-        db.commit()
-    except Exception as exc:
-        # Non-fatal: app can run, but large settings may still truncate.
-        print(f'Startup system_settings capacity check warning: {exc}')
-
-with app.app_context():
-    ensure_on_duty_permission_table()
-    ensure_system_settings_capacity()
-    # Repair/seed shift definitions as school-scoped records.
-    try:
-        from database import migrate_shift_definitions
-        migrate_shift_definitions()
-    except Exception as _shift_mig_err:
-        print(f'Startup shift definitions migration warning: {_shift_mig_err}')
-    # Expand department_shift_mappings CHECK constraint + seed overtime shift
-    try:
-        from database import migrate_department_shift_constraint
-        migrate_department_shift_constraint()
-    except Exception as _mig_err:
-        print(f'Startup migration warning: {_mig_err}')
-    # Seed shift history table for existing staff
-    try:
-        from database import migrate_shift_history
-        migrate_shift_history()
-    except Exception as _mig_err2:
-        print(f'Startup shift history migration warning: {_mig_err2}')
-
-
 ########################################
 # HELPER: Get Primary Device for Institution
 ########################################
@@ -536,6 +489,7 @@ def process_on_duty_permission():
             else:
                 db.execute('INSERT INTO attendance (staff_id, school_id, date, status) VALUES (?, ?, ?, ?)', (staff_id, school_id, date_str, 'OD'))
             current_dt += datetime.timedelta(days=1)
+        refresh_attendance_daily_summary_range(school_id, start_dt.date(), end_dt.date(), db, commit=False)
     db.commit()
     return jsonify({'success': True})
 
@@ -552,12 +506,57 @@ def allowed_file(filename):
 
 @app.teardown_appcontext
 def close_db(error):
-    """Close database connection at the end of request"""
+    """Return the request's database connection to the pool (MySQL) or close it (SQLite)"""
     _ = error  # Suppress unused parameter warning
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
         db.close()
 
+
+@app.route('/api/system/db_pool_stats')
+def api_db_pool_stats():
+    """Expose MySQL connection pool and SQL translation cache counters for monitoring"""
+    if 'user_id' not in session or session.get('user_type') != 'company_admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    from database import get_db_pool_stats, get_sql_translation_stats
+    stats = get_db_pool_stats()
+    return jsonify({
+        'success': True,
+        'pooled': stats is not None,
+        'stats': stats or {},
+        'sql_translation': get_sql_translation_stats(),
+    })
+
+
+@app.after_request
+def add_query_profile_headers(response):
+    """Report the request's database work when QUERY_PROFILING is on"""
+    from database import finish_query_profile
+    profile = finish_query_profile(request.endpoint)
+    if profile is not None:
+        response.headers['X-DB-Query-Count'] = str(profile['queries'])
+        response.headers['X-DB-Duplicate-Queries'] = str(profile['duplicates'])
+        response.headers.add('Server-Timing', f"db;dur={profile['db_ms']:.1f};desc=\"{profile['queries']} queries\"")
+    return response
+
+
+@app.route('/api/system/query_profile')
+def api_query_profile():
+    """Per-endpoint query counts and database time collected while QUERY_PROFILING is on"""
+    if 'user_id' not in session or session.get('user_type') != 'company_admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    import database
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        'success': True,
+        'enabled': database.QUERY_PROFILING,
+        'slow_query_ms': database.SLOW_QUERY_MS,
+        'slow_query_log': database.SLOW_QUERY_LOG,
+        'endpoints': database.get_query_profile_stats(limit),
+    })
+
 # Favicon route
 @app.route('/favicon.ico')
 def favicon():
@@ -629,10 +628,7 @@ def iclock_cdata():
                 
                 if device:
                     # Update device metadata from handshake
-                    device_columns = {
-                        col['name']
-                        for col in db.execute("PRAGMA table_info(biometric_devices)").fetchall()
-                    }
+                    device_columns = get_table_columns('biometric_devices', db)
                     update_fields = []
                     update_values = []
                     
@@ -738,10 +734,7 @@ def iclock_cdata():
                 'SELECT * FROM biometric_devices WHERE serial_number = ? ORDER BY is_active DESC, id DESC LIMIT 1',
                 (sn,)
             ).fetchone()
-            device_columns = {
-                col['name']
-                for col in db.execute("PRAGMA table_info(biometric_devices)").fetchall()
-            }
+            device_columns = get_table_columns('biometric_devices', db)
             
             if not device:
                 # Log unknown device attempt
@@ -821,73 +814,41 @@ def iclock_cdata():
             
             # ===== STEP 4: PROCESS NORMALIZED ATTENDANCE RECORDS =====
             records = parse_result.get('records', [])
-            processed_count = 0
-            rejected_count = 0
-            staff_columns = {
-                col['name']
-                for col in db.execute("PRAGMA table_info(staff)").fetchall()
-            }
-            has_staff_biometric_id = 'biometric_id' in staff_columns
             
             logger.info(f"✓ Parsed {len(records)} record(s) from {detected_format.upper()} format")
             
+            # Devices reconnecting after an outage push thousands of lines at
+            # once, so the whole push is applied as one batch
+            punches = []
+            rejected_count = 0
             for record in records:
                 try:
-                    user_id = record['user_id']
-                    timestamp = record['timestamp']
-                    verification_type = record['verification_type']
-                    biometric_method = record['biometric_method']
-                    
-                    # Find staff by staff_id; include biometric_id when the column exists.
-                    if has_staff_biometric_id:
-                        staff = db.execute(
-                            '''SELECT s.*, sch.name as school_name 
-                               FROM staff s 
-                               JOIN schools sch ON s.school_id = sch.id 
-                               WHERE (s.staff_id = ? OR s.biometric_id = ?) 
-                               AND s.school_id = ?''',
-                            (user_id, user_id, device['school_id'])
-                        ).fetchone()
-                    else:
-                        staff = db.execute(
-                            '''SELECT s.*, sch.name as school_name 
-                               FROM staff s 
-                               JOIN schools sch ON s.school_id = sch.id 
-                               WHERE s.staff_id = ? AND s.school_id = ?''',
-                            (user_id, device['school_id'])
-                        ).fetchone()
-                    
-                    if staff:
-                        # Use UnifiedAttendanceProcessor for consistency
-                        from zk_biometric import UnifiedAttendanceProcessor
-                        
-                        processor = UnifiedAttendanceProcessor()
-                        punch_result = processor.process_attendance_punch(
-                            device_id=device['id'],
-                            user_id=user_id,
-                            timestamp=timestamp,
-                            punch_code=record['punch_code'],
-                            verification_method=biometric_method
-                        )
-                        
-                        if punch_result['success']:
-                            processed_count += 1
-                            logger.info(f"✓ Processed: {staff['full_name']} - {verification_type} "
-                                      f"at {record['timestamp_str']} via {biometric_method}")
-                        else:
-                            rejected_count += 1
-                            logger.warning(f"⚠ Rejected: {punch_result.get('message')}")
-                    else:
-                        rejected_count += 1
-                        logger.warning(f"⚠ Staff with ID {user_id} not found for device {sn}")
-                
+                    punches.append({
+                        'user_id': record['user_id'],
+                        'timestamp': record['timestamp'],
+                        'punch_code': record['punch_code'],
+                        'verification_method': record['biometric_method']
+                    })
                 except Exception as e:
                     rejected_count += 1
                     logger.error(f"❌ Error processing record: {e}, record: {record}")
-                    continue
+            
+            from zk_biometric import UnifiedAttendanceProcessor
+            
+            processor = UnifiedAttendanceProcessor()
+            batch_result = processor.process_batch_punches(device['id'], punches)
+            processed_count = batch_result['processed']
+            rejected_count += batch_result['rejected']
+            
+            for detail in batch_result['details']:
+                if detail['reason'] == 'unknown_staff':
+                    logger.warning(f"⚠ Staff with ID {detail['user_id']} not found for device {sn}")
+                elif detail['reason']:
+                    logger.warning(f"⚠ Skipped: {detail.get('message')}")
             
             logger.info(f"✓ Universal ADMS processed {processed_count}/{len(records)} records "
-                       f"from device {sn} (format: {detected_format.upper()})")
+                       f"from device {sn} (format: {detected_format.upper()}); "
+                       f"rejected {rejected_count}, ignored {batch_result['ignored']}")
             
             # Update device sync status
             sync_update_fields = []
@@ -952,10 +913,10 @@ def index():
     db = get_db()
 
     # First check if the column exists
-    columns = db.execute("PRAGMA table_info(schools)").fetchall()
-    has_is_hidden = any(col['name'] == 'is_hidden' for col in columns)
-    has_logo_url = any(col['name'] == 'logo_url' for col in columns)
-    has_student_mgmt = any(col['name'] == 'student_management_enabled' for col in columns)
+    columns = get_table_columns('schools', db)
+    has_is_hidden = 'is_hidden' in columns
+    has_logo_url = 'logo_url' in columns
+    has_student_mgmt = 'student_management_enabled' in columns
 
     # Build the SELECT clause dynamically
     select_fields = ['id', 'name']
@@ -1926,10 +1887,7 @@ def _record_mode_attendance(staff_db_id, school_id, mode_name, event_time=None):
     event_date = timestamp.date()
     current_time = timestamp.strftime('%H:%M:%S')
 
-    attendance_columns = {
-        col['name']
-        for col in db.execute('PRAGMA table_info(attendance)').fetchall()
-    }
+    attendance_columns = get_table_columns('attendance', db)
 
     def _has_column(column_name):
         return column_name in attendance_columns
@@ -2152,6 +2110,7 @@ def _record_mode_attendance(staff_db_id, school_id, mode_name, event_time=None):
              ntype = 'checkin' if action == 'check-in' else 'checkout'
              _send_staff_attendance_notification(school_id, staff_db_id, ntype, [staff_row['full_name'], f"{event_date} {current_time}"])
 
+        refresh_attendance_daily_summary(school_id, [event_date], db, commit=False)
         db.commit()
         return {'success': True, 'message': f'{action.title()} recorded via {mode_name}', 'action': action}
     except Exception as exc:
@@ -2832,6 +2791,7 @@ def export_staff_data():
         return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'})
 
     # Generate Excel report
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     return excel_generator.create_staff_attendance_report(school_id, start_date, end_date)
 
@@ -2937,8 +2897,12 @@ def get_biometric_verifications():
     params = [staff_id]
 
     if start_date and end_date:
-        query += ' AND DATE(verification_time) BETWEEN ? AND ?'
-        params.extend([start_date, end_date])
+        try:
+            bounds = date_span_range(start_date, end_date)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid date range'})
+        query += ' AND ' + range_predicate('verification_time')
+        params.extend(bounds)
 
     query += ' ORDER BY verification_time DESC LIMIT 50'
 
@@ -3013,9 +2977,9 @@ def get_today_attendance_status():
     verifications = db.execute('''
         SELECT verification_type, verification_time, biometric_method, verification_status
         FROM biometric_verifications
-        WHERE staff_id = ? AND DATE(verification_time) = ?
+        WHERE staff_id = ? AND verification_time >= ? AND verification_time < ?
         ORDER BY verification_time DESC
-    ''', (staff_id, today)).fetchall()
+    ''', (staff_id, *day_range(today))).fetchall()
 
     # Determine available actions based on current status
     available_actions = []
@@ -3055,6 +3019,8 @@ def get_staff_status_for_date(staff_id, date, school_id, db):
     3. Approved On Duty application -> "On Duty"  
     4. Approved Permission application -> "On Permission"
     5. Standard attendance status (Present/Absent/Late)
+
+    Single-staff form of get_staff_statuses_for_date.
     
     Args:
         staff_id: Staff database ID
@@ -3065,54 +3031,142 @@ def get_staff_status_for_date(staff_id, date, school_id, db):
     Returns:
         str: Status string ("Holiday", "On Leave", "On Duty", "On Permission", "present", "absent", "late")
     """
-    
-    # Import holiday checking function
-    from database import is_holiday
-    
-    # Get staff department for holiday checking
-    staff_info = db.execute('''
-        SELECT department FROM staff WHERE id = ?
-    ''', (staff_id,)).fetchone()
-    
-    staff_department = staff_info['department'] if staff_info else None
-    
-    # Check if this date is a holiday
-    if is_holiday(date, department=staff_department, school_id=school_id):
-        return "Holiday"
-    
-    # Check for approved Leave application
-    leave_app = db.execute('''
-        SELECT id FROM leave_applications 
-        WHERE staff_id = ? AND school_id = ? AND status = 'approved'
+    return get_staff_statuses_for_date(school_id, date, db, [staff_id])[staff_id]
+
+
+def _status_from_attendance(staff_id, shift_type, attendance, get_shift_manager):
+    """
+    Derive present/late/absent from an aggregated attendance row
+    (time_in, time_out, status_rank) using the staff member's shift.
+
+    get_shift_manager is called to obtain a ShiftManager, so callers can
+    build a fresh one or share a single instance across many staff.
+    """
+    if not (attendance and attendance['time_in']):
+        return "absent"
+
+    # Parse check-in time and calculate real-time status
+    try:
+        time_in_str = attendance['time_in']
+        check_in_time = datetime.datetime.strptime(time_in_str, '%H:%M:%S').time()
+        
+        # Calculate real-time status using ShiftManager
+        shift_manager = get_shift_manager()
+        
+        check_out_time = None
+        if attendance['time_out']:
+            check_out_time = datetime.datetime.strptime(attendance['time_out'], '%H:%M:%S').time()
+        
+        status_result = shift_manager.calculate_attendance_status(
+            shift_type, check_in_time, check_out_time
+        )
+        
+        # Map ShiftManager status to valid admin dashboard status
+        calculated_status = status_result['status']
+        
+        # Ensure only valid statuses are returned for admin dashboard
+        valid_statuses = ['present', 'late', 'absent']
+        
+        if calculated_status in valid_statuses:
+            return calculated_status
+        elif calculated_status == 'left_soon':
+            # Early departure still counts as present for dashboard purposes
+            return 'present'
+        else:
+            # Any other unexpected status defaults to present if they checked in
+            print(f"Warning: Unexpected status '{calculated_status}' for staff {staff_id}, defaulting to 'present'")
+            return 'present'
+        
+    except Exception as e:
+        # Fall back to stored status if calculation fails
+        print(f"Status calculation error for staff {staff_id}: {e}")
+        if attendance and (attendance['status_rank'] or 0) >= 2:
+            return 'late'
+        if attendance and (attendance['status_rank'] or 0) == 1:
+            return 'present'
+        return "present"
+
+
+# Longest staff_ids list get_staff_statuses_for_date filters in SQL; longer
+# lists read the whole school, which is cheaper than a long IN (...)
+STAFF_STATUS_FILTER_LIMIT = 200
+
+
+def get_staff_statuses_for_date(school_id, date, db, staff_ids=None):
+    """
+    Resolve the daily status of a whole school's staff at once.
+
+    Resolves holiday, leave, on-duty, permission and attendance status for
+    every staff member in a fixed handful of queries instead of up to seven
+    per staff member, in the priority order of get_staff_status_for_date.
+    Holidays come from the cached per-school index; the other queries only
+    read the requested staff when staff_ids is short.
+
+    Args:
+        school_id: School ID
+        date: Date to check (datetime.date)
+        db: Database connection
+        staff_ids: Optional iterable of staff database IDs (defaults to all staff of the school)
+
+    Returns:
+        dict: {staff_db_id: status string}
+    """
+    date_str = date.isoformat()
+
+    staff_filter, filter_params = '', ()
+    if staff_ids is not None:
+        staff_ids = list(staff_ids)
+        if not staff_ids:
+            return {}
+        if len(staff_ids) <= STAFF_STATUS_FILTER_LIMIT:
+            staff_filter = f" AND {{column}} IN ({','.join(['?'] * len(staff_ids))})"
+            filter_params = tuple(staff_ids)
+
+    staff_rows = db.execute(f'''
+        SELECT id, department, COALESCE(shift_type, 'general') AS shift_type
+        FROM staff WHERE school_id = ?{staff_filter.format(column='id')}
+    ''', (school_id,) + filter_params).fetchall()
+    staff_info = {row['id']: row for row in staff_rows}
+    if staff_ids is None:
+        staff_ids = list(staff_info)
+
+    # Holidays (same matching rules as database.is_holiday)
+    holiday_index = None
+    if school_id:
+        try:
+            holiday_index = get_holiday_index(school_id, db)
+        except Exception as e:
+            print(f"Error checking holiday status: {e}")
+    institution_holiday = holiday_index is not None and holiday_index.is_holiday(date)
+
+    def _is_department_holiday(department):
+        if not department or holiday_index is None:
+            return False
+        return holiday_index.is_holiday(date, department)
+
+    def _staff_ids_with(sql):
+        sql += staff_filter.format(column='staff_id')
+        return {row['staff_id'] for row in db.execute(sql, (school_id, date_str) + filter_params).fetchall()}
+
+    on_leave = _staff_ids_with('''
+        SELECT DISTINCT staff_id FROM leave_applications
+        WHERE school_id = ? AND status = 'approved'
         AND ? BETWEEN start_date AND end_date
-    ''', (staff_id, school_id, date.isoformat())).fetchone()
-    
-    if leave_app:
-        return "On Leave"
-    
-    # Check for approved On Duty application
-    on_duty_app = db.execute('''
-        SELECT id FROM on_duty_applications 
-        WHERE staff_id = ? AND school_id = ? AND status = 'approved'
+    ''')
+    on_duty = _staff_ids_with('''
+        SELECT DISTINCT staff_id FROM on_duty_applications
+        WHERE school_id = ? AND status = 'approved'
         AND ? BETWEEN start_date AND end_date
-    ''', (staff_id, school_id, date.isoformat())).fetchone()
-    
-    if on_duty_app:
-        return "On Duty"
-    
-    # Check for approved Permission application (single day)
-    permission_app = db.execute('''
-        SELECT id FROM permission_applications 
-        WHERE staff_id = ? AND school_id = ? AND status = 'approved'
+    ''')
+    on_permission = _staff_ids_with('''
+        SELECT DISTINCT staff_id FROM permission_applications
+        WHERE school_id = ? AND status = 'approved'
         AND permission_date = ?
-    ''', (staff_id, school_id, date.isoformat())).fetchone()
-    
-    if permission_app:
-        return "On Permission"
-    
-    # No approved applications found, check attendance record
-    attendance = db.execute('''
+    ''')
+
+    attendance_rows = db.execute(f'''
         SELECT
+            staff_id,
             MIN(time_in) AS time_in,
             MAX(time_out) AS time_out,
             MAX(
@@ -3123,61 +3177,38 @@ def get_staff_status_for_date(staff_id, date, school_id, db):
                 END
             ) AS status_rank
         FROM attendance
-        WHERE staff_id = ? AND school_id = ? AND date = ?
-    ''', (staff_id, school_id, date.isoformat())).fetchone()
-    
-    if attendance and attendance['time_in']:
-        # Get staff shift type for accurate status calculation
-        staff_info = db.execute('''
-            SELECT COALESCE(shift_type, 'general') as shift_type
-            FROM staff WHERE id = ?
-        ''', (staff_id,)).fetchone()
-        
-        shift_type = staff_info['shift_type'] if staff_info else 'general'
-        
-        # Parse check-in time and calculate real-time status
-        try:
-            time_in_str = attendance['time_in']
-            check_in_time = datetime.datetime.strptime(time_in_str, '%H:%M:%S').time()
-            
-            # Calculate real-time status using ShiftManager
+        WHERE school_id = ? AND date = ?{staff_filter.format(column='staff_id')}
+        GROUP BY staff_id
+    ''', (school_id, date_str) + filter_params).fetchall()
+    attendance_by_staff = {row['staff_id']: row for row in attendance_rows}
+
+    shared = {}
+
+    def _shared_shift_manager():
+        if 'manager' not in shared:
             from shift_management import ShiftManager
-            shift_manager = ShiftManager()
-            
-            check_out_time = None
-            if attendance['time_out']:
-                check_out_time = datetime.datetime.strptime(attendance['time_out'], '%H:%M:%S').time()
-            
-            status_result = shift_manager.calculate_attendance_status(
-                shift_type, check_in_time, check_out_time
+            shared['manager'] = ShiftManager()
+        return shared['manager']
+
+    statuses = {}
+    for staff_id in staff_ids:
+        info = staff_info.get(staff_id)
+        if institution_holiday or _is_department_holiday(info['department'] if info else None):
+            statuses[staff_id] = "Holiday"
+        elif staff_id in on_leave:
+            statuses[staff_id] = "On Leave"
+        elif staff_id in on_duty:
+            statuses[staff_id] = "On Duty"
+        elif staff_id in on_permission:
+            statuses[staff_id] = "On Permission"
+        else:
+            statuses[staff_id] = _status_from_attendance(
+                staff_id,
+                info['shift_type'] if info else 'general',
+                attendance_by_staff.get(staff_id),
+                _shared_shift_manager
             )
-            
-            # Map ShiftManager status to valid admin dashboard status
-            calculated_status = status_result['status']
-            
-            # Ensure only valid statuses are returned for admin dashboard
-            valid_statuses = ['present', 'late', 'absent']
-            
-            if calculated_status in valid_statuses:
-                return calculated_status
-            elif calculated_status == 'left_soon':
-                # Early departure still counts as present for dashboard purposes
-                return 'present'
-            else:
-                # Any other unexpected status defaults to present if they checked in
-                print(f"Warning: Unexpected status '{calculated_status}' for staff {staff_id}, defaulting to 'present'")
-                return 'present'
-            
-        except Exception as e:
-            # Fall back to stored status if calculation fails
-            print(f"Status calculation error for staff {staff_id}: {e}")
-            if attendance and (attendance['status_rank'] or 0) >= 2:
-                return 'late'
-            if attendance and (attendance['status_rank'] or 0) == 1:
-                return 'present'
-            return "present"
-    else:
-        return "absent"  # Default status if no attendance record
+    return statuses
 
 @app.route('/get_realtime_attendance')
 def get_realtime_attendance():
@@ -3190,7 +3221,7 @@ def get_realtime_attendance():
 
     db = get_db()
 
-    staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+    staff_columns = get_table_columns('staff', db)
     active_filter = ''
     if 'is_active' in staff_columns:
         active_filter = ' AND COALESCE(s.is_active, 1) = 1'
@@ -3229,9 +3260,10 @@ def get_realtime_attendance():
         'holiday': 0
     }
     
+    statuses = get_staff_statuses_for_date(school_id, today, db, [staff['staff_id'] for staff in staff_list])
     for staff in staff_list:
         # Get comprehensive status using the new logic
-        status = get_staff_status_for_date(staff['staff_id'], today, school_id, db)
+        status = statuses[staff['staff_id']]
         
         # Build staff record
         staff_record = {
@@ -3274,6 +3306,23 @@ def get_realtime_attendance():
         'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %I:%M %p')
     })
 
+@app.route('/api/attendance/stream')
+def attendance_event_stream():
+    """Server-Sent Events feed of committed punches for the admin dashboard"""
+    if 'user_id' not in session or session['user_type'] not in ['admin', 'company_admin']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    school_id = session.get('school_id', 1)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+
+    from flask import Response
+    from attendance_events import ATTENDANCE_STREAM_MAX_DURATION, attendance_events
+    return Response(
+        attendance_events.stream(school_id, last_event_id, max_duration=ATTENDANCE_STREAM_MAX_DURATION),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/export_company_report')
 def export_company_report():
     if 'user_id' not in session or session['user_type'] != 'company_admin':
@@ -3292,9 +3341,8 @@ def export_company_report():
     except ValueError:
         return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'})
 
-    # Generate Excel report
-    excel_generator = ExcelReportGenerator()
-    return excel_generator.create_company_report(start_date, end_date)
+    # Generate Excel report (shared with identical requests through the report cache)
+    return _report_response('company_report', {'start_date': start_date, 'end_date': end_date})
 
 @app.route('/export_staff_report')
 def export_staff_report():
@@ -3316,6 +3364,7 @@ def export_staff_report():
         return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'})
 
     # Generate Excel report
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     return excel_generator.create_individual_staff_report(staff_id, start_date, end_date)
 
@@ -3335,6 +3384,7 @@ def export_monthly_report():
         return jsonify({'success': False, 'error': 'Invalid month. Must be between 1 and 12'})
 
     # Generate Excel report
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     return excel_generator.create_monthly_report(school_id, year, month)
 
@@ -3359,6 +3409,7 @@ def export_department_report():
         return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'})
 
     # Generate Excel report (using staff attendance report filtered by department)
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     return excel_generator.create_staff_attendance_report(school_id, start_date, end_date)
 
@@ -3373,12 +3424,8 @@ def export_yearly_report():
     if not year:
         return jsonify({'success': False, 'error': 'Year is required'})
 
-    start_date = f"{year}-01-01"
-    end_date = f"{year}-12-31"
-
-    # Generate Excel report
-    excel_generator = ExcelReportGenerator()
-    return excel_generator.create_staff_attendance_report(school_id, start_date, end_date)
+    # Generate Excel report (shared with identical requests through the report cache)
+    return _report_response('yearly_report', {'school_id': school_id, 'year': year})
 
 # Enhanced Staff Management Routes
 @app.route('/bulk_import_staff', methods=['POST'])
@@ -3665,7 +3712,8 @@ def update_shift():
             WHERE id = ? AND school_id = ?
         ''', (start_time, end_time, grace_period, description, shift_id, school_id))
         db.commit()
-        
+        invalidate_shift_registry(school_id)
+
         # Reload shift manager
         if hasattr(app, 'shift_manager'):
             app.shift_manager.reload_shift_definitions()
@@ -3718,6 +3766,7 @@ def add_shift():
             VALUES (?, ?, ?, ?, ?, ?, 1)
         ''', (school_id, shift_type, start_time, end_time, grace_period_value, description))
         db.commit()
+        invalidate_shift_registry(school_id)
 
         # Reload shift manager so custom shift can be used immediately
         if hasattr(app, 'shift_manager'):
@@ -3789,6 +3838,7 @@ def delete_shift():
             WHERE id = ? AND school_id = ?
         ''', (shift_id, school_id))
         db.commit()
+        invalidate_shift_registry(school_id)
 
         if hasattr(app, 'shift_manager'):
             app.shift_manager.reload_shift_definitions()
@@ -4147,7 +4197,7 @@ def payroll_processing_review():
             ''', (school_id, selected_year, selected_month)).fetchall()
             status_map = {row['staff_id']: (row['status'] or 'pending').lower() for row in status_rows}
 
-            staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+            staff_columns = get_table_columns('staff', db)
 
             staff_query = '''
                 SELECT id, staff_id, full_name, department,
@@ -4192,9 +4242,12 @@ def payroll_processing_review():
             filtered_staff = db.execute(staff_query, staff_params).fetchall()
 
             salary_calculator = SalaryCalculator(school_id=school_id)
+            staff_salaries = salary_calculator.calculate_monthly_salaries(
+                [staff['id'] for staff in filtered_staff], selected_year, selected_month
+            )
 
             for staff in filtered_staff:
-                salary_result = salary_calculator.calculate_monthly_salary(staff['id'], selected_year, selected_month)
+                salary_result = staff_salaries[staff['id']]
                 if not salary_result.get('success'):
                     continue
 
@@ -4744,6 +4797,7 @@ def export_report_excel():
         return jsonify({'success': False, 'error': 'Report type is required'})
 
     # Generate appropriate Excel report based on type
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
 
     if report_type == 'daily':
@@ -4790,6 +4844,7 @@ def generate_admin_report():
         department = request.args.get('department', '')
 
         # Create Excel generator for all reports
+        from excel_reports import ExcelReportGenerator
         excel_generator = ExcelReportGenerator()
 
         # Route to appropriate report generation based on report_type
@@ -5017,7 +5072,7 @@ def generate_monthly_salary_report(school_id, year, month, department, format_ty
     import datetime
 
     db = get_db()
-    staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+    staff_columns = get_table_columns('staff', db)
 
     # Build query based on filters
     where_conditions = ['s.school_id = ?']
@@ -7143,7 +7198,7 @@ def generate_daily_attendance_report(school_id, date_str=None, department=None,
 
     # Check attendance table columns to avoid SQL errors on older schemas
     try:
-        cols = {row['name'] for row in db.execute("PRAGMA table_info(attendance)").fetchall()}
+        cols = get_table_columns('attendance', db)
     except Exception:
         cols = set()
     has_work_hours = 'work_hours' in cols
@@ -7435,6 +7490,7 @@ def generate_daily_attendance_report(school_id, date_str=None, department=None,
 
 def generate_overtime_report(school_id, year, month, format_type):
     """Generate comprehensive overtime report with individual staff data"""
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     
     if month:
@@ -7546,6 +7602,7 @@ def export_analytics_data():
         return jsonify({'success': False, 'error': 'Date range is required'})
 
     # Use the Excel generator to create analytics report
+    from excel_reports import ExcelReportGenerator
     excel_generator = ExcelReportGenerator()
     return excel_generator.create_staff_attendance_report(school_id, start_date, end_date)
 
@@ -7685,12 +7742,11 @@ def process_leave_with_notifications():
 
         # Get leave application details before updating
         status = 'approved' if action == 'approve' else 'rejected'
-        if status == 'approved':
-            leave_details = db.execute('''
-                SELECT staff_id, school_id, start_date
-                FROM leave_applications
-                WHERE id = ?
-            ''', (leave_id,)).fetchone()
+        leave_details = db.execute('''
+            SELECT staff_id, school_id, start_date, end_date
+            FROM leave_applications
+            WHERE id = ?
+        ''', (leave_id,)).fetchone()
 
         # Update leave status
         db.execute('''
@@ -7698,6 +7754,9 @@ def process_leave_with_notifications():
             SET status = ?, processed_by = ?, processed_at = ?
             WHERE id = ?
         ''', (status, admin_id, datetime.datetime.now(), leave_id))
+        if leave_details:
+            refresh_attendance_daily_summary_range(
+                leave_details['school_id'], leave_details['start_date'], leave_details['end_date'], db, commit=False)
         db.commit()
 
         # Update quota usage if leave is approved
@@ -8177,7 +8236,7 @@ def staff_management():
     db = get_db()
     school_id = session['school_id']
     today_str = datetime.date.today().strftime('%Y-%m-%d')
-    staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+    staff_columns = get_table_columns('staff', db)
     has_next_shift = 'next_shift_type' in staff_columns and 'next_shift_effective_date' in staff_columns
 
     # Initialize default departments and positions if needed
@@ -8533,9 +8592,10 @@ def admin_dashboard():
     
     today_attendance = []
     
+    statuses = get_staff_statuses_for_date(school_id, today, db, [staff['staff_id'] for staff in all_staff])
     for staff in all_staff:
         # Get comprehensive status using the new logic
-        status = get_staff_status_for_date(staff['staff_id'], today, school_id, db)
+        status = statuses[staff['staff_id']]
         
         # Build staff record for today_attendance
         staff_record = {
@@ -9376,11 +9436,11 @@ def admin_student_management():
     total_students = len(students)
     
     # Students added this month
-    current_month = datetime.date.today().strftime('%Y-%m')
+    today = datetime.date.today()
     students_this_month = db.execute('''
         SELECT COUNT(*) as count FROM students
-        WHERE school_id = ? AND strftime('%Y-%m', created_at) = ?
-    ''', (school_id, current_month)).fetchone()['count']
+        WHERE school_id = ? AND created_at >= ? AND created_at < ?
+    ''', (school_id, *month_range(today.year, today.month))).fetchone()['count']
     
     # Fetch classes and sections from timetable academic hierarchy
     # Get active academic levels (grades/classes)
@@ -9632,8 +9692,7 @@ def bulk_upload_students():
 
     school_id = session['school_id']
     db = get_db()
-    columns = db.execute('PRAGMA table_info(students)').fetchall()
-    column_names = {col['name'] for col in columns}
+    column_names = get_table_columns('students', db)
 
     def clean_text(value):
         if pd.isna(value):
@@ -11608,8 +11667,9 @@ def api_dashboard_attendance_stats():
             'holiday': 0
         }
         
+        statuses = get_staff_statuses_for_date(school_id, today, db, [staff['staff_id'] for staff in all_staff])
         for staff in all_staff:
-            status = get_staff_status_for_date(staff['staff_id'], today, school_id, db)
+            status = statuses[staff['staff_id']]
             status_counts['total_staff'] += 1
             
             if status == 'Holiday':
@@ -11656,6 +11716,7 @@ def export_dashboard_data():
         export_type = request.args.get('type', 'all').lower()  # all, staff, attendance, applications
 
         # Use the ExcelReportGenerator for comprehensive reports
+        from excel_reports import ExcelReportGenerator
         excel_generator = ExcelReportGenerator()
 
         if export_type == 'staff':
@@ -12187,6 +12248,7 @@ def check_device_verification():
                     'error': 'You must check in first before checking out.'
                 })
 
+        refresh_attendance_daily_summary(school_id, [today], db, commit=False)
         db.commit()
 
         # Format times for display in 12-hour format
@@ -12624,6 +12686,9 @@ def process_leave():
         db.rollback()
         return jsonify({'success': False, 'error': 'Failed to update leave status - may already be processed'})
     
+    if status == 'approved':
+        refresh_attendance_daily_summary_range(
+            leave_app['school_id'], leave_app['start_date'], leave_app['end_date'], db, commit=False)
     db.commit()
 
     # Refresh quota usage for both approve/reject to keep reserved balance accurate.
@@ -12734,6 +12799,9 @@ def process_on_duty():
         except Exception as e:
             print(f"Error updating OD quota usage: {e}")
 
+        if status == 'approved':
+            refresh_attendance_daily_summary_range(
+                on_duty_app['school_id'], on_duty_app['start_date'], on_duty_app['end_date'], db, commit=False)
         db.commit()
 
         return jsonify({'success': True, 'message': f'On-duty application {status} successfully'})
@@ -13374,8 +13442,7 @@ def add_staff_enhanced():
 
     try:
         # Ensure all required columns exist in the table
-        columns = db.execute("PRAGMA table_info(staff)").fetchall()
-        column_names = [col['name'] for col in columns]
+        column_names = get_table_columns('staff', db)
 
         # Build the insert query dynamically based on available columns
         insert_columns = ['school_id', 'staff_id', 'password_hash', 'full_name']
@@ -13598,10 +13665,7 @@ def add_staff():
 
     try:
         # Ensure 'photo_url' column exists in the table
-        columns = db.execute("PRAGMA table_info(staff)").fetchall()
-        has_photo_url = any(col['name'] == 'photo_url' for col in columns)
-
-        if not has_photo_url:
+        if not has_column('staff', 'photo_url', db):
             db.execute("ALTER TABLE staff ADD COLUMN photo_url TEXT")
 
         created_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -13615,7 +13679,7 @@ def add_staff():
                             basic_salary, hra, transport_allowance, other_allowances, dearness_allowance, pf_opt_in, pf_deduction, esi_deduction, professional_tax, other_deductions,
                             bank_account_name, bank_name, bank_account_number, ifsc_code, pan_number))
 
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+        staff_columns = get_table_columns('staff', db)
         if 'is_active' in staff_columns or 'status' in staff_columns:
             update_parts = []
             update_values = []
@@ -13703,7 +13767,7 @@ def get_staff_details_enhanced():
     staff_id = request.args.get('id')
     db = get_db()
 
-    staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+    staff_columns = get_table_columns('staff', db)
     da_select = 'COALESCE(dearness_allowance, 0) AS dearness_allowance' if 'dearness_allowance' in staff_columns else '0 AS dearness_allowance'
     pf_opt_in_select = 'COALESCE(pf_opt_in, 0) AS pf_opt_in' if 'pf_opt_in' in staff_columns else '0 AS pf_opt_in'
     if 'is_active' in staff_columns and 'status' in staff_columns:
@@ -13835,8 +13899,7 @@ def update_staff_enhanced():
 
     try:
         # Build update query dynamically based on available columns
-        columns = db.execute("PRAGMA table_info(staff)").fetchall()
-        column_names = [col['name'] for col in columns]
+        column_names = get_table_columns('staff', db)
 
         # Special handling for shift_type to apply from next day
         current_staff = db.execute("SELECT shift_type, next_shift_type FROM staff WHERE id = ?", (staff_db_id,)).fetchone()
@@ -13981,104 +14044,10 @@ def export_staff_excel():
 
     try:
         school_id = session['school_id']
-        db = get_db()
 
-        # Get all staff with comprehensive details
-        staff = db.execute('''
-            SELECT staff_id, full_name, first_name, last_name,
-                   date_of_birth, date_of_joining, department, destination,
-                   position, gender, phone, email, shift_type, created_at
-            FROM staff
-            WHERE school_id = ?
-            ORDER BY CAST(staff_id AS INTEGER) ASC
-        ''', (school_id,)).fetchall()
-
-        # Create proper Excel file using openpyxl
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        from io import BytesIO
-
-        # Create workbook and worksheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Staff Details"
-
-        # Define styles
-        header_font = Font(bold=True, size=12, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # Add title
-        ws.merge_cells('A1:N1')
-        title_cell = ws['A1']
-        title_cell.value = f"Staff Details Report - Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        title_cell.font = Font(bold=True, size=16, color="2F5597")
-        title_cell.alignment = Alignment(horizontal='center')
-
-        # Add headers
-        headers = [
-            'S.No', 'Staff ID', 'First Name', 'Last Name', 'Full Name',
-            'Date of Birth', 'Date of Joining', 'Department', 'Destination/Position',
-            'Gender', 'Phone Number', 'Email ID', 'Shift Type', 'Created Date'
-        ]
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-
-        # Add data
-        for row_idx, staff_member in enumerate(staff, 4):
-            row_data = [
-                row_idx - 3,  # S.No
-                staff_member['staff_id'] or 'N/A',
-                staff_member['first_name'] or 'N/A',
-                staff_member['last_name'] or 'N/A',
-                staff_member['full_name'] or 'N/A',
-                staff_member['date_of_birth'] or 'N/A',
-                staff_member['date_of_joining'] or 'N/A',
-                staff_member['department'] or 'N/A',
-                staff_member['destination'] or staff_member['position'] or 'N/A',
-                staff_member['gender'] or 'N/A',
-                staff_member['phone'] or 'N/A',
-                staff_member['email'] or 'N/A',
-                staff_member['shift_type'] or 'General',
-                staff_member['created_at'] or 'N/A'
-            ]
-
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.value = value
-                cell.border = border
-                cell.alignment = Alignment(vertical='center')
-
-        # Auto-adjust column widths
-        for col in range(1, len(headers) + 1):
-            column_letter = get_column_letter(col)
-            ws.column_dimensions[column_letter].width = 15
-
-        # Freeze header row
-        ws.freeze_panes = 'A4'
-
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        # Create response with proper Excel headers
-        response = make_response(output.getvalue())
-        filename = f'staff_details_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        # Rows are streamed into a write-only workbook and sent in chunks
+        from excel_reports import ExcelReportGenerator
+        response = ExcelReportGenerator().create_staff_details_report(school_id)
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -14152,7 +14121,7 @@ def update_department_shift():
                 VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
             ''', (school_id, department, shift_type))
 
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+        staff_columns = get_table_columns('staff', db)
         has_next_shift = 'next_shift_type' in staff_columns and 'next_shift_effective_date' in staff_columns
 
         if has_next_shift:
@@ -14248,7 +14217,7 @@ def bulk_update_staff_shifts():
     db = get_db()
 
     try:
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+        staff_columns = get_table_columns('staff', db)
         has_next_shift = 'next_shift_type' in staff_columns and 'next_shift_effective_date' in staff_columns
 
         updated_count = 0
@@ -14378,7 +14347,7 @@ def update_staff():
             return jsonify({'success': False, 'error': 'Invalid file type. Only PNG, JPG, JPEG, and GIF files are allowed.'})
 
     try:
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+        staff_columns = get_table_columns('staff', db)
 
         update_parts = [
             'full_name = ?',
@@ -14914,6 +14883,7 @@ def sync_biometric_attendance():
         db = get_db()
         synced_count = 0
         created_staff_count = 0
+        touched_dates = set()
         
         # Get all device users for auto-creation if needed
         device_users = {}
@@ -14987,12 +14957,14 @@ def sync_biometric_attendance():
                             WHERE staff_id = ? AND date = ?
                         ''', (attendance_time, staff_db_id, attendance_date))
                         synced_count += 1
+                        touched_dates.add(attendance_date)
                     elif verification_type == 'check-out' and not existing_record['time_out']:
                         db.execute('''
                             UPDATE attendance SET time_out = ?
                             WHERE staff_id = ? AND date = ?
                         ''', (attendance_time, staff_db_id, attendance_date))
                         synced_count += 1
+                        touched_dates.add(attendance_date)
                 else:
                     # Create new attendance record
                     if verification_type == 'check-in':
@@ -15001,11 +14973,13 @@ def sync_biometric_attendance():
                             VALUES (?, ?, ?, ?, 'present')
                         ''', (staff_db_id, school_id, attendance_date, attendance_time))
                         synced_count += 1
+                        touched_dates.add(attendance_date)
 
             except Exception as record_error:
                 print(f"Error processing record {record}: {record_error}")
                 continue
 
+        refresh_attendance_daily_summary(school_id, touched_dates, db, commit=False)
         db.commit()
         zk_device.disconnect()
 
@@ -15814,7 +15788,11 @@ def poll_device_attendance():
     school_id = session.get('school_id', 1)
 
     try:
-        result = process_device_attendance_automatically(device_ip, school_id)
+        # Read only the records logged since the device's last poll
+        from database import get_primary_device_for_institution
+        device = get_primary_device_for_institution(school_id)
+        result = process_device_attendance_automatically(device_ip, school_id,
+                                                         device_id=device['id'] if device else None)
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -15843,15 +15821,45 @@ def get_latest_device_verifications():
                 'verifications': []
             })
 
-        # Get records from the last few minutes
+        # Get records from the last few minutes: the ones already synced come
+        # from the database, only the unsynced tail of the log is read from the
+        # device (without advancing its cursor, which belongs to the sync jobs)
         since_timestamp = datetime.datetime.now() - datetime.timedelta(minutes=since_minutes)
-        recent_records = zk_device.get_new_attendance_records(since_timestamp)
+        from database import get_primary_device_for_institution, get_device_log_cursor
+        device = get_primary_device_for_institution(session['school_id'])
+        log_cursor = get_device_log_cursor(device['id']) if device else None
+        if log_cursor and log_cursor.get('count') is not None:
+            recent_records, _ = zk_device.get_attendance_records_incremental(log_cursor, since_timestamp=since_timestamp)
+            recent_records = [r for r in recent_records if r['timestamp'] > since_timestamp]
+
+            db = get_db()
+            synced = db.execute('''
+                SELECT s.staff_id AS user_id, bv.verification_type, bv.verification_time
+                FROM biometric_verifications bv
+                JOIN staff s ON s.id = bv.staff_id
+                WHERE bv.school_id = ? AND bv.verification_time > ?
+                ORDER BY bv.verification_time
+            ''', (session['school_id'], since_timestamp)).fetchall()
+            for row in synced:
+                timestamp = row['verification_time']
+                if not isinstance(timestamp, datetime.datetime):
+                    timestamp = datetime.datetime.fromisoformat(str(timestamp))
+                recent_records.append({'user_id': str(row['user_id']),
+                                       'verification_type': row['verification_type'],
+                                       'timestamp': timestamp})
+        else:
+            recent_records = zk_device.get_new_attendance_records(since_timestamp)
 
         zk_device.disconnect()
 
         # Format the records for the frontend
         verifications = []
-        for record in recent_records:
+        seen = set()
+        for record in sorted(recent_records, key=lambda r: r['timestamp']):
+            key = (record['user_id'], record['verification_type'], record['timestamp'])
+            if key in seen:
+                continue
+            seen.add(key)
             verifications.append({
                 'user_id': record['user_id'],
                 'verification_type': record['verification_type'],
@@ -16048,9 +16056,9 @@ def get_comprehensive_staff_profile():
         verifications = db.execute('''
             SELECT verification_type, verification_time, verification_status, device_ip
             FROM biometric_verifications
-            WHERE staff_id = ? AND DATE(verification_time) BETWEEN ? AND ?
+            WHERE staff_id = ? AND verification_time >= ? AND verification_time < ?
             ORDER BY verification_time DESC
-        ''', (staff_id, first_day_of_month, last_day_of_month)).fetchall()
+        ''', (staff_id, *date_span_range(first_day_of_month, last_day_of_month))).fetchall()
 
         # Get leave applications
         leaves = db.execute('''
@@ -16712,10 +16720,10 @@ def staff_profile_page():
         SELECT verification_type, verification_time, biometric_method, verification_status
         FROM biometric_verifications
         WHERE staff_id = ?
-          AND DATE(verification_time) >= DATE('now', '-14 days')
+          AND verification_time >= ?
         ORDER BY verification_time DESC
         LIMIT 20
-    ''', (staff_id,)).fetchall()
+    ''', (staff_id, (datetime.date.today() - datetime.timedelta(days=14)).isoformat())).fetchall()
 
     # 🚀 OPTIMIZATION 3B: Get ALL attendance records (including web punches: id_scan, otp, dynamic_qr)
     # This combines with biometric verifications to show complete daily attendance
@@ -16881,8 +16889,7 @@ def update_staff_profile():
                     return jsonify({'success': False, 'error': 'Error saving photo'})
 
         # Build update query dynamically based on available columns
-        columns = db.execute("PRAGMA table_info(staff)").fetchall()
-        column_names = [col['name'] for col in columns]
+        column_names = get_table_columns('staff', db)
 
         update_parts = []
         update_values = []
@@ -17923,15 +17930,13 @@ def export_data_backup():
     end_date = request.form.get('end_date')
     tables = request.form.getlist('tables')
 
-    backup_manager = BackupManager()
-    result = backup_manager.export_data(export_type, school_id, start_date, end_date, tables)
-
-    if result['success']:
-        # Return file for download
-        from flask import send_file
-        return send_file(result['export_path'], as_attachment=True)
-    else:
-        return jsonify(result)
+    return _report_response('data_backup', {
+        'export_type': export_type,
+        'school_id': school_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'tables': sorted(tables)
+    })
 
 # Salary Calculation Routes
 @app.route('/calculate_salary', methods=['POST'])
@@ -17964,11 +17969,12 @@ def generate_salary_report():
     if not all([staff_id, year, month]):
         return jsonify({'success': False, 'error': 'Staff ID, year, and month are required'})
 
-    school_id = session.get('school_id')
-    salary_calculator = SalaryCalculator(school_id=school_id)
-    result = salary_calculator.generate_salary_report(staff_id, year, month)
-
-    return jsonify(result)
+    return _report_response('salary_report', {
+        'school_id': session.get('school_id'),
+        'staff_id': staff_id,
+        'year': year,
+        'month': month
+    })
 
 @app.route('/download_salary_slip', methods=['POST'])
 def download_salary_slip():
@@ -18000,6 +18006,128 @@ def download_salary_slip():
     except Exception as e:
         return jsonify({'success': False, 'error': f'Failed to generate salary slip: {str(e)}'})
 
+def _payroll_staff_list(db, school_id, department=None):
+    """Active staff of a school in payroll order (optionally one department)."""
+    staff_columns = get_table_columns('staff', db)
+
+    query = 'SELECT id, staff_id, full_name, department FROM staff WHERE school_id = ?'
+    params = [school_id]
+
+    if 'is_active' in staff_columns:
+        query += ' AND COALESCE(is_active, 1) = 1'
+    elif 'status' in staff_columns:
+        query += " AND LOWER(COALESCE(status, 'active')) = 'active'"
+
+    if department:
+        query += ' AND department = ?'
+        params.append(department)
+
+    query += ' ORDER BY CAST(staff_id AS INTEGER) ASC'
+
+    return db.execute(query, params).fetchall()
+
+
+def _bulk_salary_result_row(staff, salary_result):
+    """Summary row for one staff member as returned by bulk salary calculation."""
+    breakdown = salary_result['salary_breakdown']
+    earnings = breakdown.get('earnings', {})
+    deductions = breakdown.get('deductions', {})
+    manual_bonus = float(breakdown.get('manual_bonus', 0) or 0)
+    manual_deduction = float(breakdown.get('manual_deduction', 0) or 0)
+    adjusted_total_earnings = float(breakdown.get('adjusted_total_earnings', earnings.get('total_earnings', 0)) or 0)
+    adjusted_total_deductions = float(breakdown.get('adjusted_total_deductions', deductions.get('total_deductions', 0)) or 0)
+    adjusted_net_salary = float(adjusted_total_earnings - adjusted_total_deductions)
+
+    return {
+        'id': staff['id'],  # Add database ID
+        'staff_id': staff['staff_id'],
+        'staff_name': staff['full_name'],
+        'department': staff['department'],
+        'net_salary': adjusted_net_salary,
+        'total_earnings': adjusted_total_earnings,
+        'total_deductions': adjusted_total_deductions,
+        'manual_bonus': manual_bonus,
+        'manual_deduction': manual_deduction,
+        'present_days': breakdown['attendance_summary']['present_days'],
+        'absent_days': breakdown['attendance_summary']['absent_days']
+    }
+
+
+def _record_payroll_calculation_run(db, school_id, year, month, calculated_by, results):
+    """Upsert the month's payroll_calculation_runs totals for a school (caller commits)."""
+    total_earnings = sum(float(row.get('total_earnings', 0) or 0) for row in results)
+    total_deductions = sum(float(row.get('total_deductions', 0) or 0) for row in results)
+    total_net_salary = sum(float(row.get('net_salary', 0) or 0) for row in results)
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS payroll_calculation_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            school_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            calculated_at TIMESTAMP NOT NULL,
+            calculated_by TEXT,
+            total_staff INTEGER NOT NULL DEFAULT 0,
+            total_earnings REAL NOT NULL DEFAULT 0,
+            total_deductions REAL NOT NULL DEFAULT 0,
+            total_net_salary REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(school_id, year, month)
+        )
+    ''')
+
+    calculated_at = datetime.datetime.now().isoformat(timespec='microseconds')
+    existing_month_run = db.execute('''
+        SELECT id
+        FROM payroll_calculation_runs
+        WHERE school_id = ? AND year = ? AND month = ?
+    ''', (school_id, year, month)).fetchone()
+
+    if existing_month_run:
+        db.execute('''
+            UPDATE payroll_calculation_runs
+            SET calculated_at = ?,
+                calculated_by = ?,
+                total_staff = ?,
+                total_earnings = ?,
+                total_deductions = ?,
+                total_net_salary = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (
+            calculated_at,
+            str(calculated_by),
+            len(results),
+            total_earnings,
+            total_deductions,
+            total_net_salary,
+            existing_month_run['id']
+        ))
+    else:
+        db.execute('''
+            INSERT INTO payroll_calculation_runs
+            (school_id, year, month, calculated_at, calculated_by, total_staff, total_earnings, total_deductions, total_net_salary)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            school_id,
+            year,
+            month,
+            calculated_at,
+            str(calculated_by),
+            len(results),
+            total_earnings,
+            total_deductions,
+            total_net_salary
+        ))
+
+    return {
+        'total_staff': len(results),
+        'total_earnings': total_earnings,
+        'total_deductions': total_deductions,
+        'total_net_salary': total_net_salary
+    }
+
+
 @app.route('/bulk_salary_calculation', methods=['POST'])
 def bulk_salary_calculation():
     if 'user_id' not in session or session['user_type'] not in ['admin', 'company_admin']:
@@ -18032,121 +18160,23 @@ def bulk_salary_calculation():
         }
 
         db = get_db()
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
 
         # Get staff list based on filters
-        query = 'SELECT id, staff_id, full_name, department FROM staff WHERE school_id = ?'
-        params = [school_id]
-
-        if 'is_active' in staff_columns:
-            query += ' AND COALESCE(is_active, 1) = 1'
-        elif 'status' in staff_columns:
-            query += " AND LOWER(COALESCE(status, 'active')) = 'active'"
-
-        if department:
-            query += ' AND department = ?'
-            params.append(department)
-            
-        query += ' ORDER BY CAST(staff_id AS INTEGER) ASC'
+        staff_list = _payroll_staff_list(db, school_id, department)
 
-        staff_list = db.execute(query, params).fetchall()
-
-        school_id = session.get('school_id')
         salary_calculator = SalaryCalculator(school_id=school_id)
         results = []
+        salary_results = salary_calculator.calculate_monthly_salaries(
+            [staff['id'] for staff in staff_list], year, month
+        )
 
         for staff in staff_list:
-            salary_result = salary_calculator.calculate_monthly_salary(staff['id'], year, month)
+            salary_result = salary_results[staff['id']]
             if salary_result['success']:
-                breakdown = salary_result['salary_breakdown']
-                earnings = breakdown.get('earnings', {})
-                deductions = breakdown.get('deductions', {})
-                manual_bonus = float(breakdown.get('manual_bonus', 0) or 0)
-                manual_deduction = float(breakdown.get('manual_deduction', 0) or 0)
-                adjusted_total_earnings = float(breakdown.get('adjusted_total_earnings', earnings.get('total_earnings', 0)) or 0)
-                adjusted_total_deductions = float(breakdown.get('adjusted_total_deductions', deductions.get('total_deductions', 0)) or 0)
-                adjusted_net_salary = float(adjusted_total_earnings - adjusted_total_deductions)
-
-                results.append({
-                    'id': staff['id'],  # Add database ID
-                    'staff_id': staff['staff_id'],
-                    'staff_name': staff['full_name'],
-                    'department': staff['department'],
-                    'net_salary': adjusted_net_salary,
-                    'total_earnings': adjusted_total_earnings,
-                    'total_deductions': adjusted_total_deductions,
-                    'manual_bonus': manual_bonus,
-                    'manual_deduction': manual_deduction,
-                    'present_days': breakdown['attendance_summary']['present_days'],
-                    'absent_days': breakdown['attendance_summary']['absent_days']
-                })
-
-        total_earnings = sum(float(row.get('total_earnings', 0) or 0) for row in results)
-        total_deductions = sum(float(row.get('total_deductions', 0) or 0) for row in results)
-        total_net_salary = sum(float(row.get('net_salary', 0) or 0) for row in results)
+                results.append(_bulk_salary_result_row(staff, salary_result))
 
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS payroll_calculation_runs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                school_id INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                month INTEGER NOT NULL,
-                calculated_at TIMESTAMP NOT NULL,
-                calculated_by TEXT,
-                total_staff INTEGER NOT NULL DEFAULT 0,
-                total_earnings REAL NOT NULL DEFAULT 0,
-                total_deductions REAL NOT NULL DEFAULT 0,
-                total_net_salary REAL NOT NULL DEFAULT 0,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(school_id, year, month)
-            )
-        ''')
-
-        calculated_at = datetime.datetime.now().isoformat(timespec='microseconds')
         calculated_by = session.get('full_name') or session.get('username') or str(session.get('user_id'))
-        existing_month_run = db.execute('''
-            SELECT id
-            FROM payroll_calculation_runs
-            WHERE school_id = ? AND year = ? AND month = ?
-        ''', (school_id, year, month)).fetchone()
-
-        if existing_month_run:
-            db.execute('''
-                UPDATE payroll_calculation_runs
-                SET calculated_at = ?,
-                    calculated_by = ?,
-                    total_staff = ?,
-                    total_earnings = ?,
-                    total_deductions = ?,
-                    total_net_salary = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (
-                calculated_at,
-                str(calculated_by),
-                len(results),
-                total_earnings,
-                total_deductions,
-                total_net_salary,
-                existing_month_run['id']
-            ))
-        else:
-            db.execute('''
-                INSERT INTO payroll_calculation_runs
-                (school_id, year, month, calculated_at, calculated_by, total_staff, total_earnings, total_deductions, total_net_salary)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                school_id,
-                year,
-                month,
-                calculated_at,
-                str(calculated_by),
-                len(results),
-                total_earnings,
-                total_deductions,
-                total_net_salary
-            ))
-
+        _record_payroll_calculation_run(db, school_id, year, month, calculated_by, results)
         db.commit()
 
         return jsonify({
@@ -18159,6 +18189,306 @@ def bulk_salary_calculation():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def _run_company_payroll_job(job_id, school_ids, year, month, calculated_by):
+    """Background worker for /api/payroll/company_run (runs in its own app context)."""
+    from contextlib import nullcontext
+    from salary_calculator import PAYROLL_MAX_WORKERS, payroll_process_pool, update_payroll_job
+
+    with app.app_context():
+        try:
+            update_payroll_job(job_id, status='running')
+            db = get_db()
+            schools = []
+            completed = 0
+
+            # One worker pool for the whole run: every school's chunks go through it
+            with payroll_process_pool(PAYROLL_MAX_WORKERS) or nullcontext() as pool:
+                for school_id in school_ids:
+                    staff_list = _payroll_staff_list(db, school_id)
+                    salary_calculator = SalaryCalculator(school_id=school_id)
+                    salary_results = salary_calculator.calculate_monthly_salaries(
+                        [staff['id'] for staff in staff_list], year, month,
+                        max_workers=PAYROLL_MAX_WORKERS, pool=pool,
+                        progress=lambda done, total, base=completed: update_payroll_job(job_id, completed=base + done)
+                    )
+
+                    results = [
+                        _bulk_salary_result_row(staff, salary_results[staff['id']])
+                        for staff in staff_list
+                        if salary_results[staff['id']]['success']
+                    ]
+                    totals = _record_payroll_calculation_run(db, school_id, year, month, calculated_by, results)
+                    db.commit()
+
+                    completed += len(staff_list)
+                    update_payroll_job(job_id, completed=completed)
+                    schools.append(dict(totals, school_id=school_id))
+
+            update_payroll_job(job_id, status='completed', result={
+                'calculation_period': f"{calendar.month_name[month]} {year}",
+                'schools': schools,
+                'total_staff': sum(school['total_staff'] for school in schools),
+                'total_net_salary': sum(school['total_net_salary'] for school in schools)
+            })
+        except Exception as e:
+            logging.exception('Company payroll job %s failed', job_id)
+            update_payroll_job(job_id, status='failed', error=str(e))
+
+
+@app.route('/api/payroll/company_run', methods=['POST'])
+def start_company_payroll_run():
+    """Start month-end payroll for several institutions in the background; poll the returned job id."""
+    if 'user_id' not in session or session.get('user_type') != 'company_admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    from salary_calculator import create_payroll_job
+    import threading
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        year = int(data.get('year'))
+        month = int(data.get('month'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Year and month are required'}), 400
+    if not 1 <= month <= 12:
+        return jsonify({'success': False, 'error': 'Invalid month'}), 400
+
+    db = get_db()
+    school_ids = data.getlist('school_ids') if hasattr(data, 'getlist') else data.get('school_ids')
+    if school_ids:
+        try:
+            school_ids = [int(school_id) for school_id in school_ids]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid school_ids'}), 400
+    else:
+        school_ids = [row['id'] for row in db.execute('SELECT id FROM schools ORDER BY id').fetchall()]
+
+    total_staff = sum(len(_payroll_staff_list(db, school_id)) for school_id in school_ids)
+    calculated_by = session.get('full_name') or session.get('username') or str(session.get('user_id'))
+    job_id = create_payroll_job(
+        total=total_staff,
+        kind='company_payroll',
+        year=year,
+        month=month,
+        school_ids=school_ids,
+        requested_by=session.get('user_id')
+    )
+
+    threading.Thread(
+        target=_run_company_payroll_job,
+        args=(job_id, school_ids, year, month, calculated_by),
+        daemon=True
+    ).start()
+
+    return jsonify({'success': True, 'job_id': job_id, 'total_staff': total_staff}), 202
+
+
+@app.route('/api/payroll/jobs/<job_id>')
+def payroll_job_status(job_id):
+    """Progress and result of a background payroll job"""
+    if 'user_id' not in session or session.get('user_type') not in ['admin', 'company_admin']:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    from salary_calculator import get_payroll_job
+
+    job = get_payroll_job(job_id)
+    if job is None or job.get('requested_by') != session.get('user_id'):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    return jsonify({'success': True, 'job': job})
+
+
+# Background report jobs. The export routes hand their (validated) parameters
+# to report_queue, which builds each file on a worker thread and keeps it on
+# disk; identical requests reuse the cached file or join the running build.
+# The routes send the file when it is ready within REPORT_WAIT_TIMEOUT, and
+# otherwise (or with async=1) return the job to poll at
+# /api/reports/jobs/<job_id>.
+from report_jobs import REPORT_WAIT_TIMEOUT, ReportJobQueue, ReportFile, STAFF_PAY_COLUMNS, data_watermark
+
+report_queue = ReportJobQueue(app)
+
+
+def _month_date_range(year, month):
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+def _build_company_report(params, progress):
+    from excel_reports import ExcelReportGenerator
+    return ExcelReportGenerator().create_company_report(params['start_date'], params['end_date'])
+
+
+def _build_yearly_report(params, progress):
+    from excel_reports import ExcelReportGenerator
+    year = params['year']
+    return ExcelReportGenerator().create_staff_attendance_report(params['school_id'], f"{year}-01-01", f"{year}-12-31")
+
+
+def _build_salary_report(params, progress):
+    salary_calculator = SalaryCalculator(school_id=params['school_id'])
+    return salary_calculator.generate_salary_report(params['staff_id'], params['year'], params['month'])
+
+
+def _build_salary_calculation_export(params, progress):
+    """Bulk salary calculation for a school's month (optionally one department) as excel, csv or pdf"""
+    school_id = params['school_id']
+    year = params['year']
+    month = params['month']
+    department = params['department']
+
+    salary_calculator = SalaryCalculator(school_id=school_id)
+
+    db = get_db()
+    staff_columns = get_table_columns('staff', db)
+
+    # Get staff list based on filters
+    query = 'SELECT id, staff_id, full_name, department FROM staff WHERE school_id = ?'
+    query_params = [school_id]
+
+    if 'is_active' in staff_columns:
+        query += ' AND COALESCE(is_active, 1) = 1'
+    elif 'status' in staff_columns:
+        query += " AND LOWER(COALESCE(status, 'active')) = 'active'"
+
+    if department:
+        query += ' AND department = ?'
+        query_params.append(department)
+
+    staff_list = db.execute(query, query_params).fetchall()
+
+    # Calculate salaries for all staff
+    salary_results = []
+    staff_salaries = salary_calculator.calculate_monthly_salaries(
+        [staff['id'] for staff in staff_list], year, month, progress=progress
+    )
+    for staff in staff_list:
+        salary_result = staff_salaries[staff['id']]
+        if salary_result['success']:
+            salary_results.append({
+                'id': staff['id'],
+                'staff_id': staff['staff_id'],
+                'staff_name': staff['full_name'],
+                'department': staff['department'],
+                'salary_data': salary_result
+            })
+
+    generators = {
+        'excel': generate_salary_calculation_excel,
+        'csv': generate_salary_calculation_csv,
+        'pdf': generate_salary_calculation_pdf
+    }
+    return generators[params['format']](salary_results, year, month, department)
+
+
+def _build_data_backup(params, progress):
+    backup_manager = BackupManager()
+    result = backup_manager.export_data(params['export_type'], params['school_id'], params['start_date'],
+                                        params['end_date'], params['tables'])
+    if not result['success']:
+        return result
+    return ReportFile(result['export_path'], os.path.basename(result['export_path']), None)
+
+
+def _salary_watermark(db, params):
+    start_date, end_date = _month_date_range(params['year'], params['month'])
+    return data_watermark(db, params['school_id'], start_date, end_date,
+                          tables=('salary_rules', 'holidays', 'leave_applications', 'permission_applications',
+                                  'on_duty_applications', 'salary_adjustments', 'staff_shift_history'),
+                          staff_columns=STAFF_PAY_COLUMNS)
+
+
+report_queue.register(
+    'company_report', _build_company_report,
+    lambda db, params: data_watermark(db, start_date=params['start_date'], end_date=params['end_date'])
+)
+report_queue.register(
+    'yearly_report', _build_yearly_report,
+    lambda db, params: data_watermark(db, params['school_id'], f"{params['year']}-01-01", f"{params['year']}-12-31")
+)
+report_queue.register('salary_report', _build_salary_report, _salary_watermark)
+report_queue.register('salary_calculation_export', _build_salary_calculation_export, _salary_watermark)
+report_queue.register(
+    'data_backup', _build_data_backup,
+    lambda db, params: data_watermark(db, params['school_id'], params['start_date'], params['end_date'],
+                                      tables=('leave_applications',))
+)
+
+
+def _report_response(report_type, params):
+    """
+    Send a report built through report_queue, or its job (202 while building)
+    when it isn't ready within REPORT_WAIT_TIMEOUT or the request asks for async=1
+    """
+    job = report_queue.submit(report_type, params, requested_by=session.get('user_id'),
+                              refresh=request.values.get('refresh') == '1')
+    if request.values.get('async') != '1':
+        job = report_queue.wait(job['job_id'], timeout=REPORT_WAIT_TIMEOUT)
+        if job['status'] in ('completed', 'failed'):
+            return _report_artifact_response(job)
+
+    return jsonify({
+        'success': True,
+        'job': job,
+        'status_url': url_for('report_job_status', job_id=job['job_id']),
+        'download_url': url_for('download_report_job', job_id=job['job_id'])
+    }), 200 if job['status'] == 'completed' else 202
+
+
+def _report_artifact_response(job):
+    if job['status'] == 'failed':
+        return jsonify({'success': False, 'error': job['error']})
+
+    artifact = report_queue.artifact(job)
+    if artifact is None:
+        return jsonify({'success': False, 'error': 'Report has expired, please request it again'}), 410
+
+    if artifact['mimetype'] == 'application/json':
+        with open(artifact['path'], 'rb') as f:
+            return app.response_class(f.read(), mimetype='application/json')
+
+    from flask import send_file
+    return send_file(artifact['path'], mimetype=artifact['mimetype'], as_attachment=True,
+                     download_name=artifact['filename'] or f"{artifact['report_type']}.bin")
+
+
+def _report_job_for_session(job_id):
+    """A report job visible to the logged-in admin (company admins see every school's), or None"""
+    job = report_queue.get_job(job_id)
+    if job is None or session.get('user_type') == 'company_admin':
+        return job
+    if job['school_id'] is None or job['school_id'] != session.get('school_id'):
+        return None
+    return job
+
+
+@app.route('/api/reports/jobs/<job_id>')
+def report_job_status(job_id):
+    """Status and progress of a background report job"""
+    if 'user_id' not in session or (session.get('user_type') not in ['admin', 'company_admin'] and not session.get('is_sub_admin')):
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    job = _report_job_for_session(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/reports/jobs/<job_id>/download')
+def download_report_job(job_id):
+    """File (or JSON result) of a finished background report job"""
+    if 'user_id' not in session or (session.get('user_type') not in ['admin', 'company_admin'] and not session.get('is_sub_admin')):
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+    job = _report_job_for_session(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify({'success': False, 'error': 'Report is not ready yet', 'job': job}), 409
+
+    return _report_artifact_response(job)
+
+
 @app.route('/update_salary_rules', methods=['POST'])
 def update_salary_rules():
     if 'user_id' not in session or session['user_type'] not in ['admin', 'company_admin']:
@@ -18306,52 +18636,17 @@ def export_salary_calculation_results():
         if not year or not month:
             return jsonify({'success': False, 'error': 'Year and month are required'})
 
-        school_id = session.get('school_id')
-
-        # Re-run the bulk salary calculation to get fresh data
-        salary_calculator = SalaryCalculator(school_id=school_id)
-
-        db = get_db()
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
-
-        # Get staff list based on filters
-        query = 'SELECT id, staff_id, full_name, department FROM staff WHERE school_id = ?'
-        params = [school_id]
-
-        if 'is_active' in staff_columns:
-            query += ' AND COALESCE(is_active, 1) = 1'
-        elif 'status' in staff_columns:
-            query += " AND LOWER(COALESCE(status, 'active')) = 'active'"
-
-        if department:
-            query += ' AND department = ?'
-            params.append(department)
-
-        staff_list = db.execute(query, params).fetchall()
-
-        # Calculate salaries for all staff
-        salary_results = []
-        for staff in staff_list:
-            salary_result = salary_calculator.calculate_monthly_salary(staff['id'], year, month)
-            if salary_result['success']:
-                salary_results.append({
-                    'id': staff['id'],
-                    'staff_id': staff['staff_id'],
-                    'staff_name': staff['full_name'],
-                    'department': staff['department'],
-                    'salary_data': salary_result
-                })
-
-        # Generate report in requested format
-        if export_format == 'excel':
-            return generate_salary_calculation_excel(salary_results, year, month, department)
-        elif export_format == 'csv':
-            return generate_salary_calculation_csv(salary_results, year, month, department)
-        elif export_format == 'pdf':
-            return generate_salary_calculation_pdf(salary_results, year, month, department)
-        else:
+        if export_format not in ('excel', 'csv', 'pdf'):
             return jsonify({'success': False, 'error': 'Supported formats: excel, csv, pdf'})
 
+        return _report_response('salary_calculation_export', {
+            'school_id': session.get('school_id'),
+            'year': year,
+            'month': month,
+            'department': department,
+            'format': export_format
+        })
+
     except Exception as e:
         return jsonify({'success': False, 'error': f'Export failed: {str(e)}'})
 
@@ -19161,6 +19456,7 @@ def update_institution_timings():
             """, (school_id, checkin_time + ':00', checkout_time + ':00'))
 
         db.commit()
+        invalidate_shift_registry(school_id)
         print(f"General shift timing updated: {checkin_time} - {checkout_time}")
 
         # Notify all systems to refresh their configurations
@@ -20594,9 +20890,9 @@ def get_leave_usage_summary():
                             END
                         ) FROM on_duty_applications 
                         WHERE staff_id = ? AND school_id = ? 
-                        AND strftime('%Y', start_date) = ?
+                        AND start_date >= ? AND start_date < ?
                         AND status = 'approved'
-                    """, (staff_id, school_id, str(year)))
+                    """, (staff_id, school_id, *year_range(year)))
                 else:
                     # Calculate leave usage for this specific type
                     cursor.execute("""
@@ -20608,9 +20904,9 @@ def get_leave_usage_summary():
                         ) FROM leave_applications 
                         WHERE staff_id = ? AND school_id = ? 
                         AND leave_type = ?
-                        AND strftime('%Y', start_date) = ?
+                        AND start_date >= ? AND start_date < ?
                         AND status = 'approved'
-                    """, (staff_id, school_id, qt_name, str(year)))
+                    """, (staff_id, school_id, qt_name, *year_range(year)))
                     
                 result = cursor.fetchone()[0]
                 actual_used = result if result else 0
@@ -20621,9 +20917,9 @@ def get_leave_usage_summary():
                     SELECT SUM(duration_hours) 
                     FROM permission_applications 
                     WHERE staff_id = ? AND school_id = ? 
-                    AND strftime('%Y', permission_date) = ?
+                    AND permission_date >= ? AND permission_date < ?
                     AND status = 'approved'
-                """, (staff_id, school_id, str(year)))
+                """, (staff_id, school_id, *year_range(year)))
                 
                 result = cursor.fetchone()[0]
                 actual_used = result if result else 0
@@ -20684,9 +20980,9 @@ def get_leave_usage_summary():
                 la.reason, la.status, la.leave_type as quota_type
             FROM leave_applications la
             WHERE la.staff_id = ? AND la.school_id = ? 
-            AND strftime('%Y', la.start_date) = ?
+            AND la.start_date >= ? AND la.start_date < ?
             ORDER BY la.start_date DESC
-        """, (staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year)))
         
         usage_records = []
         for row in cursor.fetchall():
@@ -20711,9 +21007,9 @@ def get_leave_usage_summary():
                 oda.reason, oda.status, 'On Duty' as quota_type
             FROM on_duty_applications oda
             WHERE oda.staff_id = ? AND oda.school_id = ? 
-            AND strftime('%Y', oda.start_date) = ?
+            AND oda.start_date >= ? AND oda.start_date < ?
             ORDER BY oda.start_date DESC
-        """, (staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year)))
         
         for row in cursor.fetchall():
             record = {
@@ -20742,9 +21038,9 @@ def get_leave_usage_summary():
                 END
             ) FROM leave_applications la
             WHERE la.staff_id = ? AND la.school_id = ? 
-            AND strftime('%Y', la.start_date) = ?
+            AND la.start_date >= ? AND la.start_date < ?
             AND la.status = 'approved'
-        """, (staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year)))
         
         leave_days_used = cursor.fetchone()[0] or 0
         actual_used_days += leave_days_used
@@ -20758,9 +21054,9 @@ def get_leave_usage_summary():
                 END
             ) FROM on_duty_applications oda
             WHERE oda.staff_id = ? AND oda.school_id = ? 
-            AND strftime('%Y', oda.start_date) = ?
+            AND oda.start_date >= ? AND oda.start_date < ?
             AND oda.status = 'approved'
-        """, (staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year)))
         
         od_days_used = cursor.fetchone()[0] or 0
         actual_used_days += od_days_used
@@ -20770,9 +21066,9 @@ def get_leave_usage_summary():
             SELECT SUM(pa.duration_hours) 
             FROM permission_applications pa
             WHERE pa.staff_id = ? AND pa.school_id = ? 
-            AND strftime('%Y', pa.permission_date) = ?
+            AND pa.permission_date >= ? AND pa.permission_date < ?
             AND pa.status = 'approved'
-        """, (staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year)))
         
         permission_hours_used = cursor.fetchone()[0] or 0
         actual_used_hours += permission_hours_used
@@ -20837,6 +21133,7 @@ def generate_usage_report():
         staff_name, employee_id, department = staff_result
         
         # Use Excel report generator
+        from excel_reports import ExcelReportGenerator
         excel_generator = ExcelReportGenerator()
         
         # Recalculate and update quotas first (same logic as summary function)
@@ -20856,9 +21153,9 @@ def generate_usage_report():
                             END
                         ) FROM on_duty_applications 
                         WHERE staff_id = ? AND school_id = ? 
-                        AND strftime('%Y', start_date) = ?
+                        AND start_date >= ? AND start_date < ?
                         AND status = 'approved'
-                    """, (staff_id, school_id, str(year)))
+                    """, (staff_id, school_id, *year_range(year)))
                 else:
                     cursor.execute("""
                         SELECT SUM(
@@ -20869,9 +21166,9 @@ def generate_usage_report():
                         ) FROM leave_applications 
                         WHERE staff_id = ? AND school_id = ? 
                         AND leave_type = ?
-                        AND strftime('%Y', start_date) = ?
+                        AND start_date >= ? AND start_date < ?
                         AND status = 'approved'
-                    """, (staff_id, school_id, qt_name, str(year)))
+                    """, (staff_id, school_id, qt_name, *year_range(year)))
                     
                 result = cursor.fetchone()[0]
                 actual_used = result if result else 0
@@ -20881,9 +21178,9 @@ def generate_usage_report():
                     SELECT SUM(duration_hours) 
                     FROM permission_applications 
                     WHERE staff_id = ? AND school_id = ? 
-                    AND strftime('%Y', permission_date) = ?
+                    AND permission_date >= ? AND permission_date < ?
                     AND status = 'approved'
-                """, (staff_id, school_id, str(year)))
+                """, (staff_id, school_id, *year_range(year)))
                 
                 result = cursor.fetchone()[0]
                 actual_used = result if result else 0
@@ -20921,7 +21218,7 @@ def generate_usage_report():
                 la.reason, la.status, la.leave_type as quota_type, 'Leave' as application_type
             FROM leave_applications la
             WHERE la.staff_id = ? AND la.school_id = ? 
-            AND strftime('%Y', la.start_date) = ?
+            AND la.start_date >= ? AND la.start_date < ?
             
             UNION ALL
             
@@ -20934,10 +21231,10 @@ def generate_usage_report():
                 oda.reason, oda.status, 'On Duty' as quota_type, 'OD' as application_type
             FROM on_duty_applications oda
             WHERE oda.staff_id = ? AND oda.school_id = ? 
-            AND strftime('%Y', oda.start_date) = ?
+            AND oda.start_date >= ? AND oda.start_date < ?
             
             ORDER BY start_date DESC
-        """, (staff_id, school_id, str(year), staff_id, school_id, str(year)))
+        """, (staff_id, school_id, *year_range(year), staff_id, school_id, *year_range(year)))
         
         usage_records = cursor.fetchall()
         
@@ -21606,6 +21903,91 @@ def _format_system_time_display(value):
 
     return dt_value.strftime('%-m/%-d/%Y, %-I:%M:%S %p') if os.name != 'nt' else dt_value.strftime('%#m/%#d/%Y, %#I:%M:%S %p')
 
+def _sync_direct_lan_device(device):
+    """Sync one Direct LAN device (runs on a LAN sync worker thread)"""
+    from database import update_device_log_cursor, get_device_log_cursor
+    from zk_biometric import UnifiedAttendanceProcessor
+
+    device_id = device['id']
+    device_name = device['device_name']
+    ip_address = device['ip_address']
+    port = device['port']
+
+    with app.app_context():
+        logger.info(f"Syncing device: {device_name} ({ip_address}:{port}) - {device['school_name']}")
+
+        if not device['allowed_staff_ids']:
+            logger.info(f"Skipping device {device_name}: no staff IDs configured for school {device['school_id']}")
+            return {'success': True, 'record_count': 0}
+
+        # Connect to device
+        zk_device = ZKBiometricDevice(ip_address, port)
+
+        if not zk_device.connect():
+            logger.error(f"Failed to connect to device {device_name} ({ip_address}:{port})")
+            return {'success': False, 'error': 'connection_failed', 'record_count': 0}
+
+        try:
+            # Get only records for this school's staff logged after the
+            # device's sync cursor (last sync time for first sync)
+            attendance_records, log_cursor = zk_device.get_attendance_records_incremental(
+                get_device_log_cursor(device_id),
+                allowed_user_ids=device['allowed_staff_ids'],
+                since_timestamp=device['last_sync']
+            )
+            sync_confirmed = True
+
+            if attendance_records:
+                # Process records using UnifiedAttendanceProcessor
+                processor = UnifiedAttendanceProcessor()
+
+                # Convert records to format expected by processor
+                punches = []
+                for record in attendance_records:
+                    punches.append({
+                        'user_id': str(record['user_id']),
+                        'timestamp': record['timestamp'],
+                        'punch_code': record.get('punch', 0),
+                        'verification_method': record.get('verification_type', 'fingerprint')
+                    })
+
+                results = processor.process_batch_punches(device_id, punches)
+                sync_confirmed = not any(
+                    detail.get('reason') == 'exception' for detail in results.get('details', [])
+                )
+
+                logger.info(
+                    f"Device {device_name}: Processed {results['processed']} records, "
+                    f"Rejected {results['rejected']}, Ignored {results.get('ignored', 0)}"
+                )
+            else:
+                logger.info(f"No new attendance records for {device_name}")
+
+            if sync_confirmed:
+                update_device_log_cursor(device_id, zk_device.clear_log_after_confirmed_sync(log_cursor))
+
+            return {'success': sync_confirmed, 'record_count': len(attendance_records)}
+        finally:
+            zk_device.disconnect()
+
+
+def _report_direct_lan_sync(device, result):
+    """Write a device's sync status and metrics (latency, records, failures)"""
+    from database import update_device_sync_status
+
+    with app.app_context():
+        update_device_sync_status(
+            device['id'],
+            sync_status='success' if result['success'] else 'failed',
+            latency_ms=result.get('latency_ms'),
+            record_count=result.get('record_count', 0),
+            failure_count=result.get('consecutive_failures', 0)
+        )
+
+
+lan_sync_scheduler = DeviceSyncScheduler()
+
+
 def auto_sync_direct_lan_devices():
     """Background job to automatically sync all Direct LAN devices"""
     logger.info("Starting automatic sync for Direct LAN devices")
@@ -21623,82 +22005,33 @@ def auto_sync_direct_lan_devices():
                 WHERE d.is_active = 1 AND d.connection_type = 'Direct_LAN'
             """)
 
-            devices = cursor.fetchall()
-            logger.info(f"Found {len(devices)} Direct LAN devices to sync")
-
-            from database import update_device_sync_status
-            from zk_biometric import UnifiedAttendanceProcessor
-
             staff_id_cache = {}
+            devices = []
+            for row in cursor.fetchall():
+                school_id = row[4]
+                if school_id not in staff_id_cache:
+                    staff_id_cache[school_id] = _get_school_staff_id_set(school_id)
+                devices.append({
+                    'id': row[0],
+                    'device_name': row[1],
+                    'ip_address': row[2],
+                    'port': row[3] or 4370,
+                    'school_id': school_id,
+                    'school_name': row[5],
+                    'last_sync': _parse_sync_timestamp(row[6]),
+                    'allowed_staff_ids': staff_id_cache[school_id]
+                })
+            logger.info(f"Found {len(devices)} Direct LAN devices to sync")
 
-            for device in devices:
-                device_id = device[0]
-                device_name = device[1]
-                ip_address = device[2]
-                port = device[3] or 4370
-                school_id = device[4]
-                school_name = device[5]
-                last_sync = _parse_sync_timestamp(device[6])
-
-                try:
-                    logger.info(f"Syncing device: {device_name} ({ip_address}:{port}) - {school_name}")
-
-                    if school_id not in staff_id_cache:
-                        staff_id_cache[school_id] = _get_school_staff_id_set(school_id)
-                    allowed_staff_ids = staff_id_cache[school_id]
-
-                    if not allowed_staff_ids:
-                        logger.info(f"Skipping device {device_name}: no staff IDs configured for school {school_id}")
-                        update_device_sync_status(device_id)
-                        continue
-
-                    # Connect to device
-                    zk_device = ZKBiometricDevice(ip_address, port)
-
-                    if zk_device.connect():
-                        # Get only records for this school's staff since last sync
-                        attendance_records = zk_device.get_attendance_records(
-                            allowed_user_ids=allowed_staff_ids,
-                            since_timestamp=last_sync
-                        )
-
-                        if attendance_records:
-                            # Process records using UnifiedAttendanceProcessor
-                            processor = UnifiedAttendanceProcessor()
-
-                            # Convert records to format expected by processor
-                            punches = []
-                            for record in attendance_records:
-                                punches.append({
-                                    'user_id': str(record['user_id']),
-                                    'timestamp': record['timestamp'],
-                                    'punch_code': record.get('punch', 0),
-                                    'verification_method': record.get('verification_type', 'fingerprint')
-                                })
-
-                            results = processor.process_batch_punches(device_id, punches)
-
-                            logger.info(
-                                f"Device {device_name}: Processed {results['processed']} records, "
-                                f"Rejected {results['rejected']}, Ignored {results.get('ignored', 0)}"
-                            )
-
-                            # Update last sync time
-                            update_device_sync_status(device_id)
-                        else:
-                            logger.info(f"No new attendance records for {device_name}")
-
-                        zk_device.disconnect()
-                    else:
-                        logger.error(f"Failed to connect to device {device_name} ({ip_address}:{port})")
-                        update_device_sync_status(device_id, sync_status='failed')
-
-                except Exception as e:
-                    logger.error(f"Error syncing device {device_name}: {str(e)}")
-                    update_device_sync_status(device_id, sync_status='failed')
+        summary = lan_sync_scheduler.run_cycle(devices, _sync_direct_lan_device, _report_direct_lan_sync)
+        if summary is None:
+            return
 
-            db.commit()
-            logger.info("Automatic sync completed")
+        failed = [device_id for device_id, result in summary['results'].items() if not result['success']]
+        logger.info(
+            f"Automatic sync completed: {len(summary['results']) - len(failed)} synced, "
+            f"{len(failed) + len(summary['timed_out'])} failed, {len(summary['skipped'])} skipped (backoff/running)"
+        )
 
     except Exception as e:
         logger.error(f"Error in auto_sync_direct_lan_devices: {str(e)}")
@@ -21715,10 +22048,13 @@ def schedule_auto_sync():
         minutes=AUTO_SYNC_INTERVAL_MINUTES,
         id='auto_sync_biometric',
         name='Auto Sync Direct LAN Devices',
-        replace_existing=True
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
     )
 
-schedule_auto_sync()
+if not _IS_WORKER_PROCESS:
+    schedule_auto_sync()
 
 ########################################
 # AUTO-SYNC CONFIGURATION
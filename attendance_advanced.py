@@ -14,7 +14,7 @@ This module provides enhanced attendance features including:
 import sqlite3
 from datetime import datetime, timedelta, time
 from typing import Dict, List, Optional, Tuple
-from database import get_db
+from database import get_db, refresh_attendance_daily_summary
 from shift_management import ShiftManager
 import json
 
@@ -125,6 +125,7 @@ class AdvancedAttendanceManager:
                 attendance_result['shift_end_time'].strftime('%H:%M:%S')
             ))
         
+        refresh_attendance_daily_summary(school_id, [date], db, commit=False)
         db.commit()
         
         return {
@@ -147,6 +148,7 @@ class AdvancedAttendanceManager:
                 INSERT INTO attendance (staff_id, school_id, date, time_out, status)
                 VALUES (?, ?, ?, ?, 'present')
             ''', (staff_id, school_id, date, time_out.strftime('%H:%M:%S')))
+            refresh_attendance_daily_summary(school_id, [date], db, commit=False)
             db.commit()
             
             return {
@@ -194,6 +196,7 @@ class AdvancedAttendanceManager:
             staff_id, date
         ))
         
+        refresh_attendance_daily_summary(school_id, [date], db, commit=False)
         db.commit()
         
         return {
@@ -222,6 +225,7 @@ class AdvancedAttendanceManager:
             WHERE staff_id = ? AND date = ?
         ''', (overtime_in.strftime('%H:%M:%S'), staff_id, date))
         
+        refresh_attendance_daily_summary(school_id, [date], db, commit=False)
         db.commit()
         
         return {
@@ -260,6 +264,7 @@ class AdvancedAttendanceManager:
             WHERE staff_id = ? AND date = ?
         ''', (overtime_out.strftime('%H:%M:%S'), total_overtime, staff_id, date))
         
+        refresh_attendance_daily_summary(school_id, [date], db, commit=False)
         db.commit()
         
         return {
@@ -498,6 +503,11 @@ class AdvancedAttendanceManager:
                             regularization_status = 'approved'
                         WHERE id = ?
                     ''', (request['expected_time'], request['attendance_id']))
+
+                attendance = db.execute('SELECT date FROM attendance WHERE id = ?',
+                                        (request['attendance_id'],)).fetchone()
+                if attendance:
+                    refresh_attendance_daily_summary(request['school_id'], [attendance['date']], db, commit=False)
             else:
                 # Mark as rejected
                 db.execute('''
@@ -591,6 +601,8 @@ class AdvancedAttendanceManager:
                     ''', (staff['staff_id'], school_id, date, f"On {staff['leave_type']} leave"))
                     marked_count += 1
 
+            if marked_count:
+                refresh_attendance_daily_summary(school_id, [date], db, commit=False)
             db.commit()
 
             return {
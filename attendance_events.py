@@ -0,0 +1,171 @@
+# attendance_events.py
+"""
+Live Attendance Event Feed
+
+Punches are published here by UnifiedAttendanceProcessor once they are
+committed (Direct LAN sync, iClock/ADMS push and agent push all go through
+it) and streamed to admin dashboards as Server-Sent Events:
+- Each event carries the staff member, action and time of the punch
+- Check-ins carry a delta for the dashboard's status counts
+- Recent events are kept per school so reconnecting clients resume from
+  their Last-Event-ID instead of reloading the whole attendance list
+
+Dashboards load the full snapshot (/get_realtime_attendance) once and then
+apply events, so a refresh costs O(events) rather than O(staff) queries per
+connected dashboard. Events live in this process only; with several worker
+processes each dashboard sees the punches committed by its own worker. So
+streams close after ATTENDANCE_STREAM_MAX_DURATION seconds (the browser
+reconnects and reloads the snapshot), which also frees the worker thread,
+and dashboards still reload the snapshot every few minutes while connected.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+# Events kept per school for Last-Event-ID resume, and seconds between
+# keep-alive comments on idle streams.
+ATTENDANCE_EVENT_HISTORY = int(os.getenv('ATTENDANCE_EVENT_HISTORY', '500'))
+ATTENDANCE_STREAM_HEARTBEAT = int(os.getenv('ATTENDANCE_STREAM_HEARTBEAT', '15'))
+# Seconds a stream stays open before the browser has to reconnect
+ATTENDANCE_STREAM_MAX_DURATION = int(os.getenv('ATTENDANCE_STREAM_MAX_DURATION', '300'))
+
+# Attendance statuses that have their own counter on the dashboard
+_COUNTED_STATUSES = ('present', 'late', 'absent')
+
+
+class AttendanceEventBroker:
+    """In-process publish/subscribe of attendance events, per school"""
+
+    def __init__(self, history: int = None):
+        self.history = history or ATTENDANCE_EVENT_HISTORY
+        self._condition = threading.Condition()
+        self._last_id = 0
+        self._events = defaultdict(lambda: deque(maxlen=self.history))  # school_id -> (id, event)
+
+    @property
+    def last_event_id(self) -> int:
+        with self._condition:
+            return self._last_id
+
+    def publish(self, school_id, event: Dict) -> int:
+        """Append an event to a school's feed and wake its subscribers"""
+        with self._condition:
+            self._last_id += 1
+            self._events[int(school_id)].append((self._last_id, event))
+            self._condition.notify_all()
+            return self._last_id
+
+    def publish_many(self, school_id, events: List[Dict]) -> None:
+        """Publish several events with a single wake-up"""
+        if not events:
+            return
+        with self._condition:
+            feed = self._events[int(school_id)]
+            for event in events:
+                self._last_id += 1
+                feed.append((self._last_id, event))
+            self._condition.notify_all()
+
+    def events_since(self, school_id, last_event_id: int = 0) -> List[tuple]:
+        """Events of a school with an id above last_event_id, oldest first"""
+        with self._condition:
+            return self._events_since(int(school_id), last_event_id)
+
+    def _events_since(self, school_id: int, last_event_id: int) -> List[tuple]:
+        feed = self._events.get(school_id)
+        if not feed or feed[-1][0] <= last_event_id:
+            return []
+        return [item for item in feed if item[0] > last_event_id]
+
+    def wait_for_events(self, school_id, last_event_id: int, timeout: float) -> List[tuple]:
+        """Block until the school has events after last_event_id or timeout expires"""
+        school_id = int(school_id)
+        with self._condition:
+            self._condition.wait_for(lambda: self._events_since(school_id, last_event_id), timeout)
+            return self._events_since(school_id, last_event_id)
+
+    def stream(self, school_id, last_event_id: Optional[int] = None,
+               heartbeat: float = None, max_duration: float = None) -> Iterator[str]:
+        """
+        Yield Server-Sent Events for a school
+
+        Args:
+            school_id: School whose punches are streamed
+            last_event_id: Resume after this event (None: only new events)
+            heartbeat: Seconds between keep-alive comments
+            max_duration: Close the stream after this many seconds (default
+                ATTENDANCE_STREAM_MAX_DURATION; the browser's EventSource
+                reconnects with Last-Event-ID)
+        """
+        heartbeat = heartbeat or ATTENDANCE_STREAM_HEARTBEAT
+        max_duration = max_duration or ATTENDANCE_STREAM_MAX_DURATION
+        if last_event_id is None:
+            last_event_id = self.last_event_id
+        deadline = time.monotonic() + max_duration
+
+        yield f"retry: 3000\nid: {last_event_id}\n\n"
+        while time.monotonic() < deadline:
+            wait = max(0.0, min(heartbeat, deadline - time.monotonic()))
+            events = self.wait_for_events(school_id, last_event_id, wait)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event in events:
+                last_event_id = event_id
+                yield format_sse(event_id, event.get('type', 'message'), event)
+
+
+def format_sse(event_id: int, event_type: str, data: Dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def status_delta(previous_status: Optional[str], new_status: Optional[str]) -> Dict[str, int]:
+    """
+    Change to the dashboard status counts when a staff member's attendance
+    status goes from previous_status (None: no record yet, counted absent)
+    to new_status
+    """
+    previous = (previous_status or 'absent').lower()
+    new = (new_status or 'absent').lower()
+    if previous == new or previous not in _COUNTED_STATUSES or new not in _COUNTED_STATUSES:
+        return {}
+    return {previous: -1, new: 1}
+
+
+def punch_event(school_id, staff_db_id: int, staff_number, full_name: str, department: str,
+                action: str, timestamp: datetime, status: str = None, previous_status: str = None) -> Dict:
+    """Build the event published for a committed punch"""
+    event = {
+        'type': 'punch',
+        'school_id': school_id,
+        'staff_id': staff_db_id,
+        'staff_number': str(staff_number) if staff_number is not None else None,
+        'full_name': full_name,
+        'department': department,
+        'action': action,
+        'date': timestamp.date().isoformat(),
+        'time': timestamp.strftime('%H:%M:%S'),
+        'time_display': timestamp.strftime('%I:%M %p'),
+        'status': status,
+        'today': timestamp.date() == date.today(),
+        'delta': {}
+    }
+    if action == 'check-in' and event['today']:
+        event['delta'] = status_delta(previous_status, status)
+    return event
+
+
+# Broker shared by the attendance processor and the stream route
+attendance_events = AttendanceEventBroker()
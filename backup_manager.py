@@ -21,7 +21,6 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import get_db
-import pandas as pd
 import threading
 from pathlib import Path
 
@@ -172,6 +171,8 @@ class BackupManager:
                         start_date: str = None, end_date: str = None,
                         tables: List[str] = None) -> Dict:
         """Export data to Excel format"""
+        import pandas as pd  # heavy; keep it out of app startup
+
         try:
             db = get_db()
             excel_path = f"{export_path}.xlsx"
@@ -247,6 +248,8 @@ class BackupManager:
                       start_date: str = None, end_date: str = None,
                       tables: List[str] = None) -> Dict:
         """Export data to CSV format"""
+        import pandas as pd
+
         try:
             db = get_db()
             csv_dir = f"{export_path}_csv"
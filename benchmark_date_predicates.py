@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Compare function-wrapped date filters with the half-open ranges that replaced
+them (see DATE RANGES in database.py).
+
+Builds a synthetic SQLite database (staff, a year of biometric verifications
+and attendance, leave/on-duty/permission applications) with the INDEX_CATALOG
+indexes applied, then for each query pair checks that both forms return the
+same rows, prints their plans and times them. Exits with status 1 if a
+rewritten query returns different rows or doesn't search an index on its
+date column.
+
+Usage:
+    python benchmark_date_predicates.py [--staff N] [--days N] [--repeat N]
+"""
+
+import argparse
+import datetime
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+import database
+from database import date_span_range, day_range, ensure_indexes, month_range, year_range
+from index_advisor import explain
+
+SCHEMA = '''
+CREATE TABLE staff (id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT,
+                    UNIQUE(school_id, staff_id));
+CREATE TABLE students (id INTEGER PRIMARY KEY, school_id INTEGER, full_name TEXT, created_at TIMESTAMP);
+CREATE TABLE attendance (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE,
+                         status TEXT, UNIQUE(staff_id, date));
+CREATE TABLE biometric_verifications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER,
+                                      verification_type TEXT, verification_time DATETIME);
+CREATE TABLE leave_applications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, leave_type TEXT,
+                                 start_date DATE, end_date DATE, status TEXT);
+CREATE TABLE on_duty_applications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER,
+                                   start_date DATE, end_date DATE, status TEXT);
+CREATE TABLE permission_applications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER,
+                                      permission_date DATE, duration_hours REAL, status TEXT);
+'''
+
+FIRST_DAY = datetime.date(2025, 1, 1)
+SCHOOL_ID = 1
+
+# (label, filtered column, function-wrapped SQL, range SQL, legacy params,
+# range params); params are built from the sample staff member, day, month
+# and year
+QUERY_PAIRS = (
+    ('Today\'s verifications', 'verification_time',
+     'SELECT id FROM biometric_verifications WHERE staff_id = ? AND DATE(verification_time) = ? ORDER BY id',
+     'SELECT id FROM biometric_verifications WHERE staff_id = ? AND verification_time >= ? '
+     'AND verification_time < ? ORDER BY id',
+     lambda p: (p['staff'], p['day'].isoformat()),
+     lambda p: (p['staff'], *day_range(p['day']))),
+    ('Verifications in a date span', 'verification_time',
+     'SELECT id FROM biometric_verifications WHERE staff_id = ? AND DATE(verification_time) BETWEEN ? AND ? '
+     'ORDER BY id',
+     'SELECT id FROM biometric_verifications WHERE staff_id = ? AND verification_time >= ? '
+     'AND verification_time < ? ORDER BY id',
+     lambda p: (p['staff'], p['month_start'].isoformat(), p['month_end'].isoformat()),
+     lambda p: (p['staff'], *date_span_range(p['month_start'], p['month_end']))),
+    ('Students added this month', 'created_at',
+     'SELECT COUNT(*) FROM students WHERE school_id = ? AND strftime(\'%Y-%m\', created_at) = ?',
+     'SELECT COUNT(*) FROM students WHERE school_id = ? AND created_at >= ? AND created_at < ?',
+     lambda p: (SCHOOL_ID, p['month_start'].strftime('%Y-%m')),
+     lambda p: (SCHOOL_ID, *month_range(p['month_start'].year, p['month_start'].month))),
+    ('Leave taken in the year', 'start_date',
+     'SELECT id FROM leave_applications WHERE staff_id = ? AND school_id = ? '
+     'AND strftime(\'%Y\', start_date) = ? AND status = \'approved\' ORDER BY id',
+     'SELECT id FROM leave_applications WHERE staff_id = ? AND school_id = ? '
+     'AND start_date >= ? AND start_date < ? AND status = \'approved\' ORDER BY id',
+     lambda p: (p['staff'], SCHOOL_ID, str(p['year'])),
+     lambda p: (p['staff'], SCHOOL_ID, *year_range(p['year']))),
+    ('On-duty taken in the year', 'start_date',
+     'SELECT id FROM on_duty_applications WHERE staff_id = ? AND school_id = ? '
+     'AND strftime(\'%Y\', start_date) = ? AND status = \'approved\' ORDER BY id',
+     'SELECT id FROM on_duty_applications WHERE staff_id = ? AND school_id = ? '
+     'AND start_date >= ? AND start_date < ? AND status = \'approved\' ORDER BY id',
+     lambda p: (p['staff'], SCHOOL_ID, str(p['year'])),
+     lambda p: (p['staff'], SCHOOL_ID, *year_range(p['year']))),
+    ('Permission hours in the year', 'permission_date',
+     'SELECT SUM(duration_hours) FROM permission_applications WHERE staff_id = ? AND school_id = ? '
+     'AND strftime(\'%Y\', permission_date) = ? AND status = \'approved\'',
+     'SELECT SUM(duration_hours) FROM permission_applications WHERE staff_id = ? AND school_id = ? '
+     'AND permission_date >= ? AND permission_date < ? AND status = \'approved\'',
+     lambda p: (p['staff'], SCHOOL_ID, str(p['year'])),
+     lambda p: (p['staff'], SCHOOL_ID, *year_range(p['year']))),
+)
+
+
+def build_database(staff_count=100, days=365, seed=7):
+    """In-memory database with synthetic data and the catalog indexes"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+
+    conn.executemany('INSERT INTO staff (id, school_id, staff_id, full_name) VALUES (?, ?, ?, ?)',
+                     [(n, SCHOOL_ID, f'S{n}', f'Staff {n}') for n in range(1, staff_count + 1)])
+    attendance, verifications, leave, on_duty, permission, students = [], [], [], [], [], []
+    for offset in range(days):
+        day = FIRST_DAY + datetime.timedelta(days=offset)
+        students.append((SCHOOL_ID, f'Student {offset}', f'{day} 10:00:00'))
+        for staff in range(1, staff_count + 1):
+            attendance.append((staff, SCHOOL_ID, day.isoformat(), 'present'))
+            verifications.append((staff, SCHOOL_ID, 'check-in', f'{day} 0{rng.randint(7, 9)}:{rng.randint(10, 59)}:00'))
+            verifications.append((staff, SCHOOL_ID, 'check-out', f'{day} 1{rng.randint(6, 8)}:{rng.randint(10, 59)}:00'))
+            if rng.random() < 0.03:
+                leave.append((staff, SCHOOL_ID, 'CL', day.isoformat(), day.isoformat(), 'approved'))
+            if rng.random() < 0.01:
+                on_duty.append((staff, SCHOOL_ID, day.isoformat(), day.isoformat(), 'approved'))
+            if rng.random() < 0.02:
+                permission.append((staff, SCHOOL_ID, day.isoformat(), 1.5, 'approved'))
+
+    conn.executemany('INSERT INTO attendance (staff_id, school_id, date, status) VALUES (?, ?, ?, ?)', attendance)
+    conn.executemany('INSERT INTO biometric_verifications (staff_id, school_id, verification_type, verification_time) '
+                     'VALUES (?, ?, ?, ?)', verifications)
+    conn.executemany('INSERT INTO leave_applications (staff_id, school_id, leave_type, start_date, end_date, status) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', leave)
+    conn.executemany('INSERT INTO on_duty_applications (staff_id, school_id, start_date, end_date, status) '
+                     'VALUES (?, ?, ?, ?, ?)', on_duty)
+    conn.executemany('INSERT INTO permission_applications (staff_id, school_id, permission_date, duration_hours, '
+                     'status) VALUES (?, ?, ?, ?, ?)', permission)
+    conn.executemany('INSERT INTO students (school_id, full_name, created_at) VALUES (?, ?, ?)', students)
+    conn.commit()
+
+    original = database._USE_MYSQL
+    database._USE_MYSQL = False
+    database.invalidate_schema_cache()
+    try:
+        ensure_indexes(conn)
+    finally:
+        database._USE_MYSQL = original
+        database.invalidate_schema_cache()
+    conn.execute('ANALYZE')
+    return conn
+
+
+def sample_params(staff_count, days):
+    day = FIRST_DAY + datetime.timedelta(days=min(days - 1, 45))
+    month_start = day.replace(day=1)
+    month_end = datetime.date.fromisoformat(month_range(day.year, day.month)[1]) - datetime.timedelta(days=1)
+    return {'staff': max(1, staff_count // 2), 'day': day, 'month_start': month_start,
+            'month_end': month_end, 'year': day.year}
+
+
+def time_query(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def compare(conn, params, repeat=5):
+    """One result dict per QUERY_PAIRS entry"""
+    results = []
+    for label, column, legacy_sql, range_sql, legacy_params, range_params in QUERY_PAIRS:
+        legacy_args, range_args = legacy_params(params), range_params(params)
+        legacy_rows = [tuple(row) for row in conn.execute(legacy_sql, legacy_args).fetchall()]
+        range_rows = [tuple(row) for row in conn.execute(range_sql, range_args).fetchall()]
+        legacy_plan, legacy_scans = explain(conn, legacy_sql, legacy_args, False)
+        range_plan, range_scans = explain(conn, range_sql, range_args, False)
+        results.append({
+            'label': label,
+            'same_rows': legacy_rows == range_rows,
+            'rows': len(range_rows),
+            'legacy_plan': legacy_plan,
+            'range_plan': range_plan,
+            'legacy_scans': legacy_scans,
+            'range_scans': range_scans,
+            # the index is searched on the date column, not just filtered by it
+            'legacy_seek': any(f'{column}>' in line for line in legacy_plan),
+            'range_seek': any(f'{column}>' in line for line in range_plan),
+            'legacy_seconds': time_query(conn, legacy_sql, legacy_args, repeat),
+            'range_seconds': time_query(conn, range_sql, range_args, repeat),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark function-wrapped date filters against range predicates')
+    parser.add_argument('--staff', type=int, default=200, help='Synthetic staff members (default 200)')
+    parser.add_argument('--days', type=int, default=365, help='Days of synthetic data (default 365)')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query (default 20)')
+    args = parser.parse_args()
+
+    print(f'Building {args.staff} staff x {args.days} days...')
+    conn = build_database(args.staff, args.days)
+    failures = 0
+    for result in compare(conn, sample_params(args.staff, args.days), args.repeat):
+        ok = result['same_rows'] and result['range_seek'] and not result['range_scans']
+        failures += not ok
+        speedup = result['legacy_seconds'] / result['range_seconds'] if result['range_seconds'] else float('inf')
+        print(f"\n{'✓' if ok else '❌'} {result['label']}: {result['legacy_seconds'] * 1000:.2f}ms -> "
+              f"{result['range_seconds'] * 1000:.2f}ms ({speedup:.1f}x)")
+        print(f"    before: {' | '.join(result['legacy_plan'])}")
+        print(f"    after:  {' | '.join(result['range_plan'])}")
+        if not result['same_rows']:
+            print('    rows differ between the two forms')
+        if not result['range_seek']:
+            print('    the date range is not used to search an index')
+
+    if failures:
+        print(f'\n{failures} rewritten quer{"y" if failures == 1 else "ies"} failed')
+        return 1
+    print('\n✅ Every rewritten query returns the same rows through an index')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Measure application startup: importing app.py and the schema bootstrap.
+
+Each run boots the app in a fresh interpreter (as a new gunicorn worker
+would) against the configured database. The first run forces the full
+init_db() pass (FORCE_SCHEMA_BOOTSTRAP=1); the others use the
+schema_version stamp it leaves behind. --importtime also lists the
+slowest modules imported by app.py.
+
+Usage:
+    python benchmark_startup.py [--runs N] [--importtime] [--top N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'PIL', 'requests', 'pymysql', 'matplotlib', 'reportlab')
+
+CHILD = f'''
+import json, sys, time
+started = time.perf_counter()
+import app
+import_seconds = time.perf_counter() - started
+import database
+print('BENCHMARK ' + json.dumps({{
+    'import_seconds': import_seconds,
+    'bootstrap_ran': database.LAST_SCHEMA_BOOTSTRAP['ran'],
+    'bootstrap_seconds': database.LAST_SCHEMA_BOOTSTRAP['seconds'],
+    'heavy_modules': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+
+def boot(force_bootstrap=False, importtime=False):
+    env = dict(os.environ, FORCE_SCHEMA_BOOTSTRAP='1' if force_bootstrap else '0')
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD]
+    result = subprocess.run(command, capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in result.stdout.splitlines():
+        if line.startswith('BENCHMARK '):
+            return json.loads(line[len('BENCHMARK '):]), result.stderr
+    raise RuntimeError(f'App failed to start:\n{result.stderr[-2000:]}')
+
+
+def slowest_imports(stderr, top):
+    """Top-level (direct) imports of app.py by cumulative time, from -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip()) == 3:  # imported directly by app.py
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def summarize(label, runs):
+    imports = [run['import_seconds'] for run in runs]
+    bootstraps = [run['bootstrap_seconds'] for run in runs]
+    print(f"{label:<18} runs={len(runs):<3} import median={statistics.median(imports):.3f}s "
+          f"min={min(imports):.3f}s  bootstrap median={statistics.median(bootstraps) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark app import and schema bootstrap time')
+    parser.add_argument('--runs', type=int, default=5, help='Boots with a current schema stamp (default 5)')
+    parser.add_argument('--importtime', action='store_true', help='List the slowest imports of app.py')
+    parser.add_argument('--top', type=int, default=10, help='Imports to list with --importtime')
+    args = parser.parse_args()
+
+    print('Booting with a forced schema bootstrap...')
+    full, _ = boot(force_bootstrap=True)
+    stamped = []
+    for _ in range(max(1, args.runs)):
+        run, _ = boot()
+        stamped.append(run)
+
+    print()
+    summarize('Full bootstrap', [full])
+    summarize('Stamped schema', stamped)
+    if any(run['bootstrap_ran'] for run in stamped):
+        print('⚠️  The bootstrap pass ran on a stamped boot (did a startup migration fail?)')
+    print(f"Heavy modules loaded at startup: {', '.join(stamped[-1]['heavy_modules']) or 'none'}")
+
+    if args.importtime:
+        _, stderr = boot(importtime=True)
+        print('\nSlowest imports of app.py (cumulative):')
+        for seconds, name in slowest_imports(stderr, args.top):
+            print(f'  {seconds * 1000:8.1f}ms  {name}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
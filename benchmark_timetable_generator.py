@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark the timetable generator (timetable_generator.py) on synthetic
+schools.
+
+Each school has N sections with 8 periods a day, Monday to Saturday, and
+eight subjects totalling 44 periods a week; every subject has its own staff
+members, each teaching it in as many sections as keeps them near 30 periods a
+week. A few staff periods are marked unavailable. For each size the whole
+school is generated, then a tenth of its sections is re-solved around the
+rest with a fifth of their lessons locked. Every result is checked against
+the constraints. Exits with status 1 if a timetable is incomplete or breaks
+a constraint.
+
+Usage:
+    python benchmark_timetable_generator.py [--sections N [N ...]] [--budget SECONDS] [--seed N]
+"""
+
+import argparse
+import random
+import sys
+
+from timetable_generator import MAX_TIME_BUDGET, TimetableSolver
+
+DAYS = (1, 2, 3, 4, 5, 6)
+PERIODS = 8
+MAX_DAILY_LOAD = 6
+
+# (subject, periods per week, sections per staff member)
+SUBJECTS = (
+    ('English', 7, 4), ('Maths', 7, 4), ('Science', 6, 5), ('Social', 6, 5),
+    ('Language', 6, 5), ('Computer', 5, 6), ('Art', 4, 7), ('Sports', 3, 10),
+)
+
+
+def build_problem(section_count, seed=7):
+    """TimetableSolver arguments for a synthetic school"""
+    rng = random.Random(seed)
+    full_day = sum(1 << period for period in range(1, PERIODS + 1))
+    section_slots = {section: {day: full_day for day in DAYS} for section in range(1, section_count + 1)}
+    section_levels = {section: (section - 1) // 10 + 1 for section in section_slots}
+
+    requirements = []
+    staff_blocked = {}
+    next_staff = 1
+    for subject, per_week, per_staff in SUBJECTS:
+        for first in range(1, section_count + 1, per_staff):
+            staff_id = next_staff
+            next_staff += 1
+            for section in range(first, min(first + per_staff, section_count + 1)):
+                requirements.append({'section_id': section, 'subject_name': subject,
+                                     'periods_per_week': per_week, 'staff_ids': [staff_id]})
+            # One unavailable period for roughly every third staff member
+            if rng.random() < 0.3:
+                staff_blocked[staff_id] = {rng.choice(DAYS): 1 << rng.randint(1, PERIODS)}
+    return {'section_slots': section_slots, 'section_levels': section_levels, 'requirements': requirements,
+            'fixed': [], 'staff_blocked': staff_blocked, 'max_daily_load': MAX_DAILY_LOAD, 'days': DAYS}
+
+
+def check_timetable(problem, assignments):
+    """Constraint violations of `assignments` together with problem['fixed'] (empty list if none)"""
+    errors = []
+    sections, staff, load, subject_days = set(), set(), {}, {}
+    rows = [(row['staff_id'], row['section_id'], row['day_of_week'], row['period_number'], row['subject_name'])
+            for row in assignments]
+    for staff_id, section_id, day, period, subject in list(problem['fixed']) + rows:
+        if (section_id, day, period) in sections:
+            errors.append(f'section {section_id} double-booked on day {day} period {period}')
+        if (staff_id, day, period) in staff:
+            errors.append(f'staff {staff_id} double-booked on day {day} period {period}')
+        sections.add((section_id, day, period))
+        staff.add((staff_id, day, period))
+        load[(staff_id, day)] = load.get((staff_id, day), 0) + 1
+        key = (section_id, str(subject).lower(), day)
+        subject_days[key] = subject_days.get(key, 0) + 1
+
+    requirements = {(req['section_id'], req['subject_name'].lower()): req for req in problem['requirements']}
+    teachers = {}
+    for staff_id, section_id, day, period, subject in rows:
+        req = requirements.get((section_id, subject.lower()))
+        if req is None or staff_id not in req['staff_ids']:
+            errors.append(f'staff {staff_id} is not a candidate for {subject} in section {section_id}')
+        teachers.setdefault((section_id, subject.lower()), set()).add(staff_id)
+        if not problem['section_slots'][section_id].get(day, 0) >> period & 1:
+            errors.append(f'section {section_id} has no period {period} on day {day}')
+        if problem['staff_blocked'].get(staff_id, {}).get(day, 0) >> period & 1:
+            errors.append(f'staff {staff_id} is unavailable on day {day} period {period}')
+    errors.extend(f'{key[1]} in section {key[0]} split between staff {sorted(ids)}'
+                  for key, ids in teachers.items() if len(ids) > 1)
+    errors.extend(f'staff {key[0]} has {count} classes on day {key[1]}'
+                  for key, count in load.items() if count > problem['max_daily_load'])
+    for key, count in subject_days.items():
+        req = requirements.get(key[:2])
+        if req is not None and count > (req.get('max_per_day') or 2):
+            errors.append(f'{key[1]} taught {count} times on day {key[2]} in section {key[0]}')
+    return errors
+
+
+def resolve_subset(problem, assignments, seed=7):
+    """Problem re-solving a tenth of the sections around the rest, with a fifth of their lessons locked"""
+    rng = random.Random(seed)
+    section_ids = sorted(problem['section_slots'])
+    scope = set(rng.sample(section_ids, max(1, len(section_ids) // 10)))
+    fixed = []
+    for row in assignments:
+        if row['section_id'] not in scope or rng.random() < 0.2:
+            fixed.append((row['staff_id'], row['section_id'], row['day_of_week'], row['period_number'],
+                          row['subject_name']))
+    return dict(problem,
+                section_slots={section: problem['section_slots'][section] for section in scope},
+                section_levels={section: problem['section_levels'][section] for section in scope},
+                requirements=[req for req in problem['requirements'] if req['section_id'] in scope],
+                fixed=fixed)
+
+
+def report(label, problem, result):
+    errors = check_timetable(problem, result['assignments'])
+    stats = result['stats']
+    ok = result['complete'] and not errors
+    print(f"{'✓' if ok else '❌'} {label}: {stats['placed']}/{stats['lessons']} lessons in "
+          f"{stats['elapsed_ms'] / 1000:.2f}s ({stats['backtracks']} backtracks, {stats['restarts']} restarts)")
+    for error in errors[:5]:
+        print(f'    {error}')
+    if not result['complete']:
+        print(f"    {len(result['unplaced'])} subject(s) not fully placed")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the timetable generator on synthetic schools')
+    parser.add_argument('--sections', type=int, nargs='+', default=[50, 100, 200],
+                        help='School sizes in sections (default 50 100 200)')
+    parser.add_argument('--budget', type=float, default=MAX_TIME_BUDGET,
+                        help=f'Time budget per solve in seconds (default {MAX_TIME_BUDGET:g}, what a request gets)')
+    parser.add_argument('--seed', type=int, default=7, help='Seed for the synthetic data and the search')
+    args = parser.parse_args()
+
+    failures = 0
+    for count in args.sections:
+        problem = build_problem(count, args.seed)
+        print(f"\n{count} sections, {len(problem['requirements'])} subject groups")
+        result = TimetableSolver(**problem).solve(args.budget, seed=args.seed)
+        failures += not report('full timetable', problem, result)
+        if result['complete']:
+            partial = resolve_subset(problem, result['assignments'], args.seed)
+            result = TimetableSolver(**partial).solve(args.budget, seed=args.seed)
+            failures += not report(f"re-solve of {len(partial['section_slots'])} sections", partial, result)
+
+    if failures:
+        print(f'\n{failures} run(s) failed')
+        return 1
+    print('\n✅ Every timetable is complete and conflict-free')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
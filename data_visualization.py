@@ -14,7 +14,7 @@ This module provides advanced data visualization and analytics features includin
 import json
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional, Tuple
-from database import get_db
+from database import get_db, get_attendance_daily_summary
 import calendar
 
 
@@ -59,21 +59,7 @@ class DataVisualization:
     
     def generate_daily_trends_chart(self, school_id: int, start_date: str, end_date: str) -> Dict:
         """Generate line chart for daily attendance trends"""
-        db = get_db()
-        
-        daily_data = db.execute('''
-            SELECT 
-                a.date,
-                COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_count,
-                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as absent_count,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_count,
-                COUNT(*) as total_count
-            FROM attendance a
-            JOIN staff s ON a.staff_id = s.id
-            WHERE s.school_id = ? AND a.date BETWEEN ? AND ?
-            GROUP BY a.date
-            ORDER BY a.date
-        ''', (school_id, start_date, end_date)).fetchall()
+        daily_data = get_attendance_daily_summary(school_id, start_date, end_date)
         
         return {
             'type': 'line',
@@ -213,18 +199,7 @@ class DataVisualization:
         else:
             end_date = date(year, month + 1, 1) - timedelta(days=1)
         
-        daily_data = db.execute('''
-            SELECT 
-                a.date,
-                COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_count,
-                COUNT(*) as total_count,
-                ROUND(COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) * 100.0 / COUNT(*), 2) as attendance_rate
-            FROM attendance a
-            JOIN staff s ON a.staff_id = s.id
-            WHERE s.school_id = ? AND a.date BETWEEN ? AND ?
-            GROUP BY a.date
-            ORDER BY a.date
-        ''', (school_id, start_date, end_date)).fetchall()
+        daily_data = get_attendance_daily_summary(school_id, start_date, end_date, db=db)
         
         # Create calendar grid data
         calendar_data = []
@@ -237,17 +212,17 @@ class DataVisualization:
             date_str = current_date.strftime('%Y-%m-%d')
             attendance_info = attendance_lookup.get(date_str, {
                 'present_count': 0,
-                'total_count': 0,
-                'attendance_rate': 0
+                'record_count': 0
             })
+            total_count = attendance_info['record_count']
             
             calendar_data.append({
                 'date': date_str,
                 'day': current_date.day,
                 'weekday': current_date.weekday(),
-                'attendance_rate': attendance_info['attendance_rate'],
+                'attendance_rate': round(attendance_info['present_count'] * 100.0 / total_count, 2) if total_count else 0,
                 'present_count': attendance_info['present_count'],
-                'total_count': attendance_info['total_count'],
+                'total_count': total_count,
                 'is_weekend': current_date.weekday() >= 5
             })
             
@@ -1,8 +1,15 @@
 # database.py
 import sqlite3
-from flask import g
+from flask import g, has_app_context, has_request_context, request
 import os
 import json
+import re
+import functools
+import threading
+import time
+import collections
+import bisect
+import contextlib
 
 # ---------------------------------------------------------------------------
 # DATABASE BACKEND CONFIGURATION
@@ -23,6 +30,16 @@ SQLITE_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'vishnorex.db'
 # Detect backend from URL prefix
 _USE_MYSQL = DATABASE_URL.startswith('mysql')
 
+# MySQL connection pool sizing (ignored for SQLite).
+#   DB_POOL_MIN_SIZE      connections opened when the pool is first used
+#   DB_POOL_MAX_SIZE      hard cap on open connections per process
+#   DB_POOL_MAX_LIFETIME  seconds before a connection is closed and replaced
+#   DB_POOL_TIMEOUT       seconds a request waits for a free connection
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+
 
 def _parse_mysql_url(url):
     """
@@ -86,21 +103,433 @@ def _coerce_mysql_value(val):
     return val
 
 
+# PyMySQL field type codes (pymysql.constants.FIELD_TYPE) whose values may need
+# _coerce_mysql_value: TIME comes back as timedelta, and the string/blob family
+# comes back as bytes when the column uses the binary charset.
+_FIELD_TYPE_TIME = 11
+_FIELD_TYPES_TEXT = frozenset({15, 16, 249, 250, 251, 252, 253, 254, 255})
+_BINARY_CHARSET = 63
+
+
+class _MySQLResultColumns:
+    """
+    Column metadata for one result set, computed once and shared by all of
+    its rows: the column names and the indexes that need value coercion.
+    """
+    __slots__ = ('names', 'coerce_idx')
+
+    def __init__(self, raw_cursor):
+        description = raw_cursor.description or ()
+        self.names = tuple(d[0] for d in description)
+        fields = getattr(getattr(raw_cursor, '_result', None), 'fields', None)
+        if fields is not None and len(fields) != len(description):
+            fields = None
+        coerce_idx = []
+        for i, d in enumerate(description):
+            type_code = d[1]
+            if type_code == _FIELD_TYPE_TIME:
+                coerce_idx.append(i)
+            elif type_code in _FIELD_TYPES_TEXT:
+                # Without field metadata we can't tell TEXT from BLOB; check both.
+                if fields is None or getattr(fields[i], 'charsetnr', _BINARY_CHARSET) == _BINARY_CHARSET:
+                    coerce_idx.append(i)
+        self.coerce_idx = tuple(coerce_idx)
+
+
 class _MySQLRow(dict):
     """dict subclass that also supports index-based access like sqlite3.Row."""
-    def __init__(self, cursor, row):
-        cols = [d[0] for d in cursor.description]
-        coerced = [_coerce_mysql_value(v) for v in row]
-        super().__init__(zip(cols, coerced))
-        self._list = coerced
+    __slots__ = ('_values',)
+
+    def __init__(self, columns, row):
+        if columns.coerce_idx:
+            row = list(row)
+            for i in columns.coerce_idx:
+                if row[i] is not None:
+                    row[i] = _coerce_mysql_value(row[i])
+        super().__init__(zip(columns.names, row))
+        self._values = row
 
     def __getitem__(self, key):
         if isinstance(key, int):
-            return self._list[key]
+            return self._values[key]
         return super().__getitem__(key)
 
-    def keys(self):
-        return super().keys()
+
+# ---------------------------------------------------------------------------
+# SQLite → MySQL dialect translation
+# ---------------------------------------------------------------------------
+# The app issues a few hundred distinct SQL strings, so each one is translated
+# once per process and served from an LRU cache afterwards.  All patterns are
+# compiled at import time.
+SQL_TRANSLATION_CACHE_SIZE = int(os.getenv('SQL_TRANSLATION_CACHE_SIZE', '2048'))
+
+_I = re.IGNORECASE
+_RE_AUTOINCREMENT = re.compile(r'\bAUTOINCREMENT\b')
+_RE_INT_PK_AUTO = re.compile(r'\bINTEGER\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', _I)
+_RE_BOOLEAN = re.compile(r'\bBOOLEAN\b')
+_RE_REAL = re.compile(r'\bREAL\b')
+_RE_TEXT = re.compile(r'\bTEXT\b', _I)
+_RE_DEFAULT = re.compile(r'\bDEFAULT\b', _I)
+_RE_SQLITE_MASTER_SQL = re.compile(r"SELECT\s+sql\s+FROM\s+sqlite_master\b[^\n]*", _I)
+_RE_SQLITE_MASTER_TABLE = re.compile(
+    r"SELECT\s+name\s+FROM\s+sqlite_master\s+WHERE\s+type\s*=\s*'table'\s+AND\s+name\s*=\s*(%s|'[^']*')", _I)
+_RE_SQLITE_MASTER_TABLES = re.compile(
+    r"SELECT\s+name\s+FROM\s+sqlite_master\s+WHERE\s+type\s*=\s*'table'", _I)
+_RE_PRAGMA_TABLE_INFO = re.compile(r'\bPRAGMA\s+table_info\s*\(\s*([^\)]+?)\s*\)', _I)
+_RE_PRAGMA_FOREIGN_KEYS = re.compile(r'\bPRAGMA\s+foreign_keys\s*=\s*\w+\b', _I)
+_RE_PRAGMA_ANY = re.compile(r'\bPRAGMA\s+\w+(?:\s*\([^)]*\))?', _I)
+_RE_DQUOTE_LITERAL = re.compile(r'(?<=[=\(\,\s])\"([^\"\\n]*)\"(?=[,\)\s]|$)')
+_RE_INSERT_OR_IGNORE = re.compile(r'\bINSERT\s+OR\s+IGNORE\b', _I)
+_RE_INSERT_OR_REPLACE = re.compile(r'\bINSERT\s+OR\s+REPLACE\b', _I)
+_RE_CAST_INTEGER = re.compile(r'\bCAST\s*\(([^)]+)\bAS\s+INTEGER\s*\)', _I)
+_RE_CAST_TEXT = re.compile(r'\bCAST\s*\(([^)]+)\bAS\s+TEXT\s*\)', _I)
+_RE_STRFTIME = re.compile(r"strftime\s*\(\s*'([^']*)'\s*,\s*([^)]+)\)", _I)
+_RE_JULIANDAY_DIFF = re.compile(r'julianday\s*\(\s*([^)]+)\s*\)\s*-\s*julianday\s*\(\s*([^)]+)\s*\)', _I)
+_RE_NOW_LITERAL = re.compile(r"'now'", _I)
+_RE_JULIANDAY_NOW = re.compile(r"julianday\s*\(\s*'now'\s*\)", _I)
+_RE_JULIANDAY = re.compile(r'julianday\s*\(\s*([^)]+)\s*\)', _I)
+_RE_DATE_NOW_OFFSET = re.compile(r"date\s*\(\s*'now'\s*,\s*'([+\-])(\d+)\s+(\w+)'\s*\)", _I)
+_RE_DATE_NOW = re.compile(r"\bDATE\s*\(\s*'now'\s*\)", _I)
+_RE_DATETIME_NOW = re.compile(r"\bdatetime\s*\(\s*'now'\s*\)", _I)
+
+_STRFTIME_MAP = {
+    '%Y-%m-%d': lambda c: f'DATE({c})',
+    '%Y-%m':    lambda c: f"DATE_FORMAT({c}, '%%Y-%%m')",
+    '%Y':       lambda c: f'YEAR({c})',
+    '%m':       lambda c: f'MONTH({c})',
+    '%d':       lambda c: f'DAY({c})',
+    '%H':       lambda c: f'HOUR({c})',
+    '%M':       lambda c: f'MINUTE({c})',
+    '%S':       lambda c: f'SECOND({c})',
+    '%W':       lambda c: f'WEEK({c})',
+    '%w':       lambda c: f'(DAYOFWEEK({c})-1)',
+    '%j':       lambda c: f'DAYOFYEAR({c})',
+}
+
+
+def _pragma_table_info(m):
+    # PRAGMA table_info(table) → INFORMATION_SCHEMA equivalent (returns cid/name/type/notnull/dflt_value/pk)
+    tbl = m.group(1).strip('`"\'')
+    return (
+        "SELECT ORDINAL_POSITION-1 AS cid, COLUMN_NAME AS `name`, "
+        "COLUMN_TYPE AS `type`, "
+        "CASE WHEN IS_NULLABLE='NO' THEN 1 ELSE 0 END AS `notnull`, "
+        "COLUMN_DEFAULT AS dflt_value, "
+        "CASE WHEN COLUMN_KEY='PRI' THEN 1 ELSE 0 END AS pk "
+        "FROM INFORMATION_SCHEMA.COLUMNS "
+        f"WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='{tbl}' "
+        "ORDER BY ORDINAL_POSITION"
+    )
+
+
+def _strftime_to_mysql(m):
+    fmt = m.group(1)
+    col = m.group(2).strip()
+    fn = _STRFTIME_MAP.get(fmt)
+    if fn:
+        return fn(col)
+    # Escape % signs for other format strings
+    escaped_fmt = fmt.replace('%', '%%')
+    return f"DATE_FORMAT({col}, '{escaped_fmt}')"
+
+
+def _julianday_diff(m):
+    # julianday(a) - julianday(b) → DATEDIFF(a, b)
+    a = _RE_NOW_LITERAL.sub('CURDATE()', m.group(1).strip())
+    b = _RE_NOW_LITERAL.sub('CURDATE()', m.group(2).strip())
+    return f'DATEDIFF({a}, {b})'
+
+
+def _date_now_offset(m):
+    sign   = m.group(1)
+    amount = m.group(2)
+    unit   = m.group(3).rstrip('sS').upper()  # days→DAY, months→MONTH
+    unit_norm = {'DAY': 'DAY', 'MONTH': 'MONTH', 'YEAR': 'YEAR',
+                 'WEEK': 'WEEK', 'HOUR': 'HOUR', 'MINUTE': 'MINUTE'}.get(unit, unit)
+    fn = 'DATE_ADD' if sign == '+' else 'DATE_SUB'
+    return f"{fn}(CURDATE(), INTERVAL {amount} {unit_norm})"
+
+
+@functools.lru_cache(maxsize=SQL_TRANSLATION_CACHE_SIZE)
+def _translate_sql(sql):
+    """Convert SQLite syntax → MySQL syntax (memoized per raw SQL string)."""
+    # Placeholder substitution
+    sql = sql.replace('?', '%s')
+    # SQLite AUTOINCREMENT → MySQL AUTO_INCREMENT
+    sql = _RE_AUTOINCREMENT.sub('AUTO_INCREMENT', sql)
+    # SQLite INTEGER PRIMARY KEY → MySQL INT PRIMARY KEY
+    sql = _RE_INT_PK_AUTO.sub('INT PRIMARY KEY AUTO_INCREMENT', sql)
+    # BOOLEAN → TINYINT(1)
+    sql = _RE_BOOLEAN.sub('TINYINT(1)', sql)
+    # REAL → DOUBLE
+    sql = _RE_REAL.sub('DOUBLE', sql)
+    # MySQL: TEXT columns can't have DEFAULT values → VARCHAR(500)
+    fixed = []
+    for line in sql.split('\n'):
+        if _RE_TEXT.search(line) and _RE_DEFAULT.search(line):
+            line = _RE_TEXT.sub('VARCHAR(500)', line)
+        fixed.append(line)
+    sql = '\n'.join(fixed)
+    # sqlite_master → INFORMATION_SCHEMA equivalents
+    # "SELECT sql FROM sqlite_master ..." → returns no rows (skip SQLite-only migrations)
+    sql = _RE_SQLITE_MASTER_SQL.sub(
+        "SELECT '' AS `sql` FROM INFORMATION_SCHEMA.TABLES WHERE 1=0", sql)
+    # "SELECT name FROM sqlite_master WHERE type='table' AND name='X'"
+    sql = _RE_SQLITE_MASTER_TABLE.sub(
+        r"SELECT table_name AS name FROM INFORMATION_SCHEMA.TABLES WHERE table_schema=DATABASE() AND table_name=\1",
+        sql)
+    # "SELECT name FROM sqlite_master WHERE type='table'"
+    sql = _RE_SQLITE_MASTER_TABLES.sub(
+        "SELECT table_name AS name FROM INFORMATION_SCHEMA.TABLES WHERE table_schema=DATABASE()", sql)
+    sql = _RE_PRAGMA_TABLE_INFO.sub(_pragma_table_info, sql)
+    # PRAGMA foreign_keys ... → no-op
+    sql = _RE_PRAGMA_FOREIGN_KEYS.sub('SELECT 1', sql)
+    # PRAGMA ... (any other pragma, consume optional (args)) → no-op
+    sql = _RE_PRAGMA_ANY.sub('SELECT 1', sql)
+    # Convert double-quoted string literals → single-quoted (SQLite allows "val", MySQL needs 'val')
+    # Only replace "value" that follow SQL keywords or operators, not bare identifiers
+    sql = _RE_DQUOTE_LITERAL.sub(
+        lambda m: "'" + m.group(1).replace("'", "\\'") + "'", sql)
+    # INSERT OR IGNORE → INSERT IGNORE
+    sql = _RE_INSERT_OR_IGNORE.sub('INSERT IGNORE', sql)
+    # INSERT OR REPLACE → REPLACE
+    sql = _RE_INSERT_OR_REPLACE.sub('REPLACE', sql)
+
+    # ── CAST type aliases ─────────────────────────────────────────────────
+    # CAST(... AS INTEGER) → CAST(... AS SIGNED)  [MySQL ≥5.5 doesn't accept INTEGER in CAST]
+    sql = _RE_CAST_INTEGER.sub(lambda m: 'CAST(' + m.group(1) + 'AS SIGNED)', sql)
+    # CAST(... AS TEXT) → CAST(... AS CHAR)
+    sql = _RE_CAST_TEXT.sub(lambda m: 'CAST(' + m.group(1) + 'AS CHAR)', sql)
+
+    # ── SQLite strftime → MySQL date functions ────────────────────────────
+    sql = _RE_STRFTIME.sub(_strftime_to_mysql, sql)
+
+    # ── julianday arithmetic → DATEDIFF ───────────────────────────────────
+    sql = _RE_JULIANDAY_DIFF.sub(_julianday_diff, sql)
+    # any remaining bare julianday('now') → TO_DAYS(CURDATE())
+    sql = _RE_JULIANDAY_NOW.sub('TO_DAYS(CURDATE())', sql)
+    sql = _RE_JULIANDAY.sub(r'TO_DAYS(\1)', sql)
+
+    # ── date('now', '+/-N unit') → DATE_ADD/DATE_SUB ─────────────────────
+    sql = _RE_DATE_NOW_OFFSET.sub(_date_now_offset, sql)
+
+    # ── DATE('now') / datetime('now') ─────────────────────────────────────
+    sql = _RE_DATE_NOW.sub('CURDATE()', sql)
+    sql = _RE_DATETIME_NOW.sub('NOW()', sql)
+
+    return sql
+
+
+def get_sql_translation_stats():
+    """Return hit/miss counters for the SQLite → MySQL translation cache."""
+    info = _translate_sql.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+    }
+
+
+# ---------------------------------------------------------------------------
+# QUERY PROFILER
+# ---------------------------------------------------------------------------
+# Opt in with QUERY_PROFILING=1.  Every execute/executemany on a get_db()
+# connection (SQLite or MySQL) is then timed against the current request:
+# statement count, time spent executing, statements issued more than once
+# (usually a query inside a loop) and the slowest statements, with their
+# parameters reduced to type names.  app.py reports the totals in response
+# headers and keeps per-endpoint totals for /api/system/query_profile.
+# Statements slower than SLOW_QUERY_MS are appended to SLOW_QUERY_LOG, which
+# rotates at SLOW_QUERY_LOG_MAX_BYTES.
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', '') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(os.path.dirname(__file__), 'instance', 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '3'))
+QUERY_PROFILE_TOP = 5
+
+_RE_SQL_WHITESPACE = re.compile(r'\s+')
+_slow_query_logger = None
+_slow_query_logger_lock = threading.Lock()
+_endpoint_profiles = {}
+_endpoint_profiles_lock = threading.Lock()
+
+
+def _statement_text(sql):
+    return _RE_SQL_WHITESPACE.sub(' ', sql).strip()[:500]
+
+
+def _redact_params(params, many=False):
+    """Parameter types only: values may be names, phone numbers or password hashes"""
+    if many:
+        return f'{len(params)} rows' if hasattr(params, '__len__') else 'rows'
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+class QueryProfile:
+    """Statements issued while handling one request (or one app context)"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = collections.Counter()
+        self.slowest = []
+
+    def record(self, sql, params, seconds, many=False):
+        text = _statement_text(sql)
+        self.count += 1
+        self.seconds += seconds
+        self.statements[text] += 1
+        ms = round(seconds * 1000, 2)
+        if len(self.slowest) < QUERY_PROFILE_TOP or ms > self.slowest[-1]['ms']:
+            self.slowest.append({'ms': ms, 'sql': text, 'params': _redact_params(params, many)})
+            self.slowest.sort(key=lambda entry: entry['ms'], reverse=True)
+            del self.slowest[QUERY_PROFILE_TOP:]
+
+    @property
+    def duplicates(self):
+        """Statements that repeat one already issued in this request"""
+        return sum(count - 1 for count in self.statements.values())
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.seconds * 1000, 2),
+            'duplicates': self.duplicates,
+            'repeated': [{'sql': sql, 'count': count}
+                         for sql, count in self.statements.most_common(QUERY_PROFILE_TOP) if count > 1],
+            'slowest': list(self.slowest),
+        }
+
+
+class _QueryTimer:
+    __slots__ = ('sql', 'params', 'many', 'started')
+
+    def __init__(self, sql, params, many):
+        self.sql, self.params, self.many = sql, params, many
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        _record_query(self.sql, self.params, time.perf_counter() - self.started, self.many)
+        return False
+
+
+_NOT_PROFILED = contextlib.nullcontext()
+
+
+def _profile_query(sql, params, many=False):
+    """Context manager timing one statement when QUERY_PROFILING is on"""
+    if not QUERY_PROFILING:
+        return _NOT_PROFILED
+    return _QueryTimer(sql, params, many)
+
+
+def _record_query(sql, params, seconds, many=False):
+    if has_app_context():
+        profile = g.get('_query_profile')
+        if profile is None:
+            profile = g._query_profile = QueryProfile()
+        profile.record(sql, params, seconds, many)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        _log_slow_query(sql, params, seconds, many)
+
+
+def _get_slow_query_logger():
+    global _slow_query_logger
+    if _slow_query_logger is None:
+        with _slow_query_logger_lock:
+            if _slow_query_logger is None:
+                import logging
+                from logging.handlers import RotatingFileHandler
+                logger = logging.getLogger('slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(SLOW_QUERY_LOG)), exist_ok=True)
+                    handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                                  backupCount=SLOW_QUERY_LOG_BACKUPS)
+                    handler.setFormatter(logging.Formatter('%(message)s'))
+                    logger.addHandler(handler)
+                except OSError as e:
+                    print(f"Warning: slow query log unavailable ({e})")
+                _slow_query_logger = logger
+    return _slow_query_logger
+
+
+def _log_slow_query(sql, params, seconds, many=False):
+    """Append one JSON line per slow statement"""
+    entry = {
+        'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'ms': round(seconds * 1000, 2),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'sql': _statement_text(sql),
+        'params': _redact_params(params, many),
+    }
+    try:
+        _get_slow_query_logger().info(json.dumps(entry))
+    except Exception as e:
+        print(f"Warning: could not write slow query log: {e}")
+
+
+def finish_query_profile(endpoint=None):
+    """
+    Close the current request's profile and add it to the per-endpoint totals.
+
+    Returns:
+        dict: QueryProfile.summary(), or None when nothing was profiled
+    """
+    if not has_app_context():
+        return None
+    profile = g.pop('_query_profile', None)
+    if profile is None:
+        return None
+
+    summary = profile.summary()
+    with _endpoint_profiles_lock:
+        stats = _endpoint_profiles.setdefault(endpoint or '<unknown>', {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'max_db_ms': 0.0,
+            'duplicates': 0, 'slowest': None,
+        })
+        stats['requests'] += 1
+        stats['queries'] += summary['queries']
+        stats['max_queries'] = max(stats['max_queries'], summary['queries'])
+        stats['db_ms'] += summary['db_ms']
+        stats['max_db_ms'] = max(stats['max_db_ms'], summary['db_ms'])
+        stats['duplicates'] += summary['duplicates']
+        if summary['slowest'] and (stats['slowest'] is None or summary['slowest'][0]['ms'] > stats['slowest']['ms']):
+            stats['slowest'] = summary['slowest'][0]
+    return summary
+
+
+def get_query_profile_stats(limit=50):
+    """Per-endpoint query totals, the endpoints spending the most time in the database first"""
+    with _endpoint_profiles_lock:
+        items = [(endpoint, dict(stats)) for endpoint, stats in _endpoint_profiles.items()]
+    rows = []
+    for endpoint, stats in items:
+        requests = stats['requests']
+        rows.append(dict(
+            stats,
+            endpoint=endpoint,
+            db_ms=round(stats['db_ms'], 2),
+            avg_queries=round(stats['queries'] / requests, 1),
+            avg_db_ms=round(stats['db_ms'] / requests, 2),
+            avg_duplicates=round(stats['duplicates'] / requests, 1),
+        ))
+    rows.sort(key=lambda row: row['db_ms'], reverse=True)
+    return rows[:limit]
+
+
+def reset_query_profile_stats():
+    with _endpoint_profiles_lock:
+        _endpoint_profiles.clear()
 
 
 class _MySQLCursorWrapper:
@@ -109,166 +538,46 @@ class _MySQLCursorWrapper:
     def __init__(self, raw_cursor, conn_wrapper):
         self._cur = raw_cursor
         self._conn = conn_wrapper
+        self._columns = None
 
     # Convert SQLite syntax → MySQL syntax
     @staticmethod
     def _adapt(sql):
-        import re
-        # Placeholder substitution
-        sql = sql.replace('?', '%s')
-        # SQLite AUTOINCREMENT → MySQL AUTO_INCREMENT
-        sql = re.sub(r'\bAUTOINCREMENT\b', 'AUTO_INCREMENT', sql)
-        # SQLite INTEGER PRIMARY KEY → MySQL INT PRIMARY KEY
-        sql = re.sub(r'\bINTEGER\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b',
-                     'INT PRIMARY KEY AUTO_INCREMENT', sql, flags=re.IGNORECASE)
-        # BOOLEAN → TINYINT(1)
-        sql = re.sub(r'\bBOOLEAN\b', 'TINYINT(1)', sql)
-        # REAL → DOUBLE
-        sql = re.sub(r'\bREAL\b', 'DOUBLE', sql)
-        # MySQL: TEXT columns can't have DEFAULT values → VARCHAR(500)
-        lines = sql.split('\n')
-        fixed = []
-        for line in lines:
-            if re.search(r'\bTEXT\b', line, re.IGNORECASE) and re.search(r'\bDEFAULT\b', line, re.IGNORECASE):
-                line = re.sub(r'\bTEXT\b', 'VARCHAR(500)', line, flags=re.IGNORECASE)
-            fixed.append(line)
-        sql = '\n'.join(fixed)
-        # sqlite_master → INFORMATION_SCHEMA equivalents
-        # "SELECT sql FROM sqlite_master ..." → returns no rows (skip SQLite-only migrations)
-        sql = re.sub(
-            r"SELECT\s+sql\s+FROM\s+sqlite_master\b[^\n]*",
-            "SELECT '' AS `sql` FROM INFORMATION_SCHEMA.TABLES WHERE 1=0",
-            sql, flags=re.IGNORECASE
-        )
-        # "SELECT name FROM sqlite_master WHERE type='table' AND name='X'"
-        sql = re.sub(
-            r"SELECT\s+name\s+FROM\s+sqlite_master\s+WHERE\s+type\s*=\s*'table'\s+AND\s+name\s*=\s*(%s|'[^']*')",
-            r"SELECT table_name AS name FROM INFORMATION_SCHEMA.TABLES WHERE table_schema=DATABASE() AND table_name=\1",
-            sql, flags=re.IGNORECASE
-        )
-        # "SELECT name FROM sqlite_master WHERE type='table'"
-        sql = re.sub(
-            r"SELECT\s+name\s+FROM\s+sqlite_master\s+WHERE\s+type\s*=\s*'table'",
-            "SELECT table_name AS name FROM INFORMATION_SCHEMA.TABLES WHERE table_schema=DATABASE()",
-            sql, flags=re.IGNORECASE
-        )
-        # PRAGMA table_info(table) → INFORMATION_SCHEMA equivalent (returns cid/name/type/notnull/dflt_value/pk)
-        def _pragma_table_info(m):
-            tbl = m.group(1).strip('`"\'')
-            return (
-                "SELECT ORDINAL_POSITION-1 AS cid, COLUMN_NAME AS `name`, "
-                "COLUMN_TYPE AS `type`, "
-                "CASE WHEN IS_NULLABLE='NO' THEN 1 ELSE 0 END AS `notnull`, "
-                "COLUMN_DEFAULT AS dflt_value, "
-                "CASE WHEN COLUMN_KEY='PRI' THEN 1 ELSE 0 END AS pk "
-                "FROM INFORMATION_SCHEMA.COLUMNS "
-                f"WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='{tbl}' "
-                "ORDER BY ORDINAL_POSITION"
-            )
-        sql = re.sub(r'\bPRAGMA\s+table_info\s*\(\s*([^\)]+?)\s*\)', _pragma_table_info, sql, flags=re.IGNORECASE)
-        # PRAGMA foreign_keys ... → no-op
-        sql = re.sub(r'\bPRAGMA\s+foreign_keys\s*=\s*\w+\b', 'SELECT 1', sql, flags=re.IGNORECASE)
-        # PRAGMA ... (any other pragma, consume optional (args)) → no-op
-        sql = re.sub(r'\bPRAGMA\s+\w+(?:\s*\([^)]*\))?', 'SELECT 1', sql, flags=re.IGNORECASE)
-        # Convert double-quoted string literals → single-quoted (SQLite allows "val", MySQL needs 'val')
-        # Only replace "value" that follow SQL keywords or operators, not bare identifiers
-        sql = re.sub(
-            r'(?<=[=\(\,\s])\"([^\"\\n]*)\"(?=[,\)\s]|$)',
-            lambda m: "'" + m.group(1).replace("'", "\\'") + "'",
-            sql
-        )
-        # INSERT OR IGNORE → INSERT IGNORE
-        sql = re.sub(r'\bINSERT\s+OR\s+IGNORE\b', 'INSERT IGNORE', sql, flags=re.IGNORECASE)
-        # INSERT OR REPLACE → REPLACE
-        sql = re.sub(r'\bINSERT\s+OR\s+REPLACE\b', 'REPLACE', sql, flags=re.IGNORECASE)
-
-        # ── CAST type aliases ─────────────────────────────────────────────────
-        # CAST(... AS INTEGER) → CAST(... AS SIGNED)  [MySQL ≥5.5 doesn't accept INTEGER in CAST]
-        sql = re.sub(r'\bCAST\s*\(([^)]+)\bAS\s+INTEGER\s*\)',
-                     lambda m: 'CAST(' + m.group(1) + 'AS SIGNED)',
-                     sql, flags=re.IGNORECASE)
-        # CAST(... AS TEXT) → CAST(... AS CHAR)
-        sql = re.sub(r'\bCAST\s*\(([^)]+)\bAS\s+TEXT\s*\)',
-                     lambda m: 'CAST(' + m.group(1) + 'AS CHAR)',
-                     sql, flags=re.IGNORECASE)
-
-        # ── SQLite strftime → MySQL date functions ────────────────────────────
-        _strftime_map = {
-            '%Y-%m-%d': lambda c: f'DATE({c})',
-            '%Y-%m':    lambda c: f"DATE_FORMAT({c}, '%%Y-%%m')",
-            '%Y':       lambda c: f'YEAR({c})',
-            '%m':       lambda c: f'MONTH({c})',
-            '%d':       lambda c: f'DAY({c})',
-            '%H':       lambda c: f'HOUR({c})',
-            '%M':       lambda c: f'MINUTE({c})',
-            '%S':       lambda c: f'SECOND({c})',
-            '%W':       lambda c: f'WEEK({c})',
-            '%w':       lambda c: f'(DAYOFWEEK({c})-1)',
-            '%j':       lambda c: f'DAYOFYEAR({c})',
-        }
-        def _strftime_to_mysql(m):
-            fmt = m.group(1)
-            col = m.group(2).strip()
-            fn = _strftime_map.get(fmt)
-            if fn:
-                return fn(col)
-            # Escape % signs for other format strings
-            escaped_fmt = fmt.replace('%', '%%')
-            return f"DATE_FORMAT({col}, '{escaped_fmt}')"
-        sql = re.sub(r"strftime\s*\(\s*'([^']*)'\s*,\s*([^)]+)\)",
-                     _strftime_to_mysql, sql, flags=re.IGNORECASE)
-
-        # ── julianday arithmetic → DATEDIFF ───────────────────────────────────
-        # julianday(a) - julianday(b) → DATEDIFF(a, b)
-        def _julianday_diff(m):
-            a = m.group(1).strip()
-            b = m.group(2).strip()
-            a = re.sub(r"'now'", 'CURDATE()', a, flags=re.IGNORECASE)
-            b = re.sub(r"'now'", 'CURDATE()', b, flags=re.IGNORECASE)
-            return f'DATEDIFF({a}, {b})'
-        sql = re.sub(
-            r'julianday\s*\(\s*([^)]+)\s*\)\s*-\s*julianday\s*\(\s*([^)]+)\s*\)',
-            _julianday_diff, sql, flags=re.IGNORECASE)
-        # any remaining bare julianday('now') → TO_DAYS(CURDATE())
-        sql = re.sub(r"julianday\s*\(\s*'now'\s*\)", 'TO_DAYS(CURDATE())', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'julianday\s*\(\s*([^)]+)\s*\)', r'TO_DAYS(\1)', sql, flags=re.IGNORECASE)
-
-        # ── date('now', '+/-N unit') → DATE_ADD/DATE_SUB ─────────────────────
-        def _date_now_offset(m):
-            sign   = m.group(1)
-            amount = m.group(2)
-            unit   = m.group(3).rstrip('sS').upper()  # days→DAY, months→MONTH
-            unit_norm = {'DAY': 'DAY', 'MONTH': 'MONTH', 'YEAR': 'YEAR',
-                         'WEEK': 'WEEK', 'HOUR': 'HOUR', 'MINUTE': 'MINUTE'}.get(unit, unit)
-            fn = 'DATE_ADD' if sign == '+' else 'DATE_SUB'
-            return f"{fn}(CURDATE(), INTERVAL {amount} {unit_norm})"
-        sql = re.sub(
-            r"date\s*\(\s*'now'\s*,\s*'([+\-])(\d+)\s+(\w+)'\s*\)",
-            _date_now_offset, sql, flags=re.IGNORECASE)
-
-        # ── DATE('now') / datetime('now') ─────────────────────────────────────
-        sql = re.sub(r"\bDATE\s*\(\s*'now'\s*\)", 'CURDATE()', sql, flags=re.IGNORECASE)
-        sql = re.sub(r"\bdatetime\s*\(\s*'now'\s*\)", 'NOW()', sql, flags=re.IGNORECASE)
-
-        return sql
+        return _translate_sql(sql)
 
     def execute(self, sql, params=()):
-        self._cur.execute(self._adapt(sql), params)
+        _invalidate_schema_on_ddl(sql)
+        with _profile_query(sql, params):
+            self._cur.execute(self._adapt(sql), params)
+        self._columns = None
         return self
 
     def executemany(self, sql, seq):
-        self._cur.executemany(self._adapt(sql), seq)
+        with _profile_query(sql, seq, many=True):
+            self._cur.executemany(self._adapt(sql), seq)
+        self._columns = None
         return self
 
+    def _result_columns(self):
+        if self._columns is None:
+            self._columns = _MySQLResultColumns(self._cur)
+        return self._columns
+
     def fetchone(self):
         row = self._cur.fetchone()
         if row is None:
             return None
-        return _MySQLRow(self._cur, row)
+        return _MySQLRow(self._result_columns(), row)
+
+    def fetchmany(self, size=None):
+        rows = self._cur.fetchmany(size) if size is not None else self._cur.fetchmany()
+        columns = self._result_columns()
+        return [_MySQLRow(columns, r) for r in rows]
 
     def fetchall(self):
         rows = self._cur.fetchall()
-        return [_MySQLRow(self._cur, r) for r in rows]
+        columns = self._result_columns()
+        return [_MySQLRow(columns, r) for r in rows]
 
     @property
     def lastrowid(self):
@@ -283,8 +592,12 @@ class _MySQLCursorWrapper:
         return self._cur.description
 
     def __iter__(self):
+        columns = self._result_columns()
         for row in self._cur:
-            yield _MySQLRow(self._cur, row)
+            yield _MySQLRow(columns, row)
+
+    def close(self):
+        self._cur.close()
 
 
 class _MySQLConnectionWrapper:
@@ -293,8 +606,10 @@ class _MySQLConnectionWrapper:
     the exact same   db.execute(sql, params)  /  db.commit()  pattern as SQLite.
     """
 
-    def __init__(self, raw_conn):
+    def __init__(self, raw_conn, pool=None, created_at=None):
         self._conn = raw_conn
+        self._pool = pool
+        self._created_at = created_at
 
     def execute(self, sql, params=()):
         cur = self._conn.cursor()
@@ -302,6 +617,12 @@ class _MySQLConnectionWrapper:
         wrapper.execute(sql, params)
         return wrapper
 
+    def executemany(self, sql, seq_of_params):
+        cur = self._conn.cursor()
+        wrapper = _MySQLCursorWrapper(cur, self)
+        wrapper.executemany(sql, seq_of_params)
+        return wrapper
+
     def commit(self):
         self._conn.commit()
 
@@ -309,36 +630,277 @@ class _MySQLConnectionWrapper:
         self._conn.rollback()
 
     def close(self):
-        self._conn.close()
+        """Hand the connection back to the pool (or close it when unpooled)."""
+        raw, self._conn = self._conn, None
+        if raw is None:
+            return
+        if self._pool is not None:
+            self._pool.release(raw, self._created_at)
+        else:
+            raw.close()
 
     def cursor(self):
         return _MySQLCursorWrapper(self._conn.cursor(), self)
 
+    def streaming_cursor(self):
+        """Unbuffered cursor: rows stay on the server until fetched."""
+        import pymysql.cursors
+        return _MySQLCursorWrapper(self._conn.cursor(pymysql.cursors.SSCursor), self)
+
     # Let sqlite3-specific helpers work without crashing on MySQL
     def isolation_level(self):
         return None
 
 
-def _connect_mysql():
-    """Open a new pymysql connection and return it wrapped."""
-    try:
+class _MySQLConnectionPool:
+    """
+    Bounded, thread-safe pool of raw pymysql connections.
+
+    get_db() checks a connection out for the lifetime of a Flask request and
+    the teardown hook hands it back via _MySQLConnectionWrapper.close().
+    Connections are pinged before reuse and recycled once they are older than
+    max_lifetime seconds, so stale sockets behind the load balancer are never
+    handed to a request.
+    """
+
+    def __init__(self, params, min_size=1, max_size=10, max_lifetime=1800, timeout=30):
+        self._params = params
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.max_lifetime = float(max_lifetime)
+        self.timeout = float(timeout)
+        self._cond = threading.Condition()
+        self._idle = collections.deque()   # (raw_conn, created_at)
+        self._size = 0                     # open connections (idle + in use)
+        self._stats = {
+            'checkouts': 0,
+            'creations': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+        }
+
+    def _open(self):
         import pymysql
-    except ImportError:
-        raise RuntimeError(
-            "pymysql is not installed. Run:  pip install pymysql"
-        )
-    params = _parse_mysql_url(DATABASE_URL)
-    raw = pymysql.connect(**params)
-    return _MySQLConnectionWrapper(raw)
+        raw = pymysql.connect(**self._params)
+        with self._cond:
+            self._stats['creations'] += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def prefill(self):
+        """Open connections until min_size are available."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                raw = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """Check a connection out, waiting up to `timeout` seconds when exhausted."""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            raw = created_at = None
+            with self._cond:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    if not waited:
+                        self._stats['waits'] += 1
+                        waited = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._size >= self.max_size:
+                            self._stats['timeouts'] += 1
+                            raise RuntimeError(
+                                f"MySQL connection pool exhausted "
+                                f"({self.max_size} connections in use for {self.timeout:.0f}s)"
+                            )
+                    continue
+
+            if raw is None:
+                try:
+                    raw = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+            elif time.monotonic() - created_at > self.max_lifetime:
+                with self._cond:
+                    self._stats['recycled'] += 1
+                self._discard(raw)
+                continue
+            else:
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self._stats['health_check_failures'] += 1
+                    self._discard(raw)
+                    continue
+
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return raw, created_at
+
+    def release(self, raw, created_at):
+        """Return a connection to the pool, rolling back any open transaction."""
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        if time.monotonic() - created_at > self.max_lifetime:
+            with self._cond:
+                self._stats['recycled'] += 1
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, created_at))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return dict(
+                self._stats,
+                size=self._size,
+                idle=idle,
+                in_use=self._size - idle,
+                min_size=self.min_size,
+                max_size=self.max_size,
+            )
+
+
+_mysql_pool = None
+_mysql_pool_lock = threading.Lock()
+
+
+def _get_mysql_pool():
+    """Create the process-wide MySQL pool on first use."""
+    global _mysql_pool
+    if _mysql_pool is None:
+        with _mysql_pool_lock:
+            if _mysql_pool is None:
+                try:
+                    import pymysql  # noqa: F401
+                except ImportError:
+                    raise RuntimeError(
+                        "pymysql is not installed. Run:  pip install pymysql"
+                    )
+                pool = _MySQLConnectionPool(
+                    _parse_mysql_url(DATABASE_URL),
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    timeout=DB_POOL_TIMEOUT,
+                )
+                try:
+                    pool.prefill()
+                except Exception as e:
+                    print(f"Warning: MySQL pool prefill failed: {e}")
+                _mysql_pool = pool
+    return _mysql_pool
+
+
+def get_db_pool_stats():
+    """
+    Return connection pool counters (in_use, idle, waits, creations, ...).
+    Returns None on the SQLite backend, which does not pool connections.
+    """
+    if not _USE_MYSQL or _mysql_pool is None:
+        return None
+    return _mysql_pool.stats()
+
+
+def _connect_mysql():
+    """Check a pymysql connection out of the pool and return it wrapped."""
+    pool = _get_mysql_pool()
+    raw, created_at = pool.acquire()
+    return _MySQLConnectionWrapper(raw, pool, created_at)
+
+
+class _SQLiteCursor(sqlite3.Cursor):
+    """sqlite3 cursor that drops cached schema metadata after DDL (and is profiled)."""
+
+    def execute(self, sql, parameters=()):
+        _invalidate_schema_on_ddl(sql)
+        with _profile_query(sql, parameters):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with _profile_query(sql, seq_of_parameters, many=True):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are _SQLiteCursor."""
+
+    def cursor(self, factory=_SQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 
 def _connect_sqlite():
     """Open a new SQLite connection."""
-    conn = sqlite3.connect(SQLITE_PATH)
+    conn = sqlite3.connect(SQLITE_PATH, factory=_SQLiteConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# Rows fetched per round trip by iter_rows()
+STREAM_FETCH_SIZE = int(os.getenv('STREAM_FETCH_SIZE', '1000'))
+
+
+def iter_rows(sql, params=(), db=None, fetch_size=None):
+    """
+    Yield the rows of a query without loading the whole result set.
+
+    MySQL uses an unbuffered (server-side) cursor, so the connection can't run
+    other queries until the generator is exhausted or closed; SQLite cursors
+    already step through results lazily.
+    """
+    db = db or get_db()
+    cursor = db.streaming_cursor() if hasattr(db, 'streaming_cursor') else db.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size or STREAM_FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
 def get_db():
     """
     Return the database connection for the current Flask request.
@@ -353,11 +915,232 @@ def get_db():
             db = g._database = _connect_sqlite()
     return db
 
-def init_db(app):
+# ---------------------------------------------------------------------------
+# SCHEMA REGISTRY
+# ---------------------------------------------------------------------------
+# Optional-column checks used to run  PRAGMA table_info(...)  (an
+# INFORMATION_SCHEMA query on MySQL) several times per request.  Column sets
+# are now loaded once per table and process, and dropped whenever this process
+# runs DDL (ALTER/CREATE/DROP/RENAME) or a migration finishes.
+_schema_columns = {}
+_schema_lock = threading.Lock()
+_DDL_PREFIXES = ('ALTER', 'CREATE', 'DROP', 'RENAME')
+
+
+def _invalidate_schema_on_ddl(sql):
+    if sql.lstrip()[:6].upper().startswith(_DDL_PREFIXES):
+        invalidate_schema_cache()
+
+
+def invalidate_schema_cache(table=None):
+    """Forget cached column sets for `table`, or for every table when omitted."""
+    with _schema_lock:
+        if table is None:
+            _schema_columns.clear()
+        else:
+            _schema_columns.pop(table, None)
+
+
+def get_table_columns(table, db=None):
+    """
+    Return the column names of `table` as a frozenset, loading them once.
+
+    Args:
+        table (str): Table name
+        db: Connection to load with on a cache miss (defaults to get_db())
+
+    Returns:
+        frozenset: Column names (empty when the table does not exist)
+    """
+    columns = _schema_columns.get(table)
+    if columns is None:
+        if db is None:
+            db = get_db()
+        columns = frozenset(
+            row['name'] for row in db.execute(f'PRAGMA table_info({table})').fetchall()
+        )
+        # Don't remember missing tables; they may be created later.
+        if columns:
+            with _schema_lock:
+                _schema_columns[table] = columns
+    return columns
+
+
+def has_column(table, column, db=None):
+    """Return True if `table` has a column named `column`."""
+    return column in get_table_columns(table, db)
+
+
+# ---------------------------------------------------------------------------
+# DATE RANGES
+# ---------------------------------------------------------------------------
+# Filters such as  DATE(verification_time) = ?  or  strftime('%Y', start_date)
+# = ?  wrap the column in a function, so neither SQLite nor MySQL (where
+# _translate_sql turns them into DATE_FORMAT/YEAR calls) can seek an index on
+# it.  These helpers return half-open [start, end) bounds as ISO strings for
+# range_predicate(column), which compares the raw column instead.  The same
+# bounds work for DATE columns and for DATETIME/TIMESTAMP columns, since
+# '2025-03-04' sorts before every time on that day.
+
+def _as_date(value):
+    import datetime
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def day_range(day):
+    """Bounds covering one day (a date, datetime or 'YYYY-MM-DD')"""
+    import datetime
+    start = _as_date(day)
+    return start.isoformat(), (start + datetime.timedelta(days=1)).isoformat()
+
+
+def month_range(year, month):
+    """Bounds covering a calendar month"""
+    import datetime
+    year, month = int(year), int(month)
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def year_range(year):
+    """Bounds covering a calendar year"""
+    year = int(year)
+    return f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+
+
+def date_span_range(start_date, end_date):
+    """Bounds covering start_date through end_date, both days included"""
+    return _as_date(start_date).isoformat(), day_range(end_date)[1]
+
+
+def range_predicate(column):
+    """SQL for  start <= column < end; pass the two bounds as parameters"""
+    return f'{column} >= ? AND {column} < ?'
+
+
+# ---------------------------------------------------------------------------
+# SCHEMA VERSION
+# ---------------------------------------------------------------------------
+# init_db() used to run every CREATE TABLE IF NOT EXISTS, ALTER probe and
+# startup migration on each worker boot.  Once that pass completes the
+# database is stamped in schema_version with a fingerprint of SCHEMA_VERSION,
+# this file and the school/staff row counts (the migrations seed per-school
+# shifts and per-staff shift history); boots that find the same fingerprint
+# skip the pass.  Bump SCHEMA_VERSION for schema changes made outside this
+# file.  FORCE_SCHEMA_BOOTSTRAP=1 runs the pass regardless.
+SCHEMA_VERSION = 1
+FORCE_SCHEMA_BOOTSTRAP = os.getenv('FORCE_SCHEMA_BOOTSTRAP', '') == '1'
+
+# Outcome of the last init_db() in this process: {'ran': bool, 'seconds': float}
+LAST_SCHEMA_BOOTSTRAP = {'ran': None, 'seconds': None}
+
+
+def _startup_migrations():
+    return (
+        migrate_on_duty_permissions_table,
+        migrate_system_settings_capacity,
+        migrate_shift_definitions,
+        migrate_department_shift_constraint,
+        migrate_shift_history,
+        ensure_indexes,
+    )
+
+
+def schema_fingerprint(db=None):
+    """Fingerprint of the schema this code expects and the rows its seeding covers"""
+    import hashlib
+    digest = hashlib.sha256(f'schema-{SCHEMA_VERSION}'.encode())
+    try:
+        with open(__file__, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+
+    db = db or get_db()
+    for table in ('schools', 'staff'):
+        try:
+            row = db.execute(f'SELECT COUNT(*), MAX(id) FROM {table}').fetchone()
+            digest.update(repr(tuple(row)).encode())
+        except Exception:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+def get_schema_stamp(db=None):
+    """Fingerprint the database was last bootstrapped with, or None"""
+    try:
+        db = db or get_db()
+        row = db.execute('SELECT fingerprint FROM schema_version WHERE id = 1').fetchone()
+        return row['fingerprint'] if row else None
+    except Exception:
+        return None
+
+
+def stamp_schema(db=None):
+    """Record that the bootstrap pass has completed for the current fingerprint"""
+    db = db or get_db()
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            fingerprint VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    fingerprint = schema_fingerprint(db)
+    db.execute('DELETE FROM schema_version WHERE id = 1')
+    db.execute('INSERT INTO schema_version (id, version, fingerprint) VALUES (1, ?, ?)',
+               (SCHEMA_VERSION, fingerprint))
+    db.commit()
+    return fingerprint
+
+
+def init_db(app, force=False):
+    """
+    Create and migrate the database schema.
+
+    Skipped when the schema_version stamp matches schema_fingerprint(),
+    unless force=True or FORCE_SCHEMA_BOOTSTRAP=1.
+
+    Returns:
+        bool: True if the bootstrap pass ran
+    """
+    started = time.perf_counter()
+
     # Only needed for SQLite (creates the instance/ folder)
     if not _USE_MYSQL:
         os.makedirs(app.instance_path, exist_ok=True)
 
+    with app.app_context():
+        db = get_db()
+        if not (force or FORCE_SCHEMA_BOOTSTRAP) and get_schema_stamp(db) == schema_fingerprint(db):
+            LAST_SCHEMA_BOOTSTRAP.update(ran=False, seconds=time.perf_counter() - started)
+            return False
+
+    _create_schema(app)
+
+    with app.app_context():
+        migrated = True
+        for migration in _startup_migrations():
+            try:
+                migration()
+            except Exception as e:
+                migrated = False
+                print(f'Startup migration warning ({migration.__name__}): {e}')
+        # A failed step leaves the stamp alone so the next boot retries it
+        if migrated:
+            stamp_schema()
+
+    LAST_SCHEMA_BOOTSTRAP.update(ran=True, seconds=time.perf_counter() - started)
+    return True
+
+
+def _create_schema(app):
     with app.app_context():
         db = get_db()
         cursor = db.cursor()
@@ -1019,6 +1802,15 @@ def init_db(app):
         )
         ''')
 
+        # Timetable version per school (0 = every school), bumped with each
+        # timetable write; rendered grids are cached against it
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_versions (
+            school_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
         # ==================== FEE MANAGEMENT TABLES ====================
 
         # Fee types / templates per school
@@ -1101,6 +1893,8 @@ def init_db(app):
         )
         ''')
 
+        ensure_attendance_daily_summary_table(db)
+
         if _USE_MYSQL:
             cursor.execute(
                 "SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS "
@@ -1143,6 +1937,7 @@ def init_db(app):
         ensure_column_exists('schools', 'logo_url TEXT', 'logo_url')
         ensure_column_exists('schools', 'is_hidden BOOLEAN DEFAULT 0', 'is_hidden')
         ensure_column_exists('staff', 'photo_url TEXT', 'photo_url')
+        ensure_column_exists('staff', 'photo_hash VARCHAR(64)', 'photo_hash')
         ensure_column_exists('staff', 'password_hash TEXT', 'password_hash')
         ensure_column_exists('staff', 'shift_type TEXT DEFAULT "general"', 'shift_type')
 
@@ -1494,6 +2289,80 @@ def init_db(app):
                         ''', (school_id, shift_type, start_time, end_time, grace_period, desc))
 
         db.commit()
+        invalidate_schema_cache()
+        invalidate_shift_registry()
+
+        # One-time backfill of the daily summary for existing attendance
+        if (db.execute('SELECT 1 FROM attendance LIMIT 1').fetchone()
+                and not db.execute('SELECT 1 FROM attendance_daily_summary LIMIT 1').fetchone()):
+            rebuild_attendance_daily_summary(db=db)
+
+
+# ---------------------------------------------------------------------------
+# SHIFT REGISTRY
+# ---------------------------------------------------------------------------
+# Every biometric punch used to build a ShiftManager, which re-read the
+# institution timings and the school's shift_definitions rows and re-parsed
+# every time.  Parsed shift definitions are now kept per school and the
+# institution timings once per process.  Each school has a version number
+# that invalidate_shift_registry() bumps whenever shifts or timings change;
+# an entry built for an older version is rebuilt on next use.
+# SHIFT_REGISTRY_TTL (seconds) bounds how stale another worker process can be.
+SHIFT_REGISTRY_TTL = int(os.getenv('SHIFT_REGISTRY_TTL', '300'))
+
+_shift_registry = {}
+_shift_registry_versions = collections.defaultdict(int)
+_shift_registry_lock = threading.Lock()
+_institution_timings_cache = None  # (version, loaded_at, timings)
+_institution_timings_version = 0
+
+
+def _parse_shift_time(value):
+    """Parse an HH:MM or HH:MM:SS column value into a datetime.time."""
+    import datetime
+
+    fmt = '%H:%M:%S' if len(value) > 5 else '%H:%M'
+    return datetime.datetime.strptime(value, fmt).time()
+
+
+def _load_institution_timings(db):
+    import datetime
+
+    # Read from shift_definitions (general shift = single source of truth)
+    row = db.execute("""
+        SELECT start_time, end_time FROM shift_definitions
+        WHERE shift_type = 'general' AND is_active = 1
+        LIMIT 1
+    """).fetchone()
+
+    if row:
+        return {
+            'checkin_time': _parse_shift_time(row['start_time']),
+            'checkout_time': _parse_shift_time(row['end_time']),
+            'is_custom': True
+        }
+
+    # No general shift found — return defaults
+    return {
+        'checkin_time': datetime.time(9, 0),
+        'checkout_time': datetime.time(17, 0),
+        'is_custom': False
+    }
+
+
+def _cached_institution_timings(db=None):
+    global _institution_timings_cache
+
+    cached = _institution_timings_cache
+    if (cached is not None and cached[0] == _institution_timings_version
+            and time.monotonic() - cached[1] < SHIFT_REGISTRY_TTL):
+        return cached[2]
+
+    version = _institution_timings_version
+    timings = _load_institution_timings(db if db is not None else get_db())
+    with _shift_registry_lock:
+        _institution_timings_cache = (version, time.monotonic(), timings)
+    return timings
 
 
 def get_institution_timings():
@@ -1511,35 +2380,7 @@ def get_institution_timings():
     import datetime
     
     try:
-        db = get_db()
-        
-        # Read from shift_definitions (general shift = single source of truth)
-        row = db.execute("""
-            SELECT start_time, end_time FROM shift_definitions
-            WHERE shift_type = 'general' AND is_active = 1
-            LIMIT 1
-        """).fetchone()
-        
-        if row:
-            checkin_str  = (row['start_time']  or '09:00:00')[:5]   # strip seconds
-            checkout_str = (row['end_time']     or '17:00:00')[:5]
-            # Allow HH:MM or HH:MM:SS
-            fmt = '%H:%M:%S' if len(row['start_time']) > 5 else '%H:%M'
-            checkin_time  = datetime.datetime.strptime(row['start_time'],  fmt).time()
-            fmt2 = '%H:%M:%S' if len(row['end_time']) > 5 else '%H:%M'
-            checkout_time = datetime.datetime.strptime(row['end_time'], fmt2).time()
-            return {
-                'checkin_time': checkin_time,
-                'checkout_time': checkout_time,
-                'is_custom': True
-            }
-        
-        # No general shift found — return defaults
-        return {
-            'checkin_time': datetime.time(9, 0),
-            'checkout_time': datetime.time(17, 0),
-            'is_custom': False
-        }
+        return dict(_cached_institution_timings())
         
     except Exception as e:
         print(f"Error getting institution timings: {e}")
@@ -1550,6 +2391,155 @@ def get_institution_timings():
         }
 
 
+class ShiftRegistryEntry:
+    """Parsed shift definitions of one school, as used by ShiftManager."""
+
+    def __init__(self, school_id, version, definitions):
+        self.school_id = school_id
+        self.version = version
+        self.definitions = definitions
+        self.loaded_at = time.monotonic()
+
+    def copy_definitions(self):
+        """Return the definitions with every shift as a fresh dict."""
+        return {shift_type: dict(info) for shift_type, info in self.definitions.items()}
+
+
+def _shift_registry_key(school_id):
+    if school_id is None:
+        return None
+    try:
+        return int(school_id)
+    except (TypeError, ValueError):
+        return school_id
+
+
+def get_shift_registry_version(school_id=None):
+    """Return the current shift definition version of `school_id`."""
+    return (_institution_timings_version, _shift_registry_versions[_shift_registry_key(school_id)])
+
+
+def _load_shift_registry_entry(school_id, version, db):
+    import datetime
+
+    # Always prioritize institution timings for 'general' shift
+    shift_dict = {}
+    complete = True
+
+    # First, ensure 'general' shift uses current institution timings
+    try:
+        timings = _cached_institution_timings(db)
+
+        shift_dict['general'] = {
+            'start_time': timings['checkin_time'],
+            'end_time': timings['checkout_time'],
+            'grace_period_minutes': 0,  # Strict timing
+            'description': f"Institution Shift ({'Custom' if timings['is_custom'] else 'Default'})"
+        }
+
+        print(f"✅ General shift synchronized with institution timings: {timings['checkin_time']} - {timings['checkout_time']}")
+
+    except Exception as e:
+        print(f"Could not load institution timings: {e}")
+        complete = False
+        # Fallback for general shift
+        shift_dict['general'] = {
+            'start_time': datetime.time(9, 0),
+            'end_time': datetime.time(17, 0),
+            'grace_period_minutes': 0,
+            'description': 'Default Hardcoded Shift (Strict timing)'
+        }
+
+    # Then try to load additional shifts from shift_definitions table
+    try:
+        shift_columns = get_table_columns('shift_definitions', db)
+        has_school_id = 'school_id' in shift_columns
+
+        shift_query = '''
+            SELECT shift_type, start_time, end_time, grace_period_minutes, description
+            FROM shift_definitions
+            WHERE is_active = 1 AND shift_type != 'general'
+        '''
+        params = []
+        if has_school_id and school_id is not None:
+            shift_query = '''
+                SELECT shift_type, start_time, end_time, grace_period_minutes, description
+                FROM shift_definitions
+                WHERE school_id = ? AND is_active = 1 AND shift_type != 'general'
+            '''
+            params = [school_id]
+
+        shifts = db.execute(shift_query, params).fetchall()
+
+        for shift in shifts:
+            shift_dict[shift['shift_type']] = {
+                'start_time': datetime.datetime.strptime(shift['start_time'], '%H:%M:%S').time(),
+                'end_time': datetime.datetime.strptime(shift['end_time'], '%H:%M:%S').time(),
+                'grace_period_minutes': shift['grace_period_minutes'],
+                'description': shift['description']
+            }
+
+        if len(shifts) > 0:
+            print(f"✅ Loaded {len(shifts)} additional shifts from database")
+
+    except Exception as e:
+        print(f"Could not load additional shift definitions: {e}")
+        complete = False
+
+    return ShiftRegistryEntry(school_id, version, shift_dict), complete
+
+
+def get_shift_registry(school_id=None, db=None):
+    """
+    Return the ShiftRegistryEntry for `school_id`, loading it on first use.
+
+    Args:
+        school_id (int, optional): School ID; None loads shifts of every school
+        db: Connection to load with on a cache miss (defaults to get_db())
+
+    Returns:
+        ShiftRegistryEntry: Parsed shift definitions, keyed by shift type
+    """
+    key = _shift_registry_key(school_id)
+    version = get_shift_registry_version(key)
+    entry = _shift_registry.get(key)
+    if (entry is not None and entry.version == version
+            and time.monotonic() - entry.loaded_at < SHIFT_REGISTRY_TTL):
+        return entry
+
+    entry, complete = _load_shift_registry_entry(key, version, db if db is not None else get_db())
+    # Partially loaded definitions are used once but not kept
+    if complete:
+        with _shift_registry_lock:
+            _shift_registry[key] = entry
+    return entry
+
+
+def get_shift_definitions(school_id=None, db=None):
+    """Return a private copy of the shift definitions of `school_id`."""
+    return get_shift_registry(school_id, db).copy_definitions()
+
+
+def invalidate_shift_registry(school_id=None):
+    """
+    Mark cached shift definitions as stale after shift_definitions changes.
+
+    Any change may move the institution timings (the 'general' shift), which
+    every entry embeds, so the timings version is always bumped and every
+    school reloads on next use; the school's own version changes as well.
+    """
+    global _institution_timings_version
+
+    with _shift_registry_lock:
+        _institution_timings_version += 1
+        if school_id is None:
+            _shift_registry.clear()
+        else:
+            key = _shift_registry_key(school_id)
+            _shift_registry_versions[key] += 1
+            _shift_registry.pop(key, None)
+
+
 def migrate_department_shift_constraint():
     """
     Migration: expand the CHECK constraint on department_shift_mappings to include
@@ -1623,6 +2613,8 @@ def migrate_department_shift_constraint():
 
     except Exception as e:
         print(f'Warning: migrate_department_shift_constraint failed: {e}')
+    finally:
+        invalidate_schema_cache()
 
 
 def migrate_shift_definitions():
@@ -1751,6 +2743,8 @@ def migrate_shift_definitions():
         db.commit()
     except Exception as e:
         print(f'Warning: migrate_shift_definitions failed: {e}')
+    finally:
+        invalidate_schema_cache()
 
 
 def migrate_shift_history():
@@ -1809,6 +2803,177 @@ def migrate_shift_history():
 
     except Exception as e:
         print(f'Warning: migrate_shift_history failed: {e}')
+    finally:
+        invalidate_schema_cache()
+
+
+def migrate_on_duty_permissions_table():
+    """Migration: create the on_duty_permissions table used by on-duty permission requests."""
+    db = get_db()
+    table_exists = db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='on_duty_permissions'").fetchone()
+    if not table_exists:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS on_duty_permissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                staff_id INTEGER,
+                school_id INTEGER,
+                permission_type TEXT,
+                start_datetime TEXT,
+                end_datetime TEXT,
+                reason TEXT,
+                status TEXT DEFAULT 'pending',
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        db.commit()
+
+
+def migrate_system_settings_capacity():
+    """Migration: ensure system_settings columns can hold JSON payloads (MySQL legacy fix)."""
+    try:
+        if not _USE_MYSQL:
+            return
+
+        db = get_db()
+        # Older deployments use varchar(255), which truncates JSON settings.
+        db.execute('ALTER TABLE system_settings MODIFY setting_value TEXT NULL')
+        db.execute('ALTER TABLE system_settings MODIFY description TEXT NULL')
+        db.commit()
+    except Exception as exc:
+        # Non-fatal: app can run, but large settings may still truncate.
+        print(f'Startup system_settings capacity check warning: {exc}')
+
+
+# ---------------------------------------------------------------------------
+# INDEX CATALOG
+# ---------------------------------------------------------------------------
+# Secondary indexes for the filters the dashboard, attendance and payroll
+# queries use on every request.  ensure_indexes() runs with the startup
+# migrations and creates whatever is missing; an index is left alone when the
+# table or a column doesn't exist in this deployment, or when an existing
+# index already starts with the same columns (e.g. the UNIQUE(school_id,
+# staff_id) on staff).  index_advisor.py EXPLAINs the hot queries against it.
+INDEX_CATALOG = (
+    # (index name, table, columns)
+    ('idx_attendance_school_date', 'attendance', ('school_id', 'date')),
+    ('idx_leave_applications_staff_status_dates', 'leave_applications',
+     ('staff_id', 'status', 'start_date', 'end_date')),
+    ('idx_leave_applications_school_status_dates', 'leave_applications',
+     ('school_id', 'status', 'start_date', 'end_date')),
+    ('idx_on_duty_applications_staff_status_dates', 'on_duty_applications',
+     ('staff_id', 'status', 'start_date', 'end_date')),
+    ('idx_on_duty_applications_school_status_dates', 'on_duty_applications',
+     ('school_id', 'status', 'start_date', 'end_date')),
+    ('idx_permission_applications_staff_date', 'permission_applications', ('staff_id', 'permission_date')),
+    ('idx_permission_applications_school_date', 'permission_applications', ('school_id', 'permission_date')),
+    ('idx_biometric_verifications_staff_time', 'biometric_verifications', ('staff_id', 'verification_time')),
+    ('idx_holidays_school_type_active_start', 'holidays', ('school_id', 'holiday_type', 'is_active', 'start_date')),
+    ('idx_staff_school_staff_id', 'staff', ('school_id', 'staff_id')),
+    ('idx_staff_biometric_id', 'staff', ('biometric_id',)),
+    ('idx_students_school_created', 'students', ('school_id', 'created_at')),
+)
+
+# MySQL can only index the leading bytes of TEXT/BLOB columns
+_MYSQL_PREFIX_TYPES = frozenset({'tinytext', 'text', 'mediumtext', 'longtext', 'tinyblob', 'blob', 'mediumblob', 'longblob'})
+_MYSQL_INDEX_PREFIX = 191
+
+
+def get_table_indexes(table, db=None):
+    """
+    Return the indexes on `table` as {index name: (column, ...)}.
+
+    Includes the primary key and the implicit indexes behind UNIQUE
+    constraints; empty when the table does not exist.
+    """
+    db = db or get_db()
+    indexes = {}
+    if _USE_MYSQL:
+        rows = db.execute(
+            "SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name "
+            "FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? "
+            "ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table,)
+        ).fetchall()
+        for row in rows:
+            indexes.setdefault(row['index_name'], []).append(row['column_name'])
+    else:
+        for index in db.execute(f'PRAGMA index_list({table})').fetchall():
+            info = db.execute(f'PRAGMA index_info("{index["name"]}")').fetchall()
+            indexes[index['name']] = [row['name'] for row in info]
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def index_catalog_status(db=None):
+    """
+    Compare INDEX_CATALOG with the database.
+
+    Returns:
+        list: One dict per catalog entry with name, table, columns and a
+        state of 'present', 'covered' (by the index named in covered_by),
+        'missing' or 'unavailable' (table or column not in this schema)
+    """
+    db = db or get_db()
+    status = []
+    for name, table, columns in INDEX_CATALOG:
+        entry = {'name': name, 'table': table, 'columns': columns, 'state': 'missing', 'covered_by': None}
+        if not set(columns) <= get_table_columns(table, db):
+            entry['state'] = 'unavailable'
+        else:
+            existing = get_table_indexes(table, db)
+            if name in existing:
+                entry['state'] = 'present'
+            else:
+                for other, other_columns in existing.items():
+                    if other_columns[:len(columns)] == columns:
+                        entry.update(state='covered', covered_by=other)
+                        break
+        status.append(entry)
+    return status
+
+
+def _index_column_list(db, table, columns):
+    if not _USE_MYSQL:
+        return ', '.join(columns)
+    types = {
+        row['column_name']: (row['data_type'] or '').lower()
+        for row in db.execute(
+            "SELECT COLUMN_NAME AS column_name, DATA_TYPE AS data_type FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ?",
+            (table,)
+        ).fetchall()
+    }
+    return ', '.join(
+        f'{column}({_MYSQL_INDEX_PREFIX})' if types.get(column) in _MYSQL_PREFIX_TYPES else column
+        for column in columns
+    )
+
+
+def ensure_indexes(db=None):
+    """
+    Create the INDEX_CATALOG indexes that are missing. Safe to call repeatedly.
+
+    Returns:
+        list: Names of the indexes created
+    """
+    db = db or get_db()
+    created = []
+    for entry in index_catalog_status(db):
+        if entry['state'] != 'missing':
+            continue
+        column_list = _index_column_list(db, entry['table'], entry['columns'])
+        try:
+            if _USE_MYSQL:
+                db.execute(f"CREATE INDEX {entry['name']} ON {entry['table']}({column_list})")
+            else:
+                db.execute(f"CREATE INDEX IF NOT EXISTS {entry['name']} ON {entry['table']}({column_list})")
+            db.commit()
+            created.append(entry['name'])
+        except Exception as e:
+            print(f"Warning: could not create index {entry['name']}: {e}")
+    if created:
+        print(f"Migration: created {len(created)} index(es): {', '.join(created)}")
+    return created
 
 
 def calculate_attendance_status(check_time, verification_type='check-in', grace_minutes=None, date_obj=None, department=None):
@@ -1957,6 +3122,212 @@ def calculate_hourly_rate(base_monthly_salary):
         }
 
 
+# ---------------------------------------------------------------------------
+# HOLIDAY INDEX
+# ---------------------------------------------------------------------------
+# is_holiday() used to run one or two queries per date and re-parse the
+# departments JSON every time, and payroll calls it for every day of every
+# staff member's month.  Active holidays are now loaded once per school into
+# sorted date ranges and answered from memory.  create_holiday(),
+# update_holiday() and delete_holiday() drop the school's index;
+# HOLIDAY_INDEX_TTL (seconds) bounds how stale another worker process can be.
+HOLIDAY_INDEX_TTL = int(os.getenv('HOLIDAY_INDEX_TTL', '300'))
+
+_holiday_indexes = {}
+_holiday_index_lock = threading.Lock()
+
+
+def _date_key(value):
+    """Normalise a DATE/TEXT column value or date object to its ISO string."""
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _holiday_school_key(school_id):
+    # Session values are ints, form/JSON payloads may carry strings.
+    try:
+        return int(school_id)
+    except (TypeError, ValueError):
+        return school_id
+
+
+class _DateRanges:
+    """Sorted [start, end] ranges answering "is this day covered" by bisection."""
+
+    __slots__ = ('starts', 'max_end')
+
+    def __init__(self, ranges):
+        ranges = sorted(ranges)
+        self.starts = [start for start, _ in ranges]
+        # max_end[i] is the latest end among ranges 0..i: the ranges starting
+        # on or before a day cover it iff that running maximum reaches it.
+        self.max_end = []
+        latest = None
+        for _, end in ranges:
+            if latest is None or end > latest:
+                latest = end
+            self.max_end.append(latest)
+
+    def contains(self, day):
+        i = bisect.bisect_right(self.starts, day)
+        return i > 0 and self.max_end[i - 1] >= day
+
+
+class HolidayIndex:
+    """
+    In-memory view of one school's active holidays.
+
+    Institution-wide and per-department holidays are kept as separate range
+    sets, with the departments JSON parsed once at load time. Matching follows
+    the original queries: a department matches when it is ``in`` the parsed
+    departments value.
+    """
+
+    def __init__(self, school_id, rows):
+        self.school_id = school_id
+        self.loaded_at = time.monotonic()
+        self.holidays = []
+        institution = []
+        by_department = collections.defaultdict(list)
+        # Parsed values that are not plain lists of names (a bare string,
+        # a dict, ...) keep the original `department in value` semantics.
+        self._other_departments = []
+
+        for row in rows:
+            holiday = dict(row)
+            holiday['_start'] = _date_key(holiday.get('start_date'))
+            holiday['_end'] = _date_key(holiday.get('end_date'))
+            holiday['_departments'] = None
+            if holiday.get('departments'):
+                try:
+                    holiday['_departments'] = json.loads(holiday['departments'])
+                except (json.JSONDecodeError, TypeError):
+                    pass
+            self.holidays.append(holiday)
+
+            if holiday['_start'] is None or holiday['_end'] is None:
+                continue
+            span = (holiday['_start'], holiday['_end'])
+            if holiday.get('holiday_type') == 'institution_wide':
+                institution.append(span)
+            elif holiday.get('holiday_type') == 'department_specific':
+                departments = holiday['_departments']
+                if departments is None:
+                    continue
+                try:
+                    if not isinstance(departments, list):
+                        raise TypeError
+                    for name in set(departments):
+                        by_department[name].append(span)
+                except TypeError:
+                    self._other_departments.append((span, departments))
+
+        self.holidays.sort(key=lambda h: (h['_start'] is not None, h['_start'] or ''))
+        self._institution = _DateRanges(institution)
+        self._departments = {name: _DateRanges(spans) for name, spans in by_department.items()}
+
+    def is_holiday(self, date_obj, department=None):
+        """Return True if `date_obj` is a holiday (for `department`, if given)."""
+        day = _date_key(date_obj)
+        if self._institution.contains(day):
+            return True
+        if not department:
+            return False
+        try:
+            ranges = self._departments.get(department)
+        except TypeError:
+            ranges = None
+        if ranges is not None and ranges.contains(day):
+            return True
+        for (start, end), departments in self._other_departments:
+            if start <= day <= end:
+                try:
+                    if department in departments:
+                        return True
+                except TypeError:
+                    continue
+        return False
+
+    def holidays_in_range(self, start_date=None, end_date=None, department=None):
+        """
+        Return holidays overlapping [start_date, end_date], ordered by start date.
+
+        Either bound may be omitted. With `department`, only institution-wide
+        holidays and that department's holidays are returned. Each holiday is
+        a fresh dict of the table's columns.
+        """
+        start_key = _date_key(start_date)
+        end_key = _date_key(end_date)
+        result = []
+        for holiday in self.holidays:
+            if start_key and (holiday['_end'] is None or holiday['_end'] < start_key):
+                continue
+            if end_key and (holiday['_start'] is None or holiday['_start'] > end_key):
+                continue
+            if department:
+                if holiday.get('holiday_type') == 'department_specific':
+                    try:
+                        if holiday['_departments'] is None or department not in holiday['_departments']:
+                            continue
+                    except TypeError:
+                        continue
+                elif holiday.get('holiday_type') != 'institution_wide':
+                    continue
+            result.append({k: v for k, v in holiday.items() if not k.startswith('_')})
+        return result
+
+
+def get_holiday_index(school_id, db=None):
+    """
+    Return the HolidayIndex for `school_id`, loading it on first use.
+
+    Args:
+        school_id (int): School ID
+        db: Connection to load with on a cache miss (defaults to get_db())
+
+    Returns:
+        HolidayIndex: Active holidays of the school
+    """
+    school_id = _holiday_school_key(school_id)
+    index = _holiday_indexes.get(school_id)
+    if index is not None and time.monotonic() - index.loaded_at < HOLIDAY_INDEX_TTL:
+        return index
+
+    if db is None:
+        db = get_db()
+    rows = db.execute('''
+        SELECT * FROM holidays
+        WHERE school_id = ? AND is_active = 1
+    ''', (school_id,)).fetchall()
+    index = HolidayIndex(school_id, rows)
+    with _holiday_index_lock:
+        _holiday_indexes[school_id] = index
+    return index
+
+
+def invalidate_holiday_index(school_id=None):
+    """Forget the holiday index of `school_id`, or of every school when omitted."""
+    with _holiday_index_lock:
+        if school_id is None:
+            _holiday_indexes.clear()
+        else:
+            _holiday_indexes.pop(_holiday_school_key(school_id), None)
+
+
+def _resolve_holiday_school_id(school_id):
+    from flask import session, has_request_context
+
+    if school_id is None:
+        if has_request_context():
+            school_id = session.get('school_id')
+        else:
+            school_id = 1  # Default for testing
+    return school_id
+
+
 def is_holiday(date_obj, department=None, school_id=None):
     """
     Check if a given date is a holiday.
@@ -1969,53 +3340,13 @@ def is_holiday(date_obj, department=None, school_id=None):
     Returns:
         bool: True if the date is a holiday, False otherwise
     """
-    import json
-    from flask import session, has_request_context
-
     try:
-        if school_id is None:
-            if has_request_context():
-                school_id = session.get('school_id')
-            else:
-                school_id = 1  # Default for testing
+        school_id = _resolve_holiday_school_id(school_id)
 
         if not school_id:
             return False
 
-        db = get_db()
-
-        # Check for institution-wide holidays
-        institution_holidays = db.execute('''
-            SELECT * FROM holidays
-            WHERE school_id = ?
-            AND holiday_type = 'institution_wide'
-            AND is_active = 1
-            AND ? BETWEEN start_date AND end_date
-        ''', (school_id, date_obj.isoformat())).fetchall()
-
-        if institution_holidays:
-            return True
-
-        # Check for department-specific holidays if department is provided
-        if department:
-            dept_holidays = db.execute('''
-                SELECT * FROM holidays
-                WHERE school_id = ?
-                AND holiday_type = 'department_specific'
-                AND is_active = 1
-                AND ? BETWEEN start_date AND end_date
-            ''', (school_id, date_obj.isoformat())).fetchall()
-
-            for holiday in dept_holidays:
-                if holiday['departments']:
-                    try:
-                        departments = json.loads(holiday['departments'])
-                        if department in departments:
-                            return True
-                    except (json.JSONDecodeError, TypeError):
-                        continue
-
-        return False
+        return get_holiday_index(school_id).is_holiday(date_obj, department)
 
     except Exception as e:
         print(f"Error checking holiday status: {e}")
@@ -2033,59 +3364,15 @@ def get_holidays(school_id=None, start_date=None, end_date=None, department=None
         department (str, optional): Filter by department for department-specific holidays
 
     Returns:
-        list: List of holiday records
+        list: List of holiday records (dicts)
     """
-    import json
-    from flask import session, has_request_context
-
     try:
-        if school_id is None:
-            if has_request_context():
-                school_id = session.get('school_id')
-            else:
-                school_id = 1  # Default for testing
+        school_id = _resolve_holiday_school_id(school_id)
 
         if not school_id:
             return []
 
-        db = get_db()
-
-        # Build query conditions
-        conditions = ['school_id = ?', 'is_active = 1']
-        params = [school_id]
-
-        if start_date:
-            conditions.append('end_date >= ?')
-            params.append(start_date)
-
-        if end_date:
-            conditions.append('start_date <= ?')
-            params.append(end_date)
-
-        query = f'''
-            SELECT * FROM holidays
-            WHERE {' AND '.join(conditions)}
-            ORDER BY start_date ASC
-        '''
-
-        holidays = db.execute(query, params).fetchall()
-
-        # Filter department-specific holidays if department is specified
-        if department:
-            filtered_holidays = []
-            for holiday in holidays:
-                if holiday['holiday_type'] == 'institution_wide':
-                    filtered_holidays.append(holiday)
-                elif holiday['holiday_type'] == 'department_specific' and holiday['departments']:
-                    try:
-                        departments = json.loads(holiday['departments'])
-                        if department in departments:
-                            filtered_holidays.append(holiday)
-                    except (json.JSONDecodeError, TypeError):
-                        continue
-            return filtered_holidays
-
-        return holidays
+        return get_holiday_index(school_id).holidays_in_range(start_date, end_date, department)
 
     except Exception as e:
         print(f"Error getting holidays: {e}")
@@ -2157,6 +3444,7 @@ def create_holiday(holiday_data):
         ))
 
         db.commit()
+        invalidate_holiday_index(school_id)
 
         return {
             'success': True,
@@ -2236,6 +3524,7 @@ def update_holiday(holiday_id, holiday_data):
         ))
 
         db.commit()
+        invalidate_holiday_index(school_id)
 
         return {
             'success': True,
@@ -2283,6 +3572,7 @@ def delete_holiday(holiday_id):
         ''', (holiday_id, school_id))
 
         db.commit()
+        invalidate_holiday_index(school_id)
 
         return {
             'success': True,
@@ -2479,6 +3769,286 @@ def is_weekly_off_day(date, school_id=None):
         return False
 
 
+# ---------------------------------------------------------------------------
+# ATTENDANCE DAILY SUMMARY
+# ---------------------------------------------------------------------------
+# Dashboards and charts used to aggregate  attendance JOIN staff  with
+# COUNT(CASE ...) over whole months on every request.  attendance_daily_summary
+# holds those counts per school, department and date.  Whatever writes
+# attendance (punch processors, leave/OD approvals) calls
+# refresh_attendance_daily_summary() for the days it touched, which
+# re-aggregates only those days; rebuild_attendance_daily_summary() backfills.
+_SUMMARY_COUNT_COLUMNS = ('record_count', 'present_count', 'late_count', 'absent_count',
+                          'leave_count', 'on_duty_count', 'overtime_count', 'overtime_hours')
+
+# Days re-aggregated per query
+SUMMARY_REFRESH_CHUNK_DAYS = 200
+
+
+def ensure_attendance_daily_summary_table(db=None):
+    """Create attendance_daily_summary if it doesn't exist"""
+    db = db or get_db()
+    if get_table_columns('attendance_daily_summary', db):
+        return
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_daily_summary (
+            school_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            department VARCHAR(100) NOT NULL,
+            record_count INTEGER DEFAULT 0,
+            present_count INTEGER DEFAULT 0,
+            late_count INTEGER DEFAULT 0,
+            absent_count INTEGER DEFAULT 0,
+            leave_count INTEGER DEFAULT 0,
+            on_duty_count INTEGER DEFAULT 0,
+            overtime_count INTEGER DEFAULT 0,
+            overtime_hours REAL DEFAULT 0,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (school_id, date, department)
+        )
+    ''')
+
+
+def _aggregate_attendance_days(db, school_id, days):
+    """Summary rows {(day, department): counts} for some days of one school."""
+    import datetime
+    placeholders = ', '.join('?' * len(days))
+    overtime_hours = ('SUM(COALESCE(a.overtime_hours, 0))'
+                      if 'overtime_hours' in get_table_columns('attendance', db) else '0')
+    counts = {}
+
+    def bucket(day, department):
+        key = (_date_key(day)[:10], department or '')
+        if key not in counts:
+            counts[key] = dict.fromkeys(_SUMMARY_COUNT_COLUMNS, 0)
+        return counts[key]
+
+    rows = db.execute(f'''
+        SELECT a.date, COALESCE(s.department, '') AS department,
+               COUNT(*) AS record_count,
+               SUM(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 ELSE 0 END) AS present_count,
+               SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END) AS late_count,
+               SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END) AS absent_count,
+               SUM(CASE WHEN a.status IN ('on_duty', 'OD') THEN 1 ELSE 0 END) AS on_duty_count,
+               SUM(CASE WHEN a.overtime_in IS NOT NULL THEN 1 ELSE 0 END) AS overtime_count,
+               {overtime_hours} AS overtime_hours
+        FROM attendance a
+        JOIN staff s ON a.staff_id = s.id
+        WHERE s.school_id = ? AND a.date IN ({placeholders})
+        GROUP BY a.date, COALESCE(s.department, '')
+    ''', (school_id, *days)).fetchall()
+    for row in rows:
+        summary = bucket(row['date'], row['department'])
+        for column in _SUMMARY_COUNT_COLUMNS:
+            if column != 'leave_count':
+                summary[column] = row[column] or 0
+
+    # Leave: attendance marked 'leave' or an approved leave application,
+    # counted once per staff member and day
+    on_leave = set()
+    rows = db.execute(f'''
+        SELECT a.date, COALESCE(s.department, '') AS department, a.staff_id
+        FROM attendance a
+        JOIN staff s ON a.staff_id = s.id
+        WHERE s.school_id = ? AND a.status = 'leave' AND a.date IN ({placeholders})
+    ''', (school_id, *days)).fetchall()
+    for row in rows:
+        on_leave.add((_date_key(row['date'])[:10], row['department'], row['staff_id']))
+
+    leave_columns = get_table_columns('leave_applications', db)
+    if leave_columns:
+        withdrawn = ' AND COALESCE(l.withdrawn, 0) = 0' if 'withdrawn' in leave_columns else ''
+        rows = db.execute(f'''
+            SELECT l.staff_id, l.start_date, l.end_date, COALESCE(s.department, '') AS department
+            FROM leave_applications l
+            JOIN staff s ON l.staff_id = s.id
+            WHERE s.school_id = ? AND l.status = 'approved'{withdrawn}
+              AND l.start_date <= ? AND l.end_date >= ?
+        ''', (school_id, days[-1], days[0])).fetchall()
+        day_set = set(days)
+        for row in rows:
+            start = datetime.datetime.strptime(_date_key(row['start_date'])[:10], '%Y-%m-%d').date()
+            end = datetime.datetime.strptime(_date_key(row['end_date'])[:10], '%Y-%m-%d').date()
+            while start <= end:
+                if start.isoformat() in day_set:
+                    on_leave.add((start.isoformat(), row['department'], row['staff_id']))
+                start += datetime.timedelta(days=1)
+
+    for day, department, _ in on_leave:
+        bucket(day, department)['leave_count'] += 1
+    return counts
+
+
+def refresh_attendance_daily_summary(school_id, dates, db=None, commit=True):
+    """
+    Re-aggregate attendance_daily_summary for some days of a school
+
+    Args:
+        school_id: School whose summary rows are refreshed
+        dates: Dates (date objects or 'YYYY-MM-DD') whose attendance changed
+        db: Connection to use (defaults to get_db())
+        commit: Commit after writing (False to join the caller's transaction)
+
+    Returns:
+        bool: Success status
+    """
+    days = sorted({_date_key(day)[:10] for day in dates if day})
+    if not days or school_id is None:
+        return True
+
+    try:
+        import datetime
+        db = db or get_db()
+        ensure_attendance_daily_summary_table(db)
+        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for i in range(0, len(days), SUMMARY_REFRESH_CHUNK_DAYS):
+            chunk = days[i:i + SUMMARY_REFRESH_CHUNK_DAYS]
+            counts = _aggregate_attendance_days(db, school_id, chunk)
+            db.execute(f'''
+                DELETE FROM attendance_daily_summary
+                WHERE school_id = ? AND date IN ({', '.join('?' * len(chunk))})
+            ''', (school_id, *chunk))
+            if counts:
+                db.executemany(f'''
+                    INSERT INTO attendance_daily_summary
+                    (school_id, date, department, {', '.join(_SUMMARY_COUNT_COLUMNS)}, updated_at)
+                    VALUES ({', '.join('?' * (len(_SUMMARY_COUNT_COLUMNS) + 4))})
+                ''', [(school_id, day, department, *(summary[c] for c in _SUMMARY_COUNT_COLUMNS), now)
+                      for (day, department), summary in sorted(counts.items())])
+        if commit:
+            db.commit()
+        return True
+
+    except Exception as e:
+        print(f"Error refreshing attendance daily summary: {e}")
+        return False
+
+
+def refresh_attendance_daily_summary_range(school_id, start_date, end_date, db=None, commit=True):
+    """refresh_attendance_daily_summary() for every day from start_date to end_date"""
+    import datetime
+    try:
+        day = datetime.datetime.strptime(_date_key(start_date)[:10], '%Y-%m-%d').date()
+        last = datetime.datetime.strptime(_date_key(end_date)[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError) as e:
+        print(f"Error refreshing attendance daily summary: {e}")
+        return False
+    days = []
+    while day <= last:
+        days.append(day)
+        day += datetime.timedelta(days=1)
+    return refresh_attendance_daily_summary(school_id, days, db, commit)
+
+
+def rebuild_attendance_daily_summary(school_id=None, start_date=None, end_date=None, db=None):
+    """
+    Backfill attendance_daily_summary from the attendance table
+
+    Args:
+        school_id: Only this school (default: every school with attendance)
+        start_date, end_date: Optional 'YYYY-MM-DD' bounds
+
+    Returns:
+        int: Number of school-days rebuilt, or -1 on error
+    """
+    import datetime
+    try:
+        db = db or get_db()
+        ensure_attendance_daily_summary_table(db)
+        conditions, params = [], []
+        if school_id is not None:
+            conditions.append('s.school_id = ?')
+            params.append(school_id)
+        if start_date:
+            conditions.append('a.date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('a.date <= ?')
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = db.execute(f'''
+            SELECT DISTINCT s.school_id, a.date
+            FROM attendance a
+            JOIN staff s ON a.staff_id = s.id
+            {where}
+        ''', params).fetchall()
+
+        days_by_school = collections.defaultdict(set)
+        for row in rows:
+            days_by_school[row['school_id']].add(_date_key(row['date'])[:10])
+
+        # Days that only have stale summary rows (attendance since deleted)
+        summary_where = where.replace('s.school_id', 'school_id').replace('a.date', 'date')
+        for row in db.execute(f'SELECT DISTINCT school_id, date FROM attendance_daily_summary {summary_where}',
+                              params).fetchall():
+            days_by_school[row['school_id']].add(_date_key(row['date'])[:10])
+
+        # Days covered by approved leave without any attendance row
+        leave_columns = get_table_columns('leave_applications', db)
+        if leave_columns:
+            leave_where = ["l.status = 'approved'"]
+            if 'withdrawn' in leave_columns:
+                leave_where.append('COALESCE(l.withdrawn, 0) = 0')
+            leave_where += [c.replace('a.date >=', 'l.end_date >=').replace('a.date <=', 'l.start_date <=')
+                            for c in conditions]
+            rows = db.execute(f'''
+                SELECT s.school_id, l.start_date, l.end_date
+                FROM leave_applications l
+                JOIN staff s ON l.staff_id = s.id
+                WHERE {' AND '.join(leave_where)}
+            ''', params).fetchall()
+            for row in rows:
+                first = max(_date_key(row['start_date'])[:10], start_date or '')
+                last = min(_date_key(row['end_date'])[:10], end_date or '9999-12-31')
+                day = datetime.datetime.strptime(first, '%Y-%m-%d').date()
+                last = datetime.datetime.strptime(last, '%Y-%m-%d').date()
+                while day <= last:
+                    days_by_school[row['school_id']].add(day.isoformat())
+                    day += datetime.timedelta(days=1)
+
+        rebuilt = 0
+        for summary_school_id, days in days_by_school.items():
+            if not refresh_attendance_daily_summary(summary_school_id, days, db):
+                return -1
+            rebuilt += len(days)
+        return rebuilt
+
+    except Exception as e:
+        print(f"Error rebuilding attendance daily summary: {e}")
+        return -1
+
+
+def get_attendance_daily_summary(school_id, start_date, end_date, department=None, db=None):
+    """
+    Daily attendance counts of a school, summed over departments
+
+    Returns:
+        list: One dict per date that has attendance ('date' as 'YYYY-MM-DD',
+              plus record/present/late/absent/leave/on_duty/overtime counts)
+    """
+    db = db or get_db()
+    ensure_attendance_daily_summary_table(db)
+    department_filter = ' AND department = ?' if department is not None else ''
+    params = (school_id, _date_key(start_date)[:10], _date_key(end_date)[:10])
+    rows = db.execute(f'''
+        SELECT date, {', '.join(f'SUM({c}) AS {c}' for c in _SUMMARY_COUNT_COLUMNS)}
+        FROM attendance_daily_summary
+        WHERE school_id = ? AND date BETWEEN ? AND ?{department_filter}
+        GROUP BY date
+        ORDER BY date
+    ''', params + ((department,) if department is not None else ())).fetchall()
+
+    summary = []
+    for row in rows:
+        day = {column: (row[column] or 0) for column in _SUMMARY_COUNT_COLUMNS}
+        day['overtime_hours'] = float(day['overtime_hours'])
+        for column in _SUMMARY_COUNT_COLUMNS[:-1]:
+            day[column] = int(day[column])
+        day['date'] = _date_key(row['date'])[:10]
+        summary.append(day)
+    return summary
+
+
 # ===========================
 # Department Management Functions
 # ===========================
@@ -3345,7 +4915,8 @@ def delete_biometric_device(device_id, school_id):
         return {'success': False, 'message': f'Error deleting device: {str(e)}'}
 
 
-def update_device_sync_status(device_id, last_sync=None, sync_status='success'):
+def update_device_sync_status(device_id, last_sync=None, sync_status='success',
+                              latency_ms=None, record_count=None, failure_count=None):
     """
     Update device sync status and timestamp
     
@@ -3353,6 +4924,9 @@ def update_device_sync_status(device_id, last_sync=None, sync_status='success'):
         device_id: Device ID
         last_sync: Last sync datetime (defaults to now in local time)
         sync_status: Sync status ('success', 'failed', 'pending', 'unknown')
+        latency_ms: Duration of the sync in milliseconds (optional metric)
+        record_count: Attendance records read from the device (optional metric)
+        failure_count: Consecutive failed syncs (optional metric)
     
     Returns:
         bool: Success status
@@ -3367,11 +4941,22 @@ def update_device_sync_status(device_id, last_sync=None, sync_status='success'):
             # Use local time instead of UTC
             last_sync = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        cursor.execute('''
+        assignments = ['last_sync = ?', 'sync_status = ?']
+        params = [last_sync, sync_status]
+        metrics = (('last_sync_latency_ms', latency_ms), ('last_sync_record_count', record_count),
+                   ('sync_failure_count', failure_count))
+        if any(value is not None for _, value in metrics):
+            _ensure_biometric_device_columns(db, _DEVICE_SYNC_METRIC_COLUMNS)
+            for column, value in metrics:
+                if value is not None:
+                    assignments.append(f'{column} = ?')
+                    params.append(value)
+        
+        cursor.execute(f'''
             UPDATE biometric_devices 
-            SET last_sync = ?, sync_status = ?
+            SET {', '.join(assignments)}
             WHERE id = ?
-        ''', (last_sync, sync_status, device_id))
+        ''', (*params, device_id))
         
         db.commit()
         return True
@@ -3383,6 +4968,90 @@ def update_device_sync_status(device_id, last_sync=None, sync_status='success'):
         return False
 
 
+# Device log cursor: how many records of a device's attendance log have been
+# read (log_cursor_count) and the timestamp of the last of them, so that LAN
+# pulls only transfer the records added since.
+_DEVICE_LOG_CURSOR_COLUMNS = (
+    ('log_cursor_count', 'log_cursor_count INTEGER'),
+    ('log_cursor_timestamp', 'log_cursor_timestamp DATETIME'),
+)
+
+
+# Metrics of the last scheduled sync, written by update_device_sync_status()
+_DEVICE_SYNC_METRIC_COLUMNS = (
+    ('last_sync_latency_ms', 'last_sync_latency_ms INTEGER'),
+    ('last_sync_record_count', 'last_sync_record_count INTEGER'),
+    ('sync_failure_count', 'sync_failure_count INTEGER DEFAULT 0'),
+)
+
+
+def _ensure_biometric_device_columns(db, column_definitions):
+    columns = get_table_columns('biometric_devices', db)
+    missing = [definition for name, definition in column_definitions if name not in columns]
+    for definition in missing:
+        db.execute(f'ALTER TABLE biometric_devices ADD COLUMN {definition}')
+    if missing:
+        db.commit()
+        invalidate_schema_cache('biometric_devices')
+
+
+def get_device_log_cursor(device_id):
+    """
+    Get the attendance log cursor of a device
+
+    Args:
+        device_id: Device ID
+
+    Returns:
+        dict: {'count': int or None, 'last_timestamp': value or None}, or None on error
+    """
+    try:
+        db = get_db()
+        _ensure_biometric_device_columns(db, _DEVICE_LOG_CURSOR_COLUMNS)
+        row = db.execute('''
+            SELECT log_cursor_count, log_cursor_timestamp
+            FROM biometric_devices
+            WHERE id = ?
+        ''', (device_id,)).fetchone()
+        if not row:
+            return None
+        return {'count': row['log_cursor_count'], 'last_timestamp': row['log_cursor_timestamp']}
+
+    except Exception as e:
+        print(f"Error getting device log cursor: {e}")
+        return None
+
+
+def update_device_log_cursor(device_id, log_cursor):
+    """
+    Persist the attendance log cursor of a device once its records are saved
+
+    Args:
+        device_id: Device ID
+        log_cursor: {'count': int, 'last_timestamp': datetime}
+
+    Returns:
+        bool: Success status
+    """
+    db = None
+    try:
+        db = get_db()
+        _ensure_biometric_device_columns(db, _DEVICE_LOG_CURSOR_COLUMNS)
+        db.execute('''
+            UPDATE biometric_devices
+            SET log_cursor_count = ?, log_cursor_timestamp = ?
+            WHERE id = ?
+        ''', (log_cursor.get('count'), log_cursor.get('last_timestamp'), device_id))
+        db.commit()
+        return True
+
+    except Exception as e:
+        print(f"Error updating device log cursor: {e}")
+        if db:
+            db.rollback()
+        return False
+
+
 # =============================================================================
 # BIOMETRIC AGENT MANAGEMENT FUNCTIONS
 # =============================================================================
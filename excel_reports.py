@@ -8,19 +8,45 @@ This module provides advanced Excel reporting capabilities with:
 - Formatted tables
 - Summary statistics
 - Data visualization
+- Write-only (streaming) workbooks for the large monthly, overtime,
+  company and staff exports, sent to the client in chunks
 """
 
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-from openpyxl.utils.dataframe import dataframe_to_rows
-import pandas as pd
+from openpyxl.utils import get_column_letter
 from datetime import datetime, timedelta
 import sqlite3
-from database import get_db
+from database import get_db, iter_rows
 import io
 import base64
-from flask import make_response
+import itertools
+import tempfile
+from flask import Response
+
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Bytes sent per chunk when streaming a saved workbook
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_file_chunks(fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a file in chunks, closing (and so deleting) it once sent"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _solid_fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
 
 
 class ExcelReportGenerator:
@@ -37,6 +63,55 @@ class ExcelReportGenerator:
             bottom=Side(style='thin')
         )
         
+    def _new_streaming_workbook(self):
+        """Write-only workbook with the report's named cell styles registered"""
+        wb = openpyxl.Workbook(write_only=True)
+        for name, style in self._report_styles().items():
+            wb.add_named_style(NamedStyle(name=name, **style))
+        return wb
+
+    def _report_styles(self):
+        """Named styles used by the streaming reports, by name"""
+        cell_border = {'border': self.border}
+        return {
+            'report_title': {'font': self.title_font},
+            'report_title_centered': {'font': self.title_font, 'alignment': Alignment(horizontal='center')},
+            'report_subtitle': {'font': Font(bold=True, size=11)},
+            'report_section': {'font': Font(bold=True, size=12)},
+            'report_label': {'font': Font(bold=True)},
+            'report_cell_label': {'border': self.border, 'font': Font(bold=True)},
+            'report_header': {'font': self.header_font, 'fill': self.header_fill, 'border': self.border,
+                              'alignment': Alignment(horizontal='center', vertical='center')},
+            'report_cell': cell_border,
+            'report_cell_middle': {**cell_border, 'alignment': Alignment(vertical='center')},
+            'report_cell_good': {**cell_border, 'fill': _solid_fill('CCFFCC')},
+            'report_cell_warn': {**cell_border, 'fill': _solid_fill('FFFFCC')},
+            'report_cell_bad': {**cell_border, 'fill': _solid_fill('FFCCCC')},
+            'report_total_label': {**cell_border, 'font': Font(bold=True), 'fill': _solid_fill('D3D3D3')},
+            'report_total': {**cell_border, 'font': Font(bold=True), 'fill': _solid_fill('E6E6FA')},
+        }
+
+    def _row(self, ws, values, style='report_cell'):
+        """Write-only cells for one row; style is a style name or one per value"""
+        styles = style if isinstance(style, (list, tuple)) else [style] * len(values)
+        cells = []
+        for value, cell_style in zip(values, styles):
+            cell = WriteOnlyCell(ws, value=value)
+            if cell_style:
+                cell.style = cell_style
+            cells.append(cell)
+        return cells
+
+    def _append_title(self, ws, title, width, style='report_title'):
+        """First row of a sheet: the title, merged across `width` columns"""
+        ws.merged_cells.add(f"A1:{get_column_letter(width)}1")
+        ws.append(self._row(ws, [title], style))
+
+    def _set_column_widths(self, ws, widths):
+        # Write-only sheets need column widths before the first row
+        for col, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+
     def create_staff_attendance_report(self, school_id, start_date, end_date):
         """Create comprehensive staff attendance report"""
         wb = openpyxl.Workbook()
@@ -70,56 +145,91 @@ class ExcelReportGenerator:
     
     def create_company_report(self, start_date, end_date):
         """Create company-wide report across all schools"""
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)
-        
-        self._create_company_summary_sheet(wb, start_date, end_date)
-        self._create_school_comparison_sheet(wb, start_date, end_date)
-        self._create_company_charts_sheet(wb, start_date, end_date)
-        
+        wb = self._new_streaming_workbook()
+
+        # One pass over attendance feeds all three sheets
+        school_stats = self._get_company_school_stats(start_date, end_date)
+
+        self._create_company_summary_sheet(wb, start_date, end_date, school_stats)
+        self._create_school_comparison_sheet(wb, start_date, end_date, school_stats)
+        self._create_company_charts_sheet(wb, start_date, end_date, school_stats)
+
         return self._save_workbook_to_response(wb, f"Company_Report_{start_date}_to_{end_date}.xlsx")
-    
+
     def create_monthly_report(self, school_id, year, month):
         """Create monthly attendance report with individual staff records"""
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)
-        
+        wb = self._new_streaming_workbook()
+
         # Create Staff Records sheet FIRST (main data users want to see)
         self._create_monthly_staff_records_sheet(wb, school_id, year, month)
-        
+
         # Create summary sheets
         self._create_monthly_summary_sheet(wb, school_id, year, month)
         self._create_monthly_calendar_sheet(wb, school_id, year, month)
         self._create_monthly_trends_sheet(wb, school_id, year, month)
-        
+
         return self._save_workbook_to_response(wb, f"Monthly_Report_{year}_{month:02d}.xlsx")
-    
+
     def create_overtime_report(self, school_id, year, month):
         """Create comprehensive overtime report with individual staff overtime data"""
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)
-        
+        wb = self._new_streaming_workbook()
+
         # Create Overtime Records sheet FIRST (main data users want to see)
         self._create_overtime_records_sheet(wb, school_id, year, month)
-        
+
         # Create summary sheets
         self._create_overtime_summary_sheet(wb, school_id, year, month)
         self._create_overtime_trends_sheet(wb, school_id, year, month)
-        
+
         return self._save_workbook_to_response(wb, f"Overtime_Report_{year}_{month:02d}.xlsx")
-    
+
+    def create_staff_details_report(self, school_id):
+        """Create the staff details export (one row per staff member)"""
+        wb = self._new_streaming_workbook()
+        ws = wb.create_sheet("Staff Details")
+
+        headers = [
+            'S.No', 'Staff ID', 'First Name', 'Last Name', 'Full Name',
+            'Date of Birth', 'Date of Joining', 'Department', 'Destination/Position',
+            'Gender', 'Phone Number', 'Email ID', 'Shift Type', 'Created Date'
+        ]
+        self._set_column_widths(ws, [15] * len(headers))
+        ws.freeze_panes = 'A4'
+        self._append_title(
+            ws, f"Staff Details Report - Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            len(headers), 'report_title_centered')
+        ws.append([])
+        ws.append(self._row(ws, headers, 'report_header'))
+
+        staff_rows = iter_rows('''
+            SELECT staff_id, full_name, first_name, last_name,
+                   date_of_birth, date_of_joining, department, destination,
+                   position, gender, phone, email, shift_type, created_at
+            FROM staff
+            WHERE school_id = ?
+            ORDER BY CAST(staff_id AS INTEGER) ASC
+        ''', (school_id,))
+        for number, staff_member in enumerate(staff_rows, 1):
+            ws.append(self._row(ws, [
+                number,
+                staff_member['staff_id'] or 'N/A',
+                staff_member['first_name'] or 'N/A',
+                staff_member['last_name'] or 'N/A',
+                staff_member['full_name'] or 'N/A',
+                staff_member['date_of_birth'] or 'N/A',
+                staff_member['date_of_joining'] or 'N/A',
+                staff_member['department'] or 'N/A',
+                staff_member['destination'] or staff_member['position'] or 'N/A',
+                staff_member['gender'] or 'N/A',
+                staff_member['phone'] or 'N/A',
+                staff_member['email'] or 'N/A',
+                staff_member['shift_type'] or 'General',
+                staff_member['created_at'] or 'N/A'
+            ], 'report_cell_middle'))
+
+        return self._save_workbook_to_response(
+            wb, f'staff_details_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
+
     def create_staff_profile_report(self, school_id):
         """Create comprehensive staff profile report"""
         wb = openpyxl.Workbook()
@@ -255,14 +365,15 @@ class ExcelReportGenerator:
                 ws.cell(row=row, column=col).border = self.border
     
     def _save_workbook_to_response(self, wb, filename):
-        """Save workbook and return Flask response"""
-        output = io.BytesIO()
+        """Save workbook to a temporary file and stream it back in chunks"""
+        output = tempfile.TemporaryFile()
         wb.save(output)
+        size = output.tell()
         output.seek(0)
-        
-        response = make_response(output.getvalue())
+
+        response = Response(_iter_file_chunks(output), mimetype=XLSX_MIMETYPE)
         response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        response.headers['Content-type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        response.headers['Content-Length'] = str(size)
         return response
 
     def _create_staff_profile_sheet(self, wb, school_id):
@@ -609,35 +720,18 @@ class ExcelReportGenerator:
         for col in range(1, 5):
             ws.column_dimensions[chr(64 + col)].width = 15
 
-    def _create_company_summary_sheet(self, wb, start_date, end_date):
-        """Create company-wide summary sheet"""
-        ws = wb.create_sheet("Company Summary")
-
-        # Title
-        ws['A1'] = "Company-wide Attendance Summary"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
-
-        ws['A3'] = f"Report Period: {start_date} to {end_date}"
-        ws['A4'] = f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-
-        # Headers
-        headers = ['School Name', 'Total Staff', 'Total Records', 'Present Days', 'Attendance Rate', 'Late Arrivals']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=6, column=col, value=header)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center')
-
-        # Get data
+    def _get_company_school_stats(self, start_date, end_date):
+        """Per-school attendance totals for the company report sheets"""
         db = get_db()
-        school_data = db.execute('''
+        rows = db.execute('''
             SELECT
                 s.name as school_name,
                 COUNT(DISTINCT st.id) as total_staff,
+                COUNT(*) as joined_rows,
                 COUNT(a.id) as total_records,
                 COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_days,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_arrivals
+                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_arrivals,
+                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as total_absences
             FROM schools s
             LEFT JOIN staff st ON s.id = st.school_id
             LEFT JOIN attendance a ON st.id = a.staff_id AND a.date BETWEEN ? AND ?
@@ -645,113 +739,84 @@ class ExcelReportGenerator:
             ORDER BY s.name
         ''', (start_date, end_date)).fetchall()
 
-        # Add data
-        for row, school in enumerate(school_data, 7):
-            attendance_rate = (school['present_days'] / school['total_records'] * 100) if school['total_records'] > 0 else 0
+        school_stats = []
+        for row in rows:
+            stats = dict(row)
+            # Share of present rows among all joined rows, i.e. AVG(present ? 1 : 0)
+            stats['avg_attendance_rate'] = row['present_days'] * 100.0 / row['joined_rows'] if row['joined_rows'] else 0.0
+            school_stats.append(stats)
+        return school_stats
 
-            ws.cell(row=row, column=1, value=school['school_name'])
-            ws.cell(row=row, column=2, value=school['total_staff'])
-            ws.cell(row=row, column=3, value=school['total_records'])
-            ws.cell(row=row, column=4, value=school['present_days'])
-            ws.cell(row=row, column=5, value=f"{attendance_rate:.1f}%")
-            ws.cell(row=row, column=6, value=school['late_arrivals'])
+    def _create_company_summary_sheet(self, wb, start_date, end_date, school_stats):
+        """Create company-wide summary sheet"""
+        ws = wb.create_sheet("Company Summary")
+        self._set_column_widths(ws, [25, 12, 15, 12, 15, 12])
 
-        # Format columns
-        column_widths = [25, 12, 15, 12, 15, 12]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
+        # Title
+        self._append_title(ws, "Company-wide Attendance Summary", 6)
+        ws.append([])
+        ws.append([f"Report Period: {start_date} to {end_date}"])
+        ws.append([f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+        ws.append([])
 
-        # Add borders
-        for row in range(6, len(school_data) + 7):
-            for col in range(1, 7):
-                ws.cell(row=row, column=col).border = self.border
+        # Headers
+        headers = ['School Name', 'Total Staff', 'Total Records', 'Present Days', 'Attendance Rate', 'Late Arrivals']
+        ws.append(self._row(ws, headers, 'report_header'))
 
-    def _create_school_comparison_sheet(self, wb, start_date, end_date):
+        # Add data
+        for school in school_stats:
+            attendance_rate = (school['present_days'] / school['total_records'] * 100) if school['total_records'] > 0 else 0
+            ws.append(self._row(ws, [
+                school['school_name'],
+                school['total_staff'],
+                school['total_records'],
+                school['present_days'],
+                f"{attendance_rate:.1f}%",
+                school['late_arrivals']
+            ]))
+
+    def _create_school_comparison_sheet(self, wb, start_date, end_date, school_stats):
         """Create school comparison sheet"""
         ws = wb.create_sheet("School Comparison")
+        self._set_column_widths(ws, [8, 25, 12, 15, 18])
 
         # Title
-        ws['A1'] = "School Performance Comparison"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:E1')
-
-        # Get comparative data
-        db = get_db()
-        comparison_data = db.execute('''
-            SELECT
-                s.name as school_name,
-                COUNT(DISTINCT st.id) as total_staff,
-                ROUND(AVG(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1.0 ELSE 0.0 END) * 100, 2) as avg_attendance_rate,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as total_late_arrivals,
-                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as total_absences
-            FROM schools s
-            LEFT JOIN staff st ON s.id = st.school_id
-            LEFT JOIN attendance a ON st.id = a.staff_id AND a.date BETWEEN ? AND ?
-            GROUP BY s.id, s.name
-            ORDER BY avg_attendance_rate DESC
-        ''', (start_date, end_date)).fetchall()
+        self._append_title(ws, "School Performance Comparison", 5)
+        ws.append([])
 
         # Headers
         headers = ['Rank', 'School Name', 'Staff Count', 'Attendance Rate', 'Performance']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center')
+        ws.append(self._row(ws, headers, 'report_header'))
 
         # Add ranked data
-        for row, (rank, school) in enumerate(enumerate(comparison_data, 1), 4):
-            performance = "Excellent" if school['avg_attendance_rate'] >= 95 else \
-                         "Good" if school['avg_attendance_rate'] >= 85 else \
-                         "Average" if school['avg_attendance_rate'] >= 75 else "Needs Improvement"
+        ranked = sorted(school_stats, key=lambda school: round(school['avg_attendance_rate'], 2), reverse=True)
+        for rank, school in enumerate(ranked, 1):
+            attendance_rate = round(school['avg_attendance_rate'], 2)
+            performance = "Excellent" if attendance_rate >= 95 else \
+                         "Good" if attendance_rate >= 85 else \
+                         "Average" if attendance_rate >= 75 else "Needs Improvement"
 
-            ws.cell(row=row, column=1, value=rank)
-            ws.cell(row=row, column=2, value=school['school_name'])
-            ws.cell(row=row, column=3, value=school['total_staff'])
-            ws.cell(row=row, column=4, value=f"{school['avg_attendance_rate']:.1f}%")
-            ws.cell(row=row, column=5, value=performance)
+            ws.append([rank, school['school_name'], school['total_staff'], f"{attendance_rate:.1f}%", performance])
 
-        # Format columns
-        column_widths = [8, 25, 12, 15, 18]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
-
-    def _create_company_charts_sheet(self, wb, start_date, end_date):
+    def _create_company_charts_sheet(self, wb, start_date, end_date, school_stats):
         """Create company charts sheet"""
         ws = wb.create_sheet("Company Analytics")
 
         # Title
-        ws['A1'] = "Company-wide Analytics"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
-
-        # School performance comparison chart data
-        db = get_db()
-        chart_data = db.execute('''
-            SELECT
-                s.name as school_name,
-                ROUND(AVG(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1.0 ELSE 0.0 END) * 100, 1) as attendance_rate
-            FROM schools s
-            LEFT JOIN staff st ON s.id = st.school_id
-            LEFT JOIN attendance a ON st.id = a.staff_id AND a.date BETWEEN ? AND ?
-            GROUP BY s.id, s.name
-            ORDER BY attendance_rate DESC
-        ''', (start_date, end_date)).fetchall()
+        self._append_title(ws, "Company-wide Analytics", 6)
+        ws.append([])
 
         # Add chart data
-        ws['A3'] = "School Performance Comparison"
-        ws['A3'].font = Font(bold=True, size=12)
+        ws.append(self._row(ws, ["School Performance Comparison"], 'report_section'))
+        ws.append(self._row(ws, ['School', 'Attendance Rate (%)'], 'report_header'))
 
-        headers = ['School', 'Attendance Rate (%)']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-
-        for row, school in enumerate(chart_data, 5):
-            ws.cell(row=row, column=1, value=school['school_name'])
-            ws.cell(row=row, column=2, value=school['attendance_rate'])
+        chart_data = sorted(
+            ({'school_name': school['school_name'], 'attendance_rate': round(school['avg_attendance_rate'], 1)}
+             for school in school_stats),
+            key=lambda school: school['attendance_rate'], reverse=True
+        )
+        for school in chart_data:
+            ws.append([school['school_name'], school['attendance_rate']])
 
         # Create bar chart
         bar_chart = BarChart()
@@ -765,47 +830,40 @@ class ExcelReportGenerator:
         bar_chart.set_categories(categories)
         ws.add_chart(bar_chart, "D3")
 
-    def _create_monthly_staff_records_sheet(self, wb, school_id, year, month):
-        """Create individual staff records sheet for monthly attendance"""
-        ws = wb.create_sheet("Staff Records")
-        
-        # Title
-        ws['A1'] = f"Monthly Staff Attendance Records - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:I1')
-        
-        # Date range info
+    def _month_bounds(self, year, month):
         start_date = datetime(year, month, 1).date()
         if month == 12:
             end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
         else:
             end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        ws['A2'] = f"Period: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')}"
-        ws['A2'].font = Font(bold=True, size=11)
-        
+        return start_date, end_date
+
+    def _create_monthly_staff_records_sheet(self, wb, school_id, year, month):
+        """Create individual staff records sheet for monthly attendance"""
+        ws = wb.create_sheet("Staff Records")
+        self._set_column_widths(ws, [12, 25, 18, 18, 16, 14, 12, 16, 16])
+
+        # Title
+        self._append_title(ws, f"Monthly Staff Attendance Records - {year}/{month:02d}", 9)
+
+        # Date range info
+        start_date, end_date = self._month_bounds(year, month)
+        ws.append(self._row(ws, [f"Period: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')}"],
+                            'report_subtitle'))
+
         db = get_db()
         school = db.execute('SELECT name FROM schools WHERE id = ?', (school_id,)).fetchone()
-        ws['A3'] = f"School: {school['name'] if school else 'Unknown'}"
-        
+        ws.append([f"School: {school['name'] if school else 'Unknown'}"])
+        ws.append([])
+
         # Headers
         headers = [
             'Staff ID', 'Staff Name', 'Department', 'Position',
             'Total Working Days', 'Absent (count)', 'Leave (count)',
             'On Duty (OD) (count)', 'Total Present Days'
         ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=5, column=col, value=header)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = self.border
-        
-        # Calculate total working days in the month (business days)
-        import calendar
-        total_days_in_month = (end_date - start_date).days + 1
-        
+        ws.append(self._row(ws, headers, 'report_header'))
+
         # Count business days (excluding only Sundays) for more accurate working days
         business_days_count = 0
         current_date = start_date
@@ -813,10 +871,10 @@ class ExcelReportGenerator:
             if current_date.weekday() < 6:  # Monday-Saturday = 0-5, Sunday = 6
                 business_days_count += 1
             current_date += timedelta(days=1)
-        
-        # Get individual staff monthly attendance summary with corrected calculations
-        staff_records = db.execute('''
-            SELECT 
+
+        # Individual staff monthly attendance summary, streamed row by row
+        staff_records = iter_rows('''
+            SELECT
                 s.staff_id,
                 s.full_name,
                 s.department,
@@ -827,48 +885,47 @@ class ExcelReportGenerator:
                 COUNT(CASE WHEN a.status IN ('present', 'late', 'early_departure') THEN 1 END) as recorded_present_count,
                 COUNT(CASE WHEN a.date IS NOT NULL THEN 1 END) as total_recorded_days
             FROM staff s
-            LEFT JOIN attendance a ON s.id = a.staff_id 
+            LEFT JOIN attendance a ON s.id = a.staff_id
                 AND a.date BETWEEN ? AND ?
                 AND a.school_id = ?
             WHERE s.school_id = ? AND s.is_active = 1
             GROUP BY s.id, s.staff_id, s.full_name, s.department, s.destination
             ORDER BY CAST(s.staff_id AS INTEGER) ASC
-        ''', (start_date, end_date, school_id, school_id)).fetchall()
-        
-        # Store corrected values for totals calculation
-        corrected_staff_data = []
-        
-        # Add staff data with corrected calculations
-        row = 6
+        ''', (start_date, end_date, school_id, school_id))
+
+        # Running totals for the summary row
+        totals = {'staff': 0, 'absent': 0, 'leave': 0, 'on_duty': 0, 'present': 0}
+
         for staff in staff_records:
-            # Calculate corrected values
             working_days = business_days_count
             leave_count = staff['leave_count']
             on_duty_count = staff['on_duty_count']
-            recorded_present = staff['recorded_present_count']
-            
+
             # Present count includes actual present + late + on_duty days
-            total_present_days = recorded_present + on_duty_count
-            
-            # Absent count = Working days - (Present + Leave + On Duty)
-            # But we need to account for days without attendance records
-            recorded_days = staff['total_recorded_days']
-            unrecorded_days = working_days - recorded_days
-            
-            # If there are unrecorded days, we assume they are absent
+            total_present_days = staff['recorded_present_count'] + on_duty_count
+
+            # Days without attendance records are counted as absent
+            unrecorded_days = working_days - staff['total_recorded_days']
             actual_absent_count = staff['recorded_absent_count'] + unrecorded_days
-            
-            # Store corrected data for totals
-            corrected_data = {
-                'working_days': working_days,
-                'absent_count': actual_absent_count,
-                'leave_count': leave_count,
-                'on_duty_count': on_duty_count,
-                'present_count': total_present_days
-            }
-            corrected_staff_data.append(corrected_data)
-            
-            values = [
+
+            totals['staff'] += 1
+            totals['absent'] += actual_absent_count
+            totals['leave'] += leave_count
+            totals['on_duty'] += on_duty_count
+            totals['present'] += total_present_days
+
+            # Highlight high absence counts and excellent/poor attendance
+            styles = ['report_cell'] * 9
+            if actual_absent_count > 5:
+                styles[5] = 'report_cell_bad'
+            if working_days > 0:
+                rate = total_present_days / working_days
+                if rate >= 0.95:
+                    styles[8] = 'report_cell_good'
+                elif rate < 0.80:
+                    styles[8] = 'report_cell_bad'
+
+            ws.append(self._row(ws, [
                 staff['staff_id'],
                 staff['full_name'],
                 staff['department'] or 'Unassigned',
@@ -878,95 +935,55 @@ class ExcelReportGenerator:
                 leave_count,
                 on_duty_count,
                 total_present_days  # Corrected present count
-            ]
-            
-            for col, value in enumerate(values, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = self.border
-                
-                # Add conditional formatting for better readability
-                if col == 6 and value > 5:  # High absence count
-                    cell.fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-                elif col == 9 and working_days > 0:  # Attendance rate coloring based on present days
-                    rate = value / working_days
-                    if rate >= 0.95:  # Excellent attendance
-                        cell.fill = PatternFill(start_color='CCFFCC', end_color='CCFFCC', fill_type='solid')
-                    elif rate < 0.80:  # Poor attendance
-                        cell.fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-            
-            row += 1
-        
+            ], styles))
+
         # Add summary row
-        if corrected_staff_data:
-            row += 1
-            
-            # Calculate totals using corrected data
-            total_staff = len(corrected_staff_data)
-            total_working_days_display = total_staff * business_days_count
-            total_absent = sum(record['absent_count'] for record in corrected_staff_data)
-            total_leave = sum(record['leave_count'] for record in corrected_staff_data)
-            total_on_duty = sum(record['on_duty_count'] for record in corrected_staff_data)
-            total_present = sum(record['present_count'] for record in corrected_staff_data)
-            
-            # Create summary row values with proper structure
-            summary_values = [
+        if totals['staff']:
+            ws.append([])
+            ws.append(self._row(ws, [
                 "TOTALS:",
-                f"{total_staff} Staff",
+                f"{totals['staff']} Staff",
                 "",
                 "",
-                total_working_days_display,
-                total_absent,
-                total_leave,
-                total_on_duty,
-                total_present
-            ]
-            
-            for col, value in enumerate(summary_values, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.font = Font(bold=True)
-                cell.border = self.border
-                if col == 1:  # "TOTALS:" label
-                    cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-                else:  # Data cells
-                    cell.fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-        
-        # Format columns
-        column_widths = [12, 25, 18, 18, 16, 14, 12, 16, 16]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
-        
+                totals['staff'] * business_days_count,
+                totals['absent'],
+                totals['leave'],
+                totals['on_duty'],
+                totals['present']
+            ], ['report_total_label'] + ['report_total'] * 8))
+
         # Add notes
-        notes_row = row + 3
-        ws.cell(row=notes_row, column=1, value="Notes:").font = Font(bold=True)
-        ws.cell(row=notes_row + 1, column=1, value=f"• Total Working Days: {business_days_count} business days in {year}/{month:02d}")
-        ws.cell(row=notes_row + 2, column=1, value="• Staff ID sorted in ascending numerical order") 
-        ws.cell(row=notes_row + 3, column=1, value="• Absent count = Working days - (Present + Leave + On Duty)")
-        ws.cell(row=notes_row + 4, column=1, value="• Total Present Days = Present + Late + On Duty")
-        ws.cell(row=notes_row + 5, column=1, value="• Days without attendance records are counted as absent")
-        ws.cell(row=notes_row + 6, column=1, value="• Green highlighting = Excellent attendance (≥95%)")
-        ws.cell(row=notes_row + 7, column=1, value="• Red highlighting = High absence count (>5) or poor attendance (<80%)")
+        for _ in range(2 if totals['staff'] else 3):
+            ws.append([])
+        notes = [
+            f"• Total Working Days: {business_days_count} business days in {year}/{month:02d}",
+            "• Staff ID sorted in ascending numerical order",
+            "• Absent count = Working days - (Present + Leave + On Duty)",
+            "• Total Present Days = Present + Late + On Duty",
+            "• Days without attendance records are counted as absent",
+            "• Green highlighting = Excellent attendance (≥95%)",
+            "• Red highlighting = High absence count (>5) or poor attendance (<80%)"
+        ]
+        ws.append(self._row(ws, ["Notes:"], 'report_label'))
+        for note in notes:
+            ws.append([note])
 
     def _create_monthly_summary_sheet(self, wb, school_id, year, month):
         """Create monthly summary sheet"""
         ws = wb.create_sheet("Monthly Summary")
+        self._set_column_widths(ws, [20, 15])
 
         # Title
-        ws['A1'] = f"Monthly Attendance Report - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
+        self._append_title(ws, f"Monthly Attendance Report - {year}/{month:02d}", 6)
+        ws.append([])
 
         db = get_db()
         school = db.execute('SELECT name FROM schools WHERE id = ?', (school_id,)).fetchone()
-        ws['A3'] = f"School: {school['name'] if school else 'Unknown'}"
+        ws.append([f"School: {school['name'] if school else 'Unknown'}"])
+        ws.append([])
 
         # Monthly statistics
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-
-        # Get monthly stats
+        start_date, end_date = self._month_bounds(year, month)
         monthly_stats = db.execute('''
             SELECT
                 COUNT(DISTINCT staff_id) as active_staff,
@@ -980,8 +997,7 @@ class ExcelReportGenerator:
         ''', (school_id, start_date, end_date)).fetchone()
 
         # Display stats
-        ws['A5'] = "Monthly Statistics"
-        ws['A5'].font = Font(bold=True, size=12)
+        ws.append(self._row(ws, ["Monthly Statistics"], 'report_section'))
 
         stats = [
             ('Active Staff:', monthly_stats['active_staff']),
@@ -993,37 +1009,24 @@ class ExcelReportGenerator:
             ('Attendance Rate:', f"{(monthly_stats['present_days']/monthly_stats['total_records']*100):.1f}%" if monthly_stats['total_records'] > 0 else "0%")
         ]
 
-        for row, (label, value) in enumerate(stats, 6):
-            ws.cell(row=row, column=1, value=label).font = Font(bold=True)
-            ws.cell(row=row, column=2, value=value)
-
-        # Format columns
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 15
+        for label, value in stats:
+            ws.append(self._row(ws, [label, value], ['report_label', None]))
 
     def _create_monthly_calendar_sheet(self, wb, school_id, year, month):
         """Create monthly calendar view sheet"""
         ws = wb.create_sheet("Monthly Calendar")
+        self._set_column_widths(ws, [12] * 7)
 
         # Title
-        ws['A1'] = f"Monthly Calendar View - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:H1')
+        self._append_title(ws, f"Monthly Calendar View - {year}/{month:02d}", 8)
+        ws.append([])
 
         # Calendar headers
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        for col, day in enumerate(days, 1):
-            cell = ws.cell(row=3, column=col, value=day)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center')
+        ws.append(self._row(ws, days, 'report_header'))
 
         # Get daily attendance summary for the month
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
+        start_date, end_date = self._month_bounds(year, month)
 
         db = get_db()
         daily_summary = db.execute('''
@@ -1037,49 +1040,34 @@ class ExcelReportGenerator:
             ORDER BY date
         ''', (school_id, start_date, end_date)).fetchall()
 
-        # Create calendar grid
-        current_date = start_date
-        row = 4
-        col = current_date.weekday() + 1  # Monday = 0, so add 1 for column
-
-        daily_data = {record['date']: record for record in daily_summary}
+        daily_data = {str(record['date'])[:10]: record for record in daily_summary}
 
+        # One week per three rows: day numbers, present counts, absent counts
+        current_date = start_date - timedelta(days=start_date.weekday())
         while current_date <= end_date:
-            if col > 7:
-                col = 1
-                row += 3  # Leave space for attendance data
-
-            # Date
-            ws.cell(row=row, column=col, value=current_date.day).font = Font(bold=True)
-
-            # Attendance data
-            if current_date.strftime('%Y-%m-%d') in daily_data:
-                data = daily_data[current_date.strftime('%Y-%m-%d')]
-                ws.cell(row=row+1, column=col, value=f"P: {data['present_count']}")
-                ws.cell(row=row+2, column=col, value=f"A: {data['absent_count']}")
-
-            current_date += timedelta(days=1)
-            col += 1
-
-        # Format columns
-        for col in range(1, 8):
-            ws.column_dimensions[chr(64 + col)].width = 12
+            day_numbers, present, absent = [], [], []
+            for _ in range(7):
+                in_month = start_date <= current_date <= end_date
+                data = daily_data.get(current_date.strftime('%Y-%m-%d')) if in_month else None
+                day_numbers.append(current_date.day if in_month else None)
+                present.append(f"P: {data['present_count']}" if data else None)
+                absent.append(f"A: {data['absent_count']}" if data else None)
+                current_date += timedelta(days=1)
+            ws.append(self._row(ws, day_numbers, 'report_label'))
+            ws.append(present)
+            ws.append(absent)
 
     def _create_monthly_trends_sheet(self, wb, school_id, year, month):
         """Create monthly trends analysis sheet"""
         ws = wb.create_sheet("Monthly Trends")
+        self._set_column_widths(ws, [12] * 5)
 
         # Title
-        ws['A1'] = f"Monthly Trends Analysis - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
+        self._append_title(ws, f"Monthly Trends Analysis - {year}/{month:02d}", 6)
+        ws.append([])
 
         # Weekly breakdown
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
+        start_date, end_date = self._month_bounds(year, month)
 
         db = get_db()
         weekly_data = db.execute('''
@@ -1095,64 +1083,46 @@ class ExcelReportGenerator:
         ''', (school_id, start_date, end_date)).fetchall()
 
         # Add weekly data
-        ws['A3'] = "Weekly Breakdown"
-        ws['A3'].font = Font(bold=True, size=12)
+        ws.append(self._row(ws, ["Weekly Breakdown"], 'report_section'))
 
         headers = ['Week', 'Present', 'Absent', 'Total', 'Attendance %']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.font = self.header_font
-            cell.fill = self.header_fill
+        ws.append(self._row(ws, headers, 'report_header'))
 
-        for row, week in enumerate(weekly_data, 5):
+        for week in weekly_data:
             attendance_pct = (week['present_count'] / week['total_count'] * 100) if week['total_count'] > 0 else 0
-            ws.cell(row=row, column=1, value=f"Week {week['week_number']}")
-            ws.cell(row=row, column=2, value=week['present_count'])
-            ws.cell(row=row, column=3, value=week['absent_count'])
-            ws.cell(row=row, column=4, value=week['total_count'])
-            ws.cell(row=row, column=5, value=f"{attendance_pct:.1f}%")
-
-        # Format columns
-        for col in range(1, 6):
-            ws.column_dimensions[chr(64 + col)].width = 12
+            ws.append([
+                f"Week {week['week_number']}",
+                week['present_count'],
+                week['absent_count'],
+                week['total_count'],
+                f"{attendance_pct:.1f}%"
+            ])
 
     def _create_overtime_records_sheet(self, wb, school_id, year, month):
         """Create individual staff overtime records sheet"""
         ws = wb.create_sheet("Overtime Records")
-        
+        self._set_column_widths(ws, [12, 25, 18, 18, 16, 16, 50])
+
         # Title
-        ws['A1'] = f"Staff Overtime Records - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:G1')
-        
+        self._append_title(ws, f"Staff Overtime Records - {year}/{month:02d}", 7)
+
         # Date range info
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        ws['A2'] = f"Period: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')}"
-        ws['A2'].font = Font(bold=True, size=11)
-        
+        start_date, end_date = self._month_bounds(year, month)
+        ws.append(self._row(ws, [f"Period: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')}"],
+                            'report_subtitle'))
+
         db = get_db()
         school = db.execute('SELECT name FROM schools WHERE id = ?', (school_id,)).fetchone()
-        ws['A3'] = f"School: {school['name'] if school else 'Unknown'}"
-        
+        ws.append([f"School: {school['name'] if school else 'Unknown'}"])
+        ws.append([])
+
         # Headers
         headers = [
             'Staff ID', 'Staff Name', 'Department', 'Position',
             'Total Overtime Days', 'Total Overtime Hours', 'Overtime Details'
         ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=5, column=col, value=header)
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = self.border
-        
+        ws.append(self._row(ws, headers, 'report_header'))
+
         # Helper function to calculate overtime hours
         def calculate_overtime_hours(overtime_in, overtime_out):
             if not overtime_in or not overtime_out:
@@ -1163,203 +1133,164 @@ class ExcelReportGenerator:
                     in_time = datetime.strptime(overtime_in, '%H:%M:%S').time()
                 else:
                     in_time = overtime_in
-                
+
                 if isinstance(overtime_out, str):
                     out_time = datetime.strptime(overtime_out, '%H:%M:%S').time()
                 else:
                     out_time = overtime_out
-                
+
                 # Calculate duration in hours
                 in_minutes = in_time.hour * 60 + in_time.minute
                 out_minutes = out_time.hour * 60 + out_time.minute
-                
+
                 # Handle overnight overtime
                 if out_minutes < in_minutes:
                     out_minutes += 24 * 60
-                
+
                 duration_minutes = out_minutes - in_minutes
                 return round(duration_minutes / 60.0, 2)
             except:
                 return 0.0
-        
-        # Get individual staff overtime data with detailed breakdown
-        staff_overtime_data = db.execute('''
-            SELECT 
+
+        # Every staff member with their overtime days, streamed in staff order
+        # (one query instead of one per staff member)
+        overtime_rows = iter_rows('''
+            SELECT
+                s.id,
                 s.staff_id,
                 s.full_name,
                 s.department,
                 COALESCE(s.destination, '') as position,
-                COUNT(CASE WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL THEN 1 END) as overtime_days,
-                GROUP_CONCAT(
-                    CASE 
-                        WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL 
-                        THEN a.date || ' (' || a.overtime_in || '-' || a.overtime_out || ')'
-                    END, 
-                    '; '
-                ) as overtime_details,
+                a.date,
                 a.overtime_in,
                 a.overtime_out
             FROM staff s
-            LEFT JOIN attendance a ON s.id = a.staff_id 
+            LEFT JOIN attendance a ON s.id = a.staff_id
                 AND a.date BETWEEN ? AND ?
-                AND a.school_id = ?
-                AND (a.overtime_in IS NOT NULL OR a.overtime_out IS NOT NULL)
+                AND a.overtime_in IS NOT NULL
+                AND a.overtime_out IS NOT NULL
             WHERE s.school_id = ? AND s.is_active = 1
-            GROUP BY s.id, s.staff_id, s.full_name, s.department, s.destination
-            ORDER BY CAST(s.staff_id AS INTEGER) ASC
-        ''', (start_date, end_date, school_id, school_id)).fetchall()
-        
-        # Calculate total hours for each staff member and collect data for totals
-        corrected_staff_data = []
-        row = 6
-        
-        for staff in staff_overtime_data:
-            # Get detailed overtime records for this staff member
-            overtime_records = db.execute('''
-                SELECT overtime_in, overtime_out, date
-                FROM attendance a
-                JOIN staff s ON s.id = a.staff_id
-                WHERE s.staff_id = ? AND s.school_id = ?
-                    AND a.date BETWEEN ? AND ?
-                    AND a.overtime_in IS NOT NULL 
-                    AND a.overtime_out IS NOT NULL
-            ''', (staff['staff_id'], school_id, start_date, end_date)).fetchall()
-            
+            ORDER BY CAST(s.staff_id AS INTEGER) ASC, s.id, a.date
+        ''', (start_date, end_date, school_id))
+
+        # Running totals for the summary row
+        total_staff = 0
+        total_staff_with_overtime = 0
+        total_overtime_days = 0
+        total_overtime_hours = 0.0
+
+        for _, staff_rows in itertools.groupby(overtime_rows, key=lambda record: record['id']):
+            staff_rows = list(staff_rows)
+            staff = staff_rows[0]
+            overtime_records = [record for record in staff_rows if record['date'] is not None]
+
             # Calculate total overtime hours
-            total_overtime_hours = 0.0
+            staff_overtime_hours = 0.0
             for record in overtime_records:
-                hours = calculate_overtime_hours(record['overtime_in'], record['overtime_out'])
-                total_overtime_hours += hours
-            
+                staff_overtime_hours += calculate_overtime_hours(record['overtime_in'], record['overtime_out'])
+
             overtime_days = len(overtime_records)
-            
+
             # Format overtime details for display
-            overtime_details = ""
             if overtime_records:
-                details_list = []
-                for record in overtime_records:
-                    details_list.append(f"{record['date']} ({record['overtime_in']}-{record['overtime_out']})")
-                overtime_details = "; ".join(details_list[:3])  # Show max 3 details
+                details_list = [f"{record['date']} ({record['overtime_in']}-{record['overtime_out']})"
+                                for record in overtime_records[:3]]  # Show max 3 details
+                overtime_details = "; ".join(details_list)
                 if len(overtime_records) > 3:
                     overtime_details += f" and {len(overtime_records)-3} more..."
             else:
                 overtime_details = "No overtime recorded"
-            
-            # Store data for totals calculation
-            corrected_data = {
-                'overtime_days': overtime_days,
-                'total_hours': total_overtime_hours
-            }
-            corrected_staff_data.append(corrected_data)
-            
-            values = [
+
+            total_staff += 1
+            total_staff_with_overtime += 1 if overtime_days > 0 else 0
+            total_overtime_days += overtime_days
+            total_overtime_hours += staff_overtime_hours
+
+            # Red for high overtime (>5 days or >20 hours), green for any overtime
+            styles = ['report_cell'] * 7
+            if overtime_days > 5:
+                styles[4] = 'report_cell_bad'
+            elif overtime_days > 0:
+                styles[4] = 'report_cell_good'
+            if staff_overtime_hours > 20:
+                styles[5] = 'report_cell_bad'
+
+            ws.append(self._row(ws, [
                 staff['staff_id'],
                 staff['full_name'],
                 staff['department'] or 'Unassigned',
                 staff['position'],
                 overtime_days,
-                f"{total_overtime_hours:.2f}",
+                f"{staff_overtime_hours:.2f}",
                 overtime_details
-            ]
-            
-            for col, value in enumerate(values, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = self.border
-                
-                # Add conditional formatting
-                if col == 5 and overtime_days > 5:  # High overtime days
-                    cell.fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-                elif col == 6 and total_overtime_hours > 20:  # High overtime hours
-                    cell.fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-                elif col == 5 and overtime_days > 0:  # Has overtime
-                    cell.fill = PatternFill(start_color='CCFFCC', end_color='CCFFCC', fill_type='solid')
-            
-            row += 1
-        
+            ], styles))
+
         # Add summary row
-        if corrected_staff_data:
-            row += 1
-            
-            # Calculate totals
-            total_staff_with_overtime = len([d for d in corrected_staff_data if d['overtime_days'] > 0])
-            total_overtime_days = sum(record['overtime_days'] for record in corrected_staff_data)
-            total_overtime_hours = sum(record['total_hours'] for record in corrected_staff_data)
-            
-            summary_values = [
+        if total_staff:
+            ws.append([])
+            ws.append(self._row(ws, [
                 "TOTALS:",
                 f"{total_staff_with_overtime} Staff with Overtime",
                 "",
                 "",
                 total_overtime_days,
                 f"{total_overtime_hours:.2f}",
-                f"{total_staff_with_overtime} out of {len(corrected_staff_data)} staff worked overtime"
-            ]
-            
-            for col, value in enumerate(summary_values, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.font = Font(bold=True)
-                cell.border = self.border
-                if col == 1:  # "TOTALS:" label
-                    cell.fill = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
-                else:  # Data cells
-                    cell.fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-        
-        # Format columns
-        column_widths = [12, 25, 18, 18, 16, 16, 50]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
-        
+                f"{total_staff_with_overtime} out of {total_staff} staff worked overtime"
+            ], ['report_total_label'] + ['report_total'] * 6))
+
         # Add notes
-        notes_row = row + 3
-        ws.cell(row=notes_row, column=1, value="Notes:").font = Font(bold=True)
-        ws.cell(row=notes_row + 1, column=1, value=f"• Overtime data for {year}/{month:02d}")
-        ws.cell(row=notes_row + 2, column=1, value="• Staff ID sorted in ascending numerical order")
-        ws.cell(row=notes_row + 3, column=1, value="• Hours calculated from overtime_in and overtime_out times")
-        ws.cell(row=notes_row + 4, column=1, value="• Green highlighting = Staff with overtime recorded")
-        ws.cell(row=notes_row + 5, column=1, value="• Red highlighting = High overtime (>5 days or >20 hours)")
+        for _ in range(2 if total_staff else 3):
+            ws.append([])
+        notes = [
+            f"• Overtime data for {year}/{month:02d}",
+            "• Staff ID sorted in ascending numerical order",
+            "• Hours calculated from overtime_in and overtime_out times",
+            "• Green highlighting = Staff with overtime recorded",
+            "• Red highlighting = High overtime (>5 days or >20 hours)"
+        ]
+        ws.append(self._row(ws, ["Notes:"], 'report_label'))
+        for note in notes:
+            ws.append([note])
 
     def _create_overtime_summary_sheet(self, wb, school_id, year, month):
         """Create overtime summary sheet with statistics"""
         ws = wb.create_sheet("Overtime Summary")
-        
+        self._set_column_widths(ws, [25, 15])
+
         # Title
-        ws['A1'] = f"Overtime Summary Report - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
-        
+        self._append_title(ws, f"Overtime Summary Report - {year}/{month:02d}", 6)
+        ws.append([])
+
         db = get_db()
         school = db.execute('SELECT name FROM schools WHERE id = ?', (school_id,)).fetchone()
-        ws['A3'] = f"School: {school['name'] if school else 'Unknown'}"
-        
+        ws.append([f"School: {school['name'] if school else 'Unknown'}"])
+        ws.append([])
+
         # Monthly statistics
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
+        start_date, end_date = self._month_bounds(year, month)
+
         # Get overtime statistics
         overtime_stats = db.execute('''
             SELECT
                 COUNT(DISTINCT s.id) as total_staff,
                 COUNT(DISTINCT CASE WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL THEN s.id END) as staff_with_overtime,
                 COUNT(CASE WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL THEN 1 END) as total_overtime_days,
-                AVG(CASE 
-                    WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL 
-                    THEN (strftime('%H', a.overtime_out) * 60 + strftime('%M', a.overtime_out)) - 
+                AVG(CASE
+                    WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL
+                    THEN (strftime('%H', a.overtime_out) * 60 + strftime('%M', a.overtime_out)) -
                          (strftime('%H', a.overtime_in) * 60 + strftime('%M', a.overtime_in))
                 END) / 60.0 as avg_overtime_hours_per_day
             FROM staff s
-            LEFT JOIN attendance a ON s.id = a.staff_id 
+            LEFT JOIN attendance a ON s.id = a.staff_id
                 AND a.date BETWEEN ? AND ?
                 AND a.school_id = ?
             WHERE s.school_id = ? AND s.is_active = 1
         ''', (start_date, end_date, school_id, school_id)).fetchone()
-        
+
         # Summary statistics
-        ws['A5'] = "Summary Statistics"
-        ws['A5'].font = Font(bold=True, size=12)
-        
+        ws.append(self._row(ws, ["Summary Statistics"], 'report_section'))
+        ws.append([])
+
         stats = [
             ["Total Active Staff", overtime_stats['total_staff'] or 0],
             ["Staff with Overtime", overtime_stats['staff_with_overtime'] or 0],
@@ -1367,37 +1298,24 @@ class ExcelReportGenerator:
             ["Average Hours per Overtime Day", f"{overtime_stats['avg_overtime_hours_per_day']:.2f}" if overtime_stats['avg_overtime_hours_per_day'] else "0.00"],
             ["Overtime Coverage %", f"{((overtime_stats['staff_with_overtime'] or 0) / max(overtime_stats['total_staff'], 1) * 100):.1f}%"]
         ]
-        
-        for row, (label, value) in enumerate(stats, 7):
-            ws.cell(row=row, column=1, value=label).font = Font(bold=True)
-            ws.cell(row=row, column=2, value=value)
-            
-            # Add borders
-            ws.cell(row=row, column=1).border = self.border
-            ws.cell(row=row, column=2).border = self.border
-        
-        # Format columns
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 15
+
+        for label, value in stats:
+            ws.append(self._row(ws, [label, value], ['report_cell_label', 'report_cell']))
 
     def _create_overtime_trends_sheet(self, wb, school_id, year, month):
         """Create overtime trends analysis sheet"""
         ws = wb.create_sheet("Overtime Trends")
-        
+        self._set_column_widths(ws, [18, 12, 14, 12, 12])
+
         # Title
-        ws['A1'] = f"Overtime Trends - {year}/{month:02d}"
-        ws['A1'].font = self.title_font
-        ws.merge_cells('A1:F1')
-        
+        self._append_title(ws, f"Overtime Trends - {year}/{month:02d}", 6)
+        ws.append([])
+
         # Date range
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
+        start_date, end_date = self._month_bounds(year, month)
+
         db = get_db()
-        
+
         # Department-wise overtime analysis
         dept_overtime = db.execute('''
             SELECT
@@ -1406,54 +1324,38 @@ class ExcelReportGenerator:
                 COUNT(DISTINCT CASE WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL THEN s.id END) as staff_with_overtime,
                 COUNT(CASE WHEN a.overtime_in IS NOT NULL AND a.overtime_out IS NOT NULL THEN 1 END) as overtime_instances
             FROM staff s
-            LEFT JOIN attendance a ON s.id = a.staff_id 
+            LEFT JOIN attendance a ON s.id = a.staff_id
                 AND a.date BETWEEN ? AND ?
                 AND a.school_id = ?
             WHERE s.school_id = ? AND s.is_active = 1
             GROUP BY s.department
             ORDER BY overtime_instances DESC
         ''', (start_date, end_date, school_id, school_id)).fetchall()
-        
+
         # Department analysis
-        ws['A3'] = "Department-wise Overtime Analysis"
-        ws['A3'].font = Font(bold=True, size=12)
-        
+        ws.append(self._row(ws, ["Department-wise Overtime Analysis"], 'report_section'))
+
         headers = ['Department', 'Total Staff', 'Staff with OT', 'OT Instances', 'Coverage %']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.font = self.header_font
-            cell.fill = self.header_fill
-            cell.border = self.border
-        
-        for row, dept in enumerate(dept_overtime, 5):
+        ws.append(self._row(ws, headers, 'report_header'))
+
+        for dept in dept_overtime:
             coverage_pct = (dept['staff_with_overtime'] / max(dept['total_staff'], 1) * 100)
-            
-            values = [
+
+            # Color coding for coverage
+            if coverage_pct >= 50:
+                coverage_style = 'report_cell_bad'
+            elif coverage_pct >= 25:
+                coverage_style = 'report_cell_warn'
+            else:
+                coverage_style = 'report_cell_good'
+
+            ws.append(self._row(ws, [
                 dept['department'],
                 dept['total_staff'],
                 dept['staff_with_overtime'],
                 dept['overtime_instances'],
                 f"{coverage_pct:.1f}%"
-            ]
-            
-            for col, value in enumerate(values, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = self.border
-                
-                # Color coding for coverage
-                if col == 5:  # Coverage percentage
-                    if coverage_pct >= 50:
-                        cell.fill = PatternFill(start_color='FFCCCC', end_color='FFCCCC', fill_type='solid')
-                    elif coverage_pct >= 25:
-                        cell.fill = PatternFill(start_color='FFFFCC', end_color='FFFFCC', fill_type='solid')
-                    else:
-                        cell.fill = PatternFill(start_color='CCFFCC', end_color='CCFFCC', fill_type='solid')
-        
-        # Format columns
-        column_widths = [18, 12, 14, 12, 12]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col)].width = width
+            ], ['report_cell'] * 4 + [coverage_style]))
 
     def generate_usage_report(self, report_data, filename):
         """Generate comprehensive leave usage report for an individual staff member"""
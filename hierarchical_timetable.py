@@ -5,6 +5,9 @@ with dynamic section creation and staff conflict detection
 """
 
 from database import get_db
+from timetable_grid_cache import cached_grid
+from timetable_occupancy import (bump_timetable_version, get_timetable_occupancy, invalidate_timetable_occupancy,
+                                 note_assignment_added, note_assignment_removed, taken_staff_slots)
 import logging
 from datetime import datetime
 
@@ -13,6 +16,9 @@ logger = logging.getLogger(__name__)
 class HierarchicalTimetableManager:
     """Manages hierarchical timetable with conflict detection"""
     
+    # Most hierarchical assignments a staff member may have in one day
+    MAX_CLASSES_PER_DAY = 6
+    
     # ==================== ORGANIZATION CONFIGURATION ====================
     
     @staticmethod
@@ -264,6 +270,7 @@ class HierarchicalTimetableManager:
                 WHERE id = ? AND school_id = ?
             ''', (level_name, description, level_id, school_id))
             
+            bump_timetable_version(school_id, db)
             db.commit()
             return {'success': True, 'message': 'Level updated successfully'}
             
@@ -413,7 +420,9 @@ class HierarchicalTimetableManager:
 
             cursor.execute('DELETE FROM timetable_academic_levels WHERE school_id = ? AND id = ?', (school_id, level_id))
 
+            bump_timetable_version(school_id, db)
             db.commit()
+            invalidate_timetable_occupancy(school_id)
 
             return {
                 'success': True,
@@ -556,6 +565,7 @@ class HierarchicalTimetableManager:
                 WHERE id = ? AND school_id = ?
             ''', (section_id, school_id))
             
+            bump_timetable_version(school_id, db)
             db.commit()
             return {'success': True, 'message': 'Section deleted successfully'}
         
@@ -621,6 +631,7 @@ class HierarchicalTimetableManager:
                        WHERE id = ? AND school_id = ?'''
             
             cursor.execute(query, params)
+            bump_timetable_version(school_id, db)
             db.commit()
             
             logger.info(f"✅ Section {section_id} updated (School {school_id})")
@@ -655,43 +666,29 @@ class HierarchicalTimetableManager:
             }
         """
         try:
-            db = get_db()
-            cursor = db.cursor()
+            occupancy = get_timetable_occupancy(school_id)
             
             # Check 1: Is staff marked as unavailable for this slot?
-            cursor.execute('''
-                SELECT reason_if_unavailable FROM timetable_staff_availability
-                WHERE school_id = ? AND staff_id = ? AND day_of_week = ? AND period_number = ?
-                AND is_available = 0
-            ''', (school_id, staff_id, day_of_week, period_number))
-            
-            unavailable_row = cursor.fetchone()
-            if unavailable_row:
+            if occupancy.is_marked_unavailable(staff_id, day_of_week, period_number):
+                reason = occupancy.unavailable[(int(staff_id), int(day_of_week), int(period_number))]
                 return {
                     'success': True,
                     'is_available': False,
-                    'reason': f'Staff marked unavailable: {unavailable_row[0]}'
+                    'reason': f'Staff marked unavailable: {reason}'
                 }
             
             # Check 2: Does staff already have an assignment for this day/period?
-            query = '''
-                SELECT taa.id, ts.section_name, tal.level_name
-                FROM timetable_hierarchical_assignments taa
-                JOIN timetable_sections ts ON taa.section_id = ts.id
-                JOIN timetable_academic_levels tal ON taa.level_id = tal.id
-                WHERE taa.school_id = ? AND taa.staff_id = ? 
-                AND taa.day_of_week = ? AND taa.period_number = ?
-            '''
-            params = [school_id, staff_id, day_of_week, period_number]
-            
-            if exclude_assignment_id:
-                query += ' AND taa.id != ?'
-                params.append(exclude_assignment_id)
-            
-            cursor.execute(query, params)
-            conflicts = cursor.fetchall()
-            
-            if conflicts:
+            conflict_ids = occupancy.staff_conflicts(staff_id, day_of_week, period_number, exclude_assignment_id)
+            if conflict_ids:
+                # Only the (rare) conflict path needs the section names
+                placeholders = ','.join(['?'] * len(conflict_ids))
+                conflicts = get_db().execute(f'''
+                    SELECT taa.id, ts.section_name, tal.level_name
+                    FROM timetable_hierarchical_assignments taa
+                    JOIN timetable_sections ts ON taa.section_id = ts.id
+                    JOIN timetable_academic_levels tal ON taa.level_id = tal.id
+                    WHERE taa.id IN ({placeholders})
+                ''', conflict_ids).fetchall()
                 conflicting_sections = [f"{row[1]} ({row[2]})" for row in conflicts]
                 return {
                     'success': True,
@@ -701,13 +698,8 @@ class HierarchicalTimetableManager:
                 }
             
             # Check 3: Is the maximum daily load exceeded?
-            cursor.execute('''
-                SELECT COUNT(*) FROM timetable_hierarchical_assignments
-                WHERE school_id = ? AND staff_id = ? AND day_of_week = ?
-            ''', (school_id, staff_id, day_of_week))
-            
-            max_classes_per_day = 6  # Configurable
-            daily_load = cursor.fetchone()[0]
+            max_classes_per_day = HierarchicalTimetableManager.MAX_CLASSES_PER_DAY
+            daily_load = occupancy.daily_load(staff_id, day_of_week)
             if daily_load >= max_classes_per_day:
                 return {
                     'success': True,
@@ -734,31 +726,18 @@ class HierarchicalTimetableManager:
             dict: {success: bool, is_available: bool, assigned_staff: str, reason: str}
         """
         try:
-            db = get_db()
-            cursor = db.cursor()
-            
-            query = '''
-                SELECT taa.id, s.full_name
-                FROM timetable_hierarchical_assignments taa
-                JOIN staff s ON taa.staff_id = s.id
-                WHERE taa.school_id = ? AND taa.section_id = ? 
-                AND taa.day_of_week = ? AND taa.period_number = ?
-            '''
-            params = [school_id, section_id, day_of_week, period_number]
-            
-            if exclude_assignment_id:
-                query += ' AND taa.id != ?'
-                params.append(exclude_assignment_id)
-            
-            cursor.execute(query, params)
-            existing = cursor.fetchone()
+            occupant = get_timetable_occupancy(school_id).section_occupant(
+                section_id, day_of_week, period_number, exclude_assignment_id
+            )
             
-            if existing:
+            if occupant:
+                staff_row = get_db().execute('SELECT full_name FROM staff WHERE id = ?', (occupant[1],)).fetchone()
+                assigned_staff = staff_row[0] if staff_row else f'staff #{occupant[1]}'
                 return {
                     'success': True,
                     'is_available': False,
-                    'assigned_staff': existing[1],
-                    'reason': f'Section already has {existing[1]} assigned'
+                    'assigned_staff': assigned_staff,
+                    'reason': f'Section already has {assigned_staff} assigned'
                 }
             
             return {
@@ -826,6 +805,18 @@ class HierarchicalTimetableManager:
                     'error': section_check.get('reason', 'Section not available')
                 }
             
+            # The index can lag writes from other workers: confirm the staff
+            # slot in the database under the write lock before inserting
+            taken = taken_staff_slots(db, school_id, [(staff_id, day_of_week, period_number)])
+            if taken:
+                db.rollback()
+                invalidate_timetable_occupancy(school_id)
+                return {
+                    'success': False,
+                    'error': 'Staff already assigned to another section in this period',
+                    'conflicts': list(taken.values())
+                }
+            
             # Create assignment
             cursor.execute('''
                 INSERT INTO timetable_hierarchical_assignments
@@ -835,7 +826,10 @@ class HierarchicalTimetableManager:
             ''', (school_id, staff_id, section_id, level_id, day_of_week, 
                   period_number, subject_name, room_number))
             
+            bump_timetable_version(school_id, db)
             db.commit()
+            note_assignment_added(school_id, 'hierarchical', cursor.lastrowid, staff_id,
+                                  day_of_week, period_number, section_id)
             
             return {
                 'success': True,
@@ -847,8 +841,298 @@ class HierarchicalTimetableManager:
             logger.error(f"Error assigning staff to period: {e}")
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def bulk_import_allocations(school_id, rows, dry_run=False):
+        """
+        Import many staff period allocations in one pass
+        
+        Lookup keys are resolved with one query per table, every row is
+        checked in memory against the school's occupancy plus the rows
+        accepted before it (so two rows of the same file can conflict), and
+        the accepted rows are written with executemany in one transaction.
+        Each row gets the same checks as assign_staff_to_period; a row naming
+        a staff/section/period that is already assigned updates its subject
+        and room instead.
+        
+        Args:
+            school_id (int): School identifier
+            rows (list): dicts with row_no, login_staff_id, grade_name,
+                section_name, day_of_week, period_number, subject_name,
+                room_number; a row with an 'error' key is reported as skipped
+            dry_run (bool): Validate and report without writing
+            
+        Returns:
+            dict: {success: bool, dry_run: bool, created_count, updated_count,
+                   skipped_count, rows: [{row, status, error}], errors: [str]}
+        """
+        db = get_db()
+        try:
+            # Stage 1: resolve every lookup key with set queries
+            staff_by_login = {}
+            staff_names = {}
+            for row in db.execute('SELECT id, staff_id, full_name FROM staff WHERE school_id = ? ORDER BY id',
+                                  (school_id,)).fetchall():
+                staff_by_login.setdefault(str(row['staff_id']), row['id'])
+                staff_names[row['id']] = row['full_name']
+            
+            levels = {}
+            level_names = {}
+            for row in db.execute('''
+                SELECT id, level_name FROM timetable_academic_levels
+                WHERE school_id = ? AND is_active = 1 ORDER BY id
+            ''', (school_id,)).fetchall():
+                levels.setdefault(str(row['level_name']).lower(), row['id'])
+                level_names[row['id']] = row['level_name']
+            
+            sections = {}
+            section_labels = {}
+            for row in db.execute('''
+                SELECT id, level_id, section_name FROM timetable_sections
+                WHERE school_id = ? AND is_active = 1 ORDER BY id
+            ''', (school_id,)).fetchall():
+                sections.setdefault((row['level_id'], str(row['section_name']).lower()), row['id'])
+                section_labels[row['id']] = f"{row['section_name']} ({level_names.get(row['level_id'], '')})"
+            
+            periods = {
+                (row[0], row[1], row[2], row[3])
+                for row in db.execute('''
+                    SELECT level_id, section_id, day_of_week, period_number FROM timetable_periods
+                    WHERE school_id = ?
+                ''', (school_id,)).fetchall()
+            }
+            
+            existing = {}
+            for row in db.execute('''
+                SELECT id, staff_id, section_id, level_id, day_of_week, period_number
+                FROM timetable_hierarchical_assignments WHERE school_id = ?
+            ''', (school_id,)).fetchall():
+                existing[(row['staff_id'], row['section_id'], row['level_id'],
+                          row['day_of_week'], row['period_number'])] = row['id']
+            
+            # Stage 2: validate in memory against the occupancy and the batch
+            occupancy = get_timetable_occupancy(school_id, db)
+            batch_staff_slots = {}    # (staff, day, period) -> section label
+            batch_section_slots = {}  # (section, day, period) -> staff id
+            batch_load = {}           # (staff, day) -> rows accepted
+            inserts = {}              # assignment key -> insert params
+            updates = []
+            report = []
+            
+            for row in rows:
+                row_no = row.get('row_no')
+                try:
+                    if row.get('error'):
+                        raise ValueError(row['error'])
+                    
+                    staff_id = staff_by_login.get(str(row['login_staff_id']))
+                    if staff_id is None:
+                        raise ValueError(f"Staff login ID not found: {row['login_staff_id']}")
+                    level_id = levels.get(str(row['grade_name']).lower())
+                    if level_id is None:
+                        raise ValueError(f"Grade not found: {row['grade_name']}")
+                    section_id = sections.get((level_id, str(row['section_name']).lower()))
+                    if section_id is None:
+                        raise ValueError(f"Section not found: {row['section_name']} under {row['grade_name']}")
+                    day, period = row['day_of_week'], row['period_number']
+                    if (level_id, section_id, day, period) not in periods:
+                        raise ValueError('Period not found for selected grade/section/day/period_number')
+                    
+                    key = (staff_id, section_id, level_id, day, period)
+                    values = (row.get('subject_name'), row.get('room_number'))
+                    if key in existing:
+                        updates.append(values + (existing[key],))
+                        report.append({'row': row_no, 'status': 'updated', 'error': None})
+                        continue
+                    if key in inserts:
+                        # A repeated row updates the allocation the file already created
+                        inserts[key] = inserts[key][:6] + values
+                        report.append({'row': row_no, 'status': 'updated', 'error': None})
+                        continue
+                    
+                    if occupancy.is_marked_unavailable(staff_id, day, period):
+                        raise ValueError(f"Staff marked unavailable: {occupancy.unavailable[(staff_id, day, period)]}")
+                    conflicts = [section_labels.get(occupancy.entry('hierarchical', assignment_id)[1], '')
+                                 for assignment_id in occupancy.staff_conflicts(staff_id, day, period)]
+                    if (staff_id, day, period) in batch_staff_slots:
+                        conflicts.append(batch_staff_slots[(staff_id, day, period)])
+                    if conflicts:
+                        raise ValueError(f'Staff already assigned to: {", ".join(conflicts)}')
+                    max_classes = HierarchicalTimetableManager.MAX_CLASSES_PER_DAY
+                    if occupancy.daily_load(staff_id, day) + batch_load.get((staff_id, day), 0) >= max_classes:
+                        raise ValueError(f'Maximum daily classes ({max_classes}) reached')
+                    occupant = occupancy.section_occupant(section_id, day, period)
+                    occupant_id = occupant[1] if occupant else batch_section_slots.get((section_id, day, period))
+                    if occupant_id is not None:
+                        raise ValueError(f'Section already has {staff_names.get(occupant_id, occupant_id)} assigned')
+                    
+                    inserts[key] = (school_id, staff_id, section_id, level_id, day, period) + values
+                    batch_staff_slots[(staff_id, day, period)] = section_labels.get(section_id, '')
+                    batch_section_slots[(section_id, day, period)] = staff_id
+                    batch_load[(staff_id, day)] = batch_load.get((staff_id, day), 0) + 1
+                    report.append({'row': row_no, 'status': 'created', 'error': None})
+                
+                except (KeyError, ValueError) as row_err:
+                    report.append({'row': row_no, 'status': 'skipped', 'error': str(row_err)})
+            
+            # Stage 3: write everything in one transaction
+            if not dry_run and (inserts or updates):
+                try:
+                    if inserts:
+                        # Checks above used the index; confirm under the write lock
+                        taken = taken_staff_slots(db, school_id, [(row[1], row[4], row[5])
+                                                                  for row in inserts.values()])
+                        if taken:
+                            raise ValueError(f'The timetable changed during the import ({len(taken)} staff '
+                                             f'slot(s) were taken meanwhile); nothing was imported')
+                        db.executemany('''
+                            INSERT INTO timetable_hierarchical_assignments
+                            (school_id, staff_id, section_id, level_id, day_of_week, period_number,
+                             subject_name, room_number, assignment_type)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'admin_assigned')
+                        ''', list(inserts.values()))
+                    if updates:
+                        db.executemany('''
+                            UPDATE timetable_hierarchical_assignments
+                            SET subject_name = ?, room_number = ?, updated_at = CURRENT_TIMESTAMP
+                            WHERE id = ?
+                        ''', updates)
+                    bump_timetable_version(school_id, db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    invalidate_timetable_occupancy(school_id)
+            
+            counts = {status: sum(1 for entry in report if entry['status'] == status)
+                      for status in ('created', 'updated', 'skipped')}
+            return {
+                'success': True,
+                'dry_run': bool(dry_run),
+                'created_count': counts['created'],
+                'updated_count': counts['updated'],
+                'skipped_count': counts['skipped'],
+                'rows': report,
+                'errors': [f"Row {entry['row']}: {entry['error']}" for entry in report if entry['error']]
+            }
+        
+        except Exception as e:
+            logger.error(f"Error in bulk allocation import: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def generate_timetable(school_id, requirements, section_ids=None, time_budget=None, apply=False, seed=0):
+        """
+        Generate the timetable of whole sections from weekly subject requirements
+        
+        Locked assignments and the assignments of other sections stay; the
+        rest of each generated section is replaced (see timetable_generator).
+        Nothing is written unless `apply` is set and every lesson was placed.
+        
+        Args:
+            school_id (int): School identifier
+            requirements (list): dicts with subject_name, periods_per_week,
+                section_id or level_id, staff_ids (or staff_id), max_per_day
+            section_ids (list, optional): Sections to (re)generate
+            time_budget (float, optional): Seconds to search for, at most MAX_TIME_BUDGET
+            apply (bool): Replace the sections' unlocked assignments with the result
+            seed (int): Tie-break seed, for reproducible results
+            
+        Returns:
+            dict: {success: bool, complete: bool, applied: bool, sections: [ids],
+                   assignments: [...], unplaced: [...], stats: {...}}
+        """
+        from timetable_generator import DEFAULT_TIME_BUDGET, MAX_TIME_BUDGET, TimetableSolver, load_problem
+        
+        db = get_db()
+        try:
+            try:
+                problem, scope = load_problem(school_id, requirements, section_ids,
+                                              HierarchicalTimetableManager.MAX_CLASSES_PER_DAY, db=db)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
+            
+            budget = DEFAULT_TIME_BUDGET if time_budget is None else min(float(time_budget), MAX_TIME_BUDGET)
+            result = TimetableSolver(**problem).solve(budget, seed=seed)
+            result.update({'success': True, 'applied': False, 'sections': scope})
+            
+            if apply and result['complete'] and scope:
+                placeholders = ','.join(['?'] * len(scope))
+                try:
+                    db.execute(f'''
+                        DELETE FROM timetable_hierarchical_assignments
+                        WHERE school_id = ? AND section_id IN ({placeholders})
+                        AND (is_locked = 0 OR is_locked IS NULL)
+                    ''', [school_id] + scope)
+                    taken = taken_staff_slots(db, school_id, [(row['staff_id'], row['day_of_week'],
+                                                               row['period_number'])
+                                                              for row in result['assignments']])
+                    if taken:
+                        raise ValueError(f'The timetable changed while generating ({len(taken)} staff '
+                                         f'slot(s) were taken meanwhile); generate again')
+                    db.executemany('''
+                        INSERT INTO timetable_hierarchical_assignments
+                        (school_id, staff_id, section_id, level_id, day_of_week, period_number,
+                         subject_name, assignment_type)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, 'admin_assigned')
+                    ''', [(school_id, row['staff_id'], row['section_id'], row['level_id'], row['day_of_week'],
+                           row['period_number'], row['subject_name']) for row in result['assignments']])
+                    bump_timetable_version(school_id, db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    invalidate_timetable_occupancy(school_id)
+                result['applied'] = True
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error generating timetable: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def get_cached_grid(school_id, view, item_id):
+        """
+        Rendered schedule or grid with its ETag, built at most once per
+        timetable version (see timetable_grid_cache)
+        
+        Args:
+            school_id (int): School identifier
+            view (str): 'staff_schedule', 'section_schedule', 'staff_grid' or 'section_grid'
+            item_id (int): Staff ID or Section ID
+            
+        Returns:
+            tuple: (payload dict, etag str); the payload must not be modified
+        """
+        builders = {
+            'staff_schedule': lambda: HierarchicalTimetableManager._build_staff_schedule(school_id, item_id),
+            'section_schedule': lambda: HierarchicalTimetableManager._build_section_schedule(school_id, item_id),
+            'staff_grid': lambda: HierarchicalTimetableManager._build_color_coded_grid(school_id, 'staff', item_id),
+            'section_grid': lambda: HierarchicalTimetableManager._build_color_coded_grid(school_id, 'section', item_id),
+        }
+        return cached_grid(school_id, view, item_id, builders[view])
+    
     @staticmethod
     def get_staff_schedule(school_id, staff_id):
+        """Complete schedule grid for a staff member (cached, see get_cached_grid)"""
+        return HierarchicalTimetableManager.get_cached_grid(school_id, 'staff_schedule', staff_id)[0]
+    
+    @staticmethod
+    def get_section_schedule(school_id, section_id):
+        """Complete schedule grid for a section/class (cached, see get_cached_grid)"""
+        return HierarchicalTimetableManager.get_cached_grid(school_id, 'section_schedule', section_id)[0]
+    
+    @staticmethod
+    def get_color_coded_grid(school_id, item_type='staff', item_id=None):
+        """Color-coded grid of a staff member or section (cached, see get_cached_grid)"""
+        if item_type not in ('staff', 'section'):
+            return HierarchicalTimetableManager._build_color_coded_grid(school_id, item_type, item_id)
+        return HierarchicalTimetableManager.get_cached_grid(school_id, f'{item_type}_grid', item_id)[0]
+    
+    @staticmethod
+    def _build_staff_schedule(school_id, staff_id):
         """
         Get complete schedule grid for a staff member
         DISPLAYS STAFF-SPECIFIC VIEW
@@ -909,10 +1193,15 @@ class HierarchicalTimetableManager:
             
             conflicts = [dict(row) for row in cursor.fetchall()]
             
+            occupancy = get_timetable_occupancy(school_id)
+            free_slots = [{'day_of_week': day, 'period_number': period}
+                          for day, period in occupancy.common_free_slots(staff_id=staff_id)]
+            
             return {
                 'success': True,
                 'data': {
                     'schedule': schedule,
+                    'free_slots': free_slots,
                     'conflict_count': len(conflicts),
                     'conflicts': conflicts
                 }
@@ -923,7 +1212,7 @@ class HierarchicalTimetableManager:
             return {'success': False, 'error': str(e)}
     
     @staticmethod
-    def get_section_schedule(school_id, section_id):
+    def _build_section_schedule(school_id, section_id):
         """
         Get complete schedule grid for a section/class
         DISPLAYS CLASS-SPECIFIC VIEW
@@ -1002,7 +1291,7 @@ class HierarchicalTimetableManager:
             return {'success': False, 'error': str(e)}
     
     @staticmethod
-    def get_color_coded_grid(school_id, item_type='staff', item_id=None):
+    def _build_color_coded_grid(school_id, item_type='staff', item_id=None):
         """
         Get color-coded grid display for visualization
         
@@ -1150,114 +1439,24 @@ class HierarchicalTimetableManager:
             row = cursor.fetchone()
             max_periods = (row[0] or 8) if row else 8
             
-            # Debug: Log what tables we're checking
-            logger.info(f"Checking staff availability for school_id={school_id}, day_filter={day_of_week}")
-            
-            # Debug: Check each table individually first
-            cursor.execute("SELECT COUNT(*) FROM timetable_hierarchical_assignments WHERE school_id = ? AND staff_id IS NOT NULL", (school_id,))
-            h_count = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM timetable_assignments WHERE school_id = ? AND staff_id IS NOT NULL", (school_id,))
-            a_count = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM timetable_self_allocations WHERE school_id = ? AND staff_id IS NOT NULL", (school_id,))
-            s_count = cursor.fetchone()[0]
-            logger.info(f"Table counts - hierarchical: {h_count}, assignments: {a_count}, self_allocations: {s_count}")
-            
-            # Get assignments from each table separately for detailed logging
-            day_filter = "" if day_of_week is None else f" AND day_of_week = {day_of_week}"
-            
-            # From hierarchical_assignments
-            cursor.execute(f"SELECT DISTINCT staff_id, day_of_week, period_number FROM timetable_hierarchical_assignments WHERE school_id = ? AND staff_id IS NOT NULL{day_filter}", 
-                          (school_id,) if day_of_week is None else (school_id,))
-            h_assignments = cursor.fetchall()
-            logger.info(f"Hierarchical assignments: {len(h_assignments)} records")
-            
-            # From timetable_assignments  
-            cursor.execute(f"SELECT DISTINCT staff_id, day_of_week, period_number FROM timetable_assignments WHERE school_id = ? AND staff_id IS NOT NULL{day_filter}",
-                          (school_id,) if day_of_week is None else (school_id,))
-            a_assignments = cursor.fetchall()
-            logger.info(f"Direct assignments: {len(a_assignments)} records")
-            
-            # From self_allocations
-            cursor.execute(f"SELECT DISTINCT staff_id, day_of_week, period_number FROM timetable_self_allocations WHERE school_id = ? AND staff_id IS NOT NULL{day_filter}",
-                          (school_id,) if day_of_week is None else (school_id,))
-            s_assignments = cursor.fetchall()
-            logger.info(f"Self allocations: {len(s_assignments)} records")
-            
-            # Combine all assignments
-            all_assignments = []
-            for row in h_assignments:
-                all_assignments.append(('hierarchical', row))
-            for row in a_assignments:
-                all_assignments.append(('assignments', row))
-            for row in s_assignments:
-                all_assignments.append(('self_allocations', row))
-            
-            logger.info(f"Total combined: {len(all_assignments)} assignment records")
-            
-            # Map: staff_id -> day -> set(periods)
-            busy_map = {s['id']: {} for s in staff_list}
-            source_map = {}  # Track which table each assignment comes from
-            
-            for source, row in all_assignments:
-                # Handle both tuple and Row object formats (MySQL vs SQLite)
-                try:
-                    if isinstance(row, tuple):
-                        sid, day, pnum = row[0], row[1], row[2]
-                    else:
-                        sid = row['staff_id']
-                        day = row['day_of_week']
-                        pnum = row['period_number']
-                    
-                    if sid and sid in busy_map:
-                        if day not in busy_map[sid]:
-                            busy_map[sid][day] = set()
-                        
-                        # Track if this is a new addition or duplicate
-                        was_present = pnum in busy_map[sid][day]
-                        busy_map[sid][day].add(pnum)
-                        
-                        # Log the source of each assignment
-                        key = f"{sid}_{day}_{pnum}"
-                        if key not in source_map:
-                            source_map[key] = []
-                        source_map[key].append(source)
-                        
-                        if not was_present:
-                            logger.info(f"Assignment added - Staff:{sid}, Day:{day}, Period:{pnum}, Source:{source}")
-                        else:
-                            logger.warning(f"DUPLICATE - Staff:{sid}, Day:{day}, Period:{pnum} already exists, also found in {source}")
-                except Exception as e:
-                    logger.error(f"Error processing row {row} from {source}: {e}")
-                    continue
+            occupancy = get_timetable_occupancy(school_id)
             
-            # 4. Build result
-            result = []
             # logical days: if day_of_week specified, use it. Else use 1-6 (Mon-Sat)
             days_to_check = [int(day_of_week)] if day_of_week is not None else range(1, 7)
             
+            result = []
             for staff in staff_list:
                 sid = staff['id']
                 for day in days_to_check:
-                    busy = busy_map[sid].get(day, set())
-                    free = [p for p in range(1, max_periods + 1) if p not in busy]
-                    
-                    # Debug log for staff with assignments
-                    if len(busy) > 0:
-                        logger.info(f"Staff {staff['name']} (ID:{sid}) - Day {day}: {len(busy)} assigned periods: {sorted(list(busy))}")
-                        # Show which tables contributed to these assignments
-                        for p in sorted(list(busy)):
-                            key = f"{sid}_{day}_{p}"
-                            sources = source_map.get(key, ['unknown'])
-                            logger.debug(f"  Period {p} sources: {', '.join(sources)}")
-                    
+                    busy = occupancy.busy_periods(sid, day)
                     result.append({
                         'staff_id': sid,
                         'staff_name': staff['name'],
                         'department': staff['department'],
                         'day': day,
                         'total_assigned': len(busy),
-                        'assigned_periods': sorted(list(busy)),
-                        'free_periods': free
+                        'assigned_periods': busy,
+                        'free_periods': occupancy.free_periods(sid, day, max_periods)
                     })
             
             return {'success': True, 'data': result}
@@ -1278,7 +1477,9 @@ class HierarchicalTimetableManager:
                 WHERE id = ? AND school_id = ?
             ''', (assignment_id, school_id))
             
+            bump_timetable_version(school_id, db)
             db.commit()
+            note_assignment_removed(school_id, 'hierarchical', assignment_id)
             
             return {
                 'success': True,
@@ -1330,6 +1531,7 @@ class HierarchicalTimetableManager:
             '''
             
             cursor.execute(query, params)
+            bump_timetable_version(school_id, db)
             db.commit()
             
             return {
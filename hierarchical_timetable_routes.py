@@ -7,6 +7,7 @@ from flask import Blueprint, request, jsonify, session, make_response
 from functools import wraps
 from hierarchical_timetable import HierarchicalTimetableManager
 from database import get_db
+from timetable_grid_cache import grid_response
 from io import BytesIO
 import logging
 
@@ -734,9 +735,6 @@ def bulk_upload_staff_period_allocations():
         if missing:
             return jsonify({'success': False, 'error': f"Missing required columns: {', '.join(missing)}"}), 400
 
-        db = get_db()
-        cursor = db.cursor()
-
         day_map = {
             'sunday': 0, 'sun': 0,
             'monday': 1, 'mon': 1,
@@ -753,20 +751,18 @@ def bulk_upload_staff_period_allocations():
             text = str(value).strip()
             return '' if text.lower() in {'nan', 'none', 'null'} else text
 
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-        errors = []
-
+        # Parse the sheet; lookups, conflict checks and writes happen in bulk_import_allocations
+        rows = []
         for row_no, row in enumerate(df.to_dict(orient='records'), start=2):
+            parsed = {
+                'row_no': row_no,
+                'login_staff_id': clean(row.get('login_staff_id')),
+                'grade_name': clean(row.get('grade_name')),
+                'section_name': clean(row.get('section_name')),
+                'subject_name': clean(row.get('subject_name')),
+                'room_number': clean(row.get('room_number'))
+            }
             try:
-                login_staff_id = clean(row.get('login_staff_id'))
-                grade_name = clean(row.get('grade_name'))
-                section_name = clean(row.get('section_name'))
-                period_text = clean(row.get('period_number'))
-                subject_name = clean(row.get('subject_name'))
-                room_number = clean(row.get('room_number'))
-
                 day_text = clean(row.get('day_of_week')) or clean(row.get('day_name'))
                 if day_text.isdigit():
                     day_of_week = int(day_text)
@@ -776,89 +772,58 @@ def bulk_upload_staff_period_allocations():
                 if day_of_week is None or day_of_week < 0 or day_of_week > 6:
                     raise ValueError('Invalid day value. Use 0-6 or valid day name')
 
+                period_text = clean(row.get('period_number'))
                 if not period_text:
                     raise ValueError('period_number is required')
-                period_number = int(float(period_text))
-
-                cursor.execute('SELECT id FROM staff WHERE school_id = ? AND staff_id = ?', (school_id, login_staff_id))
-                staff_row = cursor.fetchone()
-                if not staff_row:
-                    raise ValueError(f'Staff login ID not found: {login_staff_id}')
-                staff_id = staff_row['id']
-
-                cursor.execute('''
-                    SELECT id FROM timetable_academic_levels
-                    WHERE school_id = ? AND LOWER(level_name) = LOWER(?) AND is_active = 1
-                ''', (school_id, grade_name))
-                level_row = cursor.fetchone()
-                if not level_row:
-                    raise ValueError(f'Grade not found: {grade_name}')
-                level_id = level_row['id']
-
-                cursor.execute('''
-                    SELECT id FROM timetable_sections
-                    WHERE school_id = ? AND level_id = ? AND LOWER(section_name) = LOWER(?) AND is_active = 1
-                ''', (school_id, level_id, section_name))
-                section_row = cursor.fetchone()
-                if not section_row:
-                    raise ValueError(f'Section not found: {section_name} under {grade_name}')
-                section_id = section_row['id']
-
-                cursor.execute('''
-                    SELECT id FROM timetable_periods
-                    WHERE school_id = ? AND level_id = ? AND section_id = ?
-                      AND day_of_week = ? AND period_number = ?
-                ''', (school_id, level_id, section_id, day_of_week, period_number))
-                period_row = cursor.fetchone()
-                if not period_row:
-                    raise ValueError('Period not found for selected grade/section/day/period_number')
-
-                cursor.execute('''
-                    SELECT id FROM timetable_hierarchical_assignments
-                    WHERE school_id = ? AND staff_id = ? AND section_id = ? AND level_id = ?
-                      AND day_of_week = ? AND period_number = ?
-                ''', (school_id, staff_id, section_id, level_id, day_of_week, period_number))
-                existing = cursor.fetchone()
-
-                if existing:
-                    cursor.execute('''
-                        UPDATE timetable_hierarchical_assignments
-                        SET subject_name = ?, room_number = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (subject_name, room_number, existing['id']))
-                    updated_count += 1
-                else:
-                    result = HierarchicalTimetableManager.assign_staff_to_period(
-                        school_id, staff_id, section_id, level_id, day_of_week,
-                        period_number, subject_name, room_number
-                    )
-                    if result.get('success'):
-                        created_count += 1
-                    else:
-                        skipped_count += 1
-                        errors.append(f"Row {row_no}: {result.get('error', 'Assignment failed')}")
-
-            except Exception as row_err:
-                skipped_count += 1
-                errors.append(f'Row {row_no}: {row_err}')
-
-        if created_count > 0 or updated_count > 0:
-            db.commit()
-
-        return jsonify({
-            'success': True,
-            'message': 'Staff period bulk upload completed',
-            'total_rows': len(df.index),
-            'created_count': created_count,
-            'updated_count': updated_count,
-            'skipped_count': skipped_count,
-            'errors': errors
+                parsed['day_of_week'] = day_of_week
+                parsed['period_number'] = int(float(period_text))
+            except ValueError as row_err:
+                parsed['error'] = str(row_err)
+            rows.append(parsed)
+
+        dry_run = str(request.form.get('dry_run') or request.args.get('dry_run') or '').lower() in ('1', 'true', 'yes', 'on')
+        result = HierarchicalTimetableManager.bulk_import_allocations(school_id, rows, dry_run=dry_run)
+        if not result['success']:
+            return jsonify(result), 500
+
+        result.update({
+            'message': 'Staff period bulk upload validated (dry run, nothing saved)' if dry_run
+                       else 'Staff period bulk upload completed',
+            'total_rows': len(df.index)
         })
+        return jsonify(result)
 
     except Exception as e:
         logger.error(f"Error in staff period bulk upload: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@hierarchical_bp.route('/generate', methods=['POST'])
+@check_admin_auth
+def generate_timetable():
+    """
+    Generate section timetables from weekly subject requirements
+    
+    JSON body: requirements (list), section_ids (optional list),
+    time_budget (seconds, optional, capped at a few), apply (bool; default only previews)
+    """
+    try:
+        school_id = session.get('school_id')
+        data = request.json or {}
+        
+        requirements = data.get('requirements')
+        if not isinstance(requirements, list) or not requirements:
+            return jsonify({'success': False, 'error': 'requirements must be a non-empty list'}), 400
+        
+        result = HierarchicalTimetableManager.generate_timetable(
+            school_id, requirements, data.get('section_ids'), data.get('time_budget'),
+            apply=bool(data.get('apply'))
+        )
+        return jsonify(result), 200 if result['success'] else 400
+    
+    except Exception as e:
+        logger.error(f"Error generating timetable: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ==================== SCHEDULE VIEWS ====================
 
 @hierarchical_bp.route('/staff-schedule/<int:staff_id>', methods=['GET'])
@@ -870,8 +835,7 @@ def get_staff_schedule(staff_id):
     """
     try:
         school_id = session.get('school_id')
-        result = HierarchicalTimetableManager.get_staff_schedule(school_id, staff_id)
-        return jsonify(result), 200 if result['success'] else 400
+        return grid_response(*HierarchicalTimetableManager.get_cached_grid(school_id, 'staff_schedule', staff_id))
     
     except Exception as e:
         logger.error(f"Error fetching staff schedule: {e}")
@@ -886,8 +850,7 @@ def get_section_schedule(section_id):
     """
     try:
         school_id = session.get('school_id')
-        result = HierarchicalTimetableManager.get_section_schedule(school_id, section_id)
-        return jsonify(result), 200 if result['success'] else 400
+        return grid_response(*HierarchicalTimetableManager.get_cached_grid(school_id, 'section_schedule', section_id))
     
     except Exception as e:
         logger.error(f"Error fetching section schedule: {e}")
@@ -910,8 +873,7 @@ def get_color_coded_grid(item_type, item_id):
         if item_type not in ['staff', 'section']:
             return jsonify({'success': False, 'error': 'Invalid item_type. Must be "staff" or "section"'}), 400
         
-        result = HierarchicalTimetableManager.get_color_coded_grid(school_id, item_type, item_id)
-        return jsonify(result), 200 if result['success'] else 400
+        return grid_response(*HierarchicalTimetableManager.get_cached_grid(school_id, f'{item_type}_grid', item_id))
     
     except Exception as e:
         logger.error(f"Error fetching color-coded grid: {e}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Index advisor: EXPLAIN the hottest dashboard, attendance and payroll queries
+and report the ones that still read a whole table.
+
+Shows the state of every INDEX_CATALOG entry (see database.py), then the
+plan of each query with representative parameters taken from the first
+active staff member. Works against SQLite (EXPLAIN QUERY PLAN) and MySQL
+(EXPLAIN, where type=ALL is a full scan).
+
+Usage:
+    python index_advisor.py [--apply] [--school ID] [--verbose]
+
+Exits with status 1 when a full table scan is found.
+"""
+
+import argparse
+import datetime
+import sys
+
+# (label, SQL, parameter names); names are filled in by sample_params()
+HOT_QUERIES = (
+    ('Dashboard: attendance for the day', '''
+        SELECT staff_id, status, time_in, time_out FROM attendance
+        WHERE school_id = ? AND date = ?
+    ''', ('school_id', 'date')),
+    ('Reports: attendance over a month', '''
+        SELECT staff_id, date, status FROM attendance
+        WHERE school_id = ? AND date BETWEEN ? AND ?
+    ''', ('school_id', 'month_start', 'month_end')),
+    ('Dashboard: staff on approved leave', '''
+        SELECT DISTINCT staff_id FROM leave_applications
+        WHERE school_id = ? AND status = 'approved'
+        AND ? BETWEEN start_date AND end_date
+    ''', ('school_id', 'date')),
+    ('Dashboard: staff on approved on-duty', '''
+        SELECT DISTINCT staff_id FROM on_duty_applications
+        WHERE school_id = ? AND status = 'approved'
+        AND ? BETWEEN start_date AND end_date
+    ''', ('school_id', 'date')),
+    ('Dashboard: staff on approved permission', '''
+        SELECT DISTINCT staff_id FROM permission_applications
+        WHERE school_id = ? AND status = 'approved'
+        AND permission_date = ?
+    ''', ('school_id', 'date')),
+    ('Payroll: leave overlapping the month', '''
+        SELECT leave_type, start_date, end_date FROM leave_applications
+        WHERE staff_id = ? AND status = 'approved'
+        AND start_date <= ? AND end_date >= ?
+    ''', ('staff_db_id', 'month_end', 'month_start')),
+    ('Payroll: on-duty overlapping the month', '''
+        SELECT start_date, end_date FROM on_duty_applications
+        WHERE staff_id = ? AND status = 'approved'
+        AND start_date <= ? AND end_date >= ?
+    ''', ('staff_db_id', 'month_end', 'month_start')),
+    ('Payroll: permissions in the month', '''
+        SELECT permission_date, duration_hours FROM permission_applications
+        WHERE staff_id = ? AND status = 'approved'
+        AND permission_date BETWEEN ? AND ?
+    ''', ('staff_db_id', 'month_start', 'month_end')),
+    ('Biometric: verification history', '''
+        SELECT verification_type, verification_time FROM biometric_verifications
+        WHERE staff_id = ? AND verification_time >= ? AND verification_time < ?
+        ORDER BY verification_time DESC
+    ''', ('staff_db_id', 'month_start', 'next_month_start')),
+    ('Holidays: active holidays in a period', '''
+        SELECT start_date, end_date, holiday_name FROM holidays
+        WHERE school_id = ? AND holiday_type = 'institution_wide' AND is_active = 1
+        AND start_date <= ? AND end_date >= ?
+    ''', ('school_id', 'month_end', 'month_start')),
+    ('Staff: lookup by staff id', '''
+        SELECT id, full_name FROM staff WHERE school_id = ? AND staff_id = ?
+    ''', ('school_id', 'staff_id')),
+)
+
+
+def sample_params(db, school_id=None):
+    """Parameter values for HOT_QUERIES, taken from an existing staff member"""
+    query = 'SELECT id, school_id, staff_id FROM staff'
+    params = ()
+    if school_id is not None:
+        query += ' WHERE school_id = ?'
+        params = (school_id,)
+    staff = db.execute(query + ' ORDER BY id LIMIT 1', params).fetchone()
+
+    today = datetime.date.today()
+    month_start = today.replace(day=1)
+    next_month_start = (month_start + datetime.timedelta(days=32)).replace(day=1)
+    return {
+        'school_id': staff['school_id'] if staff else (school_id or 1),
+        'staff_db_id': staff['id'] if staff else 1,
+        'staff_id': staff['staff_id'] if staff else '1',
+        'date': today.isoformat(),
+        'month_start': month_start.isoformat(),
+        'month_end': (next_month_start - datetime.timedelta(days=1)).isoformat(),
+        'next_month_start': next_month_start.isoformat(),
+    }
+
+
+def explain(db, sql, params, use_mysql):
+    """
+    Plan of a query as (lines, full_scan_tables).
+
+    SQLite reports a full scan as 'SCAN <table>' ('SCAN TABLE <table>' before
+    3.36) without an index; MySQL as an access type of ALL.
+    """
+    lines, scans = [], []
+    if use_mysql:
+        for row in db.execute('EXPLAIN ' + sql, params).fetchall():
+            lines.append(f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')}")
+            if (row.get('type') or '').upper() == 'ALL':
+                scans.append(row.get('table'))
+    else:
+        for row in db.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+            detail = row['detail']
+            lines.append(detail)
+            words = detail.split()
+            if words and words[0] == 'SCAN' and 'INDEX' not in words:
+                scans.append(words[2] if len(words) > 2 and words[1] == 'TABLE' else words[1])
+    return lines, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN the hot queries and report full table scans')
+    parser.add_argument('--apply', action='store_true', help='Create missing catalog indexes first')
+    parser.add_argument('--school', type=int, help='Take sample parameters from this school')
+    parser.add_argument('--verbose', action='store_true', help='Print every query plan')
+    args = parser.parse_args()
+
+    from app import app
+    import database
+
+    with app.app_context():
+        db = database.get_db()
+        if args.apply:
+            created = database.ensure_indexes(db)
+            print(f"Created {len(created)} index(es)")
+
+        print('Index catalog:')
+        for entry in database.index_catalog_status(db):
+            state = entry['state']
+            if state == 'covered':
+                state = f"covered by {entry['covered_by']}"
+            print(f"  {entry['name']:<48} {entry['table']}({', '.join(entry['columns'])})  {state}")
+
+        params = sample_params(db, args.school)
+        print('\nHot queries:')
+        full_scans = 0
+        for label, sql, names in HOT_QUERIES:
+            try:
+                lines, scans = explain(db, sql, tuple(params[name] for name in names), database._USE_MYSQL)
+            except Exception as e:
+                print(f"  ⚠️  {label}: could not EXPLAIN ({e})")
+                continue
+            if scans:
+                full_scans += 1
+                print(f"  ❌ {label}: full scan of {', '.join(scans)}")
+            else:
+                print(f"  ✓ {label}")
+            if args.verbose or scans:
+                for line in lines:
+                    print(f"       {line}")
+
+    if full_scans:
+        print(f"\n{full_scans} quer{'y' if full_scans == 1 else 'ies'} still scan a whole table"
+              + ('' if args.apply else ' (run with --apply to create missing catalog indexes)'))
+        return 1
+    print('\n✅ No full table scans')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
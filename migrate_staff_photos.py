@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Copy staff photos from staff.photo_data into the photo store.
+
+Run it by hand (init_db doesn't) after upgrading, restoring staff from an old
+backup or importing rows that only carry base64 photos. photo_data is kept
+unless --clear-data is given; pass that only when PHOTO_STORE_DIR is on
+storage every instance shares, since the others restore missing files from
+photo_data.
+
+Usage:
+    python migrate_staff_photos.py [--batch N] [--clear-data]
+"""
+
+import argparse
+import sys
+
+from app import app
+from photo_store import get_photo_store, migrate_staff_photo_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy base64 staff photos into the photo store')
+    parser.add_argument('--batch', type=int, default=50, help='Rows per commit (default 50)')
+    parser.add_argument('--clear-data', action='store_true',
+                        help='Clear staff.photo_data once stored (only if PHOTO_STORE_DIR is shared storage)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        moved = migrate_staff_photo_data(batch_size=args.batch, clear_data=args.clear_data)
+
+    print(f'✅ Copied {moved} staff photo(s) to {get_photo_store().root}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# photo_store.py
+"""
+Staff Photo Store
+
+Staff photos used to be base64 JPEGs in staff.photo_data, so the staff list
+embedded the images as data URIs. Photos are now also written to disk under
+PHOTO_STORE_DIR, named by the SHA-256 of their bytes, and staff.photo_hash
+points at them:
+- A file never changes once written, so it is served with an ETag and an
+  immutable Cache-Control header (see the staff_photo route below)
+- Thumbnails (THUMBNAIL_SIZES) are generated on first request and kept next
+  to the original
+- Identical uploads share one file
+
+PHOTO_STORE_DIR is local to each machine unless it is mounted from shared
+storage, so staff.photo_data stays the copy of record: uploads write both,
+and an instance missing a file restores it from photo_data on first request
+(restore_staff_photo). migrate_staff_photo_data() fills photo_hash for rows
+that only have photo_data; it clears photo_data only when asked to, which is
+safe once PHOTO_STORE_DIR is shared by every instance.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from typing import Optional
+
+from flask import Blueprint, jsonify, send_file, session, url_for
+
+PHOTO_STORE_DIR = os.getenv('PHOTO_STORE_DIR', os.path.join(os.path.dirname(__file__), 'instance', 'photos'))
+
+# Longest side in pixels of the generated thumbnails
+THUMBNAIL_SIZES = (64, 128)
+
+_RE_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+_RE_DATA_URI = re.compile(r'^data:image/[\w.+-]+;base64,')
+_JPEG_MAGIC = b'\xff\xd8'
+
+
+def _to_jpeg(image_bytes: bytes) -> bytes:
+    """Re-encode an image that isn't already a JPEG"""
+    if image_bytes.startswith(_JPEG_MAGIC):
+        return image_bytes
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=85)
+    return out.getvalue()
+
+
+class PhotoStore:
+    """Content-addressed JPEG files: <root>/<first two hex digits>/<sha256>[_<size>].jpg"""
+
+    def __init__(self, root: str = None):
+        self.root = root or PHOTO_STORE_DIR
+        self._thumbnail_lock = threading.Lock()
+
+    def _path(self, digest: str, size: int = None) -> str:
+        name = f'{digest}_{size}.jpg' if size else f'{digest}.jpg'
+        return os.path.join(self.root, digest[:2], name)
+
+    def _write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, image_bytes: bytes) -> str:
+        """Store a photo (converted to JPEG if needed) and return its digest"""
+        data = _to_jpeg(image_bytes)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            self._write(path, data)
+        return digest
+
+    def exists(self, digest: str) -> bool:
+        return bool(digest) and bool(_RE_DIGEST.match(digest)) and os.path.exists(self._path(digest))
+
+    def path(self, digest: str, size: int = None) -> Optional[str]:
+        """
+        File for a photo or one of its thumbnails, generating the thumbnail if
+        needed. None for unknown digests and sizes not in THUMBNAIL_SIZES.
+        """
+        if not self.exists(digest) or (size is not None and size not in THUMBNAIL_SIZES):
+            return None
+        if size is None:
+            return self._path(digest)
+
+        thumbnail_path = self._path(digest, size)
+        if not os.path.exists(thumbnail_path):
+            with self._thumbnail_lock:
+                if not os.path.exists(thumbnail_path):
+                    from PIL import Image
+                    with Image.open(self._path(digest)) as image:
+                        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                        if image.mode != 'RGB':
+                            image = image.convert('RGB')
+                        out = io.BytesIO()
+                        image.save(out, format='JPEG', quality=80)
+                    self._write(thumbnail_path, out.getvalue())
+        return thumbnail_path
+
+
+_photo_store = None
+
+
+def get_photo_store() -> PhotoStore:
+    """Process-wide store rooted at PHOTO_STORE_DIR"""
+    global _photo_store
+    if _photo_store is None:
+        _photo_store = PhotoStore()
+    return _photo_store
+
+
+def staff_photo_url(photo_hash: str, size: int = None) -> Optional[str]:
+    """URL of a stored photo (or thumbnail), or None when the staff member has none"""
+    if not photo_hash:
+        return None
+    return url_for('photos.staff_photo', digest=photo_hash, size=size)
+
+
+def decode_photo_data(photo_data: str) -> bytes:
+    """Image bytes of a staff.photo_data value (bare base64 or a data URI)"""
+    return base64.b64decode(_RE_DATA_URI.sub('', photo_data.strip()), validate=True)
+
+
+def encode_photo_data(image_bytes: bytes) -> str:
+    """staff.photo_data value (bare base64) of stored JPEG bytes"""
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+
+def restore_staff_photo(digest: str, db=None, store: PhotoStore = None) -> bool:
+    """
+    Make sure the store has photo `digest`, writing it from the staff.photo_data
+    it came from when this instance doesn't have the file yet.
+
+    Returns:
+        bool: Whether the store has the photo now
+    """
+    store = store or get_photo_store()
+    if store.exists(digest):
+        return True
+    if not digest or not _RE_DIGEST.match(digest):
+        return False
+
+    from database import get_db
+
+    db = db or get_db()
+    row = db.execute('''
+        SELECT photo_data FROM staff
+        WHERE photo_hash = ? AND photo_data IS NOT NULL AND photo_data != ''
+        LIMIT 1
+    ''', (digest,)).fetchone()
+    if not row:
+        return False
+    try:
+        return store.put(decode_photo_data(row['photo_data'])) == digest
+    except Exception as e:
+        print(f'Warning: could not restore photo {digest}: {e}')
+        return False
+
+
+def migrate_staff_photo_data(db=None, store: PhotoStore = None, batch_size: int = 50,
+                             clear_data: bool = False) -> int:
+    """
+    Copy staff.photo_data into the photo store and set photo_hash. Rows that
+    can't be decoded are left as they are.
+
+    With clear_data, photo_data is also set to NULL once its file is in the
+    store, rows copied earlier included. Only do that when PHOTO_STORE_DIR is
+    on storage every instance shares: other instances restore missing files
+    from photo_data.
+
+    Returns:
+        int: Number of photos copied
+    """
+    from database import get_db, has_column, invalidate_schema_cache
+
+    db = db or get_db()
+    store = store or get_photo_store()
+    if not has_column('staff', 'photo_data', db):
+        return 0
+    if not has_column('staff', 'photo_hash', db):
+        db.execute('ALTER TABLE staff ADD COLUMN photo_hash VARCHAR(64)')
+        db.commit()
+        invalidate_schema_cache('staff')
+
+    moved = 0
+    last_id = 0
+    while True:
+        rows = db.execute(f'''
+            SELECT id, photo_data FROM staff
+            WHERE id > ? AND photo_data IS NOT NULL AND photo_data != ''
+            {'' if clear_data else "AND (photo_hash IS NULL OR photo_hash = '')"}
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            last_id = row['id']
+            try:
+                digest = store.put(decode_photo_data(row['photo_data']))
+            except Exception as e:
+                print(f"Warning: could not move photo of staff {row['id']}: {e}")
+                continue
+            if clear_data and store.exists(digest):
+                db.execute('UPDATE staff SET photo_hash = ?, photo_data = NULL WHERE id = ?', (digest, row['id']))
+            else:
+                db.execute('UPDATE staff SET photo_hash = ? WHERE id = ?', (digest, row['id']))
+            moved += 1
+        db.commit()
+
+    if moved:
+        print(f'Migration: copied {moved} staff photo(s) to {store.root}')
+    return moved
+
+
+photo_bp = Blueprint('photos', __name__)
+
+
+@photo_bp.route('/staff_photos/<digest>.jpg')
+@photo_bp.route('/staff_photos/<digest>/<int:size>.jpg')
+def staff_photo(digest, size=None):
+    """Stored staff photo or thumbnail; content-addressed, so cached as immutable"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    # Another instance may have stored this photo: its photo_data has a copy
+    restore_staff_photo(digest)
+    path = get_photo_store().path(digest, size)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Photo not found'}), 404
+
+    response = send_file(path, mimetype='image/jpeg', etag=f"{digest}-{size or 'full'}",
+                         conditional=True, max_age=31536000)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
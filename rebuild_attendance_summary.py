@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Rebuild attendance_daily_summary from the attendance table.
+
+init_db backfills an empty summary once; run this after bulk imports,
+manual SQL fixes or restoring attendance from a backup.
+
+Usage:
+    python rebuild_attendance_summary.py [--school ID] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+
+import argparse
+import sys
+
+from app import app
+from database import rebuild_attendance_daily_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the per-school daily attendance summary')
+    parser.add_argument('--school', type=int, help='Only rebuild this school')
+    parser.add_argument('--from', dest='start_date', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end_date', help='Last date (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        rebuilt = rebuild_attendance_daily_summary(args.school, args.start_date, args.end_date)
+
+    if rebuilt < 0:
+        print('❌ Rebuilding attendance summary failed')
+        return 1
+    print(f'✅ Rebuilt attendance summary for {rebuilt} school-day(s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+# report_jobs.py
+"""
+Background Report Jobs
+
+Exports that take seconds to build (company and yearly attendance workbooks,
+salary reports, salary calculation exports, data backups) are built by a
+small pool of worker threads instead of the request thread:
+- Submitting a report returns a job id whose status and progress can be polled;
+  export requests wait up to REPORT_WAIT_TIMEOUT seconds for the file and
+  otherwise answer 202 with the job (static/js/report_jobs.js polls it)
+- Finished files are kept on disk under a cache key of (report type,
+  parameters, data-version watermark), so identical requests are served
+  straight from the cache
+- A request for a report that is already being built joins the running job
+  instead of building it a second time
+- Cached files are evicted REPORT_CACHE_TTL seconds after they were built
+
+The watermark is a handful of cheap aggregates over the tables a report
+reads (row counts, highest ids, the attendance summary refresh stamps and,
+for applications, the approved rows and processing stamps), so a new punch,
+approval or staff member produces a new key. Salary reports also fingerprint
+the staff pay columns, so editing a salary or allowance on an existing
+profile produces a new key as well.
+
+Jobs are JSON files under REPORT_CACHE_DIR/jobs, and a marker file per
+cache key names the job building it, so every process that uses the same
+REPORT_CACHE_DIR can poll any job, download its file and join its build.
+A build whose job hasn't been updated for REPORT_JOB_STALE seconds (its
+process died) no longer blocks a new one.
+"""
+
+import contextlib
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from werkzeug.http import parse_options_header
+
+from database import get_db, get_table_columns
+
+# Worker threads building reports, where finished files are kept and for how
+# many seconds, and how long finished jobs stay pollable.
+REPORT_JOB_WORKERS = max(1, int(os.getenv('REPORT_JOB_WORKERS', '2')))
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', 'report_cache')
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', '900'))
+REPORT_JOB_RETENTION = 3600
+REPORT_JOB_STALE = int(os.getenv('REPORT_JOB_STALE', '1800'))
+# Seconds an export request waits for its report before answering with the
+# job to poll instead
+REPORT_WAIT_TIMEOUT = float(os.getenv('REPORT_WAIT_TIMEOUT', '20'))
+
+_RE_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# A report written to a file by its builder (e.g. BackupManager exports)
+ReportFile = namedtuple('ReportFile', ['path', 'filename', 'mimetype'])
+
+
+class ReportJobError(Exception):
+    """A report builder finished without producing a report"""
+
+
+# Staff columns that feed salary calculations (see SalaryCalculator._staff_info_sql)
+STAFF_PAY_COLUMNS = (
+    'basic_salary', 'hra', 'transport_allowance', 'other_allowances', 'dearness_allowance', 'pf_opt_in',
+    'pf_deduction', 'esi_deduction', 'professional_tax', 'other_deductions', 'is_active',
+)
+
+# Application rows change status in place: approvals stamp processed_at,
+# withdrawals stamp withdrawn_at, and the id sum covers any other move
+_APPLICATION_AGGREGATES = ("COUNT(*), MAX(id), MAX(processed_at), MAX(withdrawn_at), "
+                           "SUM(CASE WHEN status = 'approved' THEN id ELSE 0 END)")
+
+_WATERMARK_AGGREGATES = {
+    'salary_rules': 'COUNT(*), MAX(updated_at)',
+    'leave_applications': _APPLICATION_AGGREGATES,
+    'permission_applications': _APPLICATION_AGGREGATES,
+    'on_duty_applications': _APPLICATION_AGGREGATES,
+}
+
+
+def data_watermark(db, school_id=None, start_date=None, end_date=None, tables=(), staff_columns=()) -> list:
+    """
+    Cheap fingerprint of the data behind a report.
+
+    Covers attendance (and its daily summary) in the date range and the staff
+    list, plus row count and newest id or update of any extra `tables`.
+    `staff_columns` adds the sum and id-weighted sum of those numeric staff
+    columns (and staff.updated_at where it exists), so in-place edits count.
+    Tables that don't exist in this database contribute None.
+    """
+    def scoped(where, params, dated=False):
+        if school_id is not None:
+            where.append('school_id = ?')
+            params.append(school_id)
+        if dated and start_date and end_date:
+            where.append('date BETWEEN ? AND ?')
+            params.extend([start_date, end_date])
+        return (' WHERE ' + ' AND '.join(where)) if where else '', params
+
+    staff_aggregates = 'COUNT(*), MAX(id)'
+    if staff_columns:
+        existing = get_table_columns('staff', db)
+        for column in staff_columns:
+            if column in existing:
+                staff_aggregates += f', SUM(COALESCE({column}, 0)), SUM(id * COALESCE({column}, 0))'
+        if 'updated_at' in existing:
+            staff_aggregates += ', MAX(updated_at)'
+
+    queries = [
+        ('attendance', 'COUNT(*), MAX(id)', True),
+        ('attendance_daily_summary', 'COUNT(*), MAX(updated_at)', True),
+        ('staff', staff_aggregates, False),
+    ]
+    queries += [(table, _WATERMARK_AGGREGATES.get(table, 'COUNT(*), MAX(id)'), False) for table in tables]
+
+    watermark = []
+    for table, aggregates, dated in queries:
+        where, params = scoped([], [], dated)
+        try:
+            row = db.execute(f'SELECT {aggregates} FROM {table}{where}', params).fetchone()
+            watermark.append([table] + [str(value) if value is not None else None for value in tuple(row)])
+        except Exception:
+            watermark.append([table, None])
+    return watermark
+
+
+class ReportArtifactCache:
+    """Finished report files on disk: <key>.data with a <key>.json description"""
+
+    def __init__(self, directory: str = None, ttl: int = None):
+        self.directory = directory or REPORT_CACHE_DIR
+        self.ttl = REPORT_CACHE_TTL if ttl is None else ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.data', base + '.json'
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Description of a cached report (with its 'path'), or None if missing or expired"""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - meta.get('created_at', 0) > self.ttl or not os.path.exists(data_path):
+            self._remove(key)
+            return None
+        meta['path'] = data_path
+        return meta
+
+    def put(self, key: str, source, meta: Dict) -> Dict:
+        """
+        Store a report and return its description.
+
+        `source` is either an iterable of byte chunks or the path of a file
+        to move into the cache. Files are renamed into place, so readers
+        never see a partly written report.
+        """
+        data_path, meta_path = self._paths(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            if isinstance(source, (str, os.PathLike)):
+                os.close(fd)
+                shutil.move(source, tmp_path)
+            else:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in source:
+                        f.write(chunk)
+            os.replace(tmp_path, data_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        meta = dict(meta, key=key, created_at=time.time(), size=os.path.getsize(data_path))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        self.evict_expired()
+        meta['path'] = data_path
+        return meta
+
+    def evict_expired(self) -> int:
+        """Remove cached reports older than the TTL; returns how many were removed"""
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    created_at = json.load(f).get('created_at', 0)
+            except (OSError, ValueError):
+                created_at = 0
+            if now - created_at > self.ttl:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+
+class ReportJobStore:
+    """Job records shared through a directory: <job id>.json, and <cache key>.inflight naming the job building a key"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, job: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp_path, self._path(job['job_id'] + '.json'))
+
+    def create(self, **meta) -> Dict:
+        """Record a new queued job and return it"""
+        now = time.time()
+        self.evict_expired(now)
+        job = dict(
+            meta,
+            job_id=uuid.uuid4().hex,
+            status='queued',
+            cached=False,
+            filename=None,
+            total=0,
+            completed=0,
+            created_at=now,
+            updated_at=now,
+            finished_at=None,
+            error=None,
+        )
+        self._write(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        if not job_id or not _RE_JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        """Change fields of a job; finishing statuses stamp finished_at"""
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=time.time())
+            if fields.get('status') in ('completed', 'failed'):
+                job['finished_at'] = job['updated_at']
+            self._write(job)
+            return job
+
+    def delete(self, job_id: str):
+        with contextlib.suppress(OSError):
+            os.remove(self._path(job_id + '.json'))
+
+    def _live(self, job: Optional[Dict]) -> bool:
+        return (job is not None and job['status'] in ('queued', 'running')
+                and time.time() - job.get('updated_at', 0) < REPORT_JOB_STALE)
+
+    def claim(self, key: str, job_id: str) -> Optional[str]:
+        """
+        Make `job_id` the build of `key`. Returns the id of the live job
+        already building it instead, or None once the claim is made.
+        """
+        marker = self._path(key + '.inflight')
+        for _ in range(3):
+            try:
+                fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(marker) as f:
+                        owner = f.read().strip()
+                except OSError:
+                    continue
+                if owner and self._live(self.get(owner)):
+                    return owner
+                # Finished or abandoned: take the key over
+                self.release(key, owner)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(job_id)
+            return None
+        raise ReportJobError(f'Could not claim report build {key}')
+
+    def release(self, key: str, job_id: str):
+        """Drop the marker of `key` if it still names `job_id`"""
+        marker = self._path(key + '.inflight')
+        with contextlib.suppress(OSError):
+            with open(marker) as f:
+                owner = f.read().strip()
+            if owner == job_id:
+                os.remove(marker)
+
+    def evict_expired(self, now: float = None) -> int:
+        """Remove jobs finished more than REPORT_JOB_RETENTION seconds ago"""
+        now = now or time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            job = self.get(name[:-len('.json')])
+            if job and job['finished_at'] and now - job['finished_at'] > REPORT_JOB_RETENTION:
+                self.delete(job['job_id'])
+                removed += 1
+        return removed
+
+
+class ReportJobQueue:
+    """Builds registered report types on worker threads and caches the results"""
+
+    def __init__(self, app=None, cache: ReportArtifactCache = None, max_workers: int = None,
+                 jobs: ReportJobStore = None):
+        self.app = app
+        self.cache = cache or ReportArtifactCache()
+        self.jobs = jobs or ReportJobStore(os.path.join(self.cache.directory, 'jobs'))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or REPORT_JOB_WORKERS,
+                                            thread_name_prefix='report-job')
+        self._reports = {}   # report_type -> (builder, watermark)
+        self._futures = {}   # job id -> future, for jobs built by this process
+        self._lock = threading.Lock()
+
+    def register(self, report_type: str, builder, watermark=None):
+        """
+        Register a report type.
+
+        builder(params, progress) returns a Flask Response, a ReportFile or a
+        JSON-able dict, and may call progress(done, total) as it goes.
+        watermark(db, params) returns the data version the report depends on.
+        """
+        self._reports[report_type] = (builder, watermark)
+
+    def cache_key(self, report_type: str, params: Dict) -> str:
+        _, watermark = self._reports[report_type]
+        version = watermark(get_db(), params) if watermark else None
+        payload = json.dumps([report_type, params, version], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def submit(self, report_type: str, params: Dict, requested_by=None, refresh: bool = False) -> Dict:
+        """
+        Queue a report and return its job.
+
+        A cached file for the same key completes the job straight away, and a
+        job already building the same key is returned instead of a new one.
+        """
+        if report_type not in self._reports:
+            raise ValueError(f'Unknown report type: {report_type}')
+
+        key = self.cache_key(report_type, params)
+        artifact = None if refresh else self.cache.get(key)
+        meta = dict(report_type=report_type, params=params, school_id=params.get('school_id'),
+                    requested_by=requested_by, cache_key=key)
+
+        if artifact is not None:
+            job = self.jobs.create(**meta)
+            job = self.jobs.update(job['job_id'], status='completed', cached=True, filename=artifact.get('filename'),
+                                   completed=1, total=1)
+            return self._job_copy(job)
+
+        job = self.jobs.create(**meta)
+        running = self.jobs.claim(key, job['job_id'])
+        if running is not None:
+            running_job = self.jobs.get(running)
+            if running_job is not None:
+                self.jobs.delete(job['job_id'])
+                return self._job_copy(running_job)
+
+        with self._lock:
+            self._futures = {job_id: future for job_id, future in self._futures.items() if not future.done()}
+            self._futures[job['job_id']] = self._executor.submit(self._run, job['job_id'])
+        return self._job_copy(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job with a progress percentage, or None"""
+        job = self.jobs.get(job_id)
+        return self._job_copy(job) if job else None
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Block until a job has finished (or the timeout passes) and return it"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            with contextlib.suppress(Exception):
+                future.result(timeout)
+            return self.get_job(job_id)
+
+        # Built by another process: poll its record
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job['status'] in ('completed', 'failed'):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.2 if deadline is None else max(0.0, min(0.2, deadline - time.monotonic())))
+
+    def artifact(self, job: Dict) -> Optional[Dict]:
+        """Cached file of a completed job, or None once it has expired"""
+        if not job or job.get('status') != 'completed':
+            return None
+        return self.cache.get(job['cache_key'])
+
+    def _job_copy(self, job):
+        job = dict(job)
+        if job['status'] == 'completed':
+            job['progress'] = 100.0
+        else:
+            job['progress'] = round(100.0 * job['completed'] / job['total'], 1) if job['total'] else 0.0
+        return job
+
+    def _update(self, job_id, **fields):
+        job = self.jobs.update(job_id, **fields)
+        if job is not None and fields.get('status') in ('completed', 'failed'):
+            self.jobs.release(job['cache_key'], job_id)
+
+    def _run(self, job_id):
+        job = self.jobs.get(job_id)
+        builder, _ = self._reports[job['report_type']]
+        context = self.app.app_context() if self.app is not None else contextlib.nullcontext()
+
+        with context:
+            try:
+                self._update(job_id, status='running')
+                result = builder(job['params'], lambda done, total: self._update(job_id, completed=done, total=total))
+                meta = self._store(job['cache_key'], job['report_type'], result)
+                self._update(job_id, status='completed', filename=meta.get('filename'))
+            except Exception as e:
+                print(f"Report job {job_id} ({job['report_type']}) failed: {e}")
+                self._update(job_id, status='failed', error=str(e))
+
+    def _store(self, key, report_type, result) -> Dict:
+        """Write a builder's result to the cache"""
+        meta = {'report_type': report_type}
+
+        if isinstance(result, ReportFile):
+            mimetype = result.mimetype or mimetypes.guess_type(result.filename)[0] or 'application/octet-stream'
+            meta.update(filename=result.filename, mimetype=mimetype)
+            return self.cache.put(key, result.path, meta)
+
+        if isinstance(result, dict):
+            payload = result
+        elif result.mimetype == 'application/json':
+            payload = json.loads(result.get_data())
+        else:
+            if result.status_code >= 400:
+                raise ReportJobError(f'Report builder returned HTTP {result.status_code}')
+            _, options = parse_options_header(result.headers.get('Content-Disposition', ''))
+            meta.update(filename=options.get('filename'), mimetype=result.mimetype)
+            try:
+                return self.cache.put(key, result.iter_encoded(), meta)
+            finally:
+                result.close()
+
+        if payload.get('success') is False:
+            raise ReportJobError(payload.get('error') or 'Report could not be generated')
+        meta.update(filename=None, mimetype='application/json')
+        return self.cache.put(key, [json.dumps(payload, default=str).encode()], meta)
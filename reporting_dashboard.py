@@ -13,7 +13,7 @@ This module provides advanced reporting capabilities including:
 
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional, Tuple
-from database import get_db
+from database import get_db, get_attendance_daily_summary
 import calendar
 import json
 
@@ -496,49 +496,39 @@ class ReportingDashboard:
         db = get_db()
         today = datetime.now().date()
 
-        # Today's summary
-        today_summary = db.execute('''
-            SELECT
-                COUNT(DISTINCT s.id) as total_staff,
-                COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_today,
-                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as absent_today,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_today,
-                COUNT(CASE WHEN a.status = 'leave' THEN 1 END) as leave_today
-            FROM staff s
-            LEFT JOIN attendance a ON s.id = a.staff_id AND a.date = ?
-            WHERE s.school_id = ?
-        ''', (today, school_id)).fetchone()
-
-        # This month's summary
+        # Counts come from attendance_daily_summary, one row per day
         month_start = today.replace(day=1)
-        month_summary = db.execute('''
-            SELECT
-                COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_month,
-                COUNT(CASE WHEN a.status = 'absent' THEN 1 END) as absent_month,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_month,
-                SUM(CASE WHEN a.overtime_hours IS NOT NULL THEN a.overtime_hours ELSE 0 END) as overtime_month
-            FROM attendance a
-            JOIN staff s ON a.staff_id = s.id
-            WHERE s.school_id = ? AND a.date >= ?
-        ''', (school_id, month_start)).fetchone()
+        week_ago = today - timedelta(days=7)
+        daily = get_attendance_daily_summary(school_id, min(month_start, week_ago), today, db=db)
+        today_key = today.isoformat()
+
+        total_staff = db.execute('SELECT COUNT(*) FROM staff WHERE school_id = ?', (school_id,)).fetchone()[0]
+        today_counts = next((day for day in daily if day['date'] == today_key), {})
+        today_summary = {
+            'total_staff': total_staff,
+            'present_today': today_counts.get('present_count', 0),
+            'absent_today': today_counts.get('absent_count', 0),
+            'late_today': today_counts.get('late_count', 0),
+            'leave_today': today_counts.get('leave_count', 0)
+        }
+
+        month_days = [day for day in daily if day['date'] >= month_start.isoformat()]
+        month_summary = {
+            'present_month': sum(day['present_count'] for day in month_days),
+            'absent_month': sum(day['absent_count'] for day in month_days),
+            'late_month': sum(day['late_count'] for day in month_days),
+            'overtime_month': sum(day['overtime_hours'] for day in month_days)
+        }
 
         # Recent trends (last 7 days)
-        week_ago = today - timedelta(days=7)
-        recent_trends = db.execute('''
-            SELECT
-                a.date,
-                COUNT(CASE WHEN a.status IN ('present', 'late', 'on_duty') THEN 1 END) as present_count,
-                COUNT(CASE WHEN a.status = 'late' THEN 1 END) as late_count
-            FROM attendance a
-            JOIN staff s ON a.staff_id = s.id
-            WHERE s.school_id = ? AND a.date >= ?
-            GROUP BY a.date
-            ORDER BY a.date
-        ''', (school_id, week_ago)).fetchall()
+        recent_trends = [
+            {'date': day['date'], 'present_count': day['present_count'], 'late_count': day['late_count']}
+            for day in daily if day['date'] >= week_ago.isoformat()
+        ]
 
         return {
-            'today_summary': dict(today_summary),
-            'month_summary': dict(month_summary),
-            'recent_trends': [dict(row) for row in recent_trends],
-            'attendance_rate_today': (today_summary['present_today'] / today_summary['total_staff'] * 100) if today_summary['total_staff'] > 0 else 0
+            'today_summary': today_summary,
+            'month_summary': month_summary,
+            'recent_trends': recent_trends,
+            'attendance_rate_today': (today_summary['present_today'] / total_staff * 100) if total_staff > 0 else 0
         }
@@ -13,13 +13,132 @@ This module calculates salaries based on various attendance factors:
 - Late arrival penalties
 """
 
+import json
 import sqlite3
+import os
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from database import get_db, calculate_hourly_rate, calculate_standard_working_hours_per_month, is_holiday
+from database import get_db, get_table_columns, calculate_hourly_rate, calculate_standard_working_hours_per_month, is_holiday, get_holiday_index
 from pf_calculator import calculate_pf_components
 import calendar
 
+# Parallel payroll (company-wide runs).
+#   PAYROLL_MAX_WORKERS     cap on worker processes (1 disables the pool)
+#   PAYROLL_CHUNK_SIZE      staff members handed to a worker at a time
+PAYROLL_MAX_WORKERS = max(1, int(os.getenv('PAYROLL_MAX_WORKERS', str(min(4, os.cpu_count() or 1)))))
+PAYROLL_CHUNK_SIZE = max(1, int(os.getenv('PAYROLL_CHUNK_SIZE', '100')))
+
+# Progress of background payroll runs, polled by the UI through a job id.
+# Jobs are rows of payroll_jobs, so any worker process can answer the poll;
+# finished jobs are dropped after an hour.
+PAYROLL_JOB_RETENTION = 3600
+_PAYROLL_JOB_COLUMNS = ('status', 'total', 'completed', 'result', 'error', 'finished_at')
+
+
+def _ensure_payroll_jobs_table(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS payroll_jobs (
+            job_id VARCHAR(32) PRIMARY KEY,
+            status VARCHAR(16) NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            meta TEXT,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            finished_at REAL
+        )
+    ''')
+
+
+def create_payroll_job(total: int, db=None, **meta) -> str:
+    """Register a payroll job and return its id."""
+    db = db or get_db()
+    _ensure_payroll_jobs_table(db)
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    db.execute('DELETE FROM payroll_jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+               (now - PAYROLL_JOB_RETENTION,))
+    db.execute('''
+        INSERT INTO payroll_jobs (job_id, status, total, completed, meta, created_at)
+        VALUES (?, 'queued', ?, 0, ?, ?)
+    ''', (job_id, int(total), json.dumps(meta, default=str), now))
+    db.commit()
+    return job_id
+
+
+def update_payroll_job(job_id: str, db=None, **fields):
+    """Update fields of a payroll job; finishing statuses stamp finished_at."""
+    unknown = set(fields) - set(_PAYROLL_JOB_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown payroll job fields: {', '.join(sorted(unknown))}")
+    if fields.get('status') in ('completed', 'failed'):
+        fields['finished_at'] = time.time()
+    if 'result' in fields:
+        fields['result'] = json.dumps(fields['result'], default=str)
+
+    db = db or get_db()
+    db.execute(f"UPDATE payroll_jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE job_id = ?",
+               list(fields.values()) + [job_id])
+    db.commit()
+
+
+def get_payroll_job(job_id: str, db=None) -> Optional[Dict]:
+    """Return a payroll job with a progress percentage, or None."""
+    db = db or get_db()
+    _ensure_payroll_jobs_table(db)
+    row = db.execute('SELECT * FROM payroll_jobs WHERE job_id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(json.loads(row['meta'] or '{}'),
+               job_id=row['job_id'],
+               status=row['status'],
+               total=row['total'],
+               completed=row['completed'],
+               created_at=row['created_at'],
+               finished_at=row['finished_at'],
+               result=json.loads(row['result']) if row['result'] else None,
+               error=row['error'])
+    job['progress'] = round(100.0 * job['completed'] / job['total'], 1) if job['total'] else 100.0
+    return job
+
+
+def _payroll_mp_context():
+    # Spawn, never fork: runs start from the multithreaded web process
+    # (request threads, the scheduler, the payroll job thread), and a forked
+    # child would inherit whatever locks those threads held at that moment
+    # (logging, the connection pool, imports) with no thread left to release
+    # them. Spawned workers start a fresh interpreter and only import this
+    # module; app.py skips its bootstrap when re-imported as __mp_main__.
+    return multiprocessing.get_context('spawn')
+
+
+def payroll_process_pool(max_workers: int = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Worker pool to share across the calculate_monthly_salaries() calls of one
+    run (see max_workers), or None when parallel payroll is disabled. Spawned
+    workers start a fresh interpreter each, so a company run creates the pool
+    once and feeds every school's chunks through it. The caller shuts it down
+    (use it as a context manager).
+    """
+    workers = min(max(1, int(max_workers or PAYROLL_MAX_WORKERS)), PAYROLL_MAX_WORKERS)
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_payroll_mp_context())
+
+
+def _calculate_salary_chunk(snapshot: Dict, staff_ids: List[int]) -> Tuple[Dict, List[Tuple]]:
+    """Worker entry point: calculate salaries from a pre-fetched snapshot, without database access."""
+    calculator = SalaryCalculator._from_snapshot(snapshot)
+    results = {}
+    for staff_id in staff_ids:
+        results[staff_id] = calculator.calculate_monthly_salary(staff_id, *snapshot['batch']['period'])
+    return results, calculator._batch['pf_records']
+
 
 class SalaryCalculator:
     """Comprehensive salary calculation system"""
@@ -27,6 +146,7 @@ class SalaryCalculator:
     def __init__(self, school_id=None):
         self.school_id = school_id
         self._last_salary_rules_error = None
+        self._batch = None  # preloaded inputs while calculate_monthly_salaries() runs
         # Default salary calculation rules (fallback values)
         self.default_salary_rules = {
             'early_arrival_bonus_per_hour': 50.0,  # Bonus for arriving early
@@ -52,6 +172,8 @@ class SalaryCalculator:
 
     def _get_db_connection(self):
         """Get database connection with fallback for standalone operation"""
+        if getattr(self, '_detached', False):
+            raise RuntimeError('Payroll worker processes have no database access')
         try:
             # Try Flask's get_db first (when running in Flask context)
             return get_db()
@@ -107,7 +229,7 @@ class SalaryCalculator:
 
         try:
             db = self._get_db_connection()
-            staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+            staff_columns = get_table_columns('staff', db)
 
             if 'is_active' in staff_columns:
                 row = db.execute('''
@@ -152,66 +274,72 @@ class SalaryCalculator:
             company_employee_count=self._get_company_employee_count(),
         )
 
+    _PF_RECORD_INSERT_SQL = '''
+        INSERT INTO payroll_pf_records (
+            school_id, staff_id, year, month,
+            pf_wage, employee_pf, employer_epf, eps, edli, admin_charges,
+            pf_applicable, company_pf_applicable, mandatory_pf, pf_opt_in,
+            created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    '''
+
+    def _ensure_pf_records_table(self, db):
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS payroll_pf_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                school_id INTEGER NOT NULL,
+                staff_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                pf_wage REAL DEFAULT 0,
+                employee_pf REAL DEFAULT 0,
+                employer_epf REAL DEFAULT 0,
+                eps REAL DEFAULT 0,
+                edli REAL DEFAULT 0,
+                admin_charges REAL DEFAULT 0,
+                pf_applicable INTEGER DEFAULT 0,
+                company_pf_applicable INTEGER DEFAULT 0,
+                mandatory_pf INTEGER DEFAULT 0,
+                pf_opt_in INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(school_id, staff_id, year, month)
+            )
+        ''')
+
     def _persist_pf_record(self, staff_info: Dict, year: int, month: int, pf_components: Dict[str, int]):
         """Persist month-wise PF breakup for payroll audit/reporting."""
+        record = (
+            staff_info.get('school_id', self.school_id),
+            staff_info.get('id'),
+            year,
+            month,
+            pf_components.get('pf_wage', 0),
+            pf_components.get('employee_pf', 0),
+            pf_components.get('employer_epf', 0),
+            pf_components.get('eps', 0),
+            pf_components.get('edli', 0),
+            pf_components.get('admin_charges', 0),
+            pf_components.get('pf_applicable', 0),
+            pf_components.get('company_pf_applicable', 0),
+            pf_components.get('mandatory_pf', 0),
+            pf_components.get('pf_opt_in', 0),
+        )
+        if self._batch is not None:
+            # Written by _flush_pf_records() at the end of the batch
+            self._batch['pf_records'].append(record)
+            return
+
         try:
             db = self._get_db_connection()
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS payroll_pf_records (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    school_id INTEGER NOT NULL,
-                    staff_id INTEGER NOT NULL,
-                    year INTEGER NOT NULL,
-                    month INTEGER NOT NULL,
-                    pf_wage REAL DEFAULT 0,
-                    employee_pf REAL DEFAULT 0,
-                    employer_epf REAL DEFAULT 0,
-                    eps REAL DEFAULT 0,
-                    edli REAL DEFAULT 0,
-                    admin_charges REAL DEFAULT 0,
-                    pf_applicable INTEGER DEFAULT 0,
-                    company_pf_applicable INTEGER DEFAULT 0,
-                    mandatory_pf INTEGER DEFAULT 0,
-                    pf_opt_in INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(school_id, staff_id, year, month)
-                )
-            ''')
+            self._ensure_pf_records_table(db)
 
             db.execute('''
                 DELETE FROM payroll_pf_records
                 WHERE school_id = ? AND staff_id = ? AND year = ? AND month = ?
-            ''', (
-                staff_info.get('school_id', self.school_id),
-                staff_info.get('id'),
-                year,
-                month,
-            ))
+            ''', record[:4])
 
-            db.execute('''
-                INSERT INTO payroll_pf_records (
-                    school_id, staff_id, year, month,
-                    pf_wage, employee_pf, employer_epf, eps, edli, admin_charges,
-                    pf_applicable, company_pf_applicable, mandatory_pf, pf_opt_in,
-                    created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            ''', (
-                staff_info.get('school_id', self.school_id),
-                staff_info.get('id'),
-                year,
-                month,
-                pf_components.get('pf_wage', 0),
-                pf_components.get('employee_pf', 0),
-                pf_components.get('employer_epf', 0),
-                pf_components.get('eps', 0),
-                pf_components.get('edli', 0),
-                pf_components.get('admin_charges', 0),
-                pf_components.get('pf_applicable', 0),
-                pf_components.get('company_pf_applicable', 0),
-                pf_components.get('mandatory_pf', 0),
-                pf_components.get('pf_opt_in', 0),
-            ))
+            db.execute(self._PF_RECORD_INSERT_SQL, record)
             db.commit()
         except Exception as e:
             print(f"Error persisting payroll PF record: {e}")
@@ -339,26 +467,53 @@ class SalaryCalculator:
             print(f"Error loading salary rules from database: {e}")
             return self.default_salary_rules.copy()
 
+    def _ensure_salary_adjustments_table(self, db):
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS salary_adjustments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                school_id INTEGER NOT NULL,
+                staff_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                adjustment_type TEXT NOT NULL DEFAULT 'bonus',
+                amount REAL NOT NULL DEFAULT 0.0,
+                reason TEXT,
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(school_id, staff_id, year, month, adjustment_type)
+            )
+        ''')
+
+    def _summarize_manual_adjustments(self, rows) -> Tuple[float, float, List[Dict]]:
+        """Total manual bonus/deduction rows into (bonus, deduction, entries)."""
+        manual_bonus = 0.0
+        manual_deduction = 0.0
+        adjustments = []
+
+        for row in rows:
+            adjustment_type = str(row['adjustment_type'] or '').strip().lower()
+            amount = self._to_float(row['amount'])
+            adjustments.append({
+                'adjustment_type': adjustment_type,
+                'amount': amount,
+                'reason': row['reason'],
+            })
+            if adjustment_type == 'bonus':
+                manual_bonus += amount
+            elif adjustment_type == 'deduction':
+                manual_deduction += amount
+
+        return round(manual_bonus, 2), round(manual_deduction, 2), adjustments
+
     def _get_manual_salary_adjustments(self, staff_id: int, year: int, month: int) -> Tuple[float, float, List[Dict]]:
         """Load manual salary bonus and deduction entries for a staff member."""
+        if self._batch_covers('adjustments', staff_id, (year, month)):
+            return self._batch['adjustments'].get(staff_id, (0.0, 0.0, []))
+
         try:
             db = self._get_db_connection()
-            db.execute('''
-                CREATE TABLE IF NOT EXISTS salary_adjustments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    school_id INTEGER NOT NULL,
-                    staff_id INTEGER NOT NULL,
-                    year INTEGER NOT NULL,
-                    month INTEGER NOT NULL,
-                    adjustment_type TEXT NOT NULL DEFAULT 'bonus',
-                    amount REAL NOT NULL DEFAULT 0.0,
-                    reason TEXT,
-                    created_by TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(school_id, staff_id, year, month, adjustment_type)
-                )
-            ''')
+            self._ensure_salary_adjustments_table(db)
 
             rows = db.execute('''
                 SELECT adjustment_type, amount, reason
@@ -367,24 +522,7 @@ class SalaryCalculator:
                 ORDER BY adjustment_type
             ''', (self.school_id or 0, staff_id, year, month)).fetchall()
 
-            manual_bonus = 0.0
-            manual_deduction = 0.0
-            adjustments = []
-
-            for row in rows:
-                adjustment_type = str(row['adjustment_type'] or '').strip().lower()
-                amount = self._to_float(row['amount'])
-                adjustments.append({
-                    'adjustment_type': adjustment_type,
-                    'amount': amount,
-                    'reason': row['reason'],
-                })
-                if adjustment_type == 'bonus':
-                    manual_bonus += amount
-                elif adjustment_type == 'deduction':
-                    manual_deduction += amount
-
-            return round(manual_bonus, 2), round(manual_deduction, 2), adjustments
+            return self._summarize_manual_adjustments(rows)
         except Exception:
             return 0.0, 0.0, []
 
@@ -538,6 +676,264 @@ class SalaryCalculator:
             print(f"Error saving salary rules to database: {e}")
             return False
 
+    # ------------------------------------------------------------------
+    # Batch payroll
+    # ------------------------------------------------------------------
+    # calculate_monthly_salaries() preloads everything the per-staff path
+    # reads (staff rows, attendance, leaves, permissions, manual adjustments,
+    # shift history and definitions, holidays) with one query per chunk of
+    # staff, then runs the regular calculate_monthly_salary() against that
+    # data so the results are identical. PF records are written once at the
+    # end. With max_workers > 1 the preloaded data is split into chunks that
+    # are calculated in worker processes and merged back in input order.
+
+    BATCH_CHUNK_SIZE = 500  # staff ids per IN (...) query
+
+    def calculate_monthly_salaries(self, staff_ids, year: int, month: int,
+                                   max_workers: int = 1, progress=None, pool=None) -> Dict[int, Dict]:
+        """
+        Calculate monthly salary for many staff members at once.
+
+        Args:
+            staff_ids (iterable): Staff database IDs
+            year (int): Year
+            month (int): Month
+            max_workers (int): Worker processes to use (capped by PAYROLL_MAX_WORKERS)
+            progress (callable, optional): Called as progress(done, total) as staff complete
+            pool (ProcessPoolExecutor, optional): Pool to calculate chunks in
+                (see payroll_process_pool) instead of starting one for this call
+
+        Returns:
+            Dict: {staff_id: result of calculate_monthly_salary}, in input order
+        """
+        staff_ids = list(dict.fromkeys(staff_ids))
+        results = {}
+        if not staff_ids:
+            return results
+
+        self._batch = self._load_payroll_batch(staff_ids, year, month)
+        try:
+            workers = min(max(1, int(max_workers or 1)), PAYROLL_MAX_WORKERS)
+            chunks = [staff_ids[i:i + PAYROLL_CHUNK_SIZE] for i in range(0, len(staff_ids), PAYROLL_CHUNK_SIZE)]
+            if workers > 1 and len(chunks) > 1 and not self._batch['fallbacks']:
+                results, pf_records = self._calculate_chunks_in_pool(chunks, min(workers, len(chunks)), progress, pool)
+            else:
+                for done, staff_id in enumerate(staff_ids, 1):
+                    results[staff_id] = self.calculate_monthly_salary(staff_id, year, month)
+                    if progress and (done % PAYROLL_CHUNK_SIZE == 0 or done == len(staff_ids)):
+                        progress(done, len(staff_ids))
+                pf_records = self._batch['pf_records']
+            self._flush_pf_records(pf_records)
+        finally:
+            self._batch = None
+        return results
+
+    def _calculate_chunks_in_pool(self, chunks: List[List[int]], workers: int, progress=None, pool=None):
+        """Fan staff chunks out to worker processes and merge results in chunk order."""
+        if pool is None:
+            with payroll_process_pool(workers) as own_pool:
+                return self._calculate_chunks_in_pool(chunks, workers, progress, own_pool)
+
+        self._get_company_employee_count()  # computed once here, shipped in the snapshot
+        total = sum(len(chunk) for chunk in chunks)
+        chunk_results = [None] * len(chunks)
+        done = 0
+
+        futures = {
+            pool.submit(_calculate_salary_chunk, self._snapshot(chunk), chunk): index
+            for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            chunk_results[index] = future.result()
+            done += len(chunks[index])
+            if progress:
+                progress(done, total)
+
+        results = {}
+        pf_records = []
+        for chunk_result, chunk_pf_records in chunk_results:
+            results.update(chunk_result)
+            pf_records.extend(chunk_pf_records)
+        return results, pf_records
+
+    def _snapshot(self, staff_ids: List[int]) -> Dict:
+        """Plain-data copy of the running batch restricted to `staff_ids`, for a worker process."""
+        batch = self._batch
+        per_staff = ('staff', 'attendance', 'leaves', 'permissions', 'adjustments', 'shift_history')
+        chunk_batch = {key: value for key, value in batch.items() if key not in per_staff}
+        chunk_batch['staff_ids'] = set(staff_ids)
+        chunk_batch['pf_records'] = []
+        for kind in per_staff:
+            chunk_batch[kind] = {staff_id: batch[kind][staff_id] for staff_id in staff_ids if staff_id in batch[kind]}
+        return {
+            'school_id': self.school_id,
+            'salary_rules': self.salary_rules,
+            'default_salary_rules': self.default_salary_rules,
+            'company_employee_count': self._company_employee_count_cache,
+            'batch': chunk_batch,
+        }
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict) -> 'SalaryCalculator':
+        """Rebuild a calculator in a worker process without touching the database."""
+        calculator = cls.__new__(cls)
+        calculator.school_id = snapshot['school_id']
+        calculator._last_salary_rules_error = None
+        calculator.default_salary_rules = snapshot['default_salary_rules']
+        calculator.salary_rules = snapshot['salary_rules']
+        calculator._company_employee_count_cache = snapshot['company_employee_count']
+        calculator._batch = snapshot['batch']
+        calculator._detached = True
+        return calculator
+
+    def _batch_covers(self, kind: str, staff_id: int, period: Optional[Tuple[int, int]] = None) -> bool:
+        """True when the running batch has preloaded `kind` data for this staff member."""
+        batch = self._batch
+        if batch is None or kind not in batch or staff_id not in batch['staff_ids']:
+            return False
+        return period is None or period == batch['period']
+
+    def _chunked(self, ids: List[int]):
+        for i in range(0, len(ids), self.BATCH_CHUNK_SIZE):
+            yield ids[i:i + self.BATCH_CHUNK_SIZE]
+
+    def _group_by_staff(self, sql: str, staff_ids: List[int], params_before: Tuple = (),
+                        params_after: Tuple = ()) -> Dict[int, List[Dict]]:
+        """Run `sql` (with an {ids} placeholder) per chunk and group rows by staff_id."""
+        db = self._get_db_connection()
+        grouped = {}
+        for chunk in self._chunked(staff_ids):
+            placeholders = ', '.join('?' * len(chunk))
+            rows = db.execute(sql.format(ids=placeholders),
+                              (*params_before, *chunk, *params_after)).fetchall()
+            for row in rows:
+                record = dict(row)
+                grouped.setdefault(record.pop('batch_staff_id'), []).append(record)
+        return grouped
+
+    def _load_payroll_batch(self, staff_ids: List[int], year: int, month: int) -> Dict:
+        """Preload per-staff payroll inputs. Any loader that fails is left out so
+        that data falls back to the per-staff queries."""
+        start_date = f"{year}-{month:02d}-01"
+        end_date = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]}"
+        db = self._get_db_connection()
+
+        batch = {
+            'staff_ids': set(staff_ids),
+            'period': (year, month),
+            'pf_records': [],
+            'shift_definition_by_type': {},
+            'fallbacks': [],  # kinds that could not be preloaded; blocks worker processes
+        }
+
+        def load(kind, loader):
+            try:
+                batch[kind] = loader()
+            except Exception as e:
+                batch['fallbacks'].append(kind)
+                print(f"Batch payroll: falling back to per-staff {kind} queries: {e}")
+
+        def load_staff():
+            staff = {}
+            for chunk in self._chunked(staff_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                sql = self._staff_info_sql(db, f's.id IN ({placeholders})')
+                for row in db.execute(sql, tuple(chunk)).fetchall():
+                    record = dict(row)
+                    staff[record['id']] = record
+            return staff
+
+        load('staff', load_staff)
+        load('attendance', lambda: self._group_by_staff('''
+            SELECT staff_id AS batch_staff_id,
+                   date, status, time_in, time_out,
+                   late_duration_minutes, early_departure_minutes,
+                   shift_type, shift_start_time, shift_end_time,
+                   overtime_in, overtime_out, on_duty_type, on_duty_location,
+                   on_duty_purpose
+            FROM attendance
+            WHERE staff_id IN ({ids}) AND date BETWEEN ? AND ?
+            ORDER BY staff_id, date
+        ''', staff_ids, params_after=(start_date, end_date)))
+        load('leaves', lambda: self._group_by_staff('''
+            SELECT staff_id AS batch_staff_id,
+                   leave_type, start_date, end_date, status, reason
+            FROM leave_applications
+            WHERE staff_id IN ({ids}) AND status = 'approved'
+            AND ((start_date BETWEEN ? AND ?) OR (end_date BETWEEN ? AND ?)
+                 OR (start_date <= ? AND end_date >= ?))
+            ORDER BY staff_id, start_date
+        ''', staff_ids, params_after=(start_date, end_date, start_date, end_date, start_date, end_date)))
+        load('permissions', lambda: self._group_by_staff('''
+            SELECT staff_id AS batch_staff_id,
+                   permission_type, permission_date, start_time, end_time, duration_hours, reason, status
+            FROM permission_applications
+            WHERE staff_id IN ({ids}) AND status = 'approved'
+            AND permission_date BETWEEN ? AND ?
+            ORDER BY staff_id, permission_date
+        ''', staff_ids, params_after=(start_date, end_date)))
+
+        def load_adjustments():
+            self._ensure_salary_adjustments_table(db)
+            grouped = self._group_by_staff('''
+                SELECT staff_id AS batch_staff_id, adjustment_type, amount, reason
+                FROM salary_adjustments
+                WHERE school_id = ? AND staff_id IN ({ids}) AND year = ? AND month = ?
+                ORDER BY staff_id, adjustment_type
+            ''', staff_ids, params_before=(self.school_id or 0,), params_after=(year, month))
+            return {staff_id: self._summarize_manual_adjustments(rows) for staff_id, rows in grouped.items()}
+
+        load('adjustments', load_adjustments)
+
+        def load_shift_history():
+            history_cols = get_table_columns('staff_shift_history', db)
+            if 'school_id' in history_cols and self.school_id is not None:
+                return self._group_by_staff('''
+                    SELECT staff_id AS batch_staff_id, shift_type, effective_from, effective_to
+                    FROM staff_shift_history
+                    WHERE school_id = ? AND staff_id IN ({ids})
+                    ORDER BY staff_id, effective_from ASC
+                ''', staff_ids, params_before=(self.school_id,))
+            return self._group_by_staff('''
+                SELECT staff_id AS batch_staff_id, shift_type, effective_from, effective_to
+                FROM staff_shift_history
+                WHERE staff_id IN ({ids})
+                ORDER BY staff_id, effective_from ASC
+            ''', staff_ids)
+
+        load('shift_history', load_shift_history)
+        batch['shift_defs'] = self._get_shift_definitions_map()
+
+        def load_shift_definitions():
+            shift_types = {row.get('shift_type') for row in batch['staff'].values()}
+            return {
+                shift_type: self._get_active_shift_definition(shift_type, memo=None)
+                for shift_type in shift_types if shift_type
+            }
+
+        if 'staff' in batch:
+            load('shift_definition_by_type', load_shift_definitions)
+        if self.school_id:
+            load('holiday_index', lambda: get_holiday_index(self.school_id, db))
+        return batch
+
+    def _flush_pf_records(self, records: List[Tuple]):
+        """Write PF records collected by a batch run in one executemany per statement."""
+        if not records:
+            return
+        try:
+            db = self._get_db_connection()
+            self._ensure_pf_records_table(db)
+            db.executemany('''
+                DELETE FROM payroll_pf_records
+                WHERE school_id = ? AND staff_id = ? AND year = ? AND month = ?
+            ''', [record[:4] for record in records])
+            db.executemany(self._PF_RECORD_INSERT_SQL, records)
+            db.commit()
+        except Exception as e:
+            print(f"Error persisting payroll PF record: {e}")
+
     def calculate_monthly_salary(self, staff_id: int, year: int, month: int) -> Dict:
         """Calculate comprehensive monthly salary for a staff member"""
         try:
@@ -844,10 +1240,9 @@ class SalaryCalculator:
             'hours_ratio': round(hours_ratio, 4) if standard_monthly_hours > 0 else 1.0
         }
 
-    def _get_staff_info(self, staff_id: int) -> Optional[Dict]:
-        """Get staff information including salary details"""
-        db = self._get_db_connection()
-        staff_columns = [col['name'] for col in db.execute("PRAGMA table_info(staff)").fetchall()]
+    def _staff_info_sql(self, db, id_condition: str) -> str:
+        """SELECT for staff rows with salary fields, filtered by `id_condition` and active status."""
+        staff_columns = get_table_columns('staff', db)
         pf_opt_in_select = 'COALESCE(s.pf_opt_in, 0) AS pf_opt_in' if 'pf_opt_in' in staff_columns else '0 AS pf_opt_in'
         da_select = 'COALESCE(s.dearness_allowance, 0) AS dearness_allowance' if 'dearness_allowance' in staff_columns else '0 AS dearness_allowance'
         active_filter = ''
@@ -856,7 +1251,7 @@ class SalaryCalculator:
         elif 'status' in staff_columns:
             active_filter = " AND LOWER(COALESCE(s.status, 'active')) = 'active'"
 
-        staff = db.execute(f'''
+        return f'''
             SELECT s.*, 
                    sc.name as school_name,
                    s.basic_salary,
@@ -871,8 +1266,16 @@ class SalaryCalculator:
                    s.other_deductions
             FROM staff s
             LEFT JOIN schools sc ON s.school_id = sc.id
-            WHERE s.id = ?{active_filter}
-        ''', (staff_id,)).fetchone()
+            WHERE {id_condition}{active_filter}
+        '''
+
+    def _get_staff_info(self, staff_id: int) -> Optional[Dict]:
+        """Get staff information including salary details"""
+        if self._batch_covers('staff', staff_id):
+            return self._batch['staff'].get(staff_id)
+
+        db = self._get_db_connection()
+        staff = db.execute(self._staff_info_sql(db, 's.id = ?'), (staff_id,)).fetchone()
         
         if staff:
             return dict(staff)
@@ -880,6 +1283,9 @@ class SalaryCalculator:
     
     def _get_monthly_attendance(self, staff_id: int, year: int, month: int) -> List[Dict]:
         """Get detailed attendance data for the month"""
+        if self._batch_covers('attendance', staff_id, (year, month)):
+            return self._batch['attendance'].get(staff_id, [])
+
         start_date = f"{year}-{month:02d}-01"
         end_date = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]}"
 
@@ -899,6 +1305,9 @@ class SalaryCalculator:
     
     def _get_monthly_leaves(self, staff_id: int, year: int, month: int) -> List[Dict]:
         """Get leave applications for the month"""
+        if self._batch_covers('leaves', staff_id, (year, month)):
+            return self._batch['leaves'].get(staff_id, [])
+
         start_date = f"{year}-{month:02d}-01"
         end_date = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]}"
 
@@ -916,6 +1325,9 @@ class SalaryCalculator:
     
     def _get_monthly_permissions(self, staff_id: int, year: int, month: int) -> List[Dict]:
         """Get approved permission applications for the month"""
+        if self._batch_covers('permissions', staff_id, (year, month)):
+            return self._batch['permissions'].get(staff_id, [])
+
         start_date = f"{year}-{month:02d}-01"
         end_date = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]}"
 
@@ -943,6 +1355,12 @@ class SalaryCalculator:
         
         return working_days
     
+    def _get_holiday_index(self):
+        """Holiday index of this school (the batch's copy while a batch runs)."""
+        if self._batch is not None and 'holiday_index' in self._batch:
+            return self._batch['holiday_index']
+        return get_holiday_index(self.school_id, self._get_db_connection())
+
     def _get_working_days_excluding_holidays(self, year: int, month: int, department: Optional[str] = None) -> int:
         """
         Calculate working days in month excluding weekends AND holidays.
@@ -957,6 +1375,14 @@ class SalaryCalculator:
         """
         total_days = calendar.monthrange(year, month)[1]
         working_days = 0
+
+        # One holiday index lookup per month instead of a query per day
+        holiday_index = None
+        if self.school_id:
+            try:
+                holiday_index = self._get_holiday_index()
+            except Exception as e:
+                print(f"Error checking holiday status: {e}")
         
         for day in range(1, total_days + 1):
             date_obj = datetime(year, month, day).date()
@@ -966,7 +1392,10 @@ class SalaryCalculator:
                 continue
                 
             # Exclude holidays (both institution-wide and department-specific)
-            if is_holiday(date_obj, department=department, school_id=self.school_id):
+            if holiday_index is not None:
+                if holiday_index.is_holiday(date_obj, department):
+                    continue
+            elif is_holiday(date_obj, department=department, school_id=self.school_id):
                 continue
                 
             working_days += 1
@@ -985,54 +1414,20 @@ class SalaryCalculator:
         Returns:
             Dict: Holiday details including count and list
         """
-        import json
-        
         total_days = calendar.monthrange(year, month)[1]
         start_date = f"{year}-{month:02d}-01"
         end_date = f"{year}-{month:02d}-{total_days:02d}"
         
-        db = self._get_db_connection()
-        
-        # Get institution-wide holidays
-        institution_holidays = db.execute('''
-            SELECT holiday_name, start_date, end_date, holiday_type
-            FROM holidays
-            WHERE school_id = ?
-            AND holiday_type = 'institution_wide'
-            AND is_active = 1
-            AND (
-                (start_date <= ? AND end_date >= ?) OR
-                (start_date >= ? AND start_date <= ?) OR
-                (end_date >= ? AND end_date <= ?)
-            )
-            ORDER BY start_date
-        ''', (self.school_id, start_date, start_date, start_date, end_date, start_date, end_date)).fetchall()
-        
-        # Get department-specific holidays if department is provided
+        # Served from the per-school holiday index (no query per staff member)
+        institution_holidays = []
         dept_holidays = []
-        if department:
-            dept_holiday_records = db.execute('''
-                SELECT holiday_name, start_date, end_date, holiday_type, departments
-                FROM holidays
-                WHERE school_id = ?
-                AND holiday_type = 'department_specific'
-                AND is_active = 1
-                AND (
-                    (start_date <= ? AND end_date >= ?) OR
-                    (start_date >= ? AND start_date <= ?) OR
-                    (end_date >= ? AND end_date <= ?)
-                )
-                ORDER BY start_date
-            ''', (self.school_id, start_date, start_date, start_date, end_date, start_date, end_date)).fetchall()
-            
-            for holiday in dept_holiday_records:
-                if holiday['departments']:
-                    try:
-                        departments = json.loads(holiday['departments'])
-                        if department in departments:
-                            dept_holidays.append(holiday)
-                    except (json.JSONDecodeError, TypeError):
-                        continue
+        if self.school_id:
+            index = self._get_holiday_index()
+            for holiday in index.holidays_in_range(start_date, end_date, department):
+                if holiday['holiday_type'] == 'institution_wide':
+                    institution_holidays.append(holiday)
+                elif department and holiday['holiday_type'] == 'department_specific':
+                    dept_holidays.append(holiday)
         
         # Count total holiday days in the month
         holiday_days = 0
@@ -1362,10 +1757,13 @@ class SalaryCalculator:
 
     def _get_shift_history(self, staff_id: int) -> List[Dict]:
         """Load shift history records for a staff member ordered by effective date."""
+        if self._batch_covers('shift_history', staff_id):
+            return self._batch['shift_history'].get(staff_id, [])
+
         db = self._get_db_connection()
         try:
             # Support legacy schemas that might not have school_id in history table.
-            history_cols = [col['name'] for col in db.execute("PRAGMA table_info(staff_shift_history)").fetchall()]
+            history_cols = get_table_columns('staff_shift_history', db)
             if 'school_id' in history_cols and self.school_id is not None:
                 rows = db.execute('''
                     SELECT shift_type, effective_from, effective_to
@@ -1386,9 +1784,12 @@ class SalaryCalculator:
 
     def _get_shift_definitions_map(self) -> Dict[str, Dict]:
         """Return active shift definitions indexed by shift_type."""
+        if self._batch is not None and 'shift_defs' in self._batch:
+            return self._batch['shift_defs']
+
         db = self._get_db_connection()
         try:
-            shift_columns = [col['name'] for col in db.execute("PRAGMA table_info(shift_definitions)").fetchall()]
+            shift_columns = get_table_columns('shift_definitions', db)
             if 'school_id' in shift_columns and self.school_id is not None:
                 rows = db.execute('''
                     SELECT shift_type, start_time, end_time, grace_period_minutes
@@ -1498,28 +1899,45 @@ class SalaryCalculator:
             'leave_pay': leave_pay
         }
     
+    def _get_active_shift_definition(self, shift_type: str, memo=False):
+        """Latest active shift_definitions row for a shift type (memoised during a batch)."""
+        if memo is False:
+            memo = self._batch.get('shift_definition_by_type') if self._batch is not None else None
+        if memo is not None and shift_type in memo:
+            return memo[shift_type]
+
+        shift_def = self._get_db_connection().execute('''
+            SELECT start_time, end_time, grace_period_minutes
+            FROM shift_definitions
+            WHERE shift_type = ? AND is_active = 1
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (shift_type,)).fetchone()
+        shift_def = dict(shift_def) if shift_def else None
+
+        if memo is not None:
+            memo[shift_type] = shift_def
+        return shift_def
+
     def _get_staff_shift_info(self, staff_id: int) -> Optional[Dict]:
         """Get shift information for staff member"""
         try:
-            db = self._get_db_connection()
-            # Try to get shift info from staff table only (shifts table may not exist)
-            staff = db.execute('''
-                SELECT shift_type
-                FROM staff
-                WHERE id = ?
-            ''', (staff_id,)).fetchone()
+            staff = None
+            if self._batch_covers('staff', staff_id):
+                staff = self._batch['staff'].get(staff_id)
+            if not staff or 'shift_type' not in staff:
+                # Try to get shift info from staff table only (shifts table may not exist)
+                staff = self._get_db_connection().execute('''
+                    SELECT shift_type
+                    FROM staff
+                    WHERE id = ?
+                ''', (staff_id,)).fetchone()
 
             if staff and staff['shift_type']:
                 shift_type = staff['shift_type']
                 
                 # Get actual shift definition from database
-                shift_def = db.execute('''
-                    SELECT start_time, end_time, grace_period_minutes
-                    FROM shift_definitions
-                    WHERE shift_type = ? AND is_active = 1
-                    ORDER BY id DESC
-                    LIMIT 1
-                ''', (shift_type,)).fetchone()
+                shift_def = self._get_active_shift_definition(shift_type)
                 
                 if shift_def:
                     return {
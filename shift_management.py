@@ -12,7 +12,7 @@ This module handles the core logic for:
 import datetime
 from typing import Dict, Tuple, Optional
 from flask import has_request_context, session
-from database import get_db
+from database import get_db, get_shift_definitions, invalidate_shift_registry, refresh_attendance_daily_summary
 
 
 class ShiftManager:
@@ -32,76 +32,15 @@ class ShiftManager:
         return None
     
     def _load_shift_definitions(self) -> Dict:
-        """Load shift definitions from database"""
-        db = get_db()
-        
-        # Always prioritize institution timings for 'general' shift
-        shift_dict = {}
-
-        # First, ensure 'general' shift uses current institution timings
-        try:
-            from database import get_institution_timings
-            timings = get_institution_timings()
-
-            shift_dict['general'] = {
-                'start_time': timings['checkin_time'],
-                'end_time': timings['checkout_time'],
-                'grace_period_minutes': 0,  # Strict timing
-                'description': f"Institution Shift ({'Custom' if timings['is_custom'] else 'Default'})"
-            }
-
-            print(f"✅ General shift synchronized with institution timings: {timings['checkin_time']} - {timings['checkout_time']}")
-
-        except Exception as e:
-            print(f"Could not load institution timings: {e}")
-            # Fallback for general shift
-            shift_dict['general'] = {
-                'start_time': datetime.time(9, 0),
-                'end_time': datetime.time(17, 0),
-                'grace_period_minutes': 0,
-                'description': 'Default Hardcoded Shift (Strict timing)'
-            }
-
-        # Then try to load additional shifts from shift_definitions table
-        try:
-            shift_columns = {col['name'] for col in db.execute("PRAGMA table_info(shift_definitions)").fetchall()}
-            has_school_id = 'school_id' in shift_columns
-
-            shift_query = '''
-                SELECT shift_type, start_time, end_time, grace_period_minutes, description
-                FROM shift_definitions
-                WHERE is_active = 1 AND shift_type != 'general'
-            '''
-            params = []
-            if has_school_id and self.school_id is not None:
-                shift_query = '''
-                    SELECT shift_type, start_time, end_time, grace_period_minutes, description
-                    FROM shift_definitions
-                    WHERE school_id = ? AND is_active = 1 AND shift_type != 'general'
-                '''
-                params = [self.school_id]
-
-            shifts = db.execute(shift_query, params).fetchall()
-
-            for shift in shifts:
-                shift_dict[shift['shift_type']] = {
-                    'start_time': datetime.datetime.strptime(shift['start_time'], '%H:%M:%S').time(),
-                    'end_time': datetime.datetime.strptime(shift['end_time'], '%H:%M:%S').time(),
-                    'grace_period_minutes': shift['grace_period_minutes'],
-                    'description': shift['description']
-                }
-
-            if len(shifts) > 0:
-                print(f"✅ Loaded {len(shifts)} additional shifts from database")
-
-        except Exception as e:
-            print(f"Could not load additional shift definitions: {e}")
-
-        return shift_dict
+        """Load shift definitions from the per-school shift registry"""
+        # The registry parses shift_definitions once per school and version;
+        # each manager gets its own copy so in-memory changes stay local.
+        return get_shift_definitions(self.school_id)
     
     def reload_shift_definitions(self):
         """Reload shift definitions - useful when institution timings change"""
         print("🔄 Reloading shift definitions from institution timings...")
+        invalidate_shift_registry(self.school_id)
         self.shift_definitions = self._load_shift_definitions()
         print("✅ Shift definitions reloaded with latest institution timings")
 
@@ -252,6 +191,7 @@ class ShiftManager:
     
     def refresh_shift_definitions(self):
         """Refresh shift definitions from database"""
+        invalidate_shift_registry(self.school_id)
         self.shift_definitions = self._load_shift_definitions()
 
 
@@ -359,6 +299,11 @@ class AttendanceRegularizationManager:
                     SET regularization_status = ?
                     WHERE id = ?
                 ''', (decision, request_info['attendance_id']))
+                attendance = db.execute('SELECT date FROM attendance WHERE id = ?',
+                                        (request_info['attendance_id'],)).fetchone()
+                if attendance:
+                    refresh_attendance_daily_summary(request_info['school_id'], [attendance['date']], db,
+                                                     commit=False)
                 
                 # Create notification for staff
                 NotificationManager.create_notification(
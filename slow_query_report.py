@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Summarize the slow query log written when QUERY_PROFILING=1.
+
+Groups the JSON lines of SLOW_QUERY_LOG (and its rotated .1, .2, ... files)
+by statement or by endpoint and lists the groups that spent the most time.
+
+Usage:
+    python slow_query_report.py [--log PATH] [--by statement|endpoint] [--top N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from database import SLOW_QUERY_LOG
+
+
+def read_entries(path):
+    """Entries from the log and its rotated backups, oldest first"""
+    backups = [name for name in glob.glob(path + '.*') if name.rsplit('.', 1)[1].isdigit()]
+    backups.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    entries = []
+    for name in backups + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def summarize(entries, by='statement'):
+    """Groups sorted by total time: {key, count, total_ms, max_ms, endpoints|statements}"""
+    groups = {}
+    for entry in entries:
+        endpoint = entry.get('endpoint') or '<no endpoint>'
+        key, other = (entry.get('sql'), endpoint) if by == 'statement' else (endpoint, entry.get('sql'))
+        group = groups.setdefault(key, {'key': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'related': set()})
+        group['count'] += 1
+        group['total_ms'] += entry.get('ms') or 0
+        group['max_ms'] = max(group['max_ms'], entry.get('ms') or 0)
+        group['related'].add(other)
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the slow query log')
+    parser.add_argument('--log', default=SLOW_QUERY_LOG, help=f'Log file (default {SLOW_QUERY_LOG})')
+    parser.add_argument('--by', choices=('statement', 'endpoint'), default='statement', help='Group by')
+    parser.add_argument('--top', type=int, default=15, help='Groups to list (default 15)')
+    args = parser.parse_args()
+
+    entries = read_entries(args.log)
+    if not entries:
+        print(f'No slow queries logged in {args.log}')
+        return 0
+
+    print(f'{len(entries)} slow statement(s) in {args.log}\n')
+    for group in summarize(entries, args.by)[:args.top]:
+        print(f"{group['total_ms']:10.1f}ms total  {group['count']:5d}x  max {group['max_ms']:.1f}ms")
+        print(f"    {group['key']}")
+        related = sorted(str(item)[:80] for item in group['related'])
+        label = 'endpoints' if args.by == 'statement' else 'statements'
+        print(f"    {label}: {', '.join(related[:5])}{' ...' if len(related) > 5 else ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,14 +12,13 @@ This module provides advanced staff management features including:
 """
 
 import sqlite3
-import pandas as pd
 from datetime import datetime, timedelta
 import os
 from werkzeug.utils import secure_filename
-from PIL import Image
 import io
 import base64
-from database import get_db
+from database import get_db, get_table_columns
+from photo_store import THUMBNAIL_SIZES, encode_photo_data, get_photo_store, staff_photo_url
 from flask import current_app
 import csv
 from typing import List, Dict, Optional, Tuple
@@ -36,6 +35,8 @@ class StaffManager:
     
     def bulk_import_staff(self, file_path: str, school_id: int) -> Dict:
         """Import staff from Excel/CSV file"""
+        import pandas as pd  # heavy; keep it out of app startup
+
         try:
             # Read file based on extension
             if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
@@ -92,8 +93,7 @@ class StaffManager:
                     return 0.0
             
             db = get_db()
-            columns = db.execute("PRAGMA table_info(staff)").fetchall()
-            column_names = {col['name'] for col in columns}
+            column_names = get_table_columns('staff', db)
             imported_count = 0
             errors = []
             
@@ -332,10 +332,19 @@ class StaffManager:
                 pass  # Ignore invalid limit values
         
         staff_members = db.execute(query, params).fetchall()
-        return [dict(staff) for staff in staff_members]
+        results = []
+        for staff in staff_members:
+            staff = dict(staff)
+            # Photos are served from the photo store, not embedded in the list
+            staff.pop('photo_data', None)
+            staff['photo_thumb_url'] = staff_photo_url(staff.get('photo_hash'), THUMBNAIL_SIZES[0])
+            results.append(staff)
+        return results
     
     def manage_staff_photo(self, staff_id: int, photo_file) -> Dict:
         """Upload and manage staff photos"""
+        from PIL import Image
+
         try:
             if not photo_file:
                 return {'success': False, 'error': 'No photo file provided'}
@@ -372,20 +381,20 @@ class StaffManager:
             image.save(img_byte_arr, format='JPEG', quality=85)
             img_byte_arr = img_byte_arr.getvalue()
             
-            # Encode to base64
-            photo_data = base64.b64encode(img_byte_arr).decode('utf-8')
-            
-            # Save to database
+            # Save to the photo store and point the staff row at it; photo_data
+            # keeps a copy for instances that don't share the store
+            photo_hash = get_photo_store().put(img_byte_arr)
             db = get_db()
             db.execute('''
-                UPDATE staff SET photo_data = ? WHERE id = ?
-            ''', (photo_data, staff_id))
+                UPDATE staff SET photo_hash = ?, photo_data = ? WHERE id = ?
+            ''', (photo_hash, encode_photo_data(img_byte_arr), staff_id))
             db.commit()
             
             return {
                 'success': True,
                 'message': 'Photo uploaded successfully',
-                'photo_data': f"data:image/jpeg;base64,{photo_data}"
+                'photo_url': staff_photo_url(photo_hash),
+                'photo_thumb_url': staff_photo_url(photo_hash, THUMBNAIL_SIZES[-1])
             }
             
         except Exception as e:
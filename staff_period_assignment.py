@@ -6,6 +6,7 @@ Handles individual staff member period assignments with validation and conflict
 import sqlite3
 from datetime import datetime, date
 from database import get_db
+from timetable_occupancy import bump_timetable_version, note_assignment_added, note_assignment_removed
 
 
 class StaffPeriodAssignment:
@@ -97,9 +98,11 @@ class StaffPeriodAssignment:
                 datetime.now(),
                 datetime.now()
             ))
+            bump_timetable_version(school_id, db)
             db.commit()
 
             assignment_id = cursor.lastrowid
+            note_assignment_added(school_id, 'assignments', assignment_id, staff_id, day_of_week, period_number)
             
             return {
                 'success': True,
@@ -225,7 +228,9 @@ class StaffPeriodAssignment:
                 DELETE FROM timetable_assignments
                 WHERE id = ? AND school_id = ?
             ''', (assignment_id, school_id))
+            bump_timetable_version(school_id, db)
             db.commit()
+            note_assignment_removed(school_id, 'assignments', assignment_id)
 
             days = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
             day_name = days[assignment[4]]
@@ -2127,33 +2127,106 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     });
 
-    // Real-time attendance updates
+    // Real-time attendance updates: the server pushes punches as they are
+    // saved (Server-Sent Events); browsers without EventSource poll instead
     let attendanceUpdateInterval;
+    let attendanceStream;
+    let attendanceSummary = null;
 
     function startRealtimeUpdates() {
-        // Update every 10 seconds
-        attendanceUpdateInterval = setInterval(updateAttendanceTable, 10000);
-        console.log('📡 Started real-time attendance updates');
+        if (!window.EventSource) {
+            // Update every 10 seconds
+            attendanceUpdateInterval = setInterval(pollAttendanceTable, 10000);
+            console.log('📡 Started real-time attendance updates');
+            return;
+        }
+
+        attendanceStream = new EventSource('/api/attendance/stream');
+        // Load the full table on every (re)connect, then apply pushed punches
+        attendanceStream.onopen = updateAttendanceTable;
+        attendanceStream.addEventListener('punch', event => applyPunchEvent(JSON.parse(event.data)));
+        // The feed only carries punches saved by the server process it is
+        // connected to; reload now and then to pick up the others
+        attendanceUpdateInterval = setInterval(updateAttendanceTable, 120000);
+        console.log('📡 Subscribed to live attendance feed');
     }
 
     function stopRealtimeUpdates() {
+        if (attendanceStream) {
+            attendanceStream.close();
+            attendanceStream = null;
+        }
         if (attendanceUpdateInterval) {
             clearInterval(attendanceUpdateInterval);
+            attendanceUpdateInterval = null;
             console.log('⏹️ Stopped real-time attendance updates');
         }
     }
 
-    function updateAttendanceTable() {
+    function pollAttendanceTable() {
         // First, poll for new device verifications and process them
-        pollDeviceForNewVerifications()
-            .then(() => {
-                // Then update the attendance display
-                return fetch('/get_realtime_attendance');
-            })
+        pollDeviceForNewVerifications().then(updateAttendanceTable);
+    }
+
+    // Time cells hold an icon and the time inside a coloured span; replace
+    // only the time so the icon survives
+    const TIME_CELL_CLASSES = { 'time-in': 'text-success', 'time-out': 'text-info' };
+
+    function setTimeCell(cell, value) {
+        const span = cell.querySelector('span');
+        if (!span) {
+            cell.textContent = value || '--:--:--';
+            return;
+        }
+        const icon = span.querySelector('i');
+        const activeClass = Object.keys(TIME_CELL_CLASSES).find(name => cell.classList.contains(name));
+        span.className = value && activeClass ? TIME_CELL_CLASSES[activeClass] : 'text-muted';
+        span.textContent = ` ${value || '--:--:--'}`;
+        if (icon) span.prepend(icon);
+    }
+
+    function applyPunchEvent(punch) {
+        if (!punch.today) return;
+
+        const row = document.querySelector(`#attendanceTableBody tr[data-staff-id="${punch.staff_id}"]`);
+        const cellClass = {
+            'check-in': 'time-in',
+            'check-out': 'time-out',
+            'check-out-no-checkin': 'time-out',
+            'overtime-in': 'overtime-in',
+            'overtime-out': 'overtime-out'
+        }[punch.action];
+        if (row && cellClass) {
+            const cell = row.querySelector(`.${cellClass}`);
+            if (cell) setTimeCell(cell, punch.time_display);
+            const statusCell = row.querySelector('.status');
+            if (statusCell && punch.action === 'check-in') {
+                statusCell.innerHTML = getStatusBadge(punch.status);
+            }
+            row.style.backgroundColor = '#d4edda';
+            row.style.transition = 'background-color 0.3s ease';
+            setTimeout(() => {
+                row.style.backgroundColor = '';
+            }, 3000);
+        }
+
+        if (attendanceSummary && punch.delta) {
+            Object.entries(punch.delta).forEach(([status, change]) => {
+                attendanceSummary[status] = (attendanceSummary[status] || 0) + change;
+            });
+            updateAttendanceSummary(attendanceSummary);
+        }
+
+        showNotification(`${punch.full_name}: ${punch.action} at ${punch.time_display}`, 'success');
+    }
+
+    function updateAttendanceTable() {
+        return fetch('/get_realtime_attendance')
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
                     updateAttendanceDisplay(data.attendance_data);
+                    attendanceSummary = data.summary;
                     updateAttendanceSummary(data.summary);
 
                     // Update last refresh time
@@ -2207,49 +2280,14 @@ document.addEventListener('DOMContentLoaded', function () {
                 const overtimeOutCell = row.querySelector('.overtime-out');
                 const statusCell = row.querySelector('.status');
 
-                if (timeInCell) timeInCell.textContent = attendance.time_in || '--:--:--';
-                if (timeOutCell) timeOutCell.textContent = attendance.time_out || '--:--:--';
-                if (overtimeInCell) overtimeInCell.textContent = attendance.overtime_in || '--:--:--';
-                if (overtimeOutCell) overtimeOutCell.textContent = attendance.overtime_out || '--:--:--';
+                if (timeInCell) setTimeCell(timeInCell, attendance.time_in);
+                if (timeOutCell) setTimeCell(timeOutCell, attendance.time_out);
+                if (overtimeInCell) setTimeCell(overtimeInCell, attendance.overtime_in);
+                if (overtimeOutCell) setTimeCell(overtimeOutCell, attendance.overtime_out);
 
                 // Update status badge
                 if (statusCell) {
-                    let badgeClass = 'bg-secondary';
-                    let statusText = 'Not Marked';
-
-                    switch (attendance.status) {
-                        case 'Holiday':
-                            badgeClass = 'bg-dark text-white';
-                            statusText = '<i class="bi bi-calendar-event"></i> Holiday';
-                            break;
-                        case 'present':
-                            badgeClass = 'bg-success';
-                            statusText = 'Present';
-                            break;
-                        case 'late':
-                            badgeClass = 'bg-warning';
-                            statusText = 'Late';
-                            break;
-                        case 'absent':
-                            badgeClass = 'bg-danger';
-                            statusText = 'Absent';
-                            break;
-                        case 'leave':
-                        case 'On Leave':
-                            badgeClass = 'bg-info';
-                            statusText = 'On Leave';
-                            break;
-                        case 'On Duty':
-                            badgeClass = 'bg-primary';
-                            statusText = 'On Duty';
-                            break;
-                        case 'On Permission':
-                            badgeClass = 'bg-warning';
-                            statusText = 'On Permission';
-                            break;
-                    }
-
-                    statusCell.innerHTML = `<span class="badge ${badgeClass}">${statusText}</span>`;
+                    statusCell.innerHTML = getStatusBadge(attendance.status);
                 }
 
                 // Add visual feedback for recent updates
@@ -2288,6 +2326,45 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    function getStatusBadge(status) {
+        let badgeClass = 'bg-secondary';
+        let statusText = 'Not Marked';
+
+        switch (status) {
+            case 'Holiday':
+                badgeClass = 'bg-dark text-white';
+                statusText = '<i class="bi bi-calendar-event"></i> Holiday';
+                break;
+            case 'present':
+                badgeClass = 'bg-success';
+                statusText = 'Present';
+                break;
+            case 'late':
+                badgeClass = 'bg-warning';
+                statusText = 'Late';
+                break;
+            case 'absent':
+                badgeClass = 'bg-danger';
+                statusText = 'Absent';
+                break;
+            case 'leave':
+            case 'On Leave':
+                badgeClass = 'bg-info';
+                statusText = 'On Leave';
+                break;
+            case 'On Duty':
+                badgeClass = 'bg-primary';
+                statusText = 'On Duty';
+                break;
+            case 'On Permission':
+                badgeClass = 'bg-warning';
+                statusText = 'On Permission';
+                break;
+        }
+
+        return `<span class="badge ${badgeClass}">${statusText}</span>`;
+    }
+
     function updateAttendanceSummary(summary) {
         // Update summary values in header only (not in modals)
         const headerStatsSection = document.querySelector('.results-stats');
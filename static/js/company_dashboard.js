@@ -327,7 +327,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 return;
             }
 
-            fetch(`/export_company_report?start_date=${startDate}&end_date=${endDate}`)
+            fetchReport(`/export_company_report?start_date=${startDate}&end_date=${endDate}`)
                 .then(response => {
                     if (!response.ok) {
                         throw new Error('Network response was not ok');
@@ -0,0 +1,22 @@
+// Export routes answer 202 with a report job when the report isn't ready
+// within the server's wait; fetchReport() polls the job and then fetches its
+// file, so callers get the report's response either way.
+function fetchReport(url, options) {
+    return fetch(url, options).then(response => {
+        if (response.status !== 202) return response;
+        return response.json().then(data => waitForReport(data.status_url, data.download_url));
+    });
+}
+
+function waitForReport(statusUrl, downloadUrl, delay = 2000) {
+    return new Promise(resolve => setTimeout(resolve, delay))
+        .then(() => fetch(statusUrl))
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) throw new Error(data.error || 'Report job not found');
+            if (data.job.status === 'queued' || data.job.status === 'running') {
+                return waitForReport(statusUrl, downloadUrl, delay);
+            }
+            return fetch(downloadUrl);
+        });
+}
@@ -552,7 +552,7 @@ function viewSalaryDetails(staffId) {
     formData.append('year', year);
     formData.append('month', month);
     
-    fetch('/generate_salary_report', {
+    fetchReport('/generate_salary_report', {
         method: 'POST',
         body: formData,
         headers: {
@@ -986,7 +986,7 @@ function exportSalaryResults(format = null) {
     }
 
     // Make the export request
-    fetch('/export_salary_calculation_results', {
+    fetchReport('/export_salary_calculation_results', {
         method: 'POST',
         body: formData,
         headers: {
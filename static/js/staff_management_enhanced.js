@@ -137,7 +137,9 @@ function renderStaffTable(staffData) {
                        value="${staff.id}" onchange="updateSelectedCount()">
             </td>
             <td>
-                ${staff.photo_data ? 
+                ${staff.photo_thumb_url ?
+                    `<img src="${staff.photo_thumb_url}" class="staff-photo" alt="Photo" loading="lazy">` :
+                  staff.photo_data ?
                     `<img src="data:image/jpeg;base64,${staff.photo_data}" class="staff-photo" alt="Photo">` :
                     `<div class="staff-photo bg-secondary d-flex align-items-center justify-content-center text-white">
                         <i class="bi bi-person"></i>
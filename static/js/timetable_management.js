@@ -2213,13 +2213,15 @@ function handleStaffPeriodBulkUpload(e) {
 
             resultBox.className = errors.length ? 'alert alert-warning' : 'alert alert-success';
             resultBox.innerHTML = `
-                <div><strong>Bulk upload completed.</strong></div>
+                <div><strong>${data.dry_run ? 'Dry run completed, nothing was saved.' : 'Bulk upload completed.'}</strong></div>
                 <div>Created: ${createdCount} | Updated: ${updatedCount} | Skipped: ${skippedCount} | Total rows: ${totalRows}</div>
                 ${errorsHtml}
             `;
             resultBox.classList.remove('d-none');
 
-            if (createdCount > 0 || updatedCount > 0) {
+            if (data.dry_run) {
+                showAlert(`Dry run: ${createdCount} would be created, ${updatedCount} updated, ${skippedCount} skipped.`, 'info');
+            } else if (createdCount > 0 || updatedCount > 0) {
                 showAlert(`Bulk upload complete: ${createdCount} created, ${updatedCount} updated.`, 'success');
                 const selectedStaffId = document.getElementById('staffSelectAssign')?.value;
                 if (selectedStaffId) {
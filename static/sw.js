@@ -1,5 +1,8 @@
 // Service Worker for VishnoRex Staff Management System
 const CACHE_NAME = 'vishnorex-v2';
+const TIMETABLE_CACHE = 'vishnorex-timetable-v1';
+// Weekly timetable grids: served with an ETag, revalidated on every load
+const TIMETABLE_URL = /^\/api\/(timetable\/staff$|timetable\/assignments\/|hierarchical-timetable\/(staff-schedule|section-schedule|grid)\/)/;
 const urlsToCache = [
   '/',
   '/static/images/applogo.png',
@@ -26,6 +29,22 @@ self.addEventListener('install', event => {
 
 // Fetch from cache or network
 self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+  if (event.request.method === 'GET' && url.origin === self.location.origin && TIMETABLE_URL.test(url.pathname)) {
+    // Revalidate with the server (a 304 when unchanged); keep the last copy for offline use
+    event.respondWith(
+      fetch(event.request, { cache: 'no-cache' })
+        .then(response => {
+          if (response.ok) {
+            const copy = response.clone();
+            caches.open(TIMETABLE_CACHE).then(cache => cache.put(event.request, copy));
+          }
+          return response;
+        })
+        .catch(() => caches.match(event.request))
+    );
+    return;
+  }
   event.respondWith(
     caches.match(event.request)
       .then(response => {
@@ -41,7 +60,7 @@ self.addEventListener('fetch', event => {
 
 // Update Service Worker
 self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
+  const cacheWhitelist = [CACHE_NAME, TIMETABLE_CACHE];
   event.waitUntil(
     caches.keys().then(cacheNames => {
       return Promise.all(
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Attendance daily summary - Test Suite
+Checks that attendance_daily_summary matches a full re-aggregation of the
+attendance table after punches, leave approvals and rebuilds, and that the
+dashboard and chart queries read their counts from it (in-memory SQLite)
+"""
+
+import sys
+import datetime
+
+import attendance_advanced
+import data_visualization
+import reporting_dashboard
+import test_helpers
+from database import (refresh_attendance_daily_summary, refresh_attendance_daily_summary_range,
+                      rebuild_attendance_daily_summary, get_attendance_daily_summary)
+from attendance_advanced import AdvancedAttendanceManager
+from data_visualization import DataVisualization
+from reporting_dashboard import ReportingDashboard
+from test_helpers import memory_database
+from zk_biometric import UnifiedAttendanceProcessor
+
+
+SCHEMA = '''
+CREATE TABLE biometric_devices (
+    id INTEGER PRIMARY KEY, school_id INTEGER, device_name TEXT, connection_type TEXT, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, department TEXT, shift_type TEXT
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE, time_in TEXT, time_out TEXT,
+    status TEXT, late_duration_minutes INTEGER DEFAULT 0, early_departure_minutes INTEGER DEFAULT 0,
+    shift_type TEXT, shift_start_time TEXT, shift_end_time TEXT, overtime_in TEXT, overtime_out TEXT,
+    overtime_hours REAL, UNIQUE(staff_id, date)
+);
+CREATE TABLE leave_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, start_date DATE, end_date DATE,
+    status TEXT, withdrawn INTEGER DEFAULT 0
+);
+CREATE TABLE biometric_verifications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, verification_type TEXT,
+    verification_time TIMESTAMP, device_ip TEXT, biometric_method TEXT, verification_status TEXT
+);
+CREATE TABLE shift_definitions (
+    id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+    grace_period_minutes INTEGER, description TEXT, is_active INTEGER DEFAULT 1
+);
+'''
+
+STAFF = [
+    (101, 7, 'S1', 'Asha', 'Science'), (102, 7, 'S2', 'Ravi', 'Science'),
+    (103, 7, 'S3', 'Meena', 'Maths'), (104, 7, 'S4', 'John', None), (201, 8, 'T1', 'Other', 'Science'),
+]
+
+ATTENDANCE = [
+    (101, 7, '2025-03-03', 'present', '18:00:00', 1.5), (102, 7, '2025-03-03', 'late', None, None),
+    (103, 7, '2025-03-03', 'absent', None, None), (104, 7, '2025-03-03', 'on_duty', None, None),
+    (101, 7, '2025-03-04', 'late', None, None), (102, 7, '2025-03-04', 'leave', None, None),
+    (103, 7, '2025-03-04', 'OD', None, None), (201, 8, '2025-03-03', 'present', None, None),
+]
+
+
+def build_database():
+    conn = memory_database(SCHEMA)
+    conn.execute("INSERT INTO biometric_devices VALUES (1, 7, 'Gate', 'ADMS', 1)")
+    conn.execute("INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, grace_period_minutes) "
+                 "VALUES (7, 'general', '09:00:00', '17:00:00', 10)")
+    conn.executemany('INSERT INTO staff VALUES (?, ?, ?, ?, ?, NULL)', STAFF)
+    conn.executemany('INSERT INTO attendance (staff_id, school_id, date, status, overtime_in, overtime_hours) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', ATTENDANCE)
+    conn.commit()
+    return conn
+
+
+def run_with(conn, func, *args, **kwargs):
+    return test_helpers.run_with(conn, func, *args,
+                                 modules=(data_visualization, reporting_dashboard, attendance_advanced), **kwargs)
+
+def summary_rows(db):
+    return [tuple(row) for row in db.execute('''
+        SELECT school_id, date, department, record_count, present_count, late_count, absent_count,
+               leave_count, on_duty_count, overtime_count, overtime_hours
+        FROM attendance_daily_summary ORDER BY school_id, date, department
+    ''').fetchall()]
+
+
+def rebuilt_rows(db):
+    """Summary rows from a from-scratch rebuild on a copy of the database"""
+    copy = memory_database()
+    db.backup(copy)
+    copy.execute('DELETE FROM attendance_daily_summary')
+    run_with(copy, rebuild_attendance_daily_summary, db=copy)
+    return summary_rows(copy)
+
+
+def test_refresh_counts_per_department():
+    """Touched days are re-aggregated per department, leave includes approved applications"""
+    db = build_database()
+    db.execute("INSERT INTO leave_applications (staff_id, school_id, start_date, end_date, status) "
+               "VALUES (103, 7, '2025-03-02', '2025-03-04', 'approved'), (102, 7, '2025-03-04', '2025-03-04', 'approved'),"
+               " (101, 7, '2025-03-03', '2025-03-03', 'pending')")
+    assert run_with(db, refresh_attendance_daily_summary, 7, ['2025-03-03', datetime.date(2025, 3, 4)], db)
+
+    assert summary_rows(db) == [
+        (7, '2025-03-03', '', 1, 1, 0, 0, 0, 1, 0, 0.0),
+        (7, '2025-03-03', 'Maths', 1, 0, 0, 1, 1, 0, 0, 0.0),
+        (7, '2025-03-03', 'Science', 2, 2, 1, 0, 0, 0, 1, 1.5),
+        (7, '2025-03-04', 'Maths', 1, 0, 0, 0, 1, 1, 0, 0.0),
+        (7, '2025-03-04', 'Science', 2, 1, 1, 0, 1, 0, 0, 0.0),
+    ], summary_rows(db)
+    print("✓ refresh counts per department")
+
+
+def test_rebuild_and_read():
+    """Rebuild backfills every school, drops stale days and reads sum over departments"""
+    db = build_database()
+    assert run_with(db, rebuild_attendance_daily_summary, db=db) == 3
+
+    days = run_with(db, get_attendance_daily_summary, 7, '2025-03-01', datetime.date(2025, 3, 31), db=db)
+    assert [(d['date'], d['record_count'], d['present_count'], d['late_count'], d['absent_count'],
+             d['leave_count'], d['on_duty_count']) for d in days] == [
+        ('2025-03-03', 4, 3, 1, 1, 0, 1), ('2025-03-04', 3, 1, 1, 0, 1, 1)]
+    assert days[0]['overtime_hours'] == 1.5 and days[0]['overtime_count'] == 1
+    science = run_with(db, get_attendance_daily_summary, 7, '2025-03-03', '2025-03-03', 'Science', db=db)
+    assert science[0]['record_count'] == 2
+
+    db.execute("DELETE FROM attendance WHERE date = '2025-03-04'")
+    assert run_with(db, rebuild_attendance_daily_summary, 7, db=db) == 2
+    assert [d['date'] for d in run_with(db, get_attendance_daily_summary, 7, '2025-03-01', '2025-03-31', db=db)] \
+        == ['2025-03-03']
+    print("✓ rebuild and read")
+
+
+def test_writers_keep_summary_current():
+    """Single and batch punches and leave approvals leave the same rows as a rebuild"""
+    processor = UnifiedAttendanceProcessor()
+    db = build_database()
+    run_with(db, rebuild_attendance_daily_summary, db=db)
+
+    def at(day, clock):
+        return datetime.datetime.strptime(f'{day} {clock}', '%Y-%m-%d %H:%M:%S')
+
+    run_with(db, processor.process_attendance_punch, 1, 'S3', at('2025-03-05', '08:55:00'), 0, 'face')
+    run_with(db, processor.process_batch_punches, 1, [
+        {'user_id': 'S1', 'timestamp': at('2025-03-05', '09:30:00'), 'punch_code': 0},
+        {'user_id': 'S4', 'timestamp': at('2025-03-06', '08:50:00'), 'punch_code': 0},
+        {'user_id': 'S1', 'timestamp': at('2025-03-05', '17:10:00'), 'punch_code': 1},
+        {'user_id': 'S9', 'timestamp': at('2025-03-05', '09:45:00'), 'punch_code': 0},
+    ])
+    db.execute("INSERT INTO leave_applications (staff_id, school_id, start_date, end_date, status) "
+               "VALUES (102, 7, '2025-03-05', '2025-03-07', 'approved')")
+    run_with(db, refresh_attendance_daily_summary_range, 7, '2025-03-05', '2025-03-07', db)
+
+    assert summary_rows(db) == rebuilt_rows(db)
+    day = run_with(db, get_attendance_daily_summary, 7, '2025-03-05', '2025-03-05', db=db)[0]
+    assert (day['present_count'], day['late_count'], day['leave_count']) == (2, 1, 1), day
+    print("✓ writers keep summary current")
+
+
+def test_manual_writers_keep_summary_current():
+    """Overtime punches, regularization approvals and automatic leave marking refresh their days"""
+    db = build_database()
+    db.executescript('''
+        ALTER TABLE attendance ADD COLUMN work_hours REAL;
+        ALTER TABLE attendance ADD COLUMN notes TEXT;
+        ALTER TABLE attendance ADD COLUMN regularization_status TEXT;
+        ALTER TABLE leave_applications ADD COLUMN leave_type TEXT;
+        CREATE TABLE attendance_regularization_requests (
+            id INTEGER PRIMARY KEY, attendance_id INTEGER, staff_id INTEGER, school_id INTEGER,
+            request_type TEXT, expected_time TEXT, status TEXT DEFAULT 'pending', processed_by INTEGER,
+            processed_at TIMESTAMP, admin_reason TEXT
+        );
+    ''')
+    run_with(db, rebuild_attendance_daily_summary, db=db)
+    manager = run_with(db, AdvancedAttendanceManager)
+
+    def at(day, clock):
+        return datetime.datetime.strptime(f'{day} {clock}', '%Y-%m-%d %H:%M:%S')
+
+    run_with(db, manager.process_attendance_with_overtime, 103, 7, 'check-in', at('2025-03-05', '09:20:00'))
+    run_with(db, manager.process_attendance_with_overtime, 101, 7, 'check-out', at('2025-03-05', '17:00:00'))
+    assert summary_rows(db) == rebuilt_rows(db)
+
+    late = db.execute("SELECT id FROM attendance WHERE staff_id = 101 AND date = '2025-03-04'").fetchone()['id']
+    db.execute("INSERT INTO attendance_regularization_requests (id, attendance_id, staff_id, school_id, request_type, "
+               "expected_time) VALUES (1, ?, 101, 7, 'late_arrival', '09:00:00')", (late,))
+    assert run_with(db, manager.process_regularization_request, 1, 1, 'approve', 'Traffic')['success']
+    assert summary_rows(db) == rebuilt_rows(db)
+
+    db.execute("INSERT INTO leave_applications (staff_id, school_id, start_date, end_date, status, leave_type) "
+               "VALUES (104, 7, '2025-03-06', '2025-03-06', 'approved', 'casual')")
+    assert run_with(db, manager.auto_mark_leave_attendance, 7, '2025-03-06')['marked_count'] == 1
+    assert summary_rows(db) == rebuilt_rows(db)
+    day = run_with(db, get_attendance_daily_summary, 7, '2025-03-04', '2025-03-04', db=db)[0]
+    assert (day['present_count'], day['late_count']) == (1, 0), day
+    print("✓ manual writers keep summary current")
+
+
+def test_dashboards_read_summary():
+    """Charts and the summary dashboard take their counts from the summary table"""
+    db = build_database()
+    run_with(db, rebuild_attendance_daily_summary, db=db)
+    # Attendance changed behind the summary's back is not seen until refreshed
+    db.execute("UPDATE attendance SET status = 'absent' WHERE date = '2025-03-03'")
+
+    chart = run_with(db, DataVisualization().generate_daily_trends_chart, 7, '2025-03-01', '2025-03-31')
+    assert chart['labels'] == ['2025-03-03', '2025-03-04']
+    assert [dataset['data'] for dataset in chart['datasets']] == [[3, 1], [1, 0], [1, 1]]
+
+    heatmap = run_with(db, DataVisualization().generate_monthly_heatmap_data, 7, 2025, 3)
+    third = heatmap['data'][2]
+    assert len(heatmap['data']) == 31 and (third['present_count'], third['total_count']) == (3, 4)
+    assert third['attendance_rate'] == 75.0 and heatmap['data'][0]['attendance_rate'] == 0
+
+    today = datetime.date.today().isoformat()
+    db.execute("INSERT INTO attendance (staff_id, school_id, date, status) VALUES (101, 7, ?, 'late')", (today,))
+    run_with(db, refresh_attendance_daily_summary, 7, [today], db)
+    dashboard = run_with(db, ReportingDashboard().get_summary_dashboard, 7)
+    assert dashboard['today_summary'] == {
+        'total_staff': 4, 'present_today': 1, 'absent_today': 0, 'late_today': 1, 'leave_today': 0}
+    assert dashboard['attendance_rate_today'] == 25.0
+    assert dashboard['recent_trends'][-1] == {'date': today, 'present_count': 1, 'late_count': 1}
+    print("✓ dashboards read summary")
+
+
+def run_all_tests():
+    test_refresh_counts_per_department()
+    test_rebuild_and_read()
+    test_writers_keep_summary_current()
+    test_manual_writers_keep_summary_current()
+    test_dashboards_read_summary()
+    print("\n✅ All attendance daily summary tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
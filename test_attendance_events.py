@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Live attendance feed - Test Suite
+Checks the Server-Sent Events broker (per-school feeds, Last-Event-ID resume,
+status deltas), that committed punches are published by
+UnifiedAttendanceProcessor, and that many connected dashboards cost
+O(events) without touching the database (in-memory SQLite, no server)
+"""
+
+import sys
+import threading
+import time
+import datetime
+
+import attendance_events as attendance_events_module
+from attendance_events import AttendanceEventBroker, attendance_events, status_delta, punch_event
+from test_helpers import memory_database, run_with
+from zk_biometric import UnifiedAttendanceProcessor
+
+
+SCHEMA = '''
+CREATE TABLE biometric_devices (
+    id INTEGER PRIMARY KEY, school_id INTEGER, device_name TEXT, connection_type TEXT, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, department TEXT, shift_type TEXT
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE, time_in TEXT, time_out TEXT,
+    status TEXT, late_duration_minutes INTEGER DEFAULT 0, early_departure_minutes INTEGER DEFAULT 0,
+    shift_type TEXT, shift_start_time TEXT, shift_end_time TEXT, overtime_in TEXT, overtime_out TEXT
+);
+CREATE TABLE biometric_verifications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, verification_type TEXT,
+    verification_time TIMESTAMP, device_ip TEXT, biometric_method TEXT, verification_status TEXT
+);
+CREATE TABLE shift_definitions (
+    id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+    grace_period_minutes INTEGER, description TEXT, is_active INTEGER DEFAULT 1
+);
+'''
+
+
+def build_database():
+    conn = memory_database(SCHEMA)
+    conn.execute("INSERT INTO biometric_devices VALUES (1, 7, 'Gate', 'ADMS', 1)")
+    conn.execute("INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, grace_period_minutes) "
+                 "VALUES (7, 'general', '09:00:00', '17:00:00', 10)")
+    conn.execute("INSERT INTO staff VALUES (101, 7, 'S1', 'Asha', 'Science', NULL), (102, 7, 'S2', 'Ravi', 'Maths', NULL)")
+    conn.commit()
+    return conn
+
+
+def parse_stream(chunks):
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n') if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], fields['data']))
+    return events
+
+
+def test_status_delta():
+    """Check-ins move the staff member from absent to their new status"""
+    assert status_delta(None, 'present') == {'absent': -1, 'present': 1}
+    assert status_delta('absent', 'late') == {'absent': -1, 'late': 1}
+    assert status_delta('present', 'present') == {}
+    assert status_delta(None, 'On Leave') == {}
+
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time(9, 5))
+    event = punch_event(7, 101, 'S1', 'Asha', 'Science', 'check-in', today, 'late')
+    assert event['delta'] == {'absent': -1, 'late': 1} and event['today']
+    event = punch_event(7, 101, 'S1', 'Asha', 'Science', 'check-in', today - datetime.timedelta(days=1), 'late')
+    assert event['delta'] == {} and not event['today'], "earlier days do not change today's counts"
+    print("✓ status delta")
+
+
+def test_stream_resumes_and_isolates_schools():
+    """Streams only carry their school's events and resume after Last-Event-ID"""
+    broker = AttendanceEventBroker(history=10)
+    broker.publish(1, {'type': 'punch', 'n': 1})
+    first = broker.publish(2, {'type': 'punch', 'n': 2})
+    broker.publish_many(1, [{'type': 'punch', 'n': 3}, {'type': 'punch', 'n': 4}])
+
+    events = parse_stream(broker.stream(1, last_event_id=0, heartbeat=0.05, max_duration=0.1))
+    assert [e[0] for e in events] == [1, 3, 4] and {e[1] for e in events} == {'punch'}
+    assert [e[0] for e in parse_stream(broker.stream(1, last_event_id=3, max_duration=0.05))] == [4]
+    assert parse_stream(broker.stream(2, max_duration=0.05)) == [], "new subscribers start at the head"
+    assert [e[0] for e in broker.events_since(2, 0)] == [first]
+
+    chunks = list(broker.stream(3, heartbeat=0.02, max_duration=0.07))
+    assert chunks[0].startswith('retry:') and ': keep-alive\n\n' in chunks
+
+    # Streams are always bounded so browsers reconnect and reload the table
+    original = attendance_events_module.ATTENDANCE_STREAM_MAX_DURATION
+    attendance_events_module.ATTENDANCE_STREAM_MAX_DURATION = 0.05
+    try:
+        assert list(broker.stream(3, heartbeat=0.02))[0].startswith('retry:')
+    finally:
+        attendance_events_module.ATTENDANCE_STREAM_MAX_DURATION = original
+    print("✓ stream resumes and isolates schools")
+
+
+def test_processor_publishes_committed_punches():
+    """Single and batch punches are published once committed, ignored ones are not"""
+    processor = UnifiedAttendanceProcessor()
+    db = build_database()
+    start = attendance_events.last_event_id
+    today = datetime.date.today()
+
+    def at(clock):
+        return datetime.datetime.combine(today, datetime.time.fromisoformat(clock))
+
+    run_with(db, processor.process_attendance_punch, 1, 'S1', at('08:55:00'), 0, 'face')
+    run_with(db, processor.process_batch_punches, 1, [
+        {'user_id': 'S2', 'timestamp': at('09:30:00'), 'punch_code': 0},
+        {'user_id': 'S1', 'timestamp': at('09:40:00'), 'punch_code': 0},   # duplicate, ignored
+        {'user_id': 'S9', 'timestamp': at('09:45:00'), 'punch_code': 0},   # unknown staff
+        {'user_id': 'S1', 'timestamp': at('17:10:00'), 'punch_code': 1},
+    ])
+
+    events = [event for _, event in attendance_events.events_since(7, start)]
+    assert [(e['staff_number'], e['action'], e['status']) for e in events] == [
+        ('S1', 'check-in', 'present'), ('S1', 'check-out', 'present'), ('S2', 'check-in', 'late')
+    ], events
+    assert events[0]['delta'] == {'absent': -1, 'present': 1}
+    assert events[2]['delta'] == {'absent': -1, 'late': 1} and events[2]['full_name'] == 'Ravi'
+    assert events[1]['delta'] == {} and events[1]['time_display'] == '05:10 PM'
+    print("✓ processor publishes committed punches")
+
+
+def test_dashboards_cost_o_events():
+    """N connected dashboards each receive every event with no per-dashboard queries"""
+    broker = AttendanceEventBroker()
+    dashboards, punches = 200, 50
+    received = [0] * dashboards
+    ready = threading.Barrier(dashboards + 1)
+
+    def dashboard(n):
+        stream = broker.stream(1, heartbeat=0.5, max_duration=3)
+        next(stream)  # connected
+        ready.wait()
+        for chunk in stream:
+            if chunk.startswith('id:'):
+                received[n] += 1
+                if received[n] == punches:
+                    break
+
+    threads = [threading.Thread(target=dashboard, args=(n,)) for n in range(dashboards)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+
+    started = time.monotonic()
+    for n in range(punches):
+        broker.publish(1, {'type': 'punch', 'n': n})
+    for thread in threads:
+        thread.join(5)
+    elapsed = time.monotonic() - started
+
+    assert received == [punches] * dashboards, set(received)
+    print(f"✓ {dashboards} dashboards x {punches} punches delivered in {elapsed:.2f}s, 0 queries")
+
+
+def run_all_tests():
+    test_status_delta()
+    test_stream_resumes_and_isolates_schools()
+    test_processor_publishes_committed_punches()
+    test_dashboards_cost_o_events()
+    print("\n✅ All live attendance feed tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Batch payroll - Test Suite
+Checks that SalaryCalculator.calculate_monthly_salaries() matches the
+per-staff calculate_monthly_salary() path on an in-memory SQLite database
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import salary_calculator
+from database import invalidate_schema_cache, invalidate_holiday_index
+from salary_calculator import SalaryCalculator, create_payroll_job, update_payroll_job, get_payroll_job
+from test_helpers import CountingConnection, memory_database, quietly
+
+
+SCHEMA = '''
+CREATE TABLE schools (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT,
+    department TEXT, shift_type TEXT, is_active INTEGER DEFAULT 1,
+    basic_salary REAL, hra REAL, transport_allowance REAL, other_allowances REAL,
+    pf_deduction REAL, esi_deduction REAL, professional_tax REAL, other_deductions REAL
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date TEXT, status TEXT,
+    time_in TEXT, time_out TEXT, late_duration_minutes INTEGER, early_departure_minutes INTEGER,
+    shift_type TEXT, shift_start_time TEXT, shift_end_time TEXT, overtime_in TEXT, overtime_out TEXT,
+    on_duty_type TEXT, on_duty_location TEXT, on_duty_purpose TEXT
+);
+CREATE TABLE leave_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, leave_type TEXT,
+    start_date TEXT, end_date TEXT, status TEXT, reason TEXT
+);
+CREATE TABLE permission_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, permission_type TEXT,
+    permission_date TEXT, start_time TEXT, end_time TEXT, duration_hours REAL, reason TEXT, status TEXT
+);
+CREATE TABLE shift_definitions (
+    id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+    grace_period_minutes INTEGER, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE staff_shift_history (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, shift_type TEXT,
+    effective_from TEXT, effective_to TEXT
+);
+CREATE TABLE holidays (
+    id INTEGER PRIMARY KEY, school_id INTEGER, holiday_name TEXT, start_date TEXT, end_date TEXT,
+    holiday_type TEXT, departments TEXT, is_active INTEGER DEFAULT 1
+);
+'''
+
+
+def build_database():
+    conn = memory_database(SCHEMA)
+    conn.execute("INSERT INTO schools (id, name) VALUES (1, 'Test School')")
+    conn.execute("INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, grace_period_minutes) "
+                 "VALUES (1, 'general', '09:00:00', '17:00:00', 10), (1, 'morning', '08:00:00', '16:00:00', 5)")
+    conn.execute("INSERT INTO holidays (school_id, holiday_name, start_date, end_date, holiday_type, departments) "
+                 "VALUES (1, 'Founders Day', '2025-03-14', '2025-03-14', 'institution_wide', NULL), "
+                 "(1, 'Lab Day', '2025-03-20', '2025-03-21', 'department_specific', '[\"Science\"]')")
+
+    for n in range(1, 13):
+        staff_id = 100 + n
+        conn.execute('''
+            INSERT INTO staff (id, school_id, staff_id, full_name, department, shift_type, is_active,
+                               basic_salary, hra, transport_allowance, other_allowances,
+                               pf_deduction, esi_deduction, professional_tax, other_deductions)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?, 2000, 500, 300, 0, 0, 200, 0)
+        ''', (staff_id, str(n), f'Staff {n}', ['Science', 'Maths', 'English'][n % 3],
+              ['general', 'morning'][n % 2], 0 if n == 12 else 1, 18000 + n * 250))
+        for day in range(1, 29):
+            status = ['present', 'late', 'absent', 'on_duty', 'present'][(n + day) % 5]
+            conn.execute('''
+                INSERT INTO attendance (staff_id, school_id, date, status, time_in, time_out,
+                                        late_duration_minutes, overtime_in, overtime_out)
+                VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?)
+            ''', (staff_id, f'2025-03-{day:02d}', status,
+                  '08:45:00' if day % 3 else '09:25:00',
+                  None if day % 7 == 0 else '16:30:00',
+                  25 if status == 'late' else 0,
+                  '17:30:00' if day % 6 == 0 else None,
+                  '19:00:00' if day % 6 == 0 else None))
+        if n % 4 == 0:
+            conn.execute("INSERT INTO leave_applications (staff_id, school_id, leave_type, start_date, end_date, status) "
+                         "VALUES (?, 1, 'CL', '2025-02-27', '2025-03-03', 'approved')", (staff_id,))
+        if n % 5 == 0:
+            conn.execute("INSERT INTO permission_applications (staff_id, school_id, permission_type, permission_date, status) "
+                         "VALUES (?, 1, 'Other', '2025-03-07', 'approved')", (staff_id,))
+    conn.execute("INSERT INTO staff_shift_history (staff_id, school_id, shift_type, effective_from) "
+                 "VALUES (103, 1, 'general', '2025-03-10')")
+    conn.commit()
+    return conn
+
+
+def make_calculator(conn):
+    counting = CountingConnection(conn)
+
+    class TestCalculator(SalaryCalculator):
+        def _get_db_connection(self):
+            return counting
+
+    calculator = TestCalculator(school_id=1)
+    quietly(calculator._save_salary_rules_to_db, calculator.default_salary_rules)
+    calculator._get_manual_salary_adjustments(101, 2025, 3)  # creates salary_adjustments
+    conn.execute("INSERT INTO salary_adjustments (school_id, staff_id, year, month, adjustment_type, amount, reason) "
+                 "VALUES (1, 104, 2025, 3, 'bonus', 750, 'Exam duty'), (1, 104, 2025, 3, 'deduction', 120.5, 'Advance')")
+    conn.commit()
+    return calculator, counting
+
+
+def pf_rows(conn):
+    rows = conn.execute('''
+        SELECT school_id, staff_id, year, month, pf_wage, employee_pf, employer_epf, eps, edli,
+               admin_charges, pf_applicable, company_pf_applicable, mandatory_pf, pf_opt_in
+        FROM payroll_pf_records ORDER BY staff_id
+    ''').fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_batch_matches_per_staff():
+    """Batch results and PF records are identical to the per-staff path"""
+    invalidate_schema_cache()
+    invalidate_holiday_index()
+    conn = build_database()
+    calculator, counting = make_calculator(conn)
+    staff_ids = list(range(101, 113)) + [999]
+
+    counting.statements = 0
+    single = {staff_id: calculator.calculate_monthly_salary(staff_id, 2025, 3) for staff_id in staff_ids}
+    single_statements = counting.statements
+    single_pf = pf_rows(conn)
+    conn.execute('DELETE FROM payroll_pf_records')
+    conn.commit()
+
+    counting.statements = 0
+    batch = calculator.calculate_monthly_salaries(staff_ids, 2025, 3)
+    batch_statements = counting.statements
+
+    for result in list(single.values()) + list(batch.values()):
+        result.pop('calculation_date', None)
+    assert set(batch) == set(staff_ids)
+    for staff_id in staff_ids:
+        assert batch[staff_id] == single[staff_id], f"staff {staff_id} differs"
+    assert not batch[112]['success'] and not batch[999]['success'], "inactive/missing staff must fail"
+    assert batch[104]['salary_breakdown']['manual_bonus'] == 750.0
+    assert pf_rows(conn) == single_pf and len(single_pf) == 11
+    assert batch_statements < 20 < single_statements, (batch_statements, single_statements)
+    assert calculator._batch is None
+    print(f"✓ batch matches per-staff ({single_statements} -> {batch_statements} statements)")
+
+
+def test_process_pool_matches_sequential():
+    """Chunks calculated in worker processes merge to the sequential result"""
+    invalidate_schema_cache()
+    invalidate_holiday_index()
+    conn = build_database()
+    calculator, _ = make_calculator(conn)
+    staff_ids = list(range(112, 100, -1))
+
+    sequential = calculator.calculate_monthly_salaries(staff_ids, 2025, 3)
+    sequential_pf = pf_rows(conn)
+
+    original = salary_calculator.PAYROLL_CHUNK_SIZE, salary_calculator.PAYROLL_MAX_WORKERS
+    salary_calculator.PAYROLL_CHUNK_SIZE, salary_calculator.PAYROLL_MAX_WORKERS = 5, 2
+    progress = []
+    try:
+        parallel = calculator.calculate_monthly_salaries(
+            staff_ids, 2025, 3, max_workers=8, progress=lambda done, total: progress.append((done, total))
+        )
+    finally:
+        salary_calculator.PAYROLL_CHUNK_SIZE, salary_calculator.PAYROLL_MAX_WORKERS = original
+
+    for result in list(sequential.values()) + list(parallel.values()):
+        result.pop('calculation_date', None)
+    assert list(parallel) == staff_ids, "results must keep input order"
+    assert parallel == sequential
+    assert pf_rows(conn) == sequential_pf
+    assert len(progress) == 3 and progress[-1] == (12, 12), progress
+
+    # A run shares one pool across calls (schools) instead of starting one per call
+    salary_calculator.PAYROLL_CHUNK_SIZE, salary_calculator.PAYROLL_MAX_WORKERS = 5, 2
+    try:
+        with salary_calculator.payroll_process_pool(8) as pool:
+            first = calculator.calculate_monthly_salaries(staff_ids, 2025, 3, max_workers=8, pool=pool)
+            workers = set(pool._processes)
+            second = calculator.calculate_monthly_salaries(staff_ids[:6], 2025, 3, max_workers=8, pool=pool)
+            assert workers and set(pool._processes) == workers
+    finally:
+        salary_calculator.PAYROLL_CHUNK_SIZE, salary_calculator.PAYROLL_MAX_WORKERS = original
+    for result in list(first.values()) + list(second.values()):
+        result.pop('calculation_date', None)
+    assert first == sequential and second == {staff_id: sequential[staff_id] for staff_id in staff_ids[:6]}
+    assert salary_calculator.payroll_process_pool(1) is None
+    print("✓ process pool matches sequential")
+
+
+def test_payroll_job_progress():
+    """Job ids report progress and final status to any connection (worker process)"""
+    path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    runner, poller = (sqlite3.connect(path) for _ in range(2))
+    for conn in (runner, poller):
+        conn.row_factory = sqlite3.Row
+
+    job_id = create_payroll_job(total=40, db=runner, school_ids=[1, 2], requested_by=7)
+    job = get_payroll_job(job_id, db=poller)
+    assert job['status'] == 'queued' and job['progress'] == 0.0
+    assert job['school_ids'] == [1, 2] and job['requested_by'] == 7
+
+    update_payroll_job(job_id, db=runner, status='running', completed=10)
+    assert get_payroll_job(job_id, db=poller)['progress'] == 25.0
+
+    update_payroll_job(job_id, db=runner, status='completed', completed=40, result={'total_staff': 40})
+    job = get_payroll_job(job_id, db=poller)
+    assert job['progress'] == 100.0 and job['finished_at'] and job['result'] == {'total_staff': 40}
+    assert get_payroll_job('missing', db=poller) is None
+    runner.close()
+    poller.close()
+    print("✓ payroll job progress")
+
+
+def run_all_tests():
+    test_batch_matches_per_staff()
+    test_process_pool_matches_sequential()
+    test_payroll_job_progress()
+    invalidate_schema_cache()
+    invalidate_holiday_index()
+    print("\n✅ All batch payroll tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
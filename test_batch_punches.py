@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Batch punch ingestion - Test Suite
+Checks that UnifiedAttendanceProcessor.process_batch_punches() leaves the
+same attendance and verification rows as feeding the punches one by one to
+process_attendance_punch() (in-memory SQLite, no device required)
+"""
+
+import sys
+import datetime
+
+from test_helpers import CountingConnection, memory_database, run_with
+from zk_biometric import UnifiedAttendanceProcessor
+
+
+SCHEMA = '''
+CREATE TABLE biometric_devices (
+    id INTEGER PRIMARY KEY, school_id INTEGER, device_name TEXT, connection_type TEXT, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, department TEXT, shift_type TEXT
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE, time_in TEXT, time_out TEXT,
+    status TEXT, late_duration_minutes INTEGER DEFAULT 0, early_departure_minutes INTEGER DEFAULT 0,
+    shift_type TEXT, shift_start_time TEXT, shift_end_time TEXT, overtime_in TEXT, overtime_out TEXT,
+    UNIQUE(staff_id, date)
+);
+CREATE TABLE biometric_verifications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, verification_type TEXT,
+    verification_time TIMESTAMP, device_ip TEXT, biometric_method TEXT, verification_status TEXT
+);
+CREATE TABLE shift_definitions (
+    id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+    grace_period_minutes INTEGER, description TEXT, is_active INTEGER DEFAULT 1
+);
+'''
+
+
+def build_database():
+    conn = memory_database(SCHEMA)
+    conn.execute("INSERT INTO biometric_devices VALUES (1, 1, 'Gate', 'ADMS', 1), (2, 1, 'Old Gate', 'ADMS', 0)")
+    conn.execute("INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, grace_period_minutes) "
+                 "VALUES (1, 'general', '09:00:00', '17:00:00', 10), (1, 'morning', '06:00:00', '14:00:00', 10)")
+    for n in range(1, 6):
+        conn.execute("INSERT INTO staff VALUES (?, 1, ?, ?, 'Science', ?)",
+                     (100 + n, f'S{n}', f'Staff {n}', 'morning' if n == 2 else None))
+    conn.execute("INSERT INTO staff VALUES (200, 2, 'X1', 'Other School', 'Maths', NULL)")
+    # Staff 3 already checked in on the first day
+    conn.execute("INSERT INTO attendance (staff_id, school_id, date, time_in, status, shift_start_time, shift_end_time) "
+                 "VALUES (103, 1, '2025-03-03', '08:55:00', 'present', '09:00:00', '17:00:00')")
+    conn.commit()
+    return CountingConnection(conn)
+
+
+def at(day, clock):
+    return datetime.datetime.strptime(f'2025-03-{day:02d} {clock}', '%Y-%m-%d %H:%M:%S')
+
+
+PUNCHES = [
+    {'user_id': 'S1', 'timestamp': at(3, '08:50:00'), 'punch_code': 0, 'verification_method': 'Face'},
+    {'user_id': 'S2', 'timestamp': at(3, '06:20:00'), 'punch_code': 0},
+    {'user_id': 'S3', 'timestamp': at(3, '09:05:00'), 'punch_code': 0},
+    {'user_id': 'S1', 'timestamp': at(3, '08:55:00'), 'punch_code': 0},
+    {'user_id': 'S4', 'timestamp': at(3, '16:00:00'), 'punch_code': 1},
+    {'user_id': 'S5', 'timestamp': at(3, '18:00:00'), 'punch_code': 2},
+    {'user_id': 'X1', 'timestamp': at(3, '09:00:00'), 'punch_code': 0},
+    {'user_id': 'S9', 'timestamp': at(3, '09:00:00'), 'punch_code': 0},
+    {'user_id': 'S2', 'timestamp': at(3, '13:30:00'), 'punch_code': 1, 'verification_method': 'card'},
+    {'user_id': 'S1', 'timestamp': at(3, '16:40:00'), 'punch_code': 1},
+    {'user_id': 'S1', 'timestamp': at(3, '17:30:00'), 'punch_code': 2},
+    {'user_id': 'S1', 'timestamp': at(3, '19:00:00'), 'punch_code': 3},
+    {'user_id': 'S4', 'timestamp': at(3, '16:05:00'), 'punch_code': 1},
+    {'user_id': 'S3', 'timestamp': at(3, '17:10:00'), 'punch_code': 1},
+    {'user_id': 'S4', 'timestamp': at(4, '09:20:00'), 'punch_code': 0, 'verification_method': 'retina'},
+    {'user_id': 'S4', 'timestamp': at(4, '17:00:00'), 'punch_code': 1},
+    {'user_id': 'S1', 'timestamp': None, 'punch_code': 0},
+]
+
+
+def table_rows(db, table, columns):
+    rows = db.conn.execute(f'SELECT {columns} FROM {table}').fetchall()
+    return sorted(tuple(row) for row in rows)
+
+
+def snapshot(db):
+    return (
+        table_rows(db, 'attendance', 'staff_id, school_id, date, time_in, time_out, status, late_duration_minutes, '
+                                     'early_departure_minutes, shift_start_time, shift_end_time, overtime_in, overtime_out'),
+        table_rows(db, 'biometric_verifications', 'staff_id, school_id, verification_type, verification_time, '
+                                                  'device_ip, biometric_method, verification_status'),
+    )
+
+
+def process_one_by_one(processor, device_id, punches):
+    results = []
+    for punch in punches:
+        if punch['timestamp'] is None:
+            continue
+        results.append(processor.process_attendance_punch(
+            device_id=device_id,
+            user_id=punch.get('user_id'),
+            timestamp=punch.get('timestamp'),
+            punch_code=punch.get('punch_code', 0),
+            verification_method=punch.get('verification_method', 'fingerprint')
+        ))
+    return results
+
+
+def test_batch_matches_single_punches():
+    """Batch ingestion writes the same rows and outcomes as the per-punch path"""
+    processor = UnifiedAttendanceProcessor()
+
+    single_db = build_database()
+    single = run_with(single_db, process_one_by_one, processor, 1, PUNCHES)
+    single_db.conn.commit()
+
+    batch_db = build_database()
+    batch_db.statements = 0
+    batch = run_with(batch_db, processor.process_batch_punches, 1, PUNCHES)
+
+    assert snapshot(batch_db) == snapshot(single_db)
+    details = [d for d in batch['details'] if d['timestamp']]
+    assert [(d['action'], d['reason']) for d in details] == [(r['action'], r['reason']) for r in single]
+    assert [d['message'] for d in details] == [r['message'] for r in single]
+    assert (batch['processed'], batch['rejected'], batch['ignored']) == (10, 4, 3), batch
+    assert batch['details'][-1]['reason'] == 'exception'
+    # Constant per batch: up to 15 for the punches plus the daily summary refresh
+    assert batch_db.statements < 25 < single_db.statements, (batch_db.statements, single_db.statements)
+    print(f"✓ batch matches single punches ({single_db.statements} -> {batch_db.statements} statements)")
+
+
+def test_duplicates_resolved_in_time_order():
+    """The earliest check-in of the day wins even when punches arrive out of order"""
+    processor = UnifiedAttendanceProcessor()
+    db = build_database()
+    punches = [
+        {'user_id': 'S1', 'timestamp': at(5, '09:30:00'), 'punch_code': 0},
+        {'user_id': 'S1', 'timestamp': at(5, '08:45:00'), 'punch_code': 0},
+    ]
+    result = run_with(db, processor.process_batch_punches, 1, punches)
+
+    row = db.conn.execute("SELECT time_in, status FROM attendance WHERE staff_id = 101").fetchone()
+    assert tuple(row) == ('08:45:00', 'present')
+    assert [d['reason'] for d in result['details']] == ['duplicate_checkin', '']
+    print("✓ duplicates resolved in time order")
+
+
+def test_inactive_device_rejects_batch():
+    """Punches from an unknown or inactive device are all rejected"""
+    processor = UnifiedAttendanceProcessor()
+    db = build_database()
+    result = run_with(db, processor.process_batch_punches, 2, PUNCHES[:3])
+
+    assert result['rejected'] == 3 and result['processed'] == 0
+    assert {d['reason'] for d in result['details']} == {'invalid_device'}
+    assert snapshot(db) == snapshot(build_database())
+    print("✓ inactive device rejects batch")
+
+
+def run_all_tests():
+    test_batch_matches_single_punches()
+    test_duplicates_resolved_in_time_order()
+    test_inactive_device_rejects_batch()
+    print("\n✅ All batch punch tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Bulk allocation import - Test Suite
+Checks that bulk_import_allocations reports every row with the same outcome
+the row-by-row upload gave, catches conflicts between rows of the same file,
+writes nothing on a dry run, and that the upload route feeds a CSV through
+it (temporary SQLite file)
+"""
+
+import io
+import sys
+
+from flask import Flask
+
+from hierarchical_timetable import HierarchicalTimetableManager
+from hierarchical_timetable_routes import hierarchical_bp
+from test_timetable_occupancy import school_database
+from timetable_occupancy import get_timetable_occupancy
+
+
+def add_periods(db):
+    db.executemany('INSERT INTO timetable_periods (school_id, level_id, section_id, day_of_week, period_number) '
+                   'VALUES (1, 1, ?, ?, ?)',
+                   [(section, day, period) for section in (1, 2) for day in range(7) for period in range(1, 9)])
+    db.commit()
+
+
+def row(row_no, login, section, day, period, subject='Maths', grade='Class 10'):
+    return {'row_no': row_no, 'login_staff_id': login, 'grade_name': grade, 'section_name': section,
+            'day_of_week': day, 'period_number': period, 'subject_name': subject, 'room_number': ''}
+
+
+ROWS = [
+    row(2, 'T003', 'B', 2, 4),                  # created
+    row(3, 'T003', 'a', 2, 4),                  # clashes with row 2
+    row(4, 'T003', 'A', 1, 2),                  # section held by Ravi M
+    row(5, 'T001', 'A', 1, 1, 'Algebra'),       # existing allocation: update
+    row(6, 'T999', 'A', 3, 1),                  # unknown staff
+    {'row_no': 7, 'error': 'Invalid day value. Use 0-6 or valid day name'},
+    row(8, 'T003', 'B', 2, 4, 'Physics'),       # repeats row 2: update
+    row(9, 'T003', 'A', 3, 1, grade='Class 11'),
+    row(10, 'T002', 'B', 6, 8),                 # no such period
+    row(11, 'T003', 'A', 2, 2),                 # marked unavailable
+]
+
+EXPECTED = {
+    2: ('created', None),
+    3: ('skipped', 'Staff already assigned to: B (Class 10)'),
+    4: ('skipped', 'Section already has Ravi M assigned'),
+    5: ('updated', None),
+    6: ('skipped', 'Staff login ID not found: T999'),
+    7: ('skipped', 'Invalid day value. Use 0-6 or valid day name'),
+    8: ('updated', None),
+    9: ('skipped', 'Grade not found: Class 11'),
+    10: ('skipped', 'Period not found for selected grade/section/day/period_number'),
+    11: ('skipped', 'Staff marked unavailable: Exam duty'),
+}
+
+
+def test_dry_run_then_import():
+    with school_database() as db:
+        add_periods(db)
+        db.execute('DELETE FROM timetable_periods WHERE section_id = 2 AND day_of_week = 6 AND period_number = 8')
+        db.commit()
+        before = db.execute('SELECT * FROM timetable_hierarchical_assignments ORDER BY id').fetchall()
+        before = [tuple(r) for r in before]
+
+        dry = HierarchicalTimetableManager.bulk_import_allocations(1, ROWS, dry_run=True)
+        assert dry['success'] and dry['dry_run']
+        assert {entry['row']: (entry['status'], entry['error']) for entry in dry['rows']} == EXPECTED
+        assert (dry['created_count'], dry['updated_count'], dry['skipped_count']) == (1, 2, 7)
+        assert [tuple(r) for r in db.execute('SELECT * FROM timetable_hierarchical_assignments ORDER BY id')] == before
+
+        result = HierarchicalTimetableManager.bulk_import_allocations(1, ROWS)
+        assert {entry['row']: (entry['status'], entry['error']) for entry in result['rows']} == EXPECTED
+        assert result['errors'][0] == 'Row 3: Staff already assigned to: B (Class 10)'
+        created = db.execute('SELECT staff_id, subject_name FROM timetable_hierarchical_assignments '
+                             'WHERE section_id = 2 AND day_of_week = 2 AND period_number = 4').fetchall()
+        assert [tuple(r) for r in created] == [(3, 'Physics')]
+        updated = db.execute('SELECT subject_name FROM timetable_hierarchical_assignments WHERE id = 1').fetchone()
+        assert updated[0] == 'Algebra'
+        assert get_timetable_occupancy(1).section_occupant(2, 2, 4)[1] == 3
+    print("✓ dry run then import")
+
+
+def test_daily_load_counts_the_batch():
+    with school_database() as db:
+        add_periods(db)
+        rows = [row(n, 'T002', 'A' if n % 2 else 'B', 4, n) for n in range(1, 9)]
+        result = HierarchicalTimetableManager.bulk_import_allocations(1, rows)
+        statuses = [entry['status'] for entry in result['rows']]
+        assert statuses == ['created'] * 6 + ['skipped'] * 2
+        assert result['rows'][6]['error'] == 'Maximum daily classes (6) reached'
+        count = db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments WHERE staff_id = 2 '
+                           'AND day_of_week = 4').fetchone()[0]
+        assert count == 6
+    print("✓ daily load counts the batch")
+
+
+def test_stale_index_writes_nothing():
+    with school_database() as db:
+        add_periods(db)
+        get_timetable_occupancy(1)
+        # Booked by another worker after this one loaded its index
+        db.execute('INSERT INTO timetable_hierarchical_assignments (school_id, staff_id, section_id, level_id, '
+                   'day_of_week, period_number) VALUES (1, 2, 1, 1, 5, 1)')
+        db.commit()
+        result = HierarchicalTimetableManager.bulk_import_allocations(1, [row(1, 'T001', 'A', 5, 2),
+                                                                         row(2, 'T002', 'B', 5, 1)])
+        assert not result['success'] and 'timetable changed' in result['error']
+        count = db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments WHERE day_of_week = 5'
+                           ).fetchone()[0]
+        assert count == 1
+    print("✓ stale index writes nothing")
+
+
+def test_upload_route():
+    with school_database() as db:
+        add_periods(db)
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.register_blueprint(hierarchical_bp)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['user_type'] = 'admin'
+            sess['school_id'] = 1
+        csv = ('Login Staff ID,Grade Name,Section Name,Day Name,Period Number,Subject Name\n'
+               'T003,Class 10,B,Tuesday,4,Physics\n'
+               'T003,Class 10,A,Someday,5,Physics\n')
+
+        def upload(dry_run):
+            data = {'file': (io.BytesIO(csv.encode()), 'allocations.csv')}
+            if dry_run:
+                data['dry_run'] = '1'
+            return client.post('/api/hierarchical-timetable/staff-period/bulk-upload', data=data,
+                               content_type='multipart/form-data').get_json()
+
+        dry = upload(True)
+        assert dry['success'] and dry['dry_run'] and dry['total_rows'] == 2
+        assert dry['created_count'] == 1 and dry['errors'] == ['Row 3: Invalid day value. Use 0-6 or valid day name']
+        assert db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments').fetchone()[0] == 4
+
+        result = upload(False)
+        assert result['created_count'] == 1 and not result['dry_run']
+        assert db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments').fetchone()[0] == 5
+    print("✓ upload route")
+
+
+def run_all_tests():
+    test_dry_run_then_import()
+    test_daily_load_counts_the_batch()
+    test_stale_index_writes_nothing()
+    test_upload_route()
+    print("\n✅ All bulk allocation import tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+MySQL connection pool - Test Suite
+Exercises checkout/return, health checks, lifetime recycling and exhaustion
+using fake connections (no MySQL server required)
+"""
+
+import sys
+import threading
+import time
+
+from database import _MySQLConnectionPool, _MySQLConnectionWrapper
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(_MySQLConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__({}, **kwargs)
+        self.opened = []
+
+    def _open(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        with self._cond:
+            self._stats['creations'] += 1
+        return conn
+
+
+def test_reuse_and_stats():
+    """A returned connection is reused by the next checkout"""
+    pool = FakePool(min_size=1, max_size=2)
+    pool.prefill()
+    assert pool.stats()['idle'] == 1
+
+    raw, created = pool.acquire()
+    assert pool.stats()['in_use'] == 1
+    pool.release(raw, created)
+    raw2, created2 = pool.acquire()
+
+    assert raw2 is raw, "idle connection was not reused"
+    assert raw.rollbacks == 1, "release must roll back open transactions"
+    stats = pool.stats()
+    assert stats['creations'] == 1
+    assert stats['checkouts'] == 2
+    print("✓ reuse and stats")
+
+
+def test_health_check_discards_dead_connection():
+    """A connection that fails ping() is replaced on checkout"""
+    pool = FakePool(min_size=0, max_size=2)
+    raw, created = pool.acquire()
+    pool.release(raw, created)
+    raw.healthy = False
+
+    raw2, _ = pool.acquire()
+    assert raw2 is not raw
+    assert raw.closed
+    assert pool.stats()['health_check_failures'] == 1
+    assert pool.stats()['size'] == 1
+    print("✓ health check")
+
+
+def test_max_lifetime_recycle():
+    """Connections older than max_lifetime are closed instead of reused"""
+    pool = FakePool(min_size=0, max_size=2, max_lifetime=0.01)
+    raw, created = pool.acquire()
+    pool.release(raw, created)
+    time.sleep(0.02)
+
+    raw2, _ = pool.acquire()
+    assert raw2 is not raw
+    assert raw.closed
+    assert pool.stats()['recycled'] == 1
+    print("✓ max lifetime recycle")
+
+
+def test_exhaustion_waits_then_times_out():
+    """A full pool blocks until a connection is returned, then times out"""
+    pool = FakePool(min_size=0, max_size=1, timeout=1)
+    raw, created = pool.acquire()
+
+    threading.Timer(0.05, pool.release, args=(raw, created)).start()
+    raw2, created2 = pool.acquire()
+    assert raw2 is raw
+    assert pool.stats()['waits'] == 1
+
+    pool.timeout = 0.05
+    try:
+        pool.acquire()
+        assert False, "expected pool exhaustion error"
+    except RuntimeError:
+        pass
+    assert pool.stats()['timeouts'] == 1
+    print("✓ exhaustion wait/timeout")
+
+
+def test_wrapper_close_returns_to_pool():
+    """Closing the request wrapper hands the connection back exactly once"""
+    pool = FakePool(min_size=0, max_size=1)
+    raw, created = pool.acquire()
+    wrapper = _MySQLConnectionWrapper(raw, pool, created)
+    wrapper.close()
+    wrapper.close()
+
+    assert not raw.closed
+    assert pool.stats()['idle'] == 1
+    assert pool.stats()['in_use'] == 0
+    print("✓ wrapper close")
+
+
+def run_all_tests():
+    test_reuse_and_stats()
+    test_health_check_discards_dead_connection()
+    test_max_lifetime_recycle()
+    test_exhaustion_waits_then_times_out()
+    test_wrapper_close_returns_to_pool()
+    print("\n✅ All connection pool tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
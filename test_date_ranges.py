@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Date range predicates - Test Suite
+Checks the half-open day/month/year bounds, that range predicates match the
+same DATE and DATETIME values as the function-wrapped filters they replace,
+and that the rewritten queries search the catalog indexes on their date
+column (in-memory SQLite)
+"""
+
+import contextlib
+import datetime
+import io
+import sqlite3
+import sys
+
+import benchmark_date_predicates as benchmark
+from database import date_span_range, day_range, month_range, range_predicate, year_range
+
+
+def test_bounds():
+    assert day_range('2025-03-31') == ('2025-03-31', '2025-04-01')
+    assert day_range(datetime.datetime(2024, 12, 31, 18, 30)) == ('2024-12-31', '2025-01-01')
+    assert month_range(2024, 2) == ('2024-02-01', '2024-03-01')
+    assert month_range('2025', '12') == ('2025-12-01', '2026-01-01')
+    assert year_range('2025') == ('2025-01-01', '2026-01-01')
+    assert date_span_range(datetime.date(2025, 3, 1), '2025-03-31') == ('2025-03-01', '2025-04-01')
+    assert range_predicate('bv.verification_time') == 'bv.verification_time >= ? AND bv.verification_time < ?'
+    try:
+        date_span_range('2025-03-01', 'yesterday')
+        raise AssertionError('invalid date accepted')
+    except ValueError:
+        pass
+    print("✓ bounds")
+
+
+def test_matches_function_filters():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE events (id INTEGER PRIMARY KEY, at DATETIME, day DATE)')
+    values = ['2025-02-28 23:59:59', '2025-03-01 00:00:00', '2025-03-15 12:00:00',
+              '2025-03-31 23:59:59', '2025-04-01 00:00:00', '2025-12-31 23:59:59', '2026-01-01 00:00:00']
+    conn.executemany('INSERT INTO events (at, day) VALUES (?, ?)', [(value, value[:10]) for value in values])
+
+    def ids(sql, params):
+        return [row[0] for row in conn.execute(f'SELECT id FROM events WHERE {sql} ORDER BY id', params)]
+
+    for column in ('at', 'day'):
+        assert ids(f'DATE({column}) = ?', ('2025-03-31',)) == ids(range_predicate(column), day_range('2025-03-31'))
+        assert ids(f"strftime('%Y-%m', {column}) = ?", ('2025-03',)) == ids(range_predicate(column), month_range(2025, 3))
+        assert ids(f"strftime('%Y', {column}) = ?", ('2025',)) == ids(range_predicate(column), year_range(2025))
+        assert (ids(f'DATE({column}) BETWEEN ? AND ?', ('2025-03-01', '2025-03-31'))
+                == ids(range_predicate(column), date_span_range('2025-03-01', '2025-03-31')))
+    assert ids(range_predicate('at'), month_range(2025, 3)) == [2, 3, 4]
+    print("✓ matches function filters")
+
+
+def test_rewritten_queries_use_indexes():
+    with contextlib.redirect_stdout(io.StringIO()):
+        conn = benchmark.build_database(staff_count=10, days=60)
+    results = benchmark.compare(conn, benchmark.sample_params(10, 60), repeat=1)
+    assert len(results) == len(benchmark.QUERY_PAIRS)
+    for result in results:
+        assert result['same_rows'], result['label']
+        assert result['range_seek'] and not result['range_scans'], (result['label'], result['range_plan'])
+        # The wrapped column can only be filtered after the index lookup
+        assert not result['legacy_seek'], (result['label'], result['legacy_plan'])
+    print("✓ rewritten queries use indexes")
+
+
+def run_all_tests():
+    test_bounds()
+    test_matches_function_filters()
+    test_rewritten_queries_use_indexes()
+    print("\n✅ All date range tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Device log cursor - Test Suite
+Checks that ZKBiometricDevice.get_attendance_records_incremental() reads only
+the new tail of a device log, falls back to a full read when the log was
+rewritten, and that the clear policy only clears fully synced logs
+(fake pyzk connection and in-memory SQLite, no device required)
+"""
+
+import struct
+import sys
+import datetime
+
+from zk import ZK, const
+from zk.attendance import Attendance
+
+import database
+import zk_biometric
+from database import get_device_log_cursor, update_device_log_cursor, invalidate_schema_cache
+from test_helpers import memory_database, quietly
+from zk_biometric import ZKBiometricDevice
+
+
+_zk = ZK('127.0.0.1')
+
+
+class FakeConnection:
+    """Stands in for a pyzk connection; counts how many log records it transfers."""
+
+    tcp = True
+
+    def __init__(self, log, buffered=False):
+        self.log = list(log)
+        self.records = 0
+        self.transferred = 0
+        self.full_reads = 0
+        self.cleared = False
+        self.enabled = True
+        self.chunks = []
+        if buffered:
+            self._ZK__send_command = self._send_command
+            self._ZK__read_chunk = self._read_chunk
+            self._ZK__decode_time = _zk._ZK__decode_time
+            self._ZK__data = b''
+
+    def read_sizes(self):
+        self.records = len(self.log)
+
+    def get_attendance(self):
+        self.full_reads += 1
+        self.transferred += len(self.log)
+        return list(self.log)
+
+    def get_users(self):
+        return []
+
+    def disable_device(self):
+        self.enabled = False
+
+    def enable_device(self):
+        self.enabled = True
+
+    def clear_attendance(self):
+        self.log = []
+        self.cleared = True
+        return True
+
+    def free_data(self):
+        pass
+
+    # Buffered read (command 1503), as on ZK6 firmware with 40-byte records
+    def _buffer(self):
+        body = b''.join(
+            struct.pack('<H24sB4sB8s', n + 1, record.user_id.encode(), record.status,
+                        struct.pack('<I', _zk._ZK__encode_time(record.timestamp)), record.punch, b'')
+            for n, record in enumerate(self.log)
+        )
+        return struct.pack('<I', len(body)) + body
+
+    def _send_command(self, command, command_string, response_size):
+        assert command == 1503
+        assert struct.unpack('<bhii', command_string)[1] == const.CMD_ATTLOG_RRQ
+        self._ZK__data = b'\x00' + struct.pack('I', len(self._buffer()))
+        return {'status': True, 'code': const.CMD_PREPARE_DATA}
+
+    def _read_chunk(self, start, size):
+        self.chunks.append((start, size))
+        self.transferred += size // 40
+        return self._buffer()[start:start + size]
+
+
+def at(clock):
+    return datetime.datetime.strptime(f'2025-03-03 {clock}', '%Y-%m-%d %H:%M:%S')
+
+
+def punch(user_id, clock, code=0):
+    return Attendance(user_id, at(clock), 1, code, 0)
+
+
+LOG = [punch('S1', '08:50:00'), punch('S2', '08:55:00'), punch('X9', '09:01:00'), punch('S1', '17:05:00', 1)]
+
+
+def make_device(connection):
+    device = ZKBiometricDevice('127.0.0.1', use_cloud=False)
+    device.connection = connection
+    return device
+
+
+def test_reads_only_new_tail():
+    """Unchanged logs transfer nothing and grown logs transfer only the tail"""
+    for buffered in (False, True):
+        connection = FakeConnection(LOG[:2], buffered=buffered)
+        device = make_device(connection)
+
+        records, cursor = device.get_attendance_records_incremental(None, allowed_user_ids={'S1', 'S2'})
+        assert [r['user_id'] for r in records] == ['S1', 'S2']
+        assert cursor == {'count': 2, 'last_timestamp': at('08:55:00')}
+
+        connection.transferred = 0
+        records, same = device.get_attendance_records_incremental(cursor)
+        assert records == [] and same == cursor and connection.transferred == 0
+
+        connection.log.extend(LOG[2:])
+        records, cursor = device.get_attendance_records_incremental(cursor, allowed_user_ids={'S1', 'S2'})
+        assert [(r['user_id'], r['verification_type']) for r in records] == [('S1', 'check-out')]
+        assert cursor == {'count': 4, 'last_timestamp': at('17:05:00')}
+        assert connection.enabled
+        if buffered:
+            # Anchor record plus the two new ones, starting after the header
+            assert connection.full_reads == 1 and connection.transferred == 3
+            assert connection.chunks == [(4 + 40, 3 * 40)]
+    print("✓ reads only new tail")
+
+
+def test_rewritten_log_falls_back_to_full_read():
+    """A cleared or refilled log is read in full and filtered by the cursor time"""
+    connection = FakeConnection(LOG)
+    device = make_device(connection)
+    cursor = {'count': 2, 'last_timestamp': '2025-03-03 08:55:00'}
+
+    # Log cleared on the device, then refilled with more records than before
+    connection.log = [punch('S2', '08:40:00'), punch('S1', '12:00:00'), punch('S2', '13:00:00')]
+    records, cursor = device.get_attendance_records_incremental(cursor)
+    assert [r['user_id'] for r in records] == ['S1', 'S2']
+    assert cursor == {'count': 3, 'last_timestamp': at('13:00:00')}
+
+    # Log shorter than the cursor
+    connection.log = [punch('S1', '18:00:00', 1)]
+    records, cursor = device.get_attendance_records_incremental(cursor)
+    assert [r['user_id'] for r in records] == ['S1'] and cursor['count'] == 1
+    print("✓ rewritten log falls back to full read")
+
+
+def test_clear_policy():
+    """Logs are only cleared when the policy allows and nothing arrived since the read"""
+    original = zk_biometric.DEVICE_LOG_CLEAR_POLICY
+    try:
+        cursor = {'count': 4, 'last_timestamp': at('17:05:00')}
+
+        zk_biometric.DEVICE_LOG_CLEAR_POLICY = 'never'
+        connection = FakeConnection(LOG)
+        assert make_device(connection).clear_log_after_confirmed_sync(cursor) == cursor
+        assert not connection.cleared
+
+        zk_biometric.DEVICE_LOG_CLEAR_POLICY = '10'
+        assert make_device(connection).clear_log_after_confirmed_sync(cursor) == cursor
+        assert not connection.cleared
+
+        zk_biometric.DEVICE_LOG_CLEAR_POLICY = 'after_sync'
+        connection.log.append(punch('S2', '17:30:00', 1))
+        assert make_device(connection).clear_log_after_confirmed_sync(cursor) == cursor
+        assert not connection.cleared, "unsynced punch must not be cleared"
+
+        connection.log.pop()
+        assert make_device(connection).clear_log_after_confirmed_sync(cursor) == {
+            'count': 0, 'last_timestamp': at('17:05:00')
+        }
+        assert connection.cleared and connection.enabled
+    finally:
+        zk_biometric.DEVICE_LOG_CLEAR_POLICY = original
+    print("✓ clear policy")
+
+
+def test_cursor_persisted_per_device():
+    """Cursor columns are added on demand and stored per device"""
+    invalidate_schema_cache()
+    conn = memory_database('CREATE TABLE biometric_devices (id INTEGER PRIMARY KEY, device_name TEXT, '
+                           'last_sync DATETIME);')
+    conn.execute("INSERT INTO biometric_devices (id, device_name) VALUES (1, 'Gate'), (2, 'Office')")
+
+    original = database.get_db
+    database.get_db = lambda: conn
+    try:
+        assert get_device_log_cursor(1) == {'count': None, 'last_timestamp': None}
+        assert update_device_log_cursor(1, {'count': 4, 'last_timestamp': at('17:05:00')})
+        assert get_device_log_cursor(1) == {'count': 4, 'last_timestamp': '2025-03-03 17:05:00'}
+        assert get_device_log_cursor(2)['count'] is None
+        assert quietly(get_device_log_cursor, 99) is None
+    finally:
+        database.get_db = original
+        invalidate_schema_cache()
+    print("✓ cursor persisted per device")
+
+
+def run_all_tests():
+    test_reads_only_new_tail()
+    test_rewritten_log_falls_back_to_full_read()
+    test_clear_policy()
+    test_cursor_persisted_per_device()
+    print("\n✅ All device log cursor tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
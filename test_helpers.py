@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the in-memory SQLite test suites (no tests here)
+- memory_database(): a connection with a schema applied
+- CountingConnection: counts the statements a code path sends
+- run_with(): runs a function with get_db() pointed at a test connection
+"""
+
+import contextlib
+import io
+import sqlite3
+
+import database
+from database import invalidate_schema_cache, invalidate_shift_registry
+
+
+def memory_database(schema='', **kwargs):
+    """In-memory SQLite connection with sqlite3.Row rows and `schema` applied"""
+    conn = sqlite3.connect(':memory:', **kwargs)
+    conn.row_factory = sqlite3.Row
+    if schema:
+        conn.executescript(schema)
+    return conn
+
+
+class CountingConnection:
+    """Counts statements sent to the wrapped sqlite3 connection, cursors included."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = 0
+
+    def execute(self, *args):
+        self.statements += 1
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        self.statements += 1
+        return self.conn.executemany(*args)
+
+    def cursor(self):
+        return CountingConnection._Cursor(self, self.conn.cursor())
+
+    class _Cursor:
+        def __init__(self, owner, cursor):
+            self.owner = owner
+            self.cursor = cursor
+
+        def execute(self, *args):
+            self.owner.statements += 1
+            return self.cursor.execute(*args)
+
+        def executemany(self, *args):
+            self.owner.statements += 1
+            return self.cursor.executemany(*args)
+
+        def __getattr__(self, name):
+            return getattr(self.cursor, name)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def quietly(func, *args, **kwargs):
+    """Call func with its progress prints silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def run_with(conn, func, *args, modules=(), **kwargs):
+    """
+    Call func quietly with get_db() of database (and of `modules`, which
+    imported it by name) returning `conn`. The schema and shift caches are
+    dropped before and after, so nothing leaks between test connections.
+    """
+    modules = (database,) + tuple(modules)
+    originals = [module.get_db for module in modules]
+    invalidate_schema_cache()
+    invalidate_shift_registry()
+    for module in modules:
+        module.get_db = lambda: conn
+    try:
+        return quietly(func, *args, **kwargs)
+    finally:
+        for module, original in zip(modules, originals):
+            module.get_db = original
+        invalidate_schema_cache()
+        invalidate_shift_registry()
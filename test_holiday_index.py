@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Holiday index - Test Suite
+Checks in-memory holiday lookups against the rules of the old per-date
+queries, plus loading and invalidation (no database server required)
+"""
+
+import sys
+from datetime import date
+
+import database
+from database import HolidayIndex, get_holiday_index, invalidate_holiday_index
+
+
+ROWS = [
+    {'id': 1, 'holiday_name': 'Pongal', 'holiday_type': 'institution_wide',
+     'start_date': '2025-01-14', 'end_date': '2025-01-16', 'departments': None},
+    {'id': 2, 'holiday_name': 'Lab Maintenance', 'holiday_type': 'department_specific',
+     'start_date': '2025-01-20', 'end_date': '2025-01-22', 'departments': '["Science", "Maths"]'},
+    {'id': 3, 'holiday_name': 'Sports Day', 'holiday_type': 'department_specific',
+     'start_date': date(2025, 1, 10), 'end_date': date(2025, 1, 10), 'departments': '"Physical Education"'},
+    {'id': 4, 'holiday_name': 'Broken', 'holiday_type': 'department_specific',
+     'start_date': '2025-01-01', 'end_date': '2025-01-31', 'departments': 'not json'},
+    {'id': 5, 'holiday_name': 'Republic Day', 'holiday_type': 'institution_wide',
+     'start_date': '2025-01-26', 'end_date': '2025-01-26', 'departments': None},
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def execute(self, sql, params=()):
+        self.queries += 1
+        return FakeCursor(self.rows)
+
+
+def test_institution_and_department_lookups():
+    """Institution-wide holidays apply to everyone, department ones only to listed departments"""
+    index = HolidayIndex(1, ROWS)
+
+    assert index.is_holiday(date(2025, 1, 14))
+    assert index.is_holiday(date(2025, 1, 16), 'Science')
+    assert not index.is_holiday(date(2025, 1, 17))
+
+    assert index.is_holiday(date(2025, 1, 21), 'Maths')
+    assert not index.is_holiday(date(2025, 1, 21), 'History')
+    assert not index.is_holiday(date(2025, 1, 21))
+    assert not index.is_holiday(date(2025, 1, 23), 'Science')
+    print("✓ institution and department lookups")
+
+
+def test_legacy_department_values():
+    """Non-list departments keep `in` semantics and invalid JSON never matches"""
+    index = HolidayIndex(1, ROWS)
+
+    # A bare JSON string matches by substring, as the old query did
+    assert index.is_holiday(date(2025, 1, 10), 'Physical')
+    assert not index.is_holiday(date(2025, 1, 10), 'Science')
+    assert not index.is_holiday(date(2025, 1, 5), 'Broken')
+    print("✓ legacy department values")
+
+
+def test_overlapping_ranges():
+    """A short range nested after a long one does not hide the long one"""
+    rows = [
+        {'id': 1, 'holiday_name': 'Vacation', 'holiday_type': 'institution_wide',
+         'start_date': '2025-05-01', 'end_date': '2025-05-31', 'departments': None},
+        {'id': 2, 'holiday_name': 'May Day', 'holiday_type': 'institution_wide',
+         'start_date': '2025-05-02', 'end_date': '2025-05-02', 'departments': None},
+    ]
+    index = HolidayIndex(1, rows)
+    assert index.is_holiday(date(2025, 5, 20))
+    assert not index.is_holiday(date(2025, 6, 1))
+    print("✓ overlapping ranges")
+
+
+def test_holidays_in_range():
+    """Range queries filter by overlap and department, ordered by start date"""
+    index = HolidayIndex(1, ROWS)
+
+    names = [h['holiday_name'] for h in index.holidays_in_range('2025-01-15', '2025-01-25')]
+    assert names == ['Broken', 'Pongal', 'Lab Maintenance'], names
+
+    names = [h['holiday_name'] for h in index.holidays_in_range('2025-01-15', '2025-01-31', 'Science')]
+    assert names == ['Pongal', 'Lab Maintenance', 'Republic Day'], names
+
+    last = index.holidays_in_range('2025-01-26', '2025-01-26')[-1]
+    assert set(last) == set(ROWS[4]), "internal keys leaked"
+    last['holiday_name'] = 'changed'
+    assert index.holidays_in_range('2025-01-26', '2025-01-26')[-1]['holiday_name'] == 'Republic Day'
+    print("✓ holidays in range")
+
+
+def test_loaded_once_and_invalidated():
+    """The index is loaded once per school and reloaded after invalidation"""
+    invalidate_holiday_index()
+    db = FakeDB(ROWS)
+
+    for day in range(1, 32):
+        get_holiday_index(7, db).is_holiday(date(2025, 1, day), 'Science')
+    assert db.queries == 1
+
+    assert get_holiday_index('7', db) is get_holiday_index(7, db)
+    invalidate_holiday_index('7')
+    get_holiday_index(7, db)
+    assert db.queries == 2
+
+    original_ttl = database.HOLIDAY_INDEX_TTL
+    database.HOLIDAY_INDEX_TTL = 0
+    try:
+        get_holiday_index(7, db)
+        assert db.queries == 3, "expired index was not reloaded"
+    finally:
+        database.HOLIDAY_INDEX_TTL = original_ttl
+        invalidate_holiday_index()
+    print("✓ loaded once and invalidated")
+
+
+def run_all_tests():
+    test_institution_and_department_lookups()
+    test_legacy_department_values()
+    test_overlapping_ranges()
+    test_holidays_in_range()
+    test_loaded_once_and_invalidated()
+    print("\n✅ All holiday index tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
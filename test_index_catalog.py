@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Index catalog - Test Suite
+Checks that ensure_indexes() creates the INDEX_CATALOG indexes once, leaves
+out entries whose table or column is missing or whose columns an existing
+index already leads with, and that the index advisor stops reporting full
+scans once the catalog is applied (in-memory SQLite)
+"""
+
+import sqlite3
+import sys
+
+import database
+import index_advisor
+from database import ensure_indexes, get_table_indexes, index_catalog_status
+from test_helpers import memory_database, quietly
+
+
+SCHEMA = '''
+CREATE TABLE staff (id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT,
+                    UNIQUE(school_id, staff_id));
+CREATE TABLE attendance (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE,
+                         status TEXT, time_in TEXT, time_out TEXT, UNIQUE(staff_id, date));
+CREATE TABLE leave_applications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, leave_type TEXT,
+                                 start_date DATE, end_date DATE, status TEXT);
+CREATE TABLE permission_applications (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER,
+                                      permission_date DATE, duration_hours REAL, status TEXT);
+CREATE TABLE holidays (id INTEGER PRIMARY KEY, school_id INTEGER, holiday_name TEXT, start_date DATE,
+                       end_date DATE, holiday_type TEXT, is_active BOOLEAN DEFAULT 1);
+INSERT INTO staff (school_id, staff_id, full_name) VALUES (7, 'S1', 'Asha K');
+'''
+
+
+def build_database():
+    return memory_database(SCHEMA)
+
+
+def run_quietly(func, *args):
+    original = database._USE_MYSQL
+    database._USE_MYSQL = False
+    database.invalidate_schema_cache()
+    try:
+        return quietly(func, *args)
+    finally:
+        database._USE_MYSQL = original
+        database.invalidate_schema_cache()
+
+
+def test_catalog_applied_once():
+    conn = build_database()
+    created = run_quietly(ensure_indexes, conn)
+    assert created == [
+        'idx_attendance_school_date',
+        'idx_leave_applications_staff_status_dates',
+        'idx_leave_applications_school_status_dates',
+        'idx_permission_applications_staff_date',
+        'idx_permission_applications_school_date',
+        'idx_holidays_school_type_active_start',
+    ]
+    assert run_quietly(get_table_indexes, 'attendance', conn)['idx_attendance_school_date'] == ('school_id', 'date')
+    assert run_quietly(ensure_indexes, conn) == []
+    print("✓ catalog applied once")
+
+
+def test_catalog_status():
+    conn = build_database()
+    states = {entry['name']: entry for entry in run_quietly(index_catalog_status, conn)}
+    assert states['idx_attendance_school_date']['state'] == 'missing'
+    # Tables and columns this schema doesn't have
+    assert states['idx_on_duty_applications_staff_status_dates']['state'] == 'unavailable'
+    assert states['idx_biometric_verifications_staff_time']['state'] == 'unavailable'
+    assert states['idx_staff_biometric_id']['state'] == 'unavailable'
+    # UNIQUE(school_id, staff_id) already serves staff lookups
+    assert states['idx_staff_school_staff_id']['state'] == 'covered'
+    assert states['idx_staff_school_staff_id']['covered_by'].startswith('sqlite_autoindex_staff')
+
+    run_quietly(ensure_indexes, conn)
+    states = {entry['name']: entry['state'] for entry in run_quietly(index_catalog_status, conn)}
+    assert states['idx_attendance_school_date'] == 'present'
+    print("✓ catalog status")
+
+
+def test_advisor_reports_full_scans():
+    conn = build_database()
+    params = index_advisor.sample_params(conn)
+    assert params['school_id'] == 7 and params['staff_id'] == 'S1'
+
+    def scanned_tables():
+        tables = set()
+        for label, sql, names in index_advisor.HOT_QUERIES:
+            try:
+                _, scans = index_advisor.explain(conn, sql, tuple(params[name] for name in names), False)
+            except sqlite3.OperationalError:
+                continue  # table not in this schema
+            tables.update(scans)
+        return tables
+
+    assert scanned_tables() == {'attendance', 'leave_applications', 'permission_applications', 'holidays'}
+    run_quietly(ensure_indexes, conn)
+    assert scanned_tables() == set()
+    print("✓ advisor reports full scans")
+
+
+def run_all_tests():
+    test_catalog_applied_once()
+    test_catalog_status()
+    test_advisor_reports_full_scans()
+    print("\n✅ All index catalog tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Concurrent LAN sync - Test Suite
+Checks DeviceSyncScheduler (worker pool, per-device timeout, backoff for
+offline devices, overlap protection) and the sync metrics written by
+update_device_sync_status() (fake devices and in-memory SQLite)
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+import database
+from database import update_device_sync_status, invalidate_schema_cache
+from zk_biometric import DeviceSyncScheduler
+
+
+def devices(count):
+    return [{'id': n, 'device_name': f'Device {n}'} for n in range(1, count + 1)]
+
+
+def test_devices_sync_concurrently():
+    """Slow devices overlap instead of running one after another"""
+    scheduler = DeviceSyncScheduler(max_workers=4, device_timeout=5)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def sync_device(device):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        return {'success': True, 'record_count': device['id']}
+
+    reports = {}
+    started = time.monotonic()
+    summary = scheduler.run_cycle(devices(8), sync_device, lambda d, r: reports.__setitem__(d['id'], r))
+    elapsed = time.monotonic() - started
+
+    assert peak[0] == 4, peak
+    assert elapsed < 1.2, elapsed
+    assert set(summary['results']) == set(range(1, 9)) and not summary['timed_out']
+    assert reports[3]['record_count'] == 3 and reports[3]['latency_ms'] >= 200
+    assert reports[3]['consecutive_failures'] == 0
+    print(f"✓ devices sync concurrently (8 x 0.2s in {elapsed:.2f}s)")
+
+
+def test_timeout_and_backoff():
+    """Hung devices time out, and failing devices sit out a growing number of cycles"""
+    scheduler = DeviceSyncScheduler(max_workers=4, device_timeout=0.3, max_backoff_cycles=3)
+    release = threading.Event()
+    calls = []
+
+    def sync_device(device):
+        calls.append(device['id'])
+        if device['id'] == 1:
+            release.wait(5)  # unreachable device holding its socket
+            return {'success': False}
+        if device['id'] == 2:
+            raise ConnectionError('offline')
+        return {'success': True}
+
+    reports = []
+    started = time.monotonic()
+    summary = scheduler.run_cycle(devices(3), sync_device, lambda d, r: reports.append((d['id'], r)))
+    assert time.monotonic() - started < 2
+    assert summary['timed_out'] == [1]
+    assert not summary['results'][2]['success'] and summary['results'][3]['success']
+    assert dict(reports)[1]['error'] == 'timeout'
+
+    # Device 1 is still hung: skipped, never run twice at once
+    summary = scheduler.run_cycle(devices(3), sync_device)
+    assert summary['skipped'] == {1: 'still_running'}
+    release.set()
+    time.sleep(0.1)
+    assert len(reports) == 3, "late result of a timed-out sync must not be reported again"
+
+    # Device 2 failed twice: backoff of 1 cycle, then 3 (capped)
+    schedule = []
+    for _ in range(6):
+        summary = scheduler.run_cycle(devices(3)[1:2], sync_device)
+        schedule.append('skip' if summary['skipped'] else 'run')
+    assert schedule == ['skip', 'run', 'skip', 'skip', 'skip', 'run'], schedule
+    assert scheduler.get_backoff(2)['failures'] == 4
+    print("✓ timeout and backoff")
+
+
+def test_cycles_never_overlap():
+    """A cycle started while another is running returns immediately"""
+    scheduler = DeviceSyncScheduler(max_workers=2, device_timeout=5)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow(device):
+        entered.set()
+        release.wait(5)
+        return {'success': True}
+
+    thread = threading.Thread(target=scheduler.run_cycle, args=(devices(1), slow))
+    thread.start()
+    entered.wait(5)
+    assert scheduler.run_cycle(devices(2), slow) is None
+    release.set()
+    thread.join(5)
+    assert scheduler.run_cycle(devices(1), lambda d: {'success': True})['results'][1]['success']
+    print("✓ cycles never overlap")
+
+
+def test_sync_metrics_written():
+    """Metric columns are added on demand and written with the sync status"""
+    invalidate_schema_cache()
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE biometric_devices (id INTEGER PRIMARY KEY, last_sync DATETIME, sync_status TEXT)')
+    conn.execute('INSERT INTO biometric_devices (id) VALUES (1), (2)')
+
+    original = database.get_db
+    database.get_db = lambda: conn
+    try:
+        assert update_device_sync_status(2, sync_status='failed')
+        assert 'sync_failure_count' not in database.get_table_columns('biometric_devices', conn)
+        assert update_device_sync_status(1, sync_status='failed', latency_ms=1530, record_count=0, failure_count=2)
+        row = conn.execute('SELECT * FROM biometric_devices WHERE id = 1').fetchone()
+        assert (row['sync_status'], row['last_sync_latency_ms'], row['last_sync_record_count'],
+                row['sync_failure_count']) == ('failed', 1530, 0, 2)
+        assert update_device_sync_status(1, latency_ms=40, record_count=12, failure_count=0)
+        row = conn.execute('SELECT * FROM biometric_devices WHERE id = 1').fetchone()
+        assert (row['sync_status'], row['last_sync_record_count'], row['sync_failure_count']) == ('success', 12, 0)
+    finally:
+        database.get_db = original
+        invalidate_schema_cache()
+    print("✓ sync metrics written")
+
+
+def run_all_tests():
+    test_devices_sync_concurrently()
+    test_timeout_and_backoff()
+    test_cycles_never_overlap()
+    test_sync_metrics_written()
+    print("\n✅ All LAN sync scheduler tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
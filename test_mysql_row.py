@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+MySQL row materialization - Test Suite
+Checks sqlite3.Row-compatible access and selective TIME/BLOB coercion
+using a fake pymysql cursor (no MySQL server required)
+"""
+
+import datetime
+import sys
+
+from database import _MySQLCursorWrapper, _MySQLRow
+
+
+class FakeField:
+    def __init__(self, charsetnr):
+        self.charsetnr = charsetnr
+
+
+class FakeResult:
+    def __init__(self, fields):
+        self.fields = fields
+
+
+class FakeRawCursor:
+    """Mimics a buffered pymysql cursor over a fixed result set"""
+
+    def __init__(self, description, charsets, rows):
+        self.description = description
+        self._result = FakeResult([FakeField(c) for c in charsets])
+        self._rows = list(rows)
+
+    def execute(self, sql, params=()):
+        return len(self._rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        out, self._rows = self._rows[:size], self._rows[size:]
+        return out
+
+    def fetchall(self):
+        out, self._rows = self._rows, []
+        return out
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+
+def make_cursor(rows):
+    # id INT, full_name VARCHAR (utf8mb4), shift_start TIME, photo BLOB (binary)
+    description = (
+        ('id', 3, None, 11, 11, 0, False),
+        ('full_name', 253, None, 400, 400, 0, True),
+        ('shift_start', 11, None, 10, 10, 0, True),
+        ('photo', 252, None, 65535, 65535, 0, True),
+    )
+    raw = FakeRawCursor(description, [63, 45, 63, 63], rows)
+    cur = _MySQLCursorWrapper(raw, None)
+    cur.execute('SELECT * FROM staff')
+    return cur
+
+
+ROWS = [
+    (1, 'Anita', datetime.timedelta(hours=9, minutes=15), b'abc'),
+    (2, 'Ravi', None, None),
+    (3, 'Meena', datetime.timedelta(hours=17), b'xyz'),
+]
+
+
+def test_key_and_index_access():
+    """Rows answer both row['col'] and row[i] like sqlite3.Row"""
+    row = make_cursor(ROWS).fetchone()
+    assert isinstance(row, dict)
+    assert row['id'] == 1 and row[0] == 1
+    assert row['full_name'] == 'Anita' and row[1] == 'Anita'
+    assert row.get('missing', 'x') == 'x'
+    assert list(row.keys()) == ['id', 'full_name', 'shift_start', 'photo']
+    assert dict(row)['id'] == 1
+    print("✓ key and index access")
+
+
+def test_time_and_blob_coercion():
+    """TIME → datetime.time and binary columns → str, NULLs untouched"""
+    rows = make_cursor(ROWS).fetchall()
+    assert rows[0]['shift_start'] == datetime.time(9, 15)
+    assert rows[0][2] == datetime.time(9, 15)
+    assert rows[0]['photo'] == 'abc'
+    assert rows[1]['shift_start'] is None and rows[1]['photo'] is None
+    print("✓ TIME/BLOB coercion")
+
+
+def test_columns_shared_across_rows():
+    """Column metadata is computed once per result set"""
+    cur = make_cursor(ROWS)
+    columns = cur._result_columns()
+    assert columns.coerce_idx == (2, 3), columns.coerce_idx
+    assert cur._result_columns() is columns
+    rows = list(cur)
+    assert [r['id'] for r in rows] == [1, 2, 3]
+    assert not hasattr(rows[0], '__dict__'), "rows should be __slots__-based"
+    print("✓ shared column metadata")
+
+
+def test_fetchmany_and_reexecute():
+    """fetchmany pages through rows and execute() resets the column cache"""
+    cur = make_cursor(ROWS)
+    assert [r['id'] for r in cur.fetchmany(2)] == [1, 2]
+    columns = cur._result_columns()
+    cur.execute('SELECT * FROM staff')
+    assert cur._columns is None
+    assert cur._result_columns() is not columns
+    print("✓ fetchmany and re-execute")
+
+
+def test_row_without_coercion_keeps_tuple():
+    """Result sets without TIME/BLOB columns avoid copying the raw tuple"""
+    class Cols:
+        names = ('a', 'b')
+        coerce_idx = ()
+    raw = (1, 2)
+    row = _MySQLRow(Cols, raw)
+    assert row._values is raw
+    assert row[1] == 2 and row['a'] == 1
+    print("✓ no-copy rows")
+
+
+def run_all_tests():
+    test_key_and_index_access()
+    test_time_and_blob_coercion()
+    test_columns_shared_across_rows()
+    test_fetchmany_and_reexecute()
+    test_row_without_coercion_keeps_tuple()
+    print("\n✅ All MySQL row tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Staff photo store - Test Suite
+Checks that photos are stored once per content hash, that thumbnails are
+generated on demand, that base64 photo_data rows are copied into the store
+(and only cleared when asked), that a missing file is restored from
+photo_data, and that the photo route answers with immutable caching headers and 304s
+(temporary directories and SQLite file)
+"""
+
+import base64
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+from flask import Flask
+from PIL import Image
+
+import database
+from photo_store import (PhotoStore, THUMBNAIL_SIZES, decode_photo_data, migrate_staff_photo_data,
+                         restore_staff_photo)
+
+
+def make_image(color, fmt='JPEG', size=(300, 400)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, format=fmt)
+    return out.getvalue()
+
+
+def test_put_and_thumbnails():
+    store = PhotoStore(tempfile.mkdtemp())
+    jpeg = make_image('red')
+    digest = store.put(jpeg)
+    assert store.put(jpeg) == digest
+    assert os.listdir(os.path.join(store.root, digest[:2])) == [f'{digest}.jpg']
+
+    # PNG uploads are stored as JPEG
+    png_digest = store.put(make_image('blue', fmt='PNG'))
+    with open(store.path(png_digest), 'rb') as f:
+        assert f.read(2) == b'\xff\xd8'
+
+    for size in THUMBNAIL_SIZES:
+        with Image.open(store.path(digest, size)) as thumbnail:
+            assert max(thumbnail.size) == size
+    assert store.path(digest, 999) is None
+    assert store.path('0' * 64) is None
+    assert store.path('../../etc/passwd') is None
+    print("✓ put and thumbnails")
+
+
+def test_migrates_photo_data():
+    original_use_mysql = database._USE_MYSQL
+    database._USE_MYSQL = False
+    database.invalidate_schema_cache()
+    try:
+        conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'staff.db'))
+        conn.row_factory = sqlite3.Row
+        conn.execute('CREATE TABLE staff (id INTEGER PRIMARY KEY, full_name TEXT, photo_data TEXT)')
+        jpeg = make_image('green')
+        encoded = base64.b64encode(jpeg).decode('utf-8')
+        conn.executemany('INSERT INTO staff (full_name, photo_data) VALUES (?, ?)', [
+            ('Asha K', encoded),
+            ('Ravi M', f'data:image/jpeg;base64,{encoded}'),
+            ('Meena S', None),
+            ('Broken', 'not base64!'),
+        ])
+        conn.commit()
+
+        store = PhotoStore(tempfile.mkdtemp())
+        assert migrate_staff_photo_data(conn, store, batch_size=1) == 2
+        rows = {row['full_name']: row for row in conn.execute('SELECT * FROM staff')}
+        digest = rows['Asha K']['photo_hash']
+        assert digest and rows['Ravi M']['photo_hash'] == digest
+        # photo_data stays: the store may be local to this machine
+        assert rows['Asha K']['photo_data'] == encoded
+        assert rows['Meena S']['photo_hash'] is None
+        assert rows['Broken']['photo_data'] == 'not base64!' and rows['Broken']['photo_hash'] is None
+        with open(store.path(digest), 'rb') as f:
+            assert f.read() == jpeg
+
+        # Nothing left to copy
+        assert migrate_staff_photo_data(conn, store) == 0
+
+        # Another instance restores the file from photo_data
+        other = PhotoStore(tempfile.mkdtemp())
+        assert not other.exists(digest)
+        assert restore_staff_photo(digest, conn, other) and other.exists(digest)
+        assert not restore_staff_photo('0' * 64, conn, other) and not restore_staff_photo('../x', conn, other)
+
+        # Clearing is explicit, and covers rows copied earlier
+        assert migrate_staff_photo_data(conn, store, clear_data=True) == 2
+        rows = {row['full_name']: row for row in conn.execute('SELECT * FROM staff')}
+        assert rows['Asha K']['photo_data'] is None and rows['Ravi M']['photo_data'] is None
+        assert rows['Asha K']['photo_hash'] == digest and rows['Broken']['photo_data'] == 'not base64!'
+        assert decode_photo_data(f' data:image/png;base64,{encoded}\n') == jpeg
+        conn.close()
+    finally:
+        database._USE_MYSQL = original_use_mysql
+        database.invalidate_schema_cache()
+    print("✓ migrates photo_data")
+
+
+def test_photo_route_caching():
+    import photo_store
+
+    originals = {name: getattr(database, name) for name in ('_USE_MYSQL', 'SQLITE_PATH')}
+    original_store = photo_store._photo_store
+    database._USE_MYSQL = False
+    database.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'staff.db')
+    photo_store._photo_store = PhotoStore(tempfile.mkdtemp())
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(photo_store.photo_bp)
+    try:
+        digest = photo_store._photo_store.put(make_image('purple'))
+        # Stored by another instance: only photo_data is here
+        elsewhere = make_image('orange')
+        with app.app_context():
+            db = database.get_db()
+            db.execute('CREATE TABLE staff (id INTEGER PRIMARY KEY, photo_data TEXT, photo_hash VARCHAR(64))')
+            db.execute('INSERT INTO staff (photo_data, photo_hash) VALUES (?, ?)',
+                       (base64.b64encode(elsewhere).decode('utf-8'), PhotoStore(tempfile.mkdtemp()).put(elsewhere)))
+            db.commit()
+            elsewhere_digest = db.execute('SELECT photo_hash FROM staff').fetchone()[0]
+
+        client = app.test_client()
+        assert client.get(f'/staff_photos/{digest}.jpg').status_code == 401
+
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['user_type'] = 'admin'
+        with app.test_request_context():
+            url = photo_store.staff_photo_url(digest, 64)
+        assert url == f'/staff_photos/{digest}/64.jpg'
+
+        response = client.get(url)
+        assert response.status_code == 200 and response.mimetype == 'image/jpeg'
+        cache_control = response.headers['Cache-Control']
+        assert 'immutable' in cache_control and 'private' in cache_control and 'max-age=31536000' in cache_control
+        etag = response.headers['ETag']
+
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        assert client.get(f'/staff_photos/{digest}/65.jpg').status_code == 404
+        assert client.get(f'/staff_photos/{"0" * 64}.jpg').status_code == 404
+
+        response = client.get(f'/staff_photos/{elsewhere_digest}.jpg')
+        assert response.status_code == 200 and response.data == elsewhere
+    finally:
+        for name, value in originals.items():
+            setattr(database, name, value)
+        photo_store._photo_store = original_store
+    print("✓ photo route caching")
+
+
+def run_all_tests():
+    test_put_and_thumbnails()
+    test_migrates_photo_data()
+    test_photo_route_caching()
+    print("\n✅ All photo store tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
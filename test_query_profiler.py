@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Query profiler - Test Suite
+Checks that with QUERY_PROFILING on, statements issued through SQLite and
+MySQL-wrapped connections are counted per app context with duplicates and
+redacted parameters, that finished profiles add up per endpoint, that slow
+statements go to a rotating log, and that nothing is recorded when profiling
+is off (temporary SQLite file, fake pymysql cursor)
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+from flask import Flask
+
+import database
+import slow_query_report
+from database import finish_query_profile, get_query_profile_stats, reset_query_profile_stats
+
+
+@contextlib.contextmanager
+def profiling(slow_ms=10_000, log_path=None, max_bytes=None):
+    names = ('QUERY_PROFILING', 'SLOW_QUERY_MS', 'SLOW_QUERY_LOG', 'SLOW_QUERY_LOG_MAX_BYTES',
+             '_slow_query_logger', '_USE_MYSQL', 'SQLITE_PATH')
+    originals = {name: getattr(database, name) for name in names}
+    database.QUERY_PROFILING = True
+    database.SLOW_QUERY_MS = slow_ms
+    database.SLOW_QUERY_LOG = log_path or os.path.join(tempfile.mkdtemp(), 'slow.log')
+    database.SLOW_QUERY_LOG_MAX_BYTES = max_bytes or database.SLOW_QUERY_LOG_MAX_BYTES
+    database._slow_query_logger = None
+    database._USE_MYSQL = False
+    database.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+    reset_query_profile_stats()
+    try:
+        yield
+    finally:
+        logger = database._slow_query_logger
+        if logger is not None:
+            for handler in list(logger.handlers):
+                handler.close()
+                logger.removeHandler(handler)
+        for name, value in originals.items():
+            setattr(database, name, value)
+        reset_query_profile_stats()
+
+
+def test_sqlite_requests_are_profiled():
+    app = Flask(__name__)
+    with profiling():
+        with app.test_request_context('/dashboard'):
+            db = database.get_db()
+            db.execute('CREATE TABLE staff (id INTEGER PRIMARY KEY, full_name TEXT, phone TEXT)')
+            db.executemany('INSERT INTO staff (full_name, phone) VALUES (?, ?)',
+                           [('Asha K', '9876543210'), ('Ravi M', '9123456780')])
+            for staff_id in (1, 2, 3):
+                db.execute('SELECT full_name FROM staff WHERE id = ?', (staff_id,)).fetchone()
+            cursor = db.cursor()
+            cursor.execute('SELECT  COUNT(*)\n FROM staff')
+            summary = finish_query_profile('admin_dashboard')
+            db.close()
+
+        assert summary['queries'] == 6 and summary['duplicates'] == 2
+        assert summary['repeated'] == [{'sql': 'SELECT full_name FROM staff WHERE id = ?', 'count': 3}]
+        assert 'SELECT COUNT(*) FROM staff' in [entry['sql'] for entry in summary['slowest']]
+        assert '9876543210' not in json.dumps(summary)
+
+        # A finished profile isn't reported twice
+        with app.app_context():
+            assert finish_query_profile('admin_dashboard') is None
+
+        stats = get_query_profile_stats()
+        assert [row['endpoint'] for row in stats] == ['admin_dashboard']
+        assert stats[0]['requests'] == 1 and stats[0]['max_queries'] == 6 and stats[0]['avg_duplicates'] == 2.0
+    print("✓ sqlite requests are profiled")
+
+
+def test_mysql_wrapper_is_profiled():
+    class FakeCursor:
+        description = (('full_name',),)
+
+        def __init__(self):
+            self.executed = []
+
+        def execute(self, sql, params):
+            self.executed.append((sql, params))
+
+        def executemany(self, sql, seq):
+            self.executed.append((sql, list(seq)))
+
+    app = Flask(__name__)
+    with profiling():
+        with app.app_context():
+            raw = FakeCursor()
+            cursor = database._MySQLCursorWrapper(raw, None)
+            cursor.execute('SELECT full_name FROM staff WHERE school_id = ? AND phone = ?', (4, '9876543210'))
+            cursor.executemany('UPDATE staff SET phone = ? WHERE id = ?', [('1', 1)])
+            summary = finish_query_profile('staff_lookup')
+
+    # Recorded in SQLite syntax as written in the code, executed translated
+    assert raw.executed[0][0] == 'SELECT full_name FROM staff WHERE school_id = %s AND phone = %s'
+    assert summary['queries'] == 2 and summary['duplicates'] == 0
+    lookup = next(entry for entry in summary['slowest'] if entry['sql'].startswith('SELECT'))
+    assert lookup['sql'] == 'SELECT full_name FROM staff WHERE school_id = ? AND phone = ?'
+    assert lookup['params'] == ['int', 'str']
+    update = next(entry for entry in summary['slowest'] if entry['sql'].startswith('UPDATE'))
+    assert update['params'] == '1 rows'
+    print("✓ mysql wrapper is profiled")
+
+
+def test_slow_query_log_rotates():
+    log_path = os.path.join(tempfile.mkdtemp(), 'logs', 'slow.log')
+    app = Flask(__name__)
+    with profiling(slow_ms=0, log_path=log_path, max_bytes=400):
+        with app.test_request_context('/reports'):
+            db = database.get_db()
+            for n in range(10):
+                db.execute('SELECT ? AS secret', (f'password-{n}',)).fetchone()
+            finish_query_profile('reports')
+            db.close()
+
+    assert os.path.exists(log_path) and os.path.exists(log_path + '.1')
+    entries = slow_query_report.read_entries(log_path)
+    assert entries and all(entry['params'] == ['str'] for entry in entries)
+    assert not any('password' in json.dumps(entry) for entry in entries)
+
+    groups = slow_query_report.summarize(entries, by='statement')
+    assert [group['key'] for group in groups] == ['SELECT ? AS secret']
+    assert groups[0]['count'] == len(entries) and groups[0]['related'] == {'<no endpoint>'}
+    print("✓ slow query log rotates")
+
+
+def test_disabled_records_nothing():
+    app = Flask(__name__)
+    with profiling():
+        database.QUERY_PROFILING = False
+        with app.app_context():
+            db = database.get_db()
+            db.execute('SELECT 1').fetchone()
+            assert finish_query_profile('anything') is None
+            db.close()
+        assert get_query_profile_stats() == []
+    print("✓ disabled records nothing")
+
+
+def run_all_tests():
+    test_sqlite_requests_are_profiled()
+    test_mysql_wrapper_is_profiled()
+    test_slow_query_log_rotates()
+    test_disabled_records_nothing()
+    print("\n✅ All query profiler tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Background report jobs - Test Suite
+Checks that report jobs are built off the calling thread, that finished files
+are cached by (report type, params, watermark) and expire after the TTL, that
+concurrent identical requests share one build (across processes sharing
+the cache directory too), and that data_watermark
+changes when attendance, staff pay or application approvals change (in-memory
+SQLite, temporary cache directory)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from flask import Response
+
+import report_jobs
+from database import invalidate_schema_cache
+from report_jobs import STAFF_PAY_COLUMNS, ReportArtifactCache, ReportFile, ReportJobQueue, data_watermark
+from test_helpers import memory_database
+
+
+def build_database():
+    return memory_database('''
+        CREATE TABLE staff (id INTEGER PRIMARY KEY, school_id INTEGER);
+        CREATE TABLE attendance (id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE);
+        INSERT INTO staff VALUES (1, 7), (2, 8);
+        INSERT INTO attendance (staff_id, school_id, date) VALUES (1, 7, '2025-03-03');
+    ''', check_same_thread=False)
+
+
+def make_queue(conn, ttl=900):
+    report_jobs.get_db = lambda: conn
+    return ReportJobQueue(cache=ReportArtifactCache(tempfile.mkdtemp(), ttl=ttl), max_workers=2)
+
+
+def attendance_watermark(db, params):
+    return data_watermark(db, params.get('school_id'), '2025-03-01', '2025-03-31')
+
+
+def test_cached_by_params_and_watermark():
+    conn = build_database()
+    queue = make_queue(conn)
+    builds = []
+
+    def build(params, progress):
+        builds.append(params)
+        progress(1, 2)
+        response = Response([b'report for ', str(params['school_id']).encode()], mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=report.csv'
+        return response
+
+    queue.register('report', build, attendance_watermark)
+
+    job = queue.wait(queue.submit('report', {'school_id': 7})['job_id'])
+    assert job['status'] == 'completed' and not job['cached'] and job['progress'] == 100.0
+    artifact = queue.artifact(job)
+    assert artifact['filename'] == 'report.csv' and artifact['mimetype'] == 'text/csv'
+    with open(artifact['path'], 'rb') as f:
+        assert f.read() == b'report for 7'
+
+    # Same request: served from the cache without building
+    cached = queue.submit('report', {'school_id': 7})
+    assert cached['status'] == 'completed' and cached['cached'] and cached['job_id'] != job['job_id']
+    assert len(builds) == 1
+
+    # Other parameters, new attendance and refresh each build again
+    queue.wait(queue.submit('report', {'school_id': 8})['job_id'])
+    assert len(builds) == 2
+    conn.execute("INSERT INTO attendance (staff_id, school_id, date) VALUES (1, 7, '2025-03-04')")
+    rebuilt = queue.wait(queue.submit('report', {'school_id': 7})['job_id'])
+    assert not rebuilt['cached'] and rebuilt['cache_key'] != job['cache_key'] and len(builds) == 3
+    queue.wait(queue.submit('report', {'school_id': 7}, refresh=True)['job_id'])
+    assert len(builds) == 4
+    print("✓ cached by params and watermark")
+
+
+def test_identical_requests_share_one_build():
+    conn = build_database()
+    queue = make_queue(conn)
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def build(params, progress):
+        builds.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+        return {'success': True, 'rows': [1, 2, 3]}
+
+    queue.register('report', build, attendance_watermark)
+
+    first = queue.submit('report', {'school_id': 7})
+    started.wait(5)
+    assert queue.get_job(first['job_id'])['status'] == 'running'
+    # Requests stop waiting after their timeout and hand out the job instead
+    assert queue.wait(first['job_id'], timeout=0.05)['status'] == 'running'
+    second = queue.submit('report', {'school_id': 7})
+    assert second['job_id'] == first['job_id']
+
+    release.set()
+    job = queue.wait(first['job_id'])
+    assert job['status'] == 'completed' and len(builds) == 1
+    assert builds[0].startswith('report-job') and builds[0] != threading.current_thread().name
+    with open(queue.artifact(job)['path']) as f:
+        assert json.load(f) == {'success': True, 'rows': [1, 2, 3]}
+
+    # Once finished, the next request is a cache hit rather than a join
+    assert queue.submit('report', {'school_id': 7})['cached']
+    print("✓ identical requests share one build")
+
+
+def test_jobs_shared_across_processes():
+    conn = build_database()
+    cache_dir = tempfile.mkdtemp()
+    # Two workers: separate queues (threads, futures) over one cache directory
+    here, there = (ReportJobQueue(cache=ReportArtifactCache(cache_dir), max_workers=1) for _ in range(2))
+    report_jobs.get_db = lambda: conn
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def build(params, progress):
+        builds.append(params)
+        started.set()
+        release.wait(5)
+        return {'success': True}
+
+    for queue in (here, there):
+        queue.register('report', build, attendance_watermark)
+
+    first = here.submit('report', {'school_id': 7})
+    started.wait(5)
+    assert there.get_job(first['job_id'])['status'] == 'running'
+    assert there.submit('report', {'school_id': 7})['job_id'] == first['job_id']
+    assert there.wait(first['job_id'], timeout=0.05)['status'] == 'running'
+
+    release.set()
+    job = there.wait(first['job_id'])
+    assert job['status'] == 'completed' and len(builds) == 1 and there.artifact(job)
+    assert there.get_job('../../etc/passwd') is None and there.get_job('0' * 32) is None
+
+    # A build whose process died stops blocking once stale
+    stale = here.jobs.create(report_type='report', cache_key='k')
+    assert here.jobs.claim('k', stale['job_id']) is None
+    other = here.jobs.create(report_type='report', cache_key='k')
+    assert here.jobs.claim('k', other['job_id']) == stale['job_id']
+    original = report_jobs.REPORT_JOB_STALE
+    report_jobs.REPORT_JOB_STALE = 0
+    try:
+        assert here.jobs.claim('k', other['job_id']) is None
+    finally:
+        report_jobs.REPORT_JOB_STALE = original
+    print("✓ jobs shared across processes")
+
+
+def test_failures_and_files():
+    conn = build_database()
+    queue = make_queue(conn)
+    export_dir = tempfile.mkdtemp()
+
+    def build_backup(params, progress):
+        if params['fail']:
+            return {'success': False, 'error': 'Invalid export type'}
+        path = os.path.join(export_dir, 'export.json')
+        with open(path, 'w') as f:
+            f.write('{}')
+        return ReportFile(path, 'export.json', None)
+
+    queue.register('backup', build_backup)
+
+    failed = queue.wait(queue.submit('backup', {'fail': True})['job_id'])
+    assert failed['status'] == 'failed' and failed['error'] == 'Invalid export type'
+    assert queue.artifact(failed) is None
+
+    job = queue.wait(queue.submit('backup', {'fail': False})['job_id'])
+    artifact = queue.artifact(job)
+    assert artifact['mimetype'] == 'application/json' and os.path.getsize(artifact['path']) == 2
+    assert not os.listdir(export_dir)  # moved into the cache
+
+    try:
+        queue.submit('missing', {})
+        raise AssertionError('unknown report type accepted')
+    except ValueError:
+        pass
+    print("✓ failures and files")
+
+
+def test_ttl_eviction():
+    cache = ReportArtifactCache(tempfile.mkdtemp(), ttl=60)
+    cache.put('fresh', [b'a'], {'filename': 'a.csv'})
+    cache.put('old', [b'b'], {'filename': 'b.csv'})
+
+    meta_path = os.path.join(cache.directory, 'old.json')
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta['created_at'] -= 120
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    assert cache.get('old') is None and cache.get('fresh')['filename'] == 'a.csv'
+    assert sorted(os.listdir(cache.directory)) == ['fresh.data', 'fresh.json']
+
+    cache.ttl = 0
+    assert cache.evict_expired() == 1 and not os.listdir(cache.directory)
+    print("✓ ttl eviction")
+
+
+def test_data_watermark():
+    conn = build_database()
+    before = data_watermark(conn, 7, '2025-03-01', '2025-03-31', tables=('salary_rules',))
+    assert before[0] == ['attendance', '1', '1'] and before[-1] == ['salary_rules', None]
+
+    conn.execute("INSERT INTO attendance (staff_id, school_id, date) VALUES (2, 8, '2025-03-03')")
+    conn.execute("INSERT INTO attendance (staff_id, school_id, date) VALUES (1, 7, '2025-04-01')")
+    assert data_watermark(conn, 7, '2025-03-01', '2025-03-31', tables=('salary_rules',)) == before
+    conn.execute("INSERT INTO staff VALUES (3, 7)")
+    assert data_watermark(conn, 7, '2025-03-01', '2025-03-31', tables=('salary_rules',)) != before
+    print("✓ data watermark")
+
+
+def test_salary_watermark_sees_edits():
+    conn = build_database()
+    conn.executescript('''
+        ALTER TABLE staff ADD COLUMN basic_salary REAL;
+        ALTER TABLE staff ADD COLUMN hra REAL;
+        UPDATE staff SET basic_salary = 30000, hra = 5000;
+        INSERT INTO staff VALUES (3, 7, 30000, 5000);
+        CREATE TABLE permission_applications (id INTEGER PRIMARY KEY, school_id INTEGER, status TEXT,
+                                              processed_at TIMESTAMP, withdrawn_at TIMESTAMP);
+        INSERT INTO permission_applications (school_id, status) VALUES (7, 'pending');
+    ''')
+    invalidate_schema_cache()
+    try:
+        def watermark():
+            return data_watermark(conn, 7, '2025-03-01', '2025-03-31', tables=('permission_applications',),
+                                  staff_columns=STAFF_PAY_COLUMNS)
+
+        before = watermark()
+        conn.execute('UPDATE staff SET basic_salary = 32000 WHERE id = 1')
+        after_raise = watermark()
+        assert after_raise != before
+
+        # Moving pay between staff members keeps the sums but not the id-weighted ones
+        conn.execute('UPDATE staff SET hra = 6000 WHERE id = 1')
+        conn.execute('UPDATE staff SET hra = 4000 WHERE id = 3')
+        assert watermark() != after_raise
+
+        before = watermark()
+        conn.execute("UPDATE permission_applications SET status = 'approved'")
+        assert watermark() != before
+    finally:
+        invalidate_schema_cache()
+    print("✓ salary watermark sees edits")
+
+
+def run_all_tests():
+    original_get_db = report_jobs.get_db
+    try:
+        test_cached_by_params_and_watermark()
+        test_identical_requests_share_one_build()
+        test_jobs_shared_across_processes()
+        test_failures_and_files()
+        test_ttl_eviction()
+        test_data_watermark()
+        test_salary_watermark_sees_edits()
+    finally:
+        report_jobs.get_db = original_get_db
+    print("\n✅ All report job tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
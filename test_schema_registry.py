@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Schema registry - Test Suite
+Checks that column sets are cached per table and dropped after DDL
+"""
+
+import sqlite3
+import sys
+
+import database
+from database import _SQLiteConnection, get_table_columns, has_column, invalidate_schema_cache
+
+
+class CountingConnection(_SQLiteConnection):
+    pragma_calls = 0
+
+    def execute(self, sql, parameters=()):
+        if sql.lstrip().upper().startswith('PRAGMA TABLE_INFO'):
+            CountingConnection.pragma_calls += 1
+        return super().execute(sql, parameters)
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:', factory=CountingConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE staff (id INTEGER PRIMARY KEY, staff_id TEXT, full_name TEXT)')
+    invalidate_schema_cache()
+    CountingConnection.pragma_calls = 0
+    return conn
+
+
+def test_columns_loaded_once():
+    """Repeated lookups reuse the cached column set"""
+    db = make_db()
+    assert get_table_columns('staff', db) == {'id', 'staff_id', 'full_name'}
+    for _ in range(10):
+        assert has_column('staff', 'full_name', db)
+        assert not has_column('staff', 'is_active', db)
+    assert CountingConnection.pragma_calls == 1, CountingConnection.pragma_calls
+    print("✓ columns loaded once")
+
+
+def test_ddl_invalidates_cache():
+    """ALTER TABLE through the connection drops the cached columns"""
+    db = make_db()
+    assert not has_column('staff', 'is_active', db)
+    db.execute('ALTER TABLE staff ADD COLUMN is_active INTEGER DEFAULT 1')
+    assert has_column('staff', 'is_active', db)
+    assert CountingConnection.pragma_calls == 2
+    print("✓ DDL invalidation")
+
+
+def test_missing_table_not_cached():
+    """Tables that do not exist yet are looked up again next time"""
+    db = make_db()
+    assert get_table_columns('later_table', db) == frozenset()
+    assert 'later_table' not in database._schema_columns
+    print("✓ missing tables not cached")
+
+
+def run_all_tests():
+    test_columns_loaded_once()
+    test_ddl_invalidates_cache()
+    test_missing_table_not_cached()
+    print("\n✅ All schema registry tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Schema version - Test Suite
+Checks that init_db() stamps the database after the full bootstrap pass,
+skips the pass while the stamp is current, and runs it again when new
+schools need seeding, when forced, or after a failed migration
+(temporary SQLite file)
+"""
+
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+from flask import Flask
+
+import database
+from database import get_schema_stamp, init_db, schema_fingerprint
+
+
+def make_app():
+    directory = tempfile.mkdtemp()
+    app = Flask(__name__, instance_path=os.path.join(directory, 'instance'))
+    return app, os.path.join(directory, 'test.db')
+
+
+def run_quietly(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def with_sqlite(path, func):
+    originals = database._USE_MYSQL, database.SQLITE_PATH
+    database._USE_MYSQL, database.SQLITE_PATH = False, path
+    try:
+        return func()
+    finally:
+        database._USE_MYSQL, database.SQLITE_PATH = originals
+
+
+def query(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_bootstrap_runs_once():
+    app, path = make_app()
+
+    def scenario():
+        assert run_quietly(init_db, app) is True
+        assert database.LAST_SCHEMA_BOOTSTRAP['ran'] is True
+        tables = {row[0] for row in query(path, "SELECT name FROM sqlite_master WHERE type='table'")}
+        assert {'staff', 'attendance', 'schema_version', 'on_duty_permissions', 'staff_shift_history'} <= tables
+        with app.app_context():
+            assert get_schema_stamp() == schema_fingerprint()
+
+        # A stamped database skips the pass entirely
+        def schema_pass(app):
+            raise AssertionError('schema pass ran on a stamped database')
+
+        original = database._create_schema
+        database._create_schema = schema_pass
+        try:
+            assert run_quietly(init_db, app) is False
+            assert database.LAST_SCHEMA_BOOTSTRAP['ran'] is False
+        finally:
+            database._create_schema = original
+
+        assert run_quietly(init_db, app, force=True) is True
+
+    with_sqlite(path, scenario)
+    print("✓ bootstrap runs once")
+
+
+def test_new_school_is_seeded():
+    app, path = make_app()
+
+    def scenario():
+        run_quietly(init_db, app)
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO schools (id, name) VALUES (42, 'New Campus')")
+        conn.commit()
+        conn.close()
+
+        assert run_quietly(init_db, app) is True
+        shifts = {row[0] for row in query(path, 'SELECT shift_type FROM shift_definitions WHERE school_id = 42')}
+        assert {'general', 'overtime'} <= shifts
+        assert run_quietly(init_db, app) is False
+
+    with_sqlite(path, scenario)
+    print("✓ new school is seeded")
+
+
+def test_failed_migration_is_retried():
+    app, path = make_app()
+
+    def scenario():
+        original = database.migrate_shift_history
+
+        def failing_migration():
+            raise RuntimeError('disk full')
+
+        database.migrate_shift_history = failing_migration
+        try:
+            assert run_quietly(init_db, app) is True
+        finally:
+            database.migrate_shift_history = original
+        with app.app_context():
+            assert get_schema_stamp() is None
+
+        assert run_quietly(init_db, app) is True
+        assert run_quietly(init_db, app) is False
+
+    with_sqlite(path, scenario)
+    print("✓ failed migration is retried")
+
+
+def run_all_tests():
+    test_bootstrap_runs_once()
+    test_new_school_is_seeded()
+    test_failed_migration_is_retried()
+    print("\n✅ All schema version tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
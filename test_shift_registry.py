@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Shift registry - Test Suite
+Checks that parsed shift definitions are loaded once per school and
+reloaded after versioned invalidation (in-memory SQLite, no server required)
+"""
+
+import io
+import sys
+import contextlib
+import datetime
+
+import database
+from database import (get_shift_registry, get_shift_definitions, get_shift_registry_version,
+                      get_institution_timings, invalidate_shift_registry, invalidate_schema_cache)
+from shift_management import ShiftManager
+from test_helpers import CountingConnection, memory_database, quietly
+
+
+def build_database():
+    conn = memory_database('''
+        CREATE TABLE shift_definitions (
+            id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+            grace_period_minutes INTEGER, description TEXT, is_active INTEGER DEFAULT 1
+        );
+    ''')
+    conn.execute('''
+        INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, grace_period_minutes, description)
+        VALUES (1, 'general', '09:30', '17:30:00', 15, 'General'),
+               (1, 'morning', '06:00:00', '14:00:00', 10, 'Morning'),
+               (2, 'morning', '07:00:00', '15:00:00', 5, 'Morning (school 2)'),
+               (2, 'night', '22:00:00', '06:00:00', 0, 'Night')
+    ''')
+    conn.commit()
+    return CountingConnection(conn)
+
+
+def reset():
+    invalidate_schema_cache()
+    invalidate_shift_registry()
+
+
+def test_definitions_match_shift_manager_format():
+    """Registry entries hold parsed times with the general shift from institution timings"""
+    reset()
+    db = build_database()
+    definitions = quietly(get_shift_definitions, 1, db)
+
+    assert set(definitions) == {'general', 'morning'}
+    assert definitions['general'] == {
+        'start_time': datetime.time(9, 30),
+        'end_time': datetime.time(17, 30),
+        'grace_period_minutes': 0,
+        'description': 'Institution Shift (Custom)'
+    }
+    assert definitions['morning']['start_time'] == datetime.time(6, 0)
+    assert definitions['morning']['grace_period_minutes'] == 10
+
+    school2 = quietly(get_shift_definitions, 2, db)
+    assert set(school2) == {'general', 'morning', 'night'}
+    assert school2['morning']['start_time'] == datetime.time(7, 0)
+    print("✓ definitions match ShiftManager format")
+
+
+def test_loaded_once_per_school():
+    """Repeated lookups and ShiftManager construction do not touch the database"""
+    reset()
+    db = build_database()
+    quietly(get_shift_registry, 1, db)
+    loaded = db.statements
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for _ in range(50):
+            get_shift_registry(1, db)
+            manager = ShiftManager(1)
+            get_institution_timings()
+    assert db.statements == loaded
+    assert output.getvalue() == '', "cached lookups must not print"
+    assert get_shift_registry('1', db) is get_shift_registry(1, db)
+
+    result = manager.get_shift_info('morning')
+    assert result['end_time'] == datetime.time(14, 0)
+    print("✓ loaded once per school")
+
+
+def test_managers_get_private_copies():
+    """Changing one manager's definitions does not leak into the registry"""
+    reset()
+    db = build_database()
+    quietly(get_shift_registry, 1, db)
+
+    manager = ShiftManager(1)
+    manager.shift_definitions['general']['grace_period_minutes'] = 30
+    manager.shift_definitions['custom'] = {}
+    other = ShiftManager(1)
+    assert other.shift_definitions['general']['grace_period_minutes'] == 0
+    assert 'custom' not in other.shift_definitions
+    print("✓ managers get private copies")
+
+
+def test_versioned_invalidation():
+    """Invalidation bumps the version and the next lookup reloads"""
+    reset()
+    db = build_database()
+    entry = quietly(get_shift_registry, 1, db)
+    version = get_shift_registry_version(1)
+    assert entry.version == version
+
+    db.conn.execute("UPDATE shift_definitions SET start_time = '08:00:00' WHERE shift_type = 'general'")
+    db.conn.execute("UPDATE shift_definitions SET is_active = 0 WHERE school_id = 1 AND shift_type = 'morning'")
+    assert quietly(get_shift_definitions, 1, db)['general']['start_time'] == datetime.time(9, 30)
+
+    invalidate_shift_registry(1)
+    assert get_shift_registry_version(1) != version
+    definitions = quietly(get_shift_definitions, 1, db)
+    assert definitions['general']['start_time'] == datetime.time(8, 0)
+    assert 'morning' not in definitions
+
+    # Other schools embed the institution timings too
+    assert quietly(get_shift_definitions, 2, db)['general']['start_time'] == datetime.time(8, 0)
+
+    statements = db.statements
+    original_ttl = database.SHIFT_REGISTRY_TTL
+    database.SHIFT_REGISTRY_TTL = 0
+    try:
+        quietly(get_shift_registry, 1, db)
+        assert db.statements > statements, "expired entry was not reloaded"
+    finally:
+        database.SHIFT_REGISTRY_TTL = original_ttl
+        reset()
+    print("✓ versioned invalidation")
+
+
+def run_all_tests():
+    test_definitions_match_shift_manager_format()
+    test_loaded_once_per_school()
+    test_managers_get_private_copies()
+    test_versioned_invalidation()
+    print("\n✅ All shift registry tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+SQLite → MySQL dialect translation - Test Suite
+Checks representative rewrites and the memoization counters
+"""
+
+import sys
+
+from database import _MySQLCursorWrapper, _translate_sql, get_sql_translation_stats
+
+
+def test_placeholders_and_types():
+    """Placeholders, AUTOINCREMENT and column types are rewritten"""
+    sql = _MySQLCursorWrapper._adapt(
+        "CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, ok BOOLEAN, amt REAL, "
+        "note TEXT DEFAULT 'x')"
+    )
+    assert 'INT PRIMARY KEY AUTO_INCREMENT' in sql
+    assert 'TINYINT(1)' in sql and 'DOUBLE' in sql
+    assert "VARCHAR(500) DEFAULT 'x'" in sql
+
+    sql = _MySQLCursorWrapper._adapt("SELECT * FROM staff WHERE id = ? AND school_id = ?")
+    assert sql == "SELECT * FROM staff WHERE id = %s AND school_id = %s"
+    print("✓ placeholders and types")
+
+
+def test_date_functions():
+    """strftime/julianday/date('now') map to MySQL functions"""
+    sql = _MySQLCursorWrapper._adapt("SELECT * FROM attendance WHERE strftime('%Y-%m', date) = ?")
+    assert "DATE_FORMAT(date, '%%Y-%%m') = %s" in sql
+
+    sql = _MySQLCursorWrapper._adapt("SELECT julianday(end_date) - julianday(start_date) + 1 FROM x")
+    assert 'DATEDIFF(end_date, start_date) + 1' in sql
+
+    sql = _MySQLCursorWrapper._adapt("SELECT * FROM x WHERE d >= date('now', '-30 days')")
+    assert 'DATE_SUB(CURDATE(), INTERVAL 30 DAY)' in sql
+    print("✓ date functions")
+
+
+def test_pragma_and_upserts():
+    """PRAGMA and INSERT OR ... variants are translated"""
+    sql = _MySQLCursorWrapper._adapt("PRAGMA table_info(staff)")
+    assert "INFORMATION_SCHEMA.COLUMNS" in sql and "TABLE_NAME='staff'" in sql
+    assert _MySQLCursorWrapper._adapt("PRAGMA foreign_keys = OFF") == 'SELECT 1'
+    assert _MySQLCursorWrapper._adapt("INSERT OR IGNORE INTO t VALUES (?)").startswith('INSERT IGNORE')
+    assert _MySQLCursorWrapper._adapt("INSERT OR REPLACE INTO t VALUES (?)").startswith('REPLACE')
+    print("✓ pragma and upserts")
+
+
+def test_translation_is_memoized():
+    """Repeated statements are served from the cache"""
+    _translate_sql.cache_clear()
+    sql = "SELECT status FROM attendance WHERE staff_id = ? AND date = ?"
+    first = _MySQLCursorWrapper._adapt(sql)
+    for _ in range(5):
+        assert _MySQLCursorWrapper._adapt(sql) is first
+
+    stats = get_sql_translation_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 5
+    assert stats['size'] == 1
+    print("✓ memoization")
+
+
+def run_all_tests():
+    test_placeholders_and_types()
+    test_date_functions()
+    test_pragma_and_upserts()
+    test_translation_is_memoized()
+    print("\n✅ All SQL translation tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
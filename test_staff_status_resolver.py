@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Staff status resolver - Test Suite
+Checks that get_staff_statuses_for_date gives every staff member the status
+of the per-staff lookup, in priority order: holiday, leave, on duty,
+permission, then late/present/absent from attendance (temporary SQLite file)
+"""
+
+import contextlib
+import datetime
+import importlib
+import os
+import sys
+import tempfile
+
+from flask import Flask
+
+import database
+from database import invalidate_holiday_index, invalidate_schema_cache, invalidate_shift_registry
+from test_helpers import quietly
+
+SCHEMA = '''
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, department TEXT, shift_type TEXT
+);
+CREATE TABLE holidays (
+    id INTEGER PRIMARY KEY, school_id INTEGER, holiday_name TEXT, holiday_type TEXT, start_date DATE,
+    end_date DATE, departments TEXT, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE leave_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, start_date DATE, end_date DATE, status TEXT
+);
+CREATE TABLE on_duty_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, start_date DATE, end_date DATE, status TEXT
+);
+CREATE TABLE permission_applications (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, permission_date DATE, status TEXT
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE, time_in TEXT, time_out TEXT,
+    status TEXT
+);
+CREATE TABLE shift_definitions (
+    id INTEGER PRIMARY KEY, school_id INTEGER, shift_type TEXT, start_time TEXT, end_time TEXT,
+    grace_period_minutes INTEGER, description TEXT, is_active INTEGER DEFAULT 1
+);
+'''
+
+DAY = datetime.date(2025, 3, 4)
+INSTITUTION_HOLIDAY = datetime.date(2025, 3, 5)
+
+# staff id -> expected status on DAY
+EXPECTED = {
+    1: 'Holiday',        # department holiday beats the leave below
+    2: 'On Leave',       # leave beats on duty
+    3: 'On Duty',        # on duty beats permission
+    4: 'On Permission',  # permission beats the late punch
+    5: 'late',
+    6: 'present',
+    7: 'absent',         # no attendance row
+    8: 'present',        # late on the stored row, but in on time by the shift
+}
+
+
+@contextlib.contextmanager
+def status_database():
+    """App context on a temporary SQLite file with one school (id 1) covering every priority case"""
+    originals = {name: getattr(database, name) for name in ('_USE_MYSQL', 'SQLITE_PATH')}
+    database._USE_MYSQL = False
+    database.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'status.db')
+    invalidate_schema_cache()
+    invalidate_holiday_index()
+    invalidate_shift_registry()
+    app = Flask(__name__)
+    try:
+        with app.app_context():
+            db = database.get_db()
+            db.executescript(SCHEMA)
+            db.executemany("INSERT INTO staff VALUES (?, 1, ?, ?, ?, 'general')",
+                           [(staff_id, f'S{staff_id}', f'Staff {staff_id}', 'Science' if staff_id == 1 else 'Maths')
+                            for staff_id in EXPECTED])
+            db.execute("INSERT INTO staff VALUES (9, 2, 'X1', 'Other school', 'Maths', 'general')")
+            db.execute("INSERT INTO shift_definitions (school_id, shift_type, start_time, end_time, "
+                       "grace_period_minutes) VALUES (1, 'general', '09:00:00', '17:00:00', 0)")
+            db.executemany('INSERT INTO holidays (school_id, holiday_name, holiday_type, start_date, end_date, '
+                           'departments) VALUES (1, ?, ?, ?, ?, ?)',
+                           [('Lab Day', 'department_specific', '2025-03-04', '2025-03-04', '["Science"]'),
+                            ('Festival', 'institution_wide', '2025-03-05', '2025-03-05', None)])
+            db.executemany("INSERT INTO leave_applications (staff_id, school_id, start_date, end_date, status) "
+                           "VALUES (?, 1, ?, ?, ?)",
+                           [(1, '2025-03-03', '2025-03-06', 'approved'), (2, '2025-03-04', '2025-03-04', 'approved'),
+                            (3, '2025-03-04', '2025-03-04', 'pending'), (9, '2025-03-04', '2025-03-04', 'approved')])
+            db.executemany("INSERT INTO on_duty_applications (staff_id, school_id, start_date, end_date, status) "
+                           "VALUES (?, 1, '2025-03-01', '2025-03-10', 'approved')", [(2,), (3,)])
+            db.executemany("INSERT INTO permission_applications (staff_id, school_id, permission_date, status) "
+                           "VALUES (?, 1, ?, ?)",
+                           [(3, '2025-03-04', 'approved'), (4, '2025-03-04', 'approved'),
+                            (5, '2025-03-04', 'rejected'), (6, '2025-03-03', 'approved')])
+            db.executemany("INSERT INTO attendance (staff_id, school_id, date, time_in, time_out, status) "
+                           "VALUES (?, 1, ?, ?, ?, ?)",
+                           [(4, '2025-03-04', '09:40:00', None, 'late'),
+                            (5, '2025-03-04', '09:25:00', '17:05:00', 'late'),
+                            (6, '2025-03-04', '08:55:00', '17:00:00', 'present'),
+                            (7, '2025-03-03', '08:50:00', None, 'present'),
+                            (8, '2025-03-04', '08:59:00', None, 'late')])
+            db.commit()
+            yield db
+            db.close()
+    finally:
+        for name, value in originals.items():
+            setattr(database, name, value)
+        invalidate_schema_cache()
+        invalidate_holiday_index()
+        invalidate_shift_registry()
+
+
+def import_app():
+    """The app module, imported against a throwaway SQLite file so no server is needed"""
+    if 'app' in sys.modules:
+        return sys.modules['app']
+    originals = {name: getattr(database, name) for name in ('_USE_MYSQL', 'SQLITE_PATH')}
+    database._USE_MYSQL = False
+    database.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'app.db')
+    try:
+        return quietly(importlib.import_module, 'app')
+    finally:
+        for name, value in originals.items():
+            setattr(database, name, value)
+        invalidate_schema_cache()
+
+
+def test_bulk_matches_per_staff():
+    app = import_app()
+    with status_database() as db:
+        statuses = quietly(app.get_staff_statuses_for_date, 1, DAY, db)
+        assert statuses == EXPECTED
+        for staff_id, status in EXPECTED.items():
+            assert quietly(app.get_staff_status_for_date, staff_id, DAY, 1, db) == status
+
+        # Only the requested staff, in any order
+        assert quietly(app.get_staff_statuses_for_date, 1, DAY, db, [7, 2]) == {7: 'absent', 2: 'On Leave'}
+    print("✓ bulk resolver matches per-staff lookup")
+
+
+def test_institution_holiday_covers_everyone():
+    app = import_app()
+    with status_database() as db:
+        statuses = quietly(app.get_staff_statuses_for_date, 1, INSTITUTION_HOLIDAY, db)
+        assert statuses == {staff_id: 'Holiday' for staff_id in EXPECTED}
+        assert quietly(app.get_staff_status_for_date, 5, INSTITUTION_HOLIDAY, 1, db) == 'Holiday'
+    print("✓ institution holiday covers everyone")
+
+
+def test_requested_staff_filtered():
+    app = import_app()
+    with status_database() as db:
+        quietly(app.get_staff_statuses_for_date, 1, DAY, db)  # loads the holiday index
+        statements = []
+        db.set_trace_callback(statements.append)
+        assert quietly(app.get_staff_status_for_date, 4, DAY, 1, db) == EXPECTED[4]
+        db.set_trace_callback(None)
+        selects = [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+        assert len(selects) == 5 and all('IN (4)' in sql for sql in selects), selects
+
+        # Lists over the limit read the school and give the same answers
+        original = app.STAFF_STATUS_FILTER_LIMIT
+        app.STAFF_STATUS_FILTER_LIMIT = 2
+        try:
+            assert quietly(app.get_staff_statuses_for_date, 1, DAY, db, [8, 2, 5]) == \
+                {8: EXPECTED[8], 2: EXPECTED[2], 5: EXPECTED[5]}
+        finally:
+            app.STAFF_STATUS_FILTER_LIMIT = original
+        assert app.get_staff_statuses_for_date(1, DAY, db, []) == {}
+    print("✓ requested staff filtered")
+
+
+def run_all_tests():
+    test_bulk_matches_per_staff()
+    test_institution_holiday_covers_everyone()
+    test_requested_staff_filtered()
+    print("\n✅ All staff status resolver tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Streaming Excel exports - Test Suite
+Checks that the monthly, overtime, company and staff details reports are
+built from write-only workbooks with named styles, return a chunked
+response, and that iter_rows hands rows over in fetch-size batches
+(in-memory SQLite)
+"""
+
+import io
+import sys
+
+import openpyxl
+
+import excel_reports
+import test_helpers
+from database import iter_rows
+from excel_reports import ExcelReportGenerator, EXPORT_CHUNK_SIZE
+from test_helpers import memory_database
+
+
+SCHEMA = '''
+CREATE TABLE schools (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE staff (
+    id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, first_name TEXT, last_name TEXT,
+    date_of_birth DATE, date_of_joining DATE, department TEXT, destination TEXT, position TEXT, gender TEXT,
+    phone TEXT, email TEXT, shift_type TEXT, created_at TIMESTAMP, is_active INTEGER DEFAULT 1
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, staff_id INTEGER, school_id INTEGER, date DATE, status TEXT,
+    overtime_in TEXT, overtime_out TEXT
+);
+'''
+
+STAFF = [
+    (1, 7, '10', 'Asha K', 'Asha', 'K', 'Science', 'Teacher'),
+    (2, 7, '2', 'Ravi M', 'Ravi', 'M', None, None),
+    (3, 7, '3', 'Meena S', None, None, 'Maths', 'HOD'),
+    (4, 8, '1', 'Other', 'Other', None, 'Science', None),
+]
+
+ATTENDANCE = [
+    (1, 7, '2025-03-03', 'present', '17:00:00', '19:30:00'),
+    (1, 7, '2025-03-04', 'late', '17:00:00', '18:00:00'),
+    (2, 7, '2025-03-03', 'present', None, None),
+    (2, 7, '2025-03-04', 'on_duty', None, None),
+    (3, 7, '2025-03-03', 'absent', None, None),
+    (3, 7, '2025-03-05', 'leave', None, None),
+    (4, 8, '2025-03-03', 'present', None, None),
+]
+
+
+def build_database():
+    conn = memory_database(SCHEMA)
+    conn.executemany('INSERT INTO schools VALUES (?, ?)', [(7, 'North'), (8, 'South')])
+    conn.executemany('INSERT INTO staff (id, school_id, staff_id, full_name, first_name, last_name, '
+                     'department, destination) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', STAFF)
+    conn.executemany('INSERT INTO attendance (staff_id, school_id, date, status, overtime_in, overtime_out) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', ATTENDANCE)
+    conn.commit()
+    return conn
+
+
+def run_with(conn, func, *args, **kwargs):
+    return test_helpers.run_with(conn, func, *args, modules=(excel_reports,), **kwargs)
+
+def load(response):
+    chunks = list(response.response)
+    assert all(len(chunk) <= EXPORT_CHUNK_SIZE for chunk in chunks)
+    data = b''.join(chunks)
+    assert int(response.headers['Content-Length']) == len(data)
+    return openpyxl.load_workbook(io.BytesIO(data))
+
+
+def rows(ws):
+    return [list(row) for row in ws.iter_rows(values_only=True)]
+
+
+def test_iter_rows_fetches_in_batches():
+    conn = build_database()
+    fetches = []
+
+    class CountingCursor:
+        def __init__(self):
+            self.cursor = conn.cursor()
+            self.closed = False
+
+        def execute(self, sql, params):
+            self.cursor.execute(sql, params)
+
+        def fetchmany(self, size):
+            batch = self.cursor.fetchmany(size)
+            fetches.append(len(batch))
+            return batch
+
+        def close(self):
+            self.closed = True
+
+    class StreamingConnection:
+        def __init__(self):
+            self.cursors = []
+
+        def streaming_cursor(self):
+            self.cursors.append(CountingCursor())
+            return self.cursors[-1]
+
+    db = StreamingConnection()
+    staff_ids = [row['staff_id'] for row in iter_rows('SELECT staff_id FROM staff ORDER BY id', db=db, fetch_size=3)]
+    assert staff_ids == ['10', '2', '3', '1']
+    assert fetches == [3, 1, 0]
+    assert db.cursors[0].closed
+
+    # Abandoning the generator early still closes the cursor
+    rows_iter = iter_rows('SELECT staff_id FROM staff', db=db, fetch_size=1)
+    next(rows_iter)
+    rows_iter.close()
+    assert db.cursors[1].closed
+    print("✓ iter_rows fetches in batches")
+
+
+def test_monthly_report():
+    conn = build_database()
+    response = run_with(conn, ExcelReportGenerator().create_monthly_report, 7, 2025, 3)
+    assert response.headers['Content-Disposition'] == 'attachment; filename=Monthly_Report_2025_03.xlsx'
+    wb = load(response)
+    assert wb.sheetnames == ['Staff Records', 'Monthly Summary', 'Monthly Calendar', 'Monthly Trends']
+
+    ws = wb['Staff Records']
+    assert 'A1:I1' in [str(merged) for merged in ws.merged_cells.ranges]
+    assert ws['A1'].style == 'report_title'
+    assert ws['A5'].style == 'report_header' and ws['A5'].font.bold
+    values = rows(ws)
+    # 26 business days in March 2025; staff ordered by numeric staff id
+    assert values[5] == ['2', 'Ravi M', 'Unassigned', None, 26, 24, 0, 1, 2]
+    assert values[6] == ['3', 'Meena S', 'Maths', 'HOD', 26, 25, 1, 0, 0]
+    assert values[7] == ['10', 'Asha K', 'Science', 'Teacher', 26, 24, 0, 0, 2]
+    assert values[9] == ['TOTALS:', '3 Staff', None, None, 78, 73, 1, 1, 4]
+    assert ws['F6'].style == 'report_cell_bad' and ws['A10'].style == 'report_total_label'
+
+    summary = {row[0]: row[1] for row in rows(wb['Monthly Summary']) if row and row[0]}
+    assert summary['Total Records:'] == 6 and summary['Attendance Rate:'] == '66.7%'
+
+    calendar = rows(wb['Monthly Calendar'])
+    assert calendar[3][:6] == [None, None, None, None, None, 1]
+    assert calendar[6][:3] == [3, 4, 5] and calendar[7][:3] == ['P: 2', 'P: 2', 'P: 0']
+    print("✓ monthly report")
+
+
+def test_overtime_report():
+    conn = build_database()
+    wb = load(run_with(conn, ExcelReportGenerator().create_overtime_report, 7, 2025, 3))
+    assert wb.sheetnames == ['Overtime Records', 'Overtime Summary', 'Overtime Trends']
+
+    values = rows(wb['Overtime Records'])
+    assert values[5] == ['2', 'Ravi M', 'Unassigned', None, 0, '0.00', 'No overtime recorded']
+    assert values[7] == ['10', 'Asha K', 'Science', 'Teacher', 2, '3.50',
+                         '2025-03-03 (17:00:00-19:30:00); 2025-03-04 (17:00:00-18:00:00)']
+    assert values[9][4:] == [2, '3.50', '1 out of 3 staff worked overtime']
+    assert wb['Overtime Records']['E8'].style == 'report_cell_good'
+
+    summary = {row[0]: row[1] for row in rows(wb['Overtime Summary']) if row and row[0]}
+    assert summary['Staff with Overtime'] == 1 and summary['Overtime Coverage %'] == '33.3%'
+    print("✓ overtime report")
+
+
+def test_company_report():
+    conn = build_database()
+    wb = load(run_with(conn, ExcelReportGenerator().create_company_report, '2025-03-01', '2025-03-31'))
+    assert wb.sheetnames == ['Company Summary', 'School Comparison', 'Company Analytics']
+    assert rows(wb['Company Summary'])[6:8] == [['North', 3, 6, 4, '66.7%', 1], ['South', 1, 1, 1, '100.0%', 0]]
+    assert rows(wb['School Comparison'])[3:5] == [[1, 'South', 1, '100.0%', 'Excellent'],
+                                                  [2, 'North', 3, '66.7%', 'Needs Improvement']]
+    assert len(wb['Company Analytics']._charts) == 1
+    print("✓ company report")
+
+
+def test_staff_details_report():
+    conn = build_database()
+    wb = load(run_with(conn, ExcelReportGenerator().create_staff_details_report, 7))
+    ws = wb['Staff Details']
+    assert ws.freeze_panes == 'A4' and ws['A3'].style == 'report_header'
+    assert ws['A1'].alignment.horizontal == 'center'
+    values = rows(ws)
+    assert [row[1] for row in values[3:]] == ['2', '3', '10']
+    assert values[3][:5] == [1, '2', 'Ravi', 'M', 'Ravi M'] and values[3][8] == 'N/A'
+    assert values[4][2] == 'N/A' and values[4][8] == 'HOD' and values[4][12] == 'General'
+    print("✓ staff details report")
+
+
+def run_all_tests():
+    test_iter_rows_fetches_in_batches()
+    test_monthly_report()
+    test_overtime_report()
+    test_company_report()
+    test_staff_details_report()
+    print("\n✅ All streaming Excel export tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Timetable generator - Test Suite
+Checks that the solver places every lesson of a feasible requirement set
+without breaking a constraint, reports what it couldn't place otherwise, and
+that generate_timetable keeps locked assignments, respects staff
+availability and only writes when asked to (temporary SQLite file)
+"""
+
+import random
+import sys
+
+from flask import Flask
+
+from benchmark_timetable_generator import build_problem, check_timetable
+from hierarchical_timetable import HierarchicalTimetableManager
+from hierarchical_timetable_routes import hierarchical_bp
+from test_bulk_allocation_import import add_periods
+from test_timetable_occupancy import school_database
+from timetable_generator import TimetableSolver, load_problem
+from timetable_occupancy import get_timetable_occupancy
+
+REQUIREMENTS = [
+    {'level_id': 1, 'subject_name': 'Maths', 'periods_per_week': 6, 'staff_ids': [1, 2]},
+    {'level_id': 1, 'subject_name': 'Science', 'periods_per_week': 5, 'staff_id': 3},
+    {'section_id': 2, 'subject_name': 'English', 'periods_per_week': 4, 'staff_ids': [2], 'max_per_day': 1},
+]
+
+
+def test_solver_constraints():
+    problem = build_problem(30, seed=11)
+    result = TimetableSolver(**problem).solve(30, seed=11)
+    assert result['complete'] and not result['unplaced']
+    assert result['stats']['placed'] == result['stats']['lessons'] == 30 * 44
+    assert check_timetable(problem, result['assignments']) == []
+
+    # Re-solving a few sections around the rest, with some lessons locked
+    rng = random.Random(5)
+    scope = {3, 14, 27}
+    fixed = [(row['staff_id'], row['section_id'], row['day_of_week'], row['period_number'], row['subject_name'])
+             for row in result['assignments'] if row['section_id'] not in scope or rng.random() < 0.3]
+    partial = dict(problem, fixed=fixed,
+                   section_slots={section: problem['section_slots'][section] for section in scope},
+                   requirements=[req for req in problem['requirements'] if req['section_id'] in scope])
+    locked = sum(1 for entry in fixed if entry[1] in scope)
+    result = TimetableSolver(**partial).solve(30, seed=5)
+    assert result['complete'] and len(result['assignments']) == 3 * 44 - locked
+    assert check_timetable(partial, result['assignments']) == []
+    print("✓ solver constraints")
+
+
+def test_infeasible_reports_unplaced():
+    # Two staff members can take 2 classes a day on 3 days: 12 lessons, not 14
+    slots = {section: {day: 0b11110 for day in (1, 2, 3)} for section in (1, 2)}
+    problem = {
+        'section_slots': slots, 'section_levels': {1: 1, 2: 1}, 'max_daily_load': 2, 'days': (1, 2, 3),
+        'staff_blocked': {}, 'fixed': [],
+        'requirements': [{'section_id': section, 'subject_name': subject, 'periods_per_week': count,
+                          'staff_ids': [1, 2]} for section in (1, 2) for subject, count in (('A', 4), ('B', 3))],
+    }
+    result = TimetableSolver(**problem).solve(2)
+    assert not result['complete']
+    assert result['stats']['placed'] == 12 and sum(entry['missing'] for entry in result['unplaced']) == 2
+    assert check_timetable(problem, result['assignments']) == []
+    print("✓ infeasible reports unplaced")
+
+
+def test_generate_keeps_locked_and_availability():
+    with school_database() as db:
+        add_periods(db)
+        db.execute("UPDATE timetable_hierarchical_assignments SET is_locked = 1, subject_name = 'Maths' WHERE id = 1")
+        db.commit()
+        manager = HierarchicalTimetableManager
+
+        preview = manager.generate_timetable(1, REQUIREMENTS, time_budget=10)
+        assert preview['success'] and preview['complete'] and not preview['applied']
+        assert preview['sections'] == [1, 2] and len(preview['assignments']) == 11 + 15 - 1
+        assert db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments').fetchone()[0] == 4
+
+        occupancy = get_timetable_occupancy(1)
+        result = manager.generate_timetable(1, REQUIREMENTS, time_budget=10, apply=True)
+        assert result['applied'] and get_timetable_occupancy(1) is not occupancy
+        rows = [dict(row) for row in db.execute('SELECT * FROM timetable_hierarchical_assignments')]
+        assert len(rows) == 26 and [row['id'] for row in rows if row['is_locked']] == [1]
+
+        maths = {row['staff_id'] for row in rows if row['section_id'] == 1 and row['subject_name'] == 'Maths'}
+        assert maths == {1}
+        slots = [(row['staff_id'], row['day_of_week'], row['period_number']) for row in rows]
+        assert len(slots) == len(set(slots))
+        assert (3, 2, 2) not in slots and (3, 1, 4) not in slots and (2, 1, 5) not in slots
+        assert all(1 <= row['day_of_week'] <= 6 for row in rows)
+        english_days = [row['day_of_week'] for row in rows if row['subject_name'] == 'English']
+        assert len(english_days) == 4 and len(set(english_days)) == 4
+
+        # Re-solving section 2 leaves section 1 alone
+        section_1 = sorted(tuple(row.values()) for row in rows if row['section_id'] == 1)
+        result = manager.generate_timetable(1, REQUIREMENTS, section_ids=[2], time_budget=10, apply=True, seed=3)
+        assert result['applied'] and result['sections'] == [2] and len(result['assignments']) == 15
+        after = [tuple(row) for row in db.execute('SELECT * FROM timetable_hierarchical_assignments '
+                                                  'WHERE section_id = 1')]
+        assert sorted(after) == section_1
+
+        assert not manager.generate_timetable(1, [{'level_id': 9, 'subject_name': 'Art', 'periods_per_week': 2,
+                                                    'staff_id': 1}])['success']
+    print("✓ generate keeps locked assignments and availability")
+
+
+def test_unknown_staff_rejected():
+    with school_database() as db:
+        add_periods(db)
+        db.execute("INSERT INTO staff (id, school_id, staff_id, full_name) VALUES (4, 2, 'T004', 'Other School')")
+        db.commit()
+        problem, sections = load_problem(1, REQUIREMENTS, db=db)
+        assert sections == [1, 2]
+        for staff_ids, missing in (([1, 4], '4'), ([9, 2, 8], '9, 8')):
+            requirements = REQUIREMENTS[:2] + [dict(REQUIREMENTS[2], staff_ids=staff_ids)]
+            try:
+                load_problem(1, requirements, db=db)
+            except ValueError as e:
+                assert str(e) == f'Requirement 3: staff {missing} not found'
+            else:
+                raise AssertionError('unknown staff accepted')
+        result = HierarchicalTimetableManager.generate_timetable(1, [dict(REQUIREMENTS[0], staff_ids=[4])])
+        assert not result['success'] and 'staff 4 not found' in result['error']
+    print("✓ unknown staff rejected")
+
+
+def test_generate_route():
+    with school_database() as db:
+        add_periods(db)
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.register_blueprint(hierarchical_bp)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['user_type'] = 'admin'
+            sess['school_id'] = 1
+
+        response = client.post('/api/hierarchical-timetable/generate', json={'requirements': []})
+        assert response.status_code == 400
+        response = client.post('/api/hierarchical-timetable/generate',
+                               json={'requirements': REQUIREMENTS, 'time_budget': 5})
+        data = response.get_json()
+        assert response.status_code == 200 and data['complete'] and not data['applied']
+    print("✓ generate route")
+
+
+def run_all_tests():
+    test_solver_constraints()
+    test_infeasible_reports_unplaced()
+    test_generate_keeps_locked_and_availability()
+    test_unknown_staff_rejected()
+    test_generate_route()
+    print("\n✅ All timetable generator tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Timetable grid cache - Test Suite
+Checks that staff/section schedules, colour grids and the personal timetable
+are built once per timetable version, that assignment, swap, override,
+edit and period/time slot writes bump the version, and that the routes answer If-None-Match with
+304 until the grid changes (temporary SQLite file)
+"""
+
+import sys
+
+from flask import Flask, g
+
+import timetable_grid_cache
+from hierarchical_timetable import HierarchicalTimetableManager
+from hierarchical_timetable_routes import hierarchical_bp
+from test_timetable_occupancy import school_database
+from timetable_api_routes import timetable_api
+from timetable_grid_cache import cached_grid, clear_grid_cache, grid_etag
+from timetable_management import AlterationManager, TimetableManager
+from timetable_occupancy import bump_timetable_version, note_assignment_moved, timetable_version
+
+EXTRA_SCHEMA = '''
+CREATE TABLE timetable_conflict_logs (id INTEGER PRIMARY KEY, school_id INTEGER, staff_id INTEGER,
+                                      conflict_type TEXT, conflicting_sections TEXT, reason_if_unavailable TEXT,
+                                      resolution_status TEXT);
+CREATE TABLE timetable_period_timings (id INTEGER PRIMARY KEY, school_id INTEGER, slot_label TEXT,
+                                      period_sequence INTEGER, start_time TEXT, end_time TEXT,
+                                      duration_minutes INTEGER, is_active INTEGER DEFAULT 1, updated_at TIMESTAMP);
+CREATE TABLE timetable_alteration_requests (id INTEGER PRIMARY KEY, school_id INTEGER, assignment_id INTEGER,
+                                            requester_staff_id INTEGER, target_staff_id INTEGER, status TEXT,
+                                            response_reason TEXT, responded_by INTEGER, responded_at TIMESTAMP);
+'''
+
+
+def prepare(db):
+    # The schedule queries join periods on number only: one row per period
+    db.executemany('INSERT INTO timetable_periods (school_id, level_id, section_id, period_number, start_time, '
+                   'end_time) VALUES (1, 1, ?, ?, ?, ?)',
+                   [(section, period, f'{8 + period}:00', f'{8 + period}:45') for section in (1, 2)
+                    for period in range(1, 9)])
+    db.executescript(EXTRA_SCHEMA)
+    db.execute("ALTER TABLE timetable_periods ADD COLUMN period_name TEXT")
+    db.execute("ALTER TABLE timetable_sections ADD COLUMN capacity INTEGER DEFAULT 40")
+    db.execute("ALTER TABLE timetable_sections ADD COLUMN section_code TEXT")
+    db.execute("ALTER TABLE timetable_academic_levels ADD COLUMN description TEXT")
+    db.commit()
+    clear_grid_cache()
+
+
+def client_for(*blueprints):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_type'] = 'admin'
+        sess['school_id'] = 1
+    return client
+
+
+def test_grids_cached_per_version():
+    with school_database() as db:
+        prepare(db)
+        manager = HierarchicalTimetableManager
+
+        schedule = manager.get_staff_schedule(1, 1)
+        assert [row['assignment_id'] for row in schedule['data']['schedule']] == [1, 2]
+        assert manager.get_staff_schedule(1, 1) is schedule
+        section = manager.get_section_schedule(1, 1)
+        grid = manager.get_color_coded_grid(1, 'section', 1)
+        assert grid['data']['Monday'][2]['staff'] == 'Ravi M'
+
+        # An assignment write replaces every grid of the school
+        version = timetable_version(1)
+        result = manager.assign_staff_to_period(1, 1, 2, 1, 3, 4, 'Maths')
+        assert result['success'] and timetable_version(1) != version
+        schedule = manager.get_staff_schedule(1, 1)
+        assert [row['assignment_id'] for row in schedule['data']['schedule']][-1] == result['assignment_id']
+        assert manager.get_section_schedule(1, 1) is not section
+
+        # So do subject edits, section renames and swaps
+        assert manager.update_assignment(1, 1, subject_name='Algebra')['success']
+        assert manager.get_staff_schedule(1, 1)['data']['schedule'][0]['subject_name'] == 'Algebra'
+        assert manager.update_section(1, 1, section_name='Rose')['success']
+        assert manager.get_section_schedule(1, 1)['data']['section_info']['section_name'] == 'Rose'
+
+        db.execute('INSERT INTO timetable_alteration_requests (id, school_id, assignment_id, requester_staff_id, '
+                   "target_staff_id, status) VALUES (1, 1, 1, 3, 2, 'pending')")
+        db.commit()
+        version = timetable_version(1)
+        assert AlterationManager.respond_to_swap_request(1, 2, True)['success']
+        assert timetable_version(1) != version
+
+        # Failures aren't cached
+        assert not manager.get_section_schedule(1, 99)['success']
+        assert (1, 'section_schedule', 99) not in timetable_grid_cache._grids
+    print("✓ grids cached per version")
+
+
+def test_etag_revalidation():
+    with school_database() as db:
+        prepare(db)
+        client = client_for(hierarchical_bp, timetable_api)
+
+        for url in ('/api/hierarchical-timetable/staff-schedule/1', '/api/hierarchical-timetable/section-schedule/1',
+                    '/api/hierarchical-timetable/grid/staff/1', '/api/timetable/staff?staff_id=1&school_id=1'):
+            first = client.get(url)
+            etag = first.headers['ETag']
+            assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+            again = client.get(url, headers={'If-None-Match': etag})
+            assert again.status_code == 304 and not again.data
+
+        url = '/api/timetable/staff?staff_id=2&school_id=1'
+        etag = client.get(url).headers['ETag']
+        assert client.get('/api/timetable/assignments/2?school_id=1',
+                          headers={'If-None-Match': etag}).status_code == 304
+
+        # A swap moves assignment 3 away from Ravi M: the old tag no longer matches
+        db.execute('UPDATE timetable_hierarchical_assignments SET staff_id = 3 WHERE id = 3')
+        bump_timetable_version(1, db)
+        db.commit()
+        note_assignment_moved(1, 'hierarchical', 3, 3)
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200 and changed.headers['ETag'] != etag
+        assert {row['id'] for row in changed.get_json()['timetable']} == {4}
+
+        # Tags come from the content: a cold cache (another worker) still answers 304
+        etag = changed.headers['ETag']
+        clear_grid_cache()
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        assert client.get('/api/hierarchical-timetable/section-schedule/99').status_code == 400
+    print("✓ etag revalidation")
+
+
+def test_period_writes_bump_version():
+    with school_database() as db:
+        prepare(db)
+        for column in ('duration_minutes INTEGER', 'time_slot_id INTEGER', 'updated_at TIMESTAMP'):
+            db.execute(f'ALTER TABLE timetable_periods ADD COLUMN {column}')
+        db.commit()
+        client = client_for(timetable_api)
+
+        def current_version():
+            # The writes run in requests of their own; read the row afresh
+            g.pop('timetable_versions', None)
+            return timetable_version(1)
+
+        def bumps(write):
+            version = current_version()
+            write()
+            return current_version() != version
+
+        slot = {'school_id': 1, 'slot_label': 'Zero', 'period_sequence': 9, 'start_time': '07:00',
+                'end_time': '07:40'}
+        assert bumps(lambda: client.post('/api/timetable/period-timing/save', json=slot))
+        assert bumps(lambda: client.post('/api/timetable/period-timing/save', json=dict(slot, id=1, end_time='07:45')))
+        assert bumps(lambda: client.post('/api/timetable/period/save',
+                                         json={'school_id': 1, 'time_slot_id': 1, 'level_id': 1, 'section_id': 1}))
+        period = db.execute('SELECT id, period_number, end_time FROM timetable_periods WHERE time_slot_id = 1'
+                            ).fetchone()
+        assert (period['period_number'], period['end_time']) == (9, '07:45')
+        assert bumps(lambda: client.post('/api/timetable/period/save',
+                                         json={'id': period['id'], 'school_id': 1, 'time_slot_id': 1,
+                                               'period_name': 'Assembly', 'level_id': 1, 'section_id': 1}))
+        assert bumps(lambda: TimetableManager.delete_period(1, 9))
+        assert bumps(lambda: client.post('/api/timetable/period-timing/delete', json={'school_id': 1,
+                                                                                    'timing_id': 1}))
+        assert db.execute('SELECT is_active FROM timetable_period_timings WHERE id = 1').fetchone()[0] == 0
+    print("✓ period writes bump version")
+
+
+def test_cached_grid_eviction():
+    clear_grid_cache()
+    original = timetable_grid_cache.TIMETABLE_GRID_CACHE_SIZE
+    timetable_grid_cache.TIMETABLE_GRID_CACHE_SIZE = 2
+    try:
+        builds = []
+
+        def build(item):
+            return lambda: builds.append(item) or {'success': True, 'item': item}
+
+        with school_database():
+            for item in (1, 2, 1, 3, 1, 2):
+                payload, etag = cached_grid(77, 'staff_schedule', item, build(item))
+                assert payload['item'] == item and etag == grid_etag(payload)
+        # 2 was the least recently used when 3 arrived
+        assert builds == [1, 2, 3, 2]
+    finally:
+        timetable_grid_cache.TIMETABLE_GRID_CACHE_SIZE = original
+        clear_grid_cache()
+    print("✓ cached grid eviction")
+
+
+def run_all_tests():
+    test_grids_cached_per_version()
+    test_etag_revalidation()
+    test_period_writes_bump_version()
+    test_cached_grid_eviction()
+    print("\n✅ All timetable grid cache tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Timetable occupancy - Test Suite
+Checks the per-school occupancy bitsets against the assignment tables they
+are loaded from, that incremental add/remove/move keeps them equal to a
+fresh load, and that the hierarchical conflict checks and availability
+summary answer from them (temporary SQLite file)
+"""
+
+import contextlib
+import os
+import random
+import sys
+import tempfile
+
+from flask import Flask
+
+import database
+import timetable_occupancy
+from hierarchical_timetable import HierarchicalTimetableManager
+from timetable_occupancy import (TimetableOccupancy, get_timetable_occupancy, invalidate_timetable_occupancy,
+                                 note_assignment_added, taken_staff_slots)
+
+SCHEMA = '''
+CREATE TABLE staff (id INTEGER PRIMARY KEY, school_id INTEGER, staff_id TEXT, full_name TEXT, department TEXT);
+CREATE TABLE timetable_academic_levels (id INTEGER PRIMARY KEY, school_id INTEGER, level_number INTEGER,
+                                        level_name TEXT, is_active BOOLEAN DEFAULT 1);
+CREATE TABLE timetable_sections (id INTEGER PRIMARY KEY, school_id INTEGER, level_id INTEGER, section_name TEXT,
+                                 is_active BOOLEAN DEFAULT 1);
+CREATE TABLE timetable_periods (id INTEGER PRIMARY KEY, school_id INTEGER, level_id INTEGER, section_id INTEGER,
+                                day_of_week INTEGER, period_number INTEGER, start_time TEXT, end_time TEXT);
+CREATE TABLE timetable_hierarchical_assignments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, school_id INTEGER, staff_id INTEGER, section_id INTEGER,
+    level_id INTEGER, day_of_week INTEGER, period_number INTEGER, subject_name TEXT, room_number TEXT,
+    is_locked BOOLEAN DEFAULT 0, assignment_type TEXT, updated_at TIMESTAMP,
+    UNIQUE(school_id, section_id, day_of_week, period_number));
+CREATE TABLE timetable_assignments (id INTEGER PRIMARY KEY AUTOINCREMENT, school_id INTEGER, staff_id INTEGER,
+                                    day_of_week INTEGER, period_number INTEGER);
+CREATE TABLE timetable_self_allocations (id INTEGER PRIMARY KEY AUTOINCREMENT, school_id INTEGER,
+                                         staff_id INTEGER, day_of_week INTEGER, period_number INTEGER,
+                                         class_subject TEXT);
+CREATE TABLE timetable_staff_availability (id INTEGER PRIMARY KEY, school_id INTEGER, staff_id INTEGER,
+                                           day_of_week INTEGER, period_number INTEGER, is_available BOOLEAN,
+                                           reason_if_unavailable TEXT);
+CREATE TABLE timetable_versions (school_id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);
+'''
+
+
+@contextlib.contextmanager
+def school_database():
+    """App context on a temporary SQLite file with one small school (id 1)"""
+    originals = {name: getattr(database, name) for name in ('_USE_MYSQL', 'SQLITE_PATH')}
+    database._USE_MYSQL = False
+    database.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'timetable.db')
+    invalidate_timetable_occupancy()
+    app = Flask(__name__)
+    try:
+        with app.app_context():
+            db = database.get_db()
+            db.executescript(SCHEMA)
+            db.executemany('INSERT INTO staff (id, school_id, staff_id, full_name, department) VALUES (?, 1, ?, ?, ?)',
+                           [(1, 'T001', 'Asha K', 'Maths'), (2, 'T002', 'Ravi M', 'Maths'),
+                            (3, 'T003', 'Meena S', 'Science')])
+            db.execute("INSERT INTO timetable_academic_levels (id, school_id, level_number, level_name) "
+                       "VALUES (1, 1, 10, 'Class 10')")
+            db.executemany('INSERT INTO timetable_sections (id, school_id, level_id, section_name) VALUES (?, 1, 1, ?)',
+                           [(1, 'A'), (2, 'B')])
+            db.executemany('INSERT INTO timetable_hierarchical_assignments (school_id, staff_id, section_id, '
+                           'level_id, day_of_week, period_number) VALUES (1, ?, ?, 1, ?, ?)',
+                           [(1, 1, 1, 1), (1, 2, 1, 3), (2, 1, 1, 2), (2, 2, 2, 1)])
+            db.execute('INSERT INTO timetable_assignments (school_id, staff_id, day_of_week, period_number) '
+                       'VALUES (1, 3, 1, 4)')
+            db.execute('INSERT INTO timetable_self_allocations (school_id, staff_id, day_of_week, period_number, '
+                       "class_subject) VALUES (1, 2, 1, 5, 'Lab')")
+            db.execute('INSERT INTO timetable_staff_availability (school_id, staff_id, day_of_week, period_number, '
+                       "is_available, reason_if_unavailable) VALUES (1, 3, 2, 2, 0, 'Exam duty')")
+            db.commit()
+            yield db
+            db.close()
+    finally:
+        for name, value in originals.items():
+            setattr(database, name, value)
+        invalidate_timetable_occupancy()
+
+
+def snapshot(occupancy):
+    return (occupancy._entries, {source: {staff: masks for staff, masks in bits.items() if any(masks)}
+                                 for source, bits in occupancy._staff_bits.items()},
+            {section: masks for section, masks in occupancy._section_bits.items() if any(masks)},
+            {key: count for key, count in occupancy._daily_load.items() if count})
+
+
+def test_loaded_bitsets():
+    with school_database() as db:
+        occupancy = TimetableOccupancy.load(1, db)
+        assert occupancy.busy_periods(1, 1) == [1, 3]
+        assert occupancy.busy_periods(2, 1) == [2, 5]
+        assert occupancy.busy_periods(2, 1, ('hierarchical',)) == [2]
+        assert occupancy.free_periods(3, 1, 6) == [1, 2, 3, 5, 6]
+        assert occupancy.daily_load(1, 1) == 2 and occupancy.daily_load(3, 1) == 0
+        assert occupancy.section_mask(1, 1) == 0b110
+        assert occupancy.section_occupant(1, 1, 2) == (3, 2)
+        assert occupancy.section_occupant(1, 1, 2, exclude_assignment_id=3) is None
+        assert occupancy.staff_conflicts(1, 1, 1) == [1]
+        assert occupancy.is_marked_unavailable(3, 2, 2) and occupancy.unavailable[(3, 2, 2)] == 'Exam duty'
+        assert occupancy.free_staff([1, 2, 3], 1, 1) == [2, 3]
+        assert (1, 2) not in occupancy.common_free_slots(staff_id=1, section_id=1, days=[1])
+        assert occupancy.common_free_slots(staff_id=1, section_id=1, days=[1], max_periods=5) == [(1, 4), (1, 5)]
+    print("✓ loaded bitsets")
+
+
+def test_incremental_matches_reload():
+    rng = random.Random(3)
+    with school_database() as db:
+        occupancy = TimetableOccupancy.load(1, db)
+        for _ in range(300):
+            source = rng.choice(['hierarchical', 'assignments', 'self_allocations'])
+            table = timetable_occupancy.SOURCES[source]
+            rows = db.execute(f'SELECT id FROM {table}').fetchall()
+            action = rng.random()
+            if action < 0.5 or not rows:
+                staff, day, period = rng.randint(1, 3), rng.randint(0, 6), rng.randint(1, 8)
+                if source == 'hierarchical':
+                    section = rng.randint(1, 2)
+                    if db.execute('SELECT 1 FROM timetable_hierarchical_assignments WHERE section_id = ? '
+                                  'AND day_of_week = ? AND period_number = ?', (section, day, period)).fetchone():
+                        continue
+                    cursor = db.execute(f'INSERT INTO {table} (school_id, staff_id, section_id, level_id, '
+                                        'day_of_week, period_number) VALUES (1, ?, ?, 1, ?, ?)',
+                                        (staff, section, day, period))
+                else:
+                    section = None
+                    cursor = db.execute(f'INSERT INTO {table} (school_id, staff_id, day_of_week, period_number) '
+                                        'VALUES (1, ?, ?, ?)', (staff, day, period))
+                occupancy.add(source, cursor.lastrowid, staff, day, period, section)
+            elif action < 0.8:
+                row_id = rng.choice(rows)[0]
+                db.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+                occupancy.remove(source, row_id)
+            else:
+                row_id, staff = rng.choice(rows)[0], rng.randint(1, 3)
+                db.execute(f'UPDATE {table} SET staff_id = ? WHERE id = ?', (staff, row_id))
+                occupancy.move(source, row_id, staff)
+        db.commit()
+        assert snapshot(occupancy) == snapshot(TimetableOccupancy.load(1, db))
+    print("✓ incremental matches reload")
+
+
+def test_manager_uses_occupancy():
+    with school_database() as db:
+        manager = HierarchicalTimetableManager
+        occupancy = get_timetable_occupancy(1)
+
+        check = manager.check_staff_availability(1, 1, 1, 1)
+        assert not check['is_available'] and check['conflicts'] == ['A (Class 10)']
+        assert manager.check_staff_availability(1, 1, 1, 1, exclude_assignment_id=1)['is_available']
+        assert manager.check_staff_availability(1, 3, 2, 2)['reason'] == 'Staff marked unavailable: Exam duty'
+        section = manager.check_section_availability(1, 1, 1, 2)
+        assert not section['is_available'] and section['assigned_staff'] == 'Ravi M'
+
+        # Writes through the manager keep the cached index current
+        result = manager.assign_staff_to_period(1, 3, 2, 1, 1, 2, 'Physics')
+        assert result['success'] and get_timetable_occupancy(1) is occupancy
+        assert occupancy.section_occupant(2, 1, 2) == (result['assignment_id'], 3)
+        assert not manager.assign_staff_to_period(1, 1, 2, 1, 1, 2)['success']
+        manager.delete_assignment(1, result['assignment_id'])
+        assert occupancy.section_occupant(2, 1, 2) is None
+
+        for period in range(1, 7):
+            assert manager.assign_staff_to_period(1, 3, 2, 1, 3, period)['success']
+        assert 'Maximum daily classes' in manager.check_staff_availability(1, 3, 3, 7)['reason']
+
+        summary = manager.get_all_staff_availability(1, day_of_week=1)['data']
+        by_staff = {row['staff_id']: row for row in summary}
+        assert by_staff[2]['assigned_periods'] == [2, 5] and by_staff[2]['total_assigned'] == 2
+        assert by_staff[3]['free_periods'] == [1, 2, 3, 5, 6, 7, 8]
+
+        # Inserts whose id is unknown drop the school's index instead
+        note_assignment_added(1, 'assignments', None, 1, 1, 7)
+        assert get_timetable_occupancy(1) is not occupancy
+    print("✓ manager uses occupancy")
+
+
+def test_stale_index_rechecked():
+    with school_database() as db:
+        manager = HierarchicalTimetableManager
+        occupancy = get_timetable_occupancy(1)
+
+        # Another worker books Meena S on day 4 period 1; this index never hears of it
+        db.execute('INSERT INTO timetable_hierarchical_assignments (school_id, staff_id, section_id, level_id, '
+                   'day_of_week, period_number) VALUES (1, 3, 1, 1, 4, 1)')
+        db.commit()
+        assert manager.check_staff_availability(1, 3, 4, 1)['is_available']
+
+        result = manager.assign_staff_to_period(1, 3, 2, 1, 4, 1, 'Physics')
+        assert not result['success'] and result['conflicts'] == [5]
+        assert not db.in_transaction and get_timetable_occupancy(1) is not occupancy
+        assert db.execute('SELECT COUNT(*) FROM timetable_hierarchical_assignments WHERE staff_id = 3 '
+                          'AND day_of_week = 4').fetchone()[0] == 1
+
+        assert taken_staff_slots(db, 1, [(3, 4, 1), (3, 4, 2), (1, 1, 1)]) == {(3, 4, 1): 5, (1, 1, 1): 1}
+        assert taken_staff_slots(db, 1, [(3, 4, 1)], exclude_assignment_id=5) == {}
+        db.rollback()
+    print("✓ stale index rechecked")
+
+
+def run_all_tests():
+    test_loaded_bitsets()
+    test_incremental_matches_reload()
+    test_manager_uses_occupancy()
+    test_stale_index_rechecked()
+    print("\n✅ All timetable occupancy tests passed")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -5,6 +5,9 @@ Handles all API endpoints for timetable management
 
 from flask import Blueprint, request, jsonify, session, make_response
 from database import get_db
+from timetable_grid_cache import cached_grid, grid_response
+from timetable_occupancy import (bump_timetable_version, get_timetable_occupancy, invalidate_timetable_occupancy,
+                                 note_assignment_added, note_assignment_moved, note_assignment_removed)
 from functools import wraps
 import sqlite3
 from datetime import datetime, timedelta
@@ -500,6 +503,7 @@ def bulk_upload_period_timings():
             imported_count += 1
 
         if imported_count > 0:
+            bump_timetable_version(school_id, db)
             db.commit()
 
         total_rows = len(df.index)
@@ -862,6 +866,7 @@ def bulk_upload_periods():
                 errors.append(f'Row {row_no}: failed to insert - {str(insert_err)}')
 
         if imported_count > 0:
+            bump_timetable_version(school_id, db)
             db.commit()
 
         total_rows = len(df.index)
@@ -969,6 +974,7 @@ def save_period_timing():
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (school_id, slot_label, period_sequence, start_time, end_time, duration))
 
+        bump_timetable_version(school_id, db)
         db.commit()
         return jsonify({'success': True, 'message': 'Time slot saved successfully'})
     except Exception as e:
@@ -1012,6 +1018,7 @@ def delete_period_timing():
         if cursor.rowcount == 0:
             return jsonify({'success': False, 'error': 'Time slot not found'}), 404
 
+        bump_timetable_version(school_id, db)
         db.commit()
         return jsonify({'success': True, 'message': 'Time slot deleted successfully'})
     except Exception as e:
@@ -1177,6 +1184,7 @@ def save_period():
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (school_id, level_id, section_id, day_of_week, period_number, period_name, start_time, end_time, duration, time_slot_id))
             
+        bump_timetable_version(school_id, db)
         db.commit()
         return jsonify({'success': True, 'message': 'Period saved successfully'})
     except Exception as e:
@@ -1365,7 +1373,9 @@ def delete_period():
         cursor.execute('DELETE FROM timetable_periods WHERE id = ? AND school_id = ?', 
                       (period_id, school_id))
         
+        bump_timetable_version(school_id, db)
         db.commit()
+        invalidate_timetable_occupancy(school_id)
         
         total_deleted = hierarchical_deleted + direct_deleted + self_deleted
         message = f'Period deleted successfully'
@@ -1677,7 +1687,9 @@ def admin_override_assignment():
             WHERE id = ?
         ''', (new_staff_id, 'Admin Override: ' + notes, admin_id, assignment_id))
         
+        bump_timetable_version(school_id, db)
         db.commit()
+        note_assignment_moved(school_id, 'assignments', assignment_id, new_staff_id)
         return jsonify({'success': True, 'message': 'Assignment overridden successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1782,7 +1794,9 @@ def assign_staff_period():
             VALUES (?, ?, ?, ?)
         ''', (school_id, staff_id, day_of_week, period_number))
         
+        bump_timetable_version(school_id, db)
         db.commit()
+        note_assignment_added(school_id, 'assignments', cursor.lastrowid, staff_id, day_of_week, period_number)
         return jsonify({'success': True, 'message': 'Period assigned successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1806,7 +1820,9 @@ def remove_staff_period(allocation_id=None):
         cursor = db.cursor()
         
         cursor.execute('DELETE FROM timetable_assignments WHERE id = ? AND school_id = ?', (allocation_id, school_id))
+        bump_timetable_version(school_id, db)
         db.commit()
+        note_assignment_removed(school_id, 'assignments', allocation_id)
         
         return jsonify({'success': True, 'message': 'Assignment removed successfully'})
     except Exception as e:
@@ -1832,53 +1848,59 @@ def get_personal_timetable(target_staff_id=None):
         
         if not staff_id or not school_id:
             return jsonify({'success': False, 'error': 'Unauthorized or missing params'}), 401
-            
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Get hierarchical assignments
-        cursor.execute('''
-            SELECT ha.id, ha.day_of_week, ha.period_number, ha.subject_name, ha.room_number,
-                   ha.level_id, ha.section_id, ha.is_locked,
-                   tp.period_name, tp.start_time, tp.end_time,
-                   l.level_name, s.section_name
-            FROM timetable_hierarchical_assignments ha
-            LEFT JOIN timetable_periods tp ON ha.school_id = tp.school_id AND ha.period_number = tp.period_number
-            LEFT JOIN timetable_academic_levels l ON ha.level_id = l.id
-            LEFT JOIN timetable_sections s ON ha.section_id = s.id
-            WHERE ha.staff_id = ? AND ha.school_id = ?
-            ORDER BY ha.day_of_week, ha.period_number
-        ''', (staff_id, school_id))
         
-        timetable = []
-        for row in cursor.fetchall():
-            # Format class_subject as "Level Name - Section Name - Subject"
-            level_name = row['level_name'] or f"Level {row['level_id']}"
-            section_name = row['section_name'] or f"Section {row['section_id']}"
-            subject = row['subject_name'] or 'Unknown Subject'
-            class_subject = f"{level_name} - {section_name} - {subject}"
-            
-            timetable.append({
-                'id': row['id'],
-                'day_of_week': row['day_of_week'],
-                'period_number': row['period_number'],
-                'period_name': row['period_name'],
-                'start_time': row['start_time'],
-                'end_time': row['end_time'],
-                'class_subject': class_subject,
-                'room_number': row['room_number'],
-                'is_locked': bool(row['is_locked']),
-                'type': 'assigned'
-            })
-        
-        print(f"[DEBUG] Found {len(timetable)} hierarchical assignments for staff {staff_id}")
-            
-        return jsonify({'success': True, 'timetable': timetable, 'data': timetable})
+        payload, etag = cached_grid(school_id, 'personal_timetable', staff_id,
+                                    lambda: _build_personal_timetable(staff_id, school_id))
+        return grid_response(payload, etag)
     except Exception as e:
         print(f"[ERROR] get_personal_timetable: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _build_personal_timetable(staff_id, school_id):
+    """Weekly hierarchical assignments of a staff member, as get_personal_timetable returns them"""
+    db = get_db()
+    cursor = db.cursor()
+    
+    # Get hierarchical assignments
+    cursor.execute('''
+        SELECT ha.id, ha.day_of_week, ha.period_number, ha.subject_name, ha.room_number,
+               ha.level_id, ha.section_id, ha.is_locked,
+               tp.period_name, tp.start_time, tp.end_time,
+               l.level_name, s.section_name
+        FROM timetable_hierarchical_assignments ha
+        LEFT JOIN timetable_periods tp ON ha.school_id = tp.school_id AND ha.period_number = tp.period_number
+        LEFT JOIN timetable_academic_levels l ON ha.level_id = l.id
+        LEFT JOIN timetable_sections s ON ha.section_id = s.id
+        WHERE ha.staff_id = ? AND ha.school_id = ?
+        ORDER BY ha.day_of_week, ha.period_number
+    ''', (staff_id, school_id))
+    
+    timetable = []
+    for row in cursor.fetchall():
+        # Format class_subject as "Level Name - Section Name - Subject"
+        level_name = row['level_name'] or f"Level {row['level_id']}"
+        section_name = row['section_name'] or f"Section {row['section_id']}"
+        subject = row['subject_name'] or 'Unknown Subject'
+        class_subject = f"{level_name} - {section_name} - {subject}"
+        
+        timetable.append({
+            'id': row['id'],
+            'day_of_week': row['day_of_week'],
+            'period_number': row['period_number'],
+            'period_name': row['period_name'],
+            'start_time': row['start_time'],
+            'end_time': row['end_time'],
+            'class_subject': class_subject,
+            'room_number': row['room_number'],
+            'is_locked': bool(row['is_locked']),
+            'type': 'assigned'
+        })
+    
+    print(f"[DEBUG] Found {len(timetable)} hierarchical assignments for staff {staff_id}")
+    return {'success': True, 'timetable': timetable, 'data': timetable}
+
+
 @timetable_api.route('/api/timetable/requests', methods=['GET'])
 def get_swap_requests():
     """Get pending swap requests for the staff member"""
@@ -2077,7 +2099,11 @@ def process_admin_swap_request():
                 WHERE id = ?
             ''', (effective_staff_id, admin_notes, admin_id, request_id))
 
+        if action != 'reject':
+            bump_timetable_version(school_id, db)
         db.commit()
+        if action != 'reject':
+            note_assignment_moved(school_id, 'hierarchical', request_row['assignment_id'], effective_staff_id)
         return jsonify({'success': True, 'message': 'Swap request processed successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2220,7 +2246,11 @@ def respond_swap():
                 WHERE id = ?
             ''', (staff_id, assignment_for_swap))
             
+        if accept:
+            bump_timetable_version(req_row['school_id'], db)
         db.commit()
+        if accept:
+            note_assignment_moved(req_row['school_id'], 'hierarchical', assignment_for_swap, staff_id)
         return jsonify({'success': True, 'message': f'Request {status} successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2294,7 +2324,9 @@ def save_allocation():
             VALUES (?, ?, ?, ?, ?)
         ''', (school_id, staff_id, day_of_week, period_number, class_subject))
         
+        bump_timetable_version(school_id, db)
         db.commit()
+        note_assignment_added(school_id, 'self_allocations', cursor.lastrowid, staff_id, day_of_week, period_number)
         return jsonify({'success': True, 'message': 'Slot allocated successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2357,7 +2389,9 @@ def delete_personal_allocation():
             return jsonify({'success': False, 'error': 'Cannot delete admin-locked allocation'}), 403
             
         cursor.execute('DELETE FROM timetable_self_allocations WHERE id = ?', (allocation_id,))
+        bump_timetable_version(row['school_id'], db)
         db.commit()
+        note_assignment_removed(row['school_id'], 'self_allocations', allocation_id)
         
         return jsonify({'success': True, 'message': 'Allocation deleted'})
     except Exception as e:
@@ -2424,32 +2458,22 @@ def get_available_staff_for_period():
             department = user_row['department']
         
         # Get staff in specified department who are free at this period
+        # (no hierarchical assignment or self-allocation in the slot)
         cursor.execute('''
             SELECT s.id, s.full_name, s.department
             FROM staff s
             WHERE s.school_id = ? 
                 AND s.department = ?
                 AND s.id != ?
-                AND s.id NOT IN (
-                    -- Staff who have an assignment at this time (check hierarchical_assignments)
-                    SELECT staff_id FROM timetable_hierarchical_assignments 
-                    WHERE school_id = ? 
-                        AND day_of_week = ? 
-                        AND period_number = ?
-                    UNION
-                    -- Staff who have a self-allocation at this time
-                    SELECT staff_id FROM timetable_self_allocations
-                    WHERE school_id = ? 
-                        AND day_of_week = ? 
-                        AND period_number = ?
-                )
             ORDER BY s.full_name
-        ''', (school_id, department, current_user_id, 
-              school_id, day_of_week, period_number,
-              school_id, day_of_week, period_number))
+        ''', (school_id, department, current_user_id))
         
+        occupancy = get_timetable_occupancy(school_id)
         staff = []
         for row in cursor.fetchall():
+            if not occupancy.is_staff_free(row['id'], day_of_week, period_number,
+                                           ('hierarchical', 'self_allocations')):
+                continue
             staff.append({
                 'id': row['id'],
                 'full_name': row['full_name'],
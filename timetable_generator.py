@@ -0,0 +1,596 @@
+"""
+Timetable Generator
+Builds hierarchical timetables automatically from weekly subject requirements
+
+Each requirement asks for `periods_per_week` lessons of a subject in a
+section (or in every section of a level), taught by one of its candidate
+staff members. The generator places every lesson in a free period of the
+section subject to the same rules assign_staff_to_period enforces one slot at
+a time:
+- a staff member teaches at most one section per period, and never in a
+  period they are busy in timetable_assignments/timetable_self_allocations
+  or marked unavailable in timetable_staff_availability
+- a section has at most one lesson per period, and only in periods defined
+  for it in timetable_periods
+- a staff member teaches at most max_daily_load hierarchical classes a day
+- a subject takes at most max_per_day periods of a section's day, and all
+  lessons of a subject in a section go to the same staff member
+
+Locked hierarchical assignments (is_locked = 1), and every assignment of a
+section outside the sections being generated, are kept as they are; a locked
+assignment also counts towards the requirement of its subject. Everything
+else in the generated sections is replaced, so re-running the generator for
+a few sections is a partial re-solve around what admins have pinned.
+
+TimetableSolver is a backtracking search over (section, subject) groups:
+the group with the fewest remaining slots is placed next (smallest domain
+first), its values are tried in an order that spreads a subject over the
+week and balances staff load, and every placement re-counts the domains of
+the groups sharing its section or staff, backtracking as soon as one can no
+longer fit its lessons or a section/staff member runs out of periods
+(forward checking). The lessons of a group are interchangeable, so a
+placement that failed isn't retried for the group's later lessons. Domains
+are per-day period bitmasks like those of timetable_occupancy. Runs that
+backtrack too often restart with another tie-break order; the search stops
+at `time_budget` seconds, and when no complete timetable was found it
+reports the most complete one (or a greedy placement of what fits).
+"""
+
+import heapq
+import random
+import time
+
+DEFAULT_DAYS = (1, 2, 3, 4, 5, 6)
+DEFAULT_MAX_PER_DAY = 2
+DEFAULT_TIME_BUDGET = 3.0
+# Longest search a request may ask for: generate_timetable runs inside the
+# HTTP request, and a 200-section school solves in about a second
+MAX_TIME_BUDGET = 5.0
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+else:
+    def _popcount(mask):
+        return bin(mask).count('1')
+
+
+def _bits(mask):
+    """Set bit positions of `mask`, lowest first"""
+    periods = []
+    while mask:
+        low = mask & -mask
+        periods.append(low.bit_length() - 1)
+        mask ^= low
+    return periods
+
+
+class _Group:
+    """The lessons of one subject in one section"""
+
+    __slots__ = ('index', 'section_id', 'level_id', 'subject', 'candidates', 'required', 'max_per_day',
+                 'fixed_staff', 'staff', 'remaining', 'placed', 'day_count', 'excluded', 'version')
+
+    def __init__(self, index, section_id, level_id, subject, candidates, required, max_per_day):
+        self.index = index
+        self.section_id = section_id
+        self.level_id = level_id
+        self.subject = subject
+        self.candidates = candidates
+        self.required = required
+        self.max_per_day = max_per_day
+        self.fixed_staff = None
+
+
+class TimetableSolver:
+    """
+    Constraint solver for one school's hierarchical timetable.
+
+    Args:
+        section_slots (dict): section_id -> {day: bitmask of usable periods}
+        section_levels (dict): section_id -> level_id
+        requirements (list): dicts with section_id, subject_name,
+            periods_per_week, staff_ids and optionally max_per_day
+        fixed (list): (staff_id, section_id, day, period, subject_name) of
+            assignments to keep
+        staff_blocked (dict): staff_id -> {day: bitmask of periods the staff
+            member can't teach in (other assignments, unavailability)}
+        max_daily_load (int): Hierarchical classes a staff member may take a day
+        days (iterable): Working days (0-6)
+    """
+
+    def __init__(self, section_slots, section_levels, requirements, fixed=(), staff_blocked=None,
+                 max_daily_load=6, days=DEFAULT_DAYS):
+        self.days = tuple(days)
+        self.section_slots = section_slots
+        self.section_levels = section_levels
+        self.fixed = list(fixed)
+        self.staff_blocked = staff_blocked or {}
+        self.max_daily_load = max_daily_load
+        self.groups = []
+        for requirement in requirements:
+            self.groups.append(_Group(
+                len(self.groups), requirement['section_id'], section_levels.get(requirement['section_id']),
+                requirement['subject_name'], tuple(dict.fromkeys(requirement['staff_ids'])),
+                int(requirement['periods_per_week']),
+                int(requirement.get('max_per_day') or DEFAULT_MAX_PER_DAY)
+            ))
+
+        # A locked assignment of the subject counts towards its requirement
+        # and decides who teaches the rest of it
+        self._credit = {group.index: 0 for group in self.groups}
+        by_subject = {(group.section_id, str(group.subject).strip().lower()): group for group in self.groups}
+        for staff_id, section_id, day, period, subject in self.fixed:
+            group = by_subject.get((section_id, str(subject or '').strip().lower()))
+            if group is not None:
+                self._credit[group.index] += 1
+                if staff_id in group.candidates and group.fixed_staff is None:
+                    group.fixed_staff = staff_id
+
+        self._by_section = {}
+        self._by_staff = {}
+        for group in self.groups:
+            self._by_section.setdefault(group.section_id, []).append(group)
+            for staff_id in group.candidates:
+                self._by_staff.setdefault(staff_id, []).append(group)
+
+    # ---- state ----
+
+    def _reset(self):
+        days = self.days
+        self._section_free = {section_id: {day: slots.get(day, 0) for day in days}
+                              for section_id, slots in self.section_slots.items()}
+        staff_ids = set(self._by_staff) | {entry[0] for entry in self.fixed}
+        self._staff_busy = {staff_id: {day: self.staff_blocked.get(staff_id, {}).get(day, 0) for day in days}
+                            for staff_id in staff_ids}
+        self._staff_load = {staff_id: dict.fromkeys(days, 0) for staff_id in staff_ids}
+        self._staff_total = dict.fromkeys(staff_ids, 0)
+        fixed_subjects = {}
+        for staff_id, section_id, day, period, subject in self.fixed:
+            if day not in self._staff_load[staff_id]:
+                continue
+            bit = 1 << period
+            if section_id in self._section_free:
+                self._section_free[section_id][day] &= ~bit
+            self._staff_busy[staff_id][day] |= bit
+            self._staff_load[staff_id][day] += 1
+            self._staff_total[staff_id] += 1
+            key = (section_id, str(subject or '').strip().lower(), day)
+            fixed_subjects[key] = fixed_subjects.get(key, 0) + 1
+
+        self._left = 0
+        for group in self.groups:
+            group.staff = group.fixed_staff
+            group.placed = 0
+            group.remaining = max(0, group.required - self._credit[group.index])
+            subject = str(group.subject).strip().lower()
+            group.day_count = {day: fixed_subjects.get((group.section_id, subject, day), 0) for day in days}
+            group.excluded = {}
+            group.version = 0
+            self._left += group.remaining
+        self._periods = {day: 0 for day in days}
+        for slots in self.section_slots.values():
+            for day in days:
+                self._periods[day] |= slots.get(day, 0)
+        self._heap = []
+        self._skipped = set()
+        for group in self.groups:
+            self._refresh(group)
+
+    def _domain_size(self, group):
+        section_free = self._section_free.get(group.section_id)
+        if section_free is None:
+            return 0
+        candidates = (group.staff,) if group.staff is not None else group.candidates
+        size = 0
+        for day in self.days:
+            free = section_free[day]
+            if not free or group.day_count[day] >= group.max_per_day:
+                continue
+            for staff_id in candidates:
+                if self._staff_load[staff_id][day] < self.max_daily_load:
+                    size += _popcount(free & ~self._staff_busy[staff_id][day]
+                                      & ~group.excluded.get((staff_id, day), 0))
+        return size
+
+    def _refresh(self, group):
+        """Re-count a group's domain and queue it; False if it can't fit its remaining lessons"""
+        if not group.remaining:
+            return True
+        size = self._domain_size(group)
+        group.version += 1
+        heapq.heappush(self._heap, (size - group.remaining, -group.remaining, self._rng_key(group),
+                                    group.index, group.version))
+        return size >= group.remaining
+
+    def _rng_key(self, group):
+        return self._tiebreak[group.index]
+
+    def _pick(self):
+        """The unfinished group with the smallest domain (relative to what it still needs)"""
+        while self._heap:
+            _, _, _, index, version = heapq.heappop(self._heap)
+            group = self.groups[index]
+            if group.remaining and group.version == version and index not in self._skipped:
+                return group
+        if self._left:
+            for group in self.groups:
+                if group.remaining and group.index not in self._skipped:
+                    return group
+        return None
+
+    def _values(self, group, rng):
+        """(day, period, staff_id) placements of the group's next lesson, best first"""
+        section_free = self._section_free[group.section_id]
+        candidates = (group.staff,) if group.staff is not None else group.candidates
+        ranked = []
+        for day in self.days:
+            free = section_free[day]
+            if not free or group.day_count[day] >= group.max_per_day:
+                continue
+            for staff_id in candidates:
+                load = self._staff_load[staff_id][day]
+                if load >= self.max_daily_load:
+                    continue
+                excluded = group.excluded.get((staff_id, day), 0)
+                for period in _bits(free & ~self._staff_busy[staff_id][day] & ~excluded):
+                    ranked.append(((group.day_count[day], self._staff_total[staff_id], load, rng.random()),
+                                   day, period, staff_id))
+        ranked.sort()
+        return [value[1:] for value in ranked]
+
+    def _affected(self, group, staff_id):
+        seen = set()
+        for other in self._by_section.get(group.section_id, []) + self._by_staff.get(staff_id, []):
+            if other.index not in seen:
+                seen.add(other.index)
+                yield other
+
+    def _staff_capacity(self, staff_id):
+        """Lessons the staff member can still take this week"""
+        busy, load = self._staff_busy[staff_id], self._staff_load[staff_id]
+        return sum(min(self.max_daily_load - load[day], _popcount(self._periods[day] & ~busy[day]))
+                   for day in self.days)
+
+    def _fits(self, section_id, staff_ids):
+        """
+        Whether the section's unplaced lessons fit its free periods, and the
+        unplaced lessons only `staff_ids` can teach fit the periods and daily
+        load those staff members have left
+        """
+        groups = self._by_section.get(section_id, [])
+        if sum(group.remaining for group in groups) > \
+                sum(_popcount(free) for free in self._section_free[section_id].values()):
+            return False
+        staff_ids = set(staff_ids)
+        demand, seen = 0, set()
+        for staff_id in staff_ids:
+            for group in self._by_staff.get(staff_id, ()):
+                if group.index in seen or not group.remaining:
+                    continue
+                seen.add(group.index)
+                if group.staff in staff_ids or (group.staff is None and staff_ids.issuperset(group.candidates)):
+                    demand += group.remaining
+        return not demand or demand <= sum(self._staff_capacity(staff_id) for staff_id in staff_ids)
+
+    def _exclude(self, group, day, period, staff_id):
+        """Rule out a placement that has failed, for the rest of the frame trying it"""
+        key = (staff_id, day)
+        group.excluded[key] = group.excluded.get(key, 0) | 1 << period
+
+    def _include(self, group, day, period, staff_id):
+        key = (staff_id, day)
+        group.excluded[key] &= ~(1 << period)
+
+    def _apply(self, group, day, period, staff_id):
+        """Place one lesson; False if a neighbouring group can no longer fit"""
+        bit = 1 << period
+        self._section_free[group.section_id][day] &= ~bit
+        self._staff_busy[staff_id][day] |= bit
+        self._staff_load[staff_id][day] += 1
+        self._staff_total[staff_id] += 1
+        group.day_count[day] += 1
+        group.remaining -= 1
+        group.placed += 1
+        group.staff = staff_id
+        self._left -= 1
+        ok = True
+        for other in self._affected(group, staff_id):
+            ok = self._refresh(other) and ok
+        return ok and self._fits(group.section_id, (staff_id,)) and self._fits(group.section_id, group.candidates)
+
+    def _undo(self, group, day, period, staff_id):
+        bit = 1 << period
+        self._section_free[group.section_id][day] |= bit
+        self._staff_busy[staff_id][day] &= ~bit
+        self._staff_load[staff_id][day] -= 1
+        self._staff_total[staff_id] -= 1
+        group.day_count[day] -= 1
+        group.remaining += 1
+        group.placed -= 1
+        if not group.placed:
+            group.staff = group.fixed_staff
+        self._left += 1
+        for other in self._affected(group, staff_id):
+            self._refresh(other)
+
+    # ---- search ----
+
+    def _run(self, rng, deadline, max_backtracks):
+        """
+        One depth-first search. Returns (placements, complete, backtracks,
+        exhausted): the longest list of placements reached, whether it's a
+        full timetable, and whether the whole search space was covered.
+        """
+        self._tiebreak = [rng.random() for _ in self.groups]
+        self._reset()
+        # [group, values, next value index, applied value or None, values ruled out]
+        stack = []
+        best = []
+        backtracks = 0
+        steps = 0
+        descend = True
+
+        while True:
+            if descend:
+                group = self._pick()
+                if group is None:
+                    return [(frame[0], frame[3]) for frame in stack], True, backtracks, False
+                stack.append([group, self._values(group, rng), 0, None, []])
+
+            frame = stack[-1]
+            group = frame[0]
+            if frame[3] is not None:
+                # Every timetable with this placement has been tried: the
+                # group's later lessons in this frame needn't use it either
+                self._undo(group, *frame[3])
+                self._exclude(group, *frame[3])
+                frame[4].append(frame[3])
+                frame[3] = None
+            descend = False
+            while frame[2] < len(frame[1]):
+                value = frame[1][frame[2]]
+                frame[2] += 1
+                frame[3] = value
+                if self._apply(group, *value):
+                    descend = True
+                    break
+                self._undo(group, *value)
+                self._exclude(group, *value)
+                frame[4].append(value)
+                frame[3] = None
+            if descend:
+                steps += 1
+                if steps & 63 == 0 and time.monotonic() > deadline:
+                    return [(f[0], f[3]) for f in stack], False, backtracks, False
+                continue
+
+            # Dead end: keep the deepest partial timetable, then step back
+            if len(stack) - 1 > len(best):
+                best = [(f[0], f[3]) for f in stack[:-1]]
+            stack.pop()
+            for value in frame[4]:
+                self._include(group, *value)
+            self._refresh(group)
+            backtracks += 1
+            if not stack:
+                return best, False, backtracks, True
+            if backtracks >= max_backtracks or time.monotonic() > deadline:
+                current = [(f[0], f[3]) for f in stack]
+                return (current if len(current) > len(best) else best), False, backtracks, False
+
+    def _greedy(self, rng):
+        """
+        Place lessons in smallest-domain order without backtracking, leaving
+        out those that don't fit: the best effort for a requirement set that
+        can't be met in full
+        """
+        self._tiebreak = [rng.random() for _ in self.groups]
+        self._reset()
+        placements = []
+        while True:
+            group = self._pick()
+            if group is None:
+                return placements
+            values = self._values(group, rng)
+            if values:
+                self._apply(group, *values[0])
+                placements.append((group, values[0]))
+            else:
+                self._skipped.add(group.index)
+
+    def solve(self, time_budget=DEFAULT_TIME_BUDGET, seed=0, max_backtracks=None):
+        """
+        Search for a complete timetable within `time_budget` seconds.
+
+        Returns:
+            dict: {complete: bool, assignments: [{section_id, level_id,
+                   staff_id, day_of_week, period_number, subject_name}],
+                   unplaced: [{section_id, subject_name, missing}],
+                   stats: {lessons, placed, backtracks, restarts, elapsed_ms}}
+        """
+        started = time.monotonic()
+        deadline = started + max(0.0, float(time_budget))
+        rng = random.Random(seed)
+        lessons = sum(max(0, group.required - self._credit[group.index]) for group in self.groups)
+        max_backtracks = max_backtracks or max(200, lessons // 4)
+
+        best, complete, total_backtracks, restarts = [], False, 0, 0
+        while True:
+            placements, complete, backtracks, exhausted = self._run(rng, deadline, max_backtracks)
+            total_backtracks += backtracks
+            if complete or len(placements) > len(best):
+                best = placements
+            if complete or exhausted or time.monotonic() > deadline:
+                break
+            restarts += 1
+            # Each restart may backtrack a little longer before giving up
+            max_backtracks = int(max_backtracks * 1.5)
+        if not complete:
+            placements = self._greedy(rng)
+            if len(placements) > len(best):
+                best = placements
+
+        assignments = [{
+            'section_id': group.section_id,
+            'level_id': group.level_id,
+            'staff_id': staff_id,
+            'day_of_week': day,
+            'period_number': period,
+            'subject_name': group.subject,
+        } for group, (day, period, staff_id) in best]
+        placed = {}
+        for group, _ in best:
+            placed[group.index] = placed.get(group.index, 0) + 1
+        unplaced = []
+        for group in self.groups:
+            missing = max(0, group.required - self._credit[group.index]) - placed.get(group.index, 0)
+            if missing:
+                unplaced.append({'section_id': group.section_id, 'subject_name': group.subject,
+                                 'missing': missing})
+
+        return {
+            'complete': complete,
+            'assignments': assignments,
+            'unplaced': unplaced,
+            'stats': {
+                'lessons': lessons,
+                'placed': len(assignments),
+                'backtracks': total_backtracks,
+                'restarts': restarts,
+                'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+            },
+        }
+
+
+def load_problem(school_id, requirements, section_ids=None, max_daily_load=6, days=DEFAULT_DAYS, db=None):
+    """
+    Read a school's sections, periods, assignments and staff availability into
+    the arguments of TimetableSolver.
+
+    Args:
+        school_id (int): School ID
+        requirements (list): dicts with subject_name, periods_per_week, a
+            section_id or a level_id (every active section of the level), and
+            staff_ids (or a single staff_id); max_per_day is optional
+        section_ids (iterable): Sections to generate; defaults to every section
+            named by the requirements. Other sections keep their assignments.
+        max_daily_load (int): Hierarchical classes a staff member may take a day
+        days (iterable): Working days (0-6)
+        db: Connection (defaults to get_db())
+
+    Returns:
+        tuple: (solver kwargs dict, section ids being generated)
+
+    Raises:
+        ValueError: for a malformed requirement or staff not in the school
+    """
+    from database import get_db
+    from timetable_occupancy import get_timetable_occupancy
+
+    db = db if db is not None else get_db()
+    days = tuple(days)
+
+    sections = {}
+    for row in db.execute('''
+        SELECT ts.id, ts.level_id FROM timetable_sections ts
+        JOIN timetable_academic_levels tal ON ts.level_id = tal.id
+        WHERE ts.school_id = ? AND ts.is_active = 1 AND tal.is_active = 1
+    ''', (school_id,)).fetchall():
+        sections[row[0]] = row[1]
+    sections_by_level = {}
+    for section_id, level_id in sections.items():
+        sections_by_level.setdefault(level_id, []).append(section_id)
+
+    expanded = []
+    requested = []
+    for number, requirement in enumerate(requirements, start=1):
+        subject = str(requirement.get('subject_name') or '').strip()
+        staff_ids = requirement.get('staff_ids')
+        if staff_ids is None and requirement.get('staff_id') is not None:
+            staff_ids = [requirement['staff_id']]
+        try:
+            count = int(requirement.get('periods_per_week') or 0)
+            staff_ids = [int(staff_id) for staff_id in staff_ids or []]
+        except (TypeError, ValueError):
+            raise ValueError(f'Requirement {number}: periods_per_week and staff_ids must be numbers')
+        if not subject or count <= 0 or not staff_ids:
+            raise ValueError(f'Requirement {number}: subject_name, periods_per_week and staff_ids are required')
+        if requirement.get('section_id') is not None:
+            targets = [int(requirement['section_id'])]
+            if targets[0] not in sections:
+                raise ValueError(f"Requirement {number}: section {targets[0]} not found")
+        elif requirement.get('level_id') is not None:
+            targets = sorted(sections_by_level.get(int(requirement['level_id']), []))
+            if not targets:
+                raise ValueError(f"Requirement {number}: level {requirement['level_id']} has no sections")
+        else:
+            raise ValueError(f'Requirement {number}: section_id or level_id is required')
+        for section_id in targets:
+            expanded.append({'section_id': section_id, 'subject_name': subject, 'periods_per_week': count,
+                             'staff_ids': staff_ids, 'max_per_day': requirement.get('max_per_day')})
+        requested.append((number, staff_ids))
+
+    # Staff must belong to the school: their ids come from the request
+    wanted = sorted({staff_id for _, staff_ids in requested for staff_id in staff_ids})
+    known = set()
+    if wanted:
+        known = {int(row[0]) for row in db.execute(f'''
+            SELECT id FROM staff WHERE school_id = ? AND id IN ({','.join(['?'] * len(wanted))})
+        ''', [school_id] + wanted).fetchall()}
+    for number, staff_ids in requested:
+        unknown = [staff_id for staff_id in staff_ids if staff_id not in known]
+        if unknown:
+            raise ValueError(f"Requirement {number}: staff {', '.join(map(str, unknown))} not found")
+
+    scope = set(int(section_id) for section_id in section_ids) if section_ids else \
+        {requirement['section_id'] for requirement in expanded}
+    expanded = [requirement for requirement in expanded if requirement['section_id'] in scope]
+
+    # Periods defined for the section, its level or the whole school; rows
+    # without a day apply to every working day
+    level_periods, section_periods = {}, {}
+    for row in db.execute('''
+        SELECT level_id, section_id, day_of_week, period_number FROM timetable_periods
+        WHERE school_id = ?
+    ''', (school_id,)).fetchall():
+        level_id, section_id, day, period = row[0], row[1], row[2], row[3]
+        if period is None:
+            continue
+        target = section_periods.setdefault(section_id, {}) if section_id is not None \
+            else level_periods.setdefault(level_id, {})
+        for slot_day in (days if day is None else (day,)):
+            if slot_day in days:
+                target[slot_day] = target.get(slot_day, 0) | 1 << int(period)
+    section_slots = {}
+    for section_id in scope:
+        slots = section_periods.get(section_id) or level_periods.get(sections[section_id]) \
+            or level_periods.get(None) or {}
+        section_slots[section_id] = dict(slots)
+
+    fixed = []
+    for row in db.execute('''
+        SELECT staff_id, section_id, day_of_week, period_number, subject_name, is_locked
+        FROM timetable_hierarchical_assignments WHERE school_id = ?
+    ''', (school_id,)).fetchall():
+        if row[1] not in scope or row[5]:
+            fixed.append((row[0], row[1], row[2], row[3], row[4]))
+
+    occupancy = get_timetable_occupancy(school_id, db)
+    staff_ids = {staff_id for requirement in expanded for staff_id in requirement['staff_ids']}
+    staff_blocked = {}
+    for staff_id in staff_ids:
+        staff_blocked[staff_id] = {day: occupancy.staff_mask(staff_id, day, ('assignments', 'self_allocations'))
+                                   for day in days}
+    for (staff_id, day, period) in occupancy.unavailable:
+        if staff_id in staff_blocked and day in days:
+            staff_blocked[staff_id][day] |= 1 << period
+
+    return {
+        'section_slots': section_slots,
+        'section_levels': {section_id: sections[section_id] for section_id in scope},
+        'requirements': expanded,
+        'fixed': fixed,
+        'staff_blocked': staff_blocked,
+        'max_daily_load': max_daily_load,
+        'days': days,
+    }, sorted(scope)
@@ -0,0 +1,109 @@
+"""
+Timetable Grid Cache
+Rendered weekly timetables kept per (school, staff member or section)
+
+The staff portal asks for the same week grid every time a staff member opens
+it, and each request used to rebuild it from join queries. Grids are now
+built once and kept with the school's timetable_version() (see
+timetable_occupancy), which every assignment, swap and override write bumps
+in its own transaction, so a cached grid is served by any worker process
+until the timetable changes.
+
+Responses carry an ETag computed from the grid's content, so a browser or the
+PWA service worker revalidates with If-None-Match and gets a 304 while
+nothing has changed. Because the tag comes from the content, a worker process
+whose cache is behind never answers 304 to a newer grid it hasn't seen.
+TIMETABLE_GRID_TTL (seconds) bounds how long a grid is kept;
+TIMETABLE_GRID_CACHE_SIZE caps the number of grids kept (least recently used
+go first).
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+from timetable_occupancy import timetable_version
+
+TIMETABLE_GRID_TTL = int(os.getenv('TIMETABLE_GRID_TTL', '300'))
+TIMETABLE_GRID_CACHE_SIZE = int(os.getenv('TIMETABLE_GRID_CACHE_SIZE', '10000'))
+
+_Grid = collections.namedtuple('_Grid', 'version built_at payload etag')
+
+_grids = collections.OrderedDict()
+_grid_lock = threading.Lock()
+
+
+def _key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def grid_etag(payload):
+    """Strong ETag of a JSON-serialisable payload"""
+    body = json.dumps(payload, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def cached_grid(school_id, kind, item_id, build):
+    """
+    Return (payload, etag) of a rendered grid, calling `build()` when the
+    cached one is missing, expired or older than the school's timetable.
+
+    Only successful payloads ({'success': True, ...}) are kept. Callers must
+    not modify the payload they get back.
+
+    Args:
+        school_id (int): School ID
+        kind (str): Which grid ('staff_schedule', 'section_schedule', ...)
+        item_id: Staff or section ID the grid is for
+        build (callable): Builds the payload dict
+    """
+    key = (_key(school_id), kind, _key(item_id))
+    version = timetable_version(school_id)
+    grid = _grids.get(key)
+    if grid is not None and grid.version == version and time.monotonic() - grid.built_at < TIMETABLE_GRID_TTL:
+        with _grid_lock:
+            if key in _grids:
+                _grids.move_to_end(key)
+        return grid.payload, grid.etag
+
+    # The version is read before building, so a write landing meanwhile
+    # leaves this entry already out of date
+    payload = build()
+    etag = grid_etag(payload)
+    if payload.get('success'):
+        with _grid_lock:
+            _grids[key] = _Grid(version, time.monotonic(), payload, etag)
+            _grids.move_to_end(key)
+            while len(_grids) > TIMETABLE_GRID_CACHE_SIZE:
+                _grids.popitem(last=False)
+    return payload, etag
+
+
+def clear_grid_cache():
+    """Drop every cached grid (tests, memory pressure)"""
+    with _grid_lock:
+        _grids.clear()
+
+
+def grid_response(payload, etag, status=None):
+    """
+    JSON response for a grid with its ETag, answering 304 when the request's
+    If-None-Match already has it. Failed payloads get status 400 and no tag.
+    """
+    from flask import jsonify, request
+
+    if not payload.get('success'):
+        return jsonify(payload), status or 400
+    response = jsonify(payload)
+    if status:
+        response.status_code = status
+    response.set_etag(etag)
+    # Always revalidate: the grid changes whenever the timetable does
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
@@ -6,6 +6,8 @@ Handles period configuration, staff assignments, alterations, and admin override
 from datetime import datetime, time
 import json
 from database import get_db
+from timetable_occupancy import (bump_timetable_version, invalidate_timetable_occupancy, note_assignment_moved,
+                                 note_assignment_removed)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -89,6 +91,7 @@ class TimetableManager:
                         duration_minutes = excluded.duration_minutes,
                         updated_at = CURRENT_TIMESTAMP
                 ''', (school_id, period_number, period_name, start_time, end_time, duration))
+            bump_timetable_version(school_id, db)
             db.commit()
             return {'success': True, 'period_id': period_number}
         except Exception as e:
@@ -115,6 +118,7 @@ class TimetableManager:
                 'DELETE FROM timetable_periods WHERE school_id = ? AND period_number = ?',
                 (school_id, period_number)
             )
+            bump_timetable_version(school_id, db)
             db.commit()
             return {'success': True}
         except Exception as e:
@@ -220,7 +224,10 @@ class TimetableAssignmentManager:
                         is_assigned = 1,
                         updated_at = CURRENT_TIMESTAMP
                 ''', (school_id, staff_id, day_of_week, period_number, class_subject))
+            bump_timetable_version(school_id, db)
             db.commit()
+            # An upsert has no reliable lastrowid; reload the occupancy
+            invalidate_timetable_occupancy(school_id)
             return {'success': True}
         except Exception as e:
             logger.error(f"Error assigning staff: {e}")
@@ -301,7 +308,9 @@ class TimetableAssignmentManager:
                 VALUES (?, ?, ?, ?, 'admin_override', 'admin_override', ?, ?, CURRENT_TIMESTAMP)
             ''', (school_id, assignment_id, assignment['staff_id'], new_staff_id, notes, admin_id))
             
+            bump_timetable_version(school_id, db)
             db.commit()
+            note_assignment_moved(school_id, 'assignments', assignment_id, new_staff_id)
             return {'success': True, 'message': 'Assignment reassigned successfully'}
         except Exception as e:
             logger.error(f"Error in admin override: {e}")
@@ -399,7 +408,9 @@ class AlterationManager:
                     WHERE id = ?
                 ''', (staff_id, assignment['assignment_id']))
                 
+                bump_timetable_version(assignment['school_id'], db)
                 db.commit()
+                note_assignment_moved(assignment['school_id'], 'assignments', assignment['assignment_id'], staff_id)
             
             return {'success': True, 'message': f'Request {status}'}
         except Exception as e:
@@ -491,7 +502,9 @@ class SelfAllocationManager:
                     DO UPDATE SET is_admin_locked = 1, updated_at = CURRENT_TIMESTAMP
                 ''', (school_id, staff_id, day_of_week, period_number, class_subject))
             
+            bump_timetable_version(school_id, db)
             db.commit()
+            invalidate_timetable_occupancy(school_id)
             return {'success': True, 'message': 'Slot allocated successfully'}
         except Exception as e:
             logger.error(f"Error in self-allocation: {e}")
@@ -547,7 +560,9 @@ class SelfAllocationManager:
                 'DELETE FROM timetable_self_allocations WHERE id = ? AND school_id = ?',
                 (allocation_id, school_id)
             )
+            bump_timetable_version(school_id, db)
             db.commit()
+            note_assignment_removed(school_id, 'self_allocations', allocation_id)
             return {'success': True}
         except Exception as e:
             logger.error(f"Error deleting allocation: {e}")
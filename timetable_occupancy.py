@@ -0,0 +1,394 @@
+"""
+Timetable Occupancy Index
+Per-school bitsets of which staff and sections are busy in each day/period,
+used for conflict detection, availability and free-slot lookups
+
+Conflict checks used to run three queries per slot (unavailability, existing
+assignment, daily load) and the availability APIs unioned the three
+assignment tables on every request. The occupancy of a school is now loaded
+once from timetable_hierarchical_assignments, timetable_assignments,
+timetable_self_allocations and timetable_staff_availability and kept as one
+int per (staff, day) and (section, day), bit N set when period N is taken.
+
+Writers report their changes with note_assignment_added(),
+note_assignment_removed() and note_assignment_moved(); bulk deletes call
+invalidate_timetable_occupancy(). TIMETABLE_OCCUPANCY_TTL (seconds) bounds
+how stale another worker process can be, so writers confirm the staff slots
+they are about to take with taken_staff_slots() inside their transaction.
+
+The rendered grids in timetable_grid_cache are keyed on the school's
+timetable_version(), a row of timetable_versions. Every write that changes
+what a grid shows (assignments, swaps, subjects, section and level names)
+calls bump_timetable_version() before its commit, so the new version becomes
+visible to every worker process together with the write. The version is read
+once per request.
+"""
+
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g, has_app_context
+
+from database import get_db
+
+TIMETABLE_OCCUPANCY_TTL = int(os.getenv('TIMETABLE_OCCUPANCY_TTL', '60'))
+
+# Assignment tables feeding the index, by the source name used in the API
+SOURCES = {
+    'hierarchical': 'timetable_hierarchical_assignments',
+    'assignments': 'timetable_assignments',
+    'self_allocations': 'timetable_self_allocations',
+}
+
+_DAYS = 7
+
+# timetable_versions row bumped when every school's timetable changes at once
+ALL_SCHOOLS = 0
+
+_occupancies = {}
+_occupancy_lock = threading.Lock()
+
+
+def _school_key(school_id):
+    try:
+        return int(school_id)
+    except (TypeError, ValueError):
+        return school_id
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+def _bits(mask):
+    """Set bit positions of `mask`, lowest first"""
+    periods = []
+    while mask:
+        low = mask & -mask
+        periods.append(low.bit_length() - 1)
+        mask ^= low
+    return periods
+
+
+class TimetableOccupancy:
+    """
+    Occupied day/period slots of one school.
+
+    Staff slots are tracked per source table, so callers can keep the
+    semantics of the query they replace (the hierarchical conflict check only
+    looks at hierarchical assignments; the availability summary unions all
+    three). Section slots and the daily load come from hierarchical
+    assignments only.
+    """
+
+    def __init__(self, school_id):
+        self.school_id = school_id
+        self.loaded_at = time.monotonic()
+        self._lock = threading.Lock()
+        # (source, row id) -> (staff_id, section_id, day, period)
+        self._entries = {}
+        # (source, staff_id, day, period) -> {row ids}
+        self._staff_slots = collections.defaultdict(set)
+        # source -> staff_id -> [mask per day]
+        self._staff_bits = {source: {} for source in SOURCES}
+        # (section_id, day, period) -> {hierarchical row ids}
+        self._section_slots = collections.defaultdict(set)
+        self._section_bits = {}
+        # (staff_id, day) -> number of hierarchical assignments
+        self._daily_load = collections.defaultdict(int)
+        # (staff_id, day, period) -> reason
+        self.unavailable = {}
+
+    @classmethod
+    def load(cls, school_id, db=None):
+        db = db if db is not None else get_db()
+        occupancy = cls(school_id)
+        rows = db.execute('''
+            SELECT id, staff_id, section_id, day_of_week, period_number
+            FROM timetable_hierarchical_assignments WHERE school_id = ?
+        ''', (school_id,)).fetchall()
+        for row in rows:
+            occupancy._add('hierarchical', row[0], row[1], row[3], row[4], row[2])
+        for source in ('assignments', 'self_allocations'):
+            rows = db.execute(f'''
+                SELECT id, staff_id, day_of_week, period_number
+                FROM {SOURCES[source]} WHERE school_id = ? AND staff_id IS NOT NULL
+            ''', (school_id,)).fetchall()
+            for row in rows:
+                occupancy._add(source, row[0], row[1], row[2], row[3])
+        rows = db.execute('''
+            SELECT staff_id, day_of_week, period_number, reason_if_unavailable
+            FROM timetable_staff_availability WHERE school_id = ? AND is_available = 0
+        ''', (school_id,)).fetchall()
+        for row in rows:
+            occupancy.unavailable[(_int(row[0]), _int(row[1]), _int(row[2]))] = row[3]
+        return occupancy
+
+    # ---- maintenance ----
+
+    def _add(self, source, row_id, staff_id, day, period, section_id=None):
+        row_id, staff_id, day, period = _int(row_id), _int(staff_id), _int(day), _int(period)
+        section_id = _int(section_id)
+        if staff_id is None or day is None or period is None or not 0 <= day < _DAYS:
+            return
+        key = (source, row_id)
+        if key in self._entries:
+            self._remove(source, row_id)
+        self._entries[key] = (staff_id, section_id, day, period)
+
+        self._staff_slots[(source, staff_id, day, period)].add(row_id)
+        masks = self._staff_bits[source].setdefault(staff_id, [0] * _DAYS)
+        masks[day] |= 1 << period
+        if source == 'hierarchical':
+            self._daily_load[(staff_id, day)] += 1
+            if section_id is not None:
+                self._section_slots[(section_id, day, period)].add(row_id)
+                self._section_bits.setdefault(section_id, [0] * _DAYS)[day] |= 1 << period
+
+    def _remove(self, source, row_id):
+        entry = self._entries.pop((source, _int(row_id)), None)
+        if entry is None:
+            return None
+        staff_id, section_id, day, period = entry
+
+        slot = self._staff_slots[(source, staff_id, day, period)]
+        slot.discard(_int(row_id))
+        if not slot:
+            del self._staff_slots[(source, staff_id, day, period)]
+            self._staff_bits[source][staff_id][day] &= ~(1 << period)
+        if source == 'hierarchical':
+            self._daily_load[(staff_id, day)] -= 1
+            if section_id is not None:
+                slot = self._section_slots[(section_id, day, period)]
+                slot.discard(_int(row_id))
+                if not slot:
+                    del self._section_slots[(section_id, day, period)]
+                    self._section_bits[section_id][day] &= ~(1 << period)
+        return entry
+
+    def add(self, source, row_id, staff_id, day, period, section_id=None):
+        with self._lock:
+            self._add(source, row_id, staff_id, day, period, section_id)
+
+    def remove(self, source, row_id):
+        with self._lock:
+            self._remove(source, row_id)
+
+    def move(self, source, row_id, staff_id):
+        """Give an existing assignment to another staff member (swaps, overrides)"""
+        with self._lock:
+            entry = self._remove(source, row_id)
+            if entry is not None:
+                _, section_id, day, period = entry
+                self._add(source, row_id, staff_id, day, period, section_id)
+
+    # ---- queries ----
+
+    def entry(self, source, row_id):
+        """(staff_id, section_id, day, period) of an indexed assignment, or None"""
+        return self._entries.get((source, _int(row_id)))
+
+    def staff_mask(self, staff_id, day, sources=tuple(SOURCES)):
+        """Bitmask of the periods `staff_id` is busy on `day` in `sources`"""
+        staff_id, day = _int(staff_id), _int(day)
+        mask = 0
+        for source in sources:
+            masks = self._staff_bits[source].get(staff_id)
+            if masks is not None:
+                mask |= masks[day]
+        return mask
+
+    def section_mask(self, section_id, day):
+        masks = self._section_bits.get(_int(section_id))
+        return masks[_int(day)] if masks is not None else 0
+
+    def is_staff_free(self, staff_id, day, period, sources=tuple(SOURCES)):
+        return not self.staff_mask(staff_id, day, sources) >> _int(period) & 1
+
+    def busy_periods(self, staff_id, day, sources=tuple(SOURCES)):
+        return _bits(self.staff_mask(staff_id, day, sources))
+
+    def free_periods(self, staff_id, day, max_periods, sources=tuple(SOURCES)):
+        mask = self.staff_mask(staff_id, day, sources)
+        return [period for period in range(1, max_periods + 1) if not mask >> period & 1]
+
+    def staff_conflicts(self, staff_id, day, period, exclude_assignment_id=None):
+        """Hierarchical assignment ids holding `staff_id` at day/period"""
+        exclude = _int(exclude_assignment_id) if exclude_assignment_id else None
+        with self._lock:
+            ids = self._staff_slots.get(('hierarchical', _int(staff_id), _int(day), _int(period)), ())
+            return sorted(row_id for row_id in ids if row_id != exclude)
+
+    def section_occupant(self, section_id, day, period, exclude_assignment_id=None):
+        """(assignment id, staff id) holding the section slot, or None"""
+        exclude = _int(exclude_assignment_id) if exclude_assignment_id else None
+        with self._lock:
+            ids = self._section_slots.get((_int(section_id), _int(day), _int(period)), ())
+            for row_id in sorted(ids):
+                if row_id != exclude:
+                    return row_id, self._entries[('hierarchical', row_id)][0]
+        return None
+
+    def daily_load(self, staff_id, day):
+        """Hierarchical assignments of `staff_id` on `day`"""
+        return self._daily_load.get((_int(staff_id), _int(day)), 0)
+
+    def is_marked_unavailable(self, staff_id, day, period):
+        """True if timetable_staff_availability blocks the slot (the reason is in `unavailable`)"""
+        return (_int(staff_id), _int(day), _int(period)) in self.unavailable
+
+    def free_staff(self, staff_ids, day, period, sources=tuple(SOURCES)):
+        """The members of `staff_ids` with nothing in `sources` at day/period"""
+        return [staff_id for staff_id in staff_ids if self.is_staff_free(staff_id, day, period, sources)]
+
+    def common_free_slots(self, staff_id=None, section_id=None, days=range(1, _DAYS), max_periods=8):
+        """(day, period) pairs where the staff member and the section are both free"""
+        slots = []
+        for day in days:
+            busy = 0
+            if staff_id is not None:
+                busy |= self.staff_mask(staff_id, day)
+            if section_id is not None:
+                busy |= self.section_mask(section_id, day)
+            slots.extend((day, period) for period in range(1, max_periods + 1) if not busy >> period & 1)
+        return slots
+
+
+def get_timetable_occupancy(school_id, db=None):
+    """
+    Return the TimetableOccupancy of `school_id`, loading it on first use.
+
+    Args:
+        school_id (int): School ID
+        db: Connection to load with on a cache miss (defaults to get_db())
+    """
+    key = _school_key(school_id)
+    occupancy = _occupancies.get(key)
+    if occupancy is not None and time.monotonic() - occupancy.loaded_at < TIMETABLE_OCCUPANCY_TTL:
+        return occupancy
+
+    occupancy = TimetableOccupancy.load(key, db)
+    with _occupancy_lock:
+        _occupancies[key] = occupancy
+    return occupancy
+
+
+def timetable_version(school_id, db=None):
+    """
+    Opaque value that changes whenever the school's timetable is written to.
+    Read from timetable_versions once per request (kept in flask.g).
+    """
+    key = _school_key(school_id)
+    versions = g.setdefault('timetable_versions', {}) if has_app_context() else {}
+    if key not in versions:
+        db = db if db is not None else get_db()
+        rows = db.execute('SELECT school_id, version FROM timetable_versions WHERE school_id IN (?, ?)',
+                          (ALL_SCHOOLS, key)).fetchall()
+        found = {_int(row[0]): row[1] for row in rows}
+        versions[key] = (found.get(ALL_SCHOOLS, 0), found.get(key, 0))
+    return versions[key]
+
+
+def bump_timetable_version(school_id=None, db=None):
+    """
+    Mark the timetable of `school_id` (or of every school) as changed.
+
+    Runs in the caller's transaction and doesn't commit: call it before the
+    commit of the write it reports, so both become visible together.
+    """
+    key = ALL_SCHOOLS if school_id is None else _school_key(school_id)
+    db = db if db is not None else get_db()
+    db.execute('INSERT OR IGNORE INTO timetable_versions (school_id, version) VALUES (?, 0)', (key,))
+    db.execute('UPDATE timetable_versions SET version = version + 1 WHERE school_id = ?', (key,))
+    if has_app_context() and 'timetable_versions' in g:
+        if school_id is None:
+            g.timetable_versions.clear()
+        else:
+            g.timetable_versions.pop(key, None)
+
+
+def invalidate_timetable_occupancy(school_id=None):
+    """
+    Forget the occupancy of `school_id`, or of every school when omitted.
+    The writer bumps the timetable version itself, before its commit.
+    """
+    with _occupancy_lock:
+        if school_id is None:
+            _occupancies.clear()
+        else:
+            _occupancies.pop(_school_key(school_id), None)
+
+
+def taken_staff_slots(db, school_id, slots, exclude_assignment_id=None):
+    """
+    Which staff slots already hold a hierarchical assignment, read from the
+    table under the write lock
+
+    The index may not have seen another worker's latest writes, so a writer
+    that checked slots against it confirms them here and writes in the same
+    transaction. SQLite takes the database write lock first (BEGIN IMMEDIATE,
+    unless the transaction already writes); MySQL reads the rows FOR UPDATE,
+    which holds off a concurrent insert into the same slots until commit.
+
+    Args:
+        db: Connection the caller writes with
+        school_id (int): School ID
+        slots (iterable): (staff_id, day_of_week, period_number) tuples
+        exclude_assignment_id (int, optional): Assignment the caller is moving
+
+    Returns:
+        dict: {(staff_id, day_of_week, period_number): assignment_id}
+    """
+    wanted = {(int(staff_id), int(day), int(period)) for staff_id, day, period in slots}
+    if not wanted:
+        return {}
+
+    is_sqlite = isinstance(db, sqlite3.Connection)
+    if is_sqlite and not db.in_transaction:
+        db.execute('BEGIN IMMEDIATE')
+    staff_ids = sorted({slot[0] for slot in wanted})
+    rows = db.execute(f'''
+        SELECT id, staff_id, day_of_week, period_number
+        FROM timetable_hierarchical_assignments
+        WHERE school_id = ? AND staff_id IN ({','.join(['?'] * len(staff_ids))})
+        {'' if is_sqlite else 'FOR UPDATE'}
+    ''', [school_id] + staff_ids).fetchall()
+
+    taken = {}
+    for row in rows:
+        slot = (int(row[1]), int(row[2]), int(row[3]))
+        if slot in wanted and row[0] != exclude_assignment_id:
+            taken.setdefault(slot, row[0])
+    return taken
+
+
+def _loaded(school_id):
+    return _occupancies.get(_school_key(school_id))
+
+
+def note_assignment_added(school_id, source, row_id, staff_id, day_of_week, period_number, section_id=None):
+    """Record a committed insert into a SOURCES table"""
+    occupancy = _loaded(school_id)
+    if occupancy is None:
+        return
+    if row_id is None:
+        invalidate_timetable_occupancy(school_id)
+    else:
+        occupancy.add(source, row_id, staff_id, day_of_week, period_number, section_id)
+
+
+def note_assignment_removed(school_id, source, row_id):
+    """Record a committed delete from a SOURCES table"""
+    occupancy = _loaded(school_id)
+    if occupancy is not None:
+        occupancy.remove(source, row_id)
+
+
+def note_assignment_moved(school_id, source, row_id, staff_id):
+    """Record a committed change of the staff member on an assignment"""
+    occupancy = _loaded(school_id)
+    if occupancy is not None:
+        occupancy.move(source, row_id, staff_id)
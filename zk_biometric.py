@@ -6,20 +6,35 @@ Now supports both direct Ethernet and cloud-based connectivity
 """
 
 from zk import ZK, const
-import pymysql
 import sqlite3
 import datetime
 import logging
-import requests
 import json
-from typing import List, Dict, Optional, Iterable, Set
-from database import get_db
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Iterable, Set, Tuple
+from database import (get_db, get_device_log_cursor, update_device_log_cursor,
+                      refresh_attendance_daily_summary)
+from attendance_events import attendance_events, punch_event
 from flask import current_app
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# When to clear a LAN device's attendance log after its records are saved:
+# 'never', 'after_sync', or a record count at which the log is cleared.
+DEVICE_LOG_CLEAR_POLICY = os.getenv('DEVICE_LOG_CLEAR_POLICY', 'never')
+
+# Concurrent Direct LAN sync (see DeviceSyncScheduler): worker threads, seconds
+# a single device may take, and the most cycles an offline device sits out.
+LAN_SYNC_MAX_WORKERS = int(os.getenv('LAN_SYNC_MAX_WORKERS', '8'))
+LAN_SYNC_DEVICE_TIMEOUT = int(os.getenv('LAN_SYNC_DEVICE_TIMEOUT', '120'))
+LAN_SYNC_MAX_BACKOFF_CYCLES = int(os.getenv('LAN_SYNC_MAX_BACKOFF_CYCLES', '8'))
+
 # Import cloud modules (with fallback for backward compatibility)
 try:
     from cloud_config import get_cloud_config, get_device_config
@@ -192,29 +207,7 @@ class ZKBiometricDevice:
 
             # Get attendance records
             attendance = self.connection.get_attendance()
-            records = []
-            raw_count = len(attendance)
-
-            for record in attendance:
-                user_id = str(record.user_id).strip()
-                if allowed_user_ids is not None and user_id not in allowed_user_ids:
-                    continue
-
-                record_timestamp = record.timestamp
-                if since_timestamp and isinstance(record_timestamp, datetime.datetime) and record_timestamp <= since_timestamp:
-                    continue
-
-                # Map punch codes to our verification types
-                verification_type = self._map_punch_to_verification_type(record.punch)
-
-                records.append({
-                    'user_id': user_id,
-                    'timestamp': record_timestamp,
-                    'status': record.status,
-                    'punch': record.punch,  # Original punch code
-                    'verification_type': verification_type,  # Mapped verification type
-                    'verify': getattr(record, 'verify', 0)  # Verification method (safe access)
-                })
+            records = self._attendance_to_records(attendance, allowed_user_ids, since_timestamp)
 
             # Re-enable device
             self.connection.enable_device()
@@ -236,6 +229,32 @@ class ZKBiometricDevice:
                 pass
             return []
 
+    def _attendance_to_records(self, attendance, allowed_user_ids: Optional[Set[str]] = None,
+                               since_timestamp: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Filter pyzk Attendance objects and convert them to record dicts"""
+        records = []
+        for record in attendance:
+            user_id = str(record.user_id).strip()
+            if allowed_user_ids is not None and user_id not in allowed_user_ids:
+                continue
+
+            record_timestamp = record.timestamp
+            if since_timestamp and isinstance(record_timestamp, datetime.datetime) and record_timestamp <= since_timestamp:
+                continue
+
+            # Map punch codes to our verification types
+            verification_type = self._map_punch_to_verification_type(record.punch)
+
+            records.append({
+                'user_id': user_id,
+                'timestamp': record_timestamp,
+                'status': record.status,
+                'punch': record.punch,  # Original punch code
+                'verification_type': verification_type,  # Mapped verification type
+                'verify': getattr(record, 'verify', 0)  # Verification method (safe access)
+            })
+        return records
+
     def _get_attendance_records_cloud(self, allowed_user_ids: Optional[Set[str]] = None,
                                       since_timestamp: Optional[datetime.datetime] = None) -> List[Dict]:
         """Get attendance records from ZK device via Cloud"""
@@ -334,12 +353,201 @@ class ZKBiometricDevice:
             return all_records
         return all_records
 
-    def process_device_attendance_to_database(self, school_id: int = 1) -> Dict:
+    def get_attendance_records_incremental(self, log_cursor: Optional[Dict] = None,
+                                           allowed_user_ids: Optional[Iterable] = None,
+                                           since_timestamp: datetime.datetime = None) -> Tuple[List[Dict], Dict]:
+        """
+        Get attendance records added to the device log after a sync cursor
+
+        The cursor is {'count': records already read, 'last_timestamp': time of
+        the last of them}. Over Ethernet only the new tail of the log is
+        transferred, and nothing at all when the record count is unchanged.
+        Without a usable cursor (first sync, log cleared or rewritten on the
+        device) the whole log is read and filtered by timestamp instead.
+
+        Args:
+            log_cursor: Cursor saved after the previous sync (None for first sync)
+            allowed_user_ids: Only return records of these user IDs
+            since_timestamp: Timestamp filter for full reads without a cursor
+
+        Returns:
+            (records, new_cursor) - save new_cursor once the records are stored
+        """
+        log_cursor = dict(log_cursor or {})
+        normalized_user_ids = self._normalize_allowed_user_ids(allowed_user_ids)
+        last_timestamp = self._normalize_since_timestamp(log_cursor.get('last_timestamp'))
+        known_count = int(log_cursor.get('count') or 0)
+
+        if self.use_cloud:
+            records = self._get_attendance_records_cloud(
+                normalized_user_ids, last_timestamp or self._normalize_since_timestamp(since_timestamp)
+            )
+            timestamps = [r['timestamp'] for r in records if isinstance(r.get('timestamp'), datetime.datetime)]
+            return records, {'count': None, 'last_timestamp': max(timestamps, default=last_timestamp)}
+
+        if not self.connection:
+            logger.error("No connection to ZK device")
+            return [], log_cursor
+
+        conn = self.connection
+        try:
+            conn.read_sizes()
+            total = conn.records
+            if known_count and total == known_count:
+                return [], log_cursor
+
+            # Disable device to prevent interference
+            conn.disable_device()
+            try:
+                attendance = None
+                if known_count and total > known_count:
+                    # Re-read the last known record as an anchor: if it no longer
+                    # matches, the log was cleared and refilled since last sync.
+                    tail = self._read_attendance_tail(known_count - 1, total)
+                    transferred = len(tail) if tail is not None else total
+                    if tail is None:
+                        tail = conn.get_attendance()[known_count - 1:]
+                    if tail and (last_timestamp is None or tail[0].timestamp == last_timestamp):
+                        attendance = tail[1:]
+                if attendance is None:
+                    attendance = conn.get_attendance()
+                    transferred = len(attendance)
+                    records = self._attendance_to_records(
+                        attendance, normalized_user_ids,
+                        last_timestamp or self._normalize_since_timestamp(since_timestamp)
+                    )
+                else:
+                    records = self._attendance_to_records(attendance, normalized_user_ids)
+            finally:
+                # Re-enable device
+                conn.enable_device()
+
+            new_cursor = {
+                'count': total,
+                'last_timestamp': attendance[-1].timestamp if attendance else last_timestamp
+            }
+            logger.info(
+                f"Read {transferred} of {total} log records from ZK device {self.device_ip}; "
+                f"{len(records)} new attendance records"
+            )
+            return records, new_cursor
+
+        except Exception as e:
+            logger.error(f"Error reading attendance log incrementally: {str(e)}")
+            return [], log_cursor
+
+    def _read_attendance_tail(self, start_index: int, total: int):
+        """
+        Read log records [start_index, total) from the device buffer.
+
+        pyzk only exposes whole-log downloads, so this drives its buffered
+        read (prepare buffer, then read chunks at an offset) directly. Returns
+        None when the connection or firmware does not support it.
+        """
+        conn = self.connection
+        send_command = getattr(conn, '_ZK__send_command', None)
+        read_chunk = getattr(conn, '_ZK__read_chunk', None)
+        decode_time = getattr(conn, '_ZK__decode_time', None)
+        if not (send_command and read_chunk and decode_time) or total <= 0:
+            return None
+
+        try:
+            response = send_command(1503, struct.pack('<bhii', 1, const.CMD_ATTLOG_RRQ, 0, 0), 1024)
+            if not response.get('status') or response.get('code') == const.CMD_DATA:
+                # Not supported, or a small log sent inline: use a full read
+                return None
+
+            size = struct.unpack('I', conn._ZK__data[1:5])[0]
+            record_size, remainder = divmod(size - 4, total)
+            if remainder or record_size not in (8, 16, 40):
+                conn.free_data()
+                return None
+
+            max_chunk = 0xFFc0 if conn.tcp else 16 * 1024
+            start = 4 + start_index * record_size
+            data = []
+            while start < size:
+                length = min(max_chunk, size - start)
+                data.append(read_chunk(start, length))
+                start += length
+            conn.free_data()
+        except Exception as e:
+            logger.warning(f"Tail read not supported by ZK device {self.device_ip}: {str(e)}")
+            return None
+
+        return self._decode_attendance_log(b''.join(data), record_size, decode_time)
+
+    def _decode_attendance_log(self, data: bytes, record_size: int, decode_time) -> List:
+        """Decode raw attendance log records, as pyzk's get_attendance() does."""
+        from zk.attendance import Attendance
+
+        users = self.connection.get_users() if record_size in (8, 16) else []
+        attendance = []
+        for offset in range(0, len(data) - record_size + 1, record_size):
+            chunk = data[offset:offset + record_size]
+            if record_size == 8:
+                uid, status, timestamp, punch = struct.unpack('HB4sB', chunk)
+                user = next((u for u in users if u.uid == uid), None)
+                user_id = user.user_id if user else str(uid)
+            elif record_size == 16:
+                user_id, timestamp, status, punch, _, _ = struct.unpack('<I4sBB2sI', chunk)
+                user_id = str(user_id)
+                user = next((u for u in users if u.user_id == user_id), None)
+                uid = user.uid if user else user_id
+            else:
+                uid, user_id, status, timestamp, punch, _ = struct.unpack('<H24sB4sB8s', chunk)
+                user_id = user_id.split(b'\x00')[0].decode(errors='ignore')
+            attendance.append(Attendance(user_id, decode_time(timestamp), status, punch, uid))
+        return attendance
+
+    def clear_log_after_confirmed_sync(self, log_cursor: Dict) -> Dict:
+        """
+        Apply DEVICE_LOG_CLEAR_POLICY once records up to `log_cursor` are saved
+
+        The log is only cleared when the device still holds exactly the
+        records covered by the cursor, so punches made meanwhile are kept.
+
+        Returns:
+            dict: Cursor to save (count reset to 0 when the log was cleared)
+        """
+        policy = str(DEVICE_LOG_CLEAR_POLICY or 'never').strip().lower()
+        count = log_cursor.get('count')
+        if self.use_cloud or not self.connection or not count or policy == 'never':
+            return log_cursor
+        if policy != 'after_sync':
+            try:
+                if count < int(policy):
+                    return log_cursor
+            except ValueError:
+                logger.warning(f"Unknown DEVICE_LOG_CLEAR_POLICY '{DEVICE_LOG_CLEAR_POLICY}'; not clearing")
+                return log_cursor
+
+        conn = self.connection
+        try:
+            conn.disable_device()
+            try:
+                conn.read_sizes()
+                if conn.records != count:
+                    return log_cursor
+                if not self.clear_attendance():
+                    return log_cursor
+            finally:
+                conn.enable_device()
+        except Exception as e:
+            logger.error(f"Error clearing synced attendance log: {str(e)}")
+            return log_cursor
+
+        logger.info(f"Cleared {count} synced records from ZK device {self.device_ip}")
+        return {'count': 0, 'last_timestamp': log_cursor.get('last_timestamp')}
+
+    def process_device_attendance_to_database(self, school_id: int = 1, device_id: int = None) -> Dict:
         """
         Process attendance records from device and update database automatically
 
         Args:
             school_id: School ID for the attendance records
+            device_id: biometric_devices ID; when given, only records after the
+                device's saved log cursor are read and the cursor is advanced
 
         Returns:
             Dict with processing results
@@ -370,14 +578,22 @@ class ZKBiometricDevice:
                 return result
 
             # Fetch only records that can match this institution.
-            records = self.get_attendance_records(allowed_user_ids=allowed_staff_ids)
+            if device_id is not None:
+                records, new_cursor = self.get_attendance_records_incremental(
+                    get_device_log_cursor(device_id), allowed_user_ids=allowed_staff_ids
+                )
+            else:
+                records = self.get_attendance_records(allowed_user_ids=allowed_staff_ids)
 
             if not records:
+                if device_id is not None:
+                    update_device_log_cursor(device_id, self.clear_log_after_confirmed_sync(new_cursor))
                 result['message'] = 'No attendance records found on device'
                 result['success'] = True
                 return result
 
             processed_count = 0
+            processed_dates = set()
 
             for record in records:
                 try:
@@ -401,13 +617,19 @@ class ZKBiometricDevice:
                     # Process the attendance record
                     self._process_single_attendance_record(db, staff_db_id, school_id, record)
                     processed_count += 1
+                    processed_dates.add(record['timestamp'].date())
 
                 except Exception as e:
                     result['errors'].append(f"Error processing record for user {record['user_id']}: {str(e)}")
                     logger.error(f"Error processing attendance record: {str(e)}")
 
+            refresh_attendance_daily_summary(school_id, processed_dates, db, commit=False)
             db.commit()
 
+            # Advance the cursor only when every record was saved (or is unknown staff)
+            if device_id is not None and not any(error.startswith('Error processing') for error in result['errors']):
+                update_device_log_cursor(device_id, self.clear_log_after_confirmed_sync(new_cursor))
+
             result['success'] = True
             result['processed_count'] = processed_count
             result['message'] = f"Successfully processed {processed_count} attendance records"
@@ -468,7 +690,7 @@ class ZKBiometricDevice:
             shift_type = staff_info['shift_type'] if staff_info else 'general'
 
             # Calculate status and late minutes strictly vs shift start
-            shift_manager = ShiftManager()
+            shift_manager = ShiftManager(school_id)
             attendance_result = shift_manager.calculate_attendance_status(
                 shift_type, timestamp.time()
             )
@@ -526,7 +748,7 @@ class ZKBiometricDevice:
                         check_in_time = None
 
                 # Use ShiftManager for check-out status calculation
-                shift_manager = ShiftManager()
+                shift_manager = ShiftManager(school_id)
                 staff_info = db.execute('''
                     SELECT COALESCE(shift_type, 'general') AS shift_type
                     FROM staff WHERE id = ?
@@ -1089,6 +1311,7 @@ class AttendanceSync:
     def sync_to_sqlite(self, records: List[Dict], school_id: int = 1) -> int:
         """Sync attendance records to SQLite database"""
         synced_count = 0
+        synced_dates = set()
         
         try:
             # Use Flask app context to get database connection
@@ -1140,6 +1363,7 @@ class AttendanceSync:
                                     VALUES (?, ?, ?, ?, ?)
                                 ''', (staff_id, school_id, date, time_str, status))
                                 synced_count += 1
+                                synced_dates.add(date)
 
                         elif record['punch'] == 1:  # Check Out - AUTO SYNC ENABLED
                             # Check if attendance record exists for check-out update
@@ -1160,6 +1384,7 @@ class AttendanceSync:
                                         WHERE staff_id = ? AND date = ?
                                     ''', (time_str, staff_id, date))
                                     synced_count += 1
+                                    synced_dates.add(date)
                                     logger.info(f"Auto-synced check-out time {time_str} for staff {staff_id} on {date}")
                             else:
                                 # No check-in record found, log warning but don't create orphan check-out
@@ -1171,6 +1396,7 @@ class AttendanceSync:
                         logger.error(f"Error syncing record {record}: {str(e)}")
                         continue
                 
+                refresh_attendance_daily_summary(school_id, synced_dates, db, commit=False)
                 db.commit()
                 logger.info(f"Synced {synced_count} records to SQLite database")
                 
@@ -1181,6 +1407,8 @@ class AttendanceSync:
     
     def sync_to_mysql(self, records: List[Dict]) -> int:
         """Sync attendance records to MySQL database"""
+        import pymysql
+
         synced_count = 0
 
         try:
@@ -1319,7 +1547,8 @@ def verify_staff_biometric(staff_id: str, device_ip: str = '192.168.1.201', biom
     return result
 
 
-def process_device_attendance_automatically(device_ip: str = '192.168.1.201', school_id: int = 1) -> Dict:
+def process_device_attendance_automatically(device_ip: str = '192.168.1.201', school_id: int = 1,
+                                            device_id: int = None) -> Dict:
     """
     Process attendance records from ZK device automatically
 
@@ -1328,6 +1557,7 @@ def process_device_attendance_automatically(device_ip: str = '192.168.1.201', sc
     Args:
         device_ip: IP address of ZK device
         school_id: School ID for the attendance records
+        device_id: biometric_devices ID, to read only records after its log cursor
 
     Returns:
         Dict with processing results
@@ -1342,7 +1572,7 @@ def process_device_attendance_automatically(device_ip: str = '192.168.1.201', sc
                 'processed_count': 0
             }
 
-        result = zk_device.process_device_attendance_to_database(school_id)
+        result = zk_device.process_device_attendance_to_database(school_id, device_id=device_id)
         return result
 
     except Exception as e:
@@ -1554,6 +1784,8 @@ class UnifiedAttendanceProcessor:
             ''', (staff_db_id, today))
             
             existing_attendance = cursor.fetchone()
+            previous_status = existing_attendance['status'] if existing_attendance else None
+            status = previous_status
             
             # Process based on verification type
             if verification_type == 'check-in':
@@ -1567,7 +1799,7 @@ class UnifiedAttendanceProcessor:
                 
                 # Calculate attendance status using shift management
                 from shift_management import ShiftManager
-                shift_manager = ShiftManager()
+                shift_manager = ShiftManager(school_id)
                 attendance_result = shift_manager.calculate_attendance_status(
                     shift_type, timestamp.time()
                 )
@@ -1615,9 +1847,6 @@ class UnifiedAttendanceProcessor:
                 
                 if existing_attendance:
                     # Calculate early departure if applicable
-                    from shift_management import ShiftManager
-                    shift_manager = ShiftManager()
-                    
                     shift_end_time = None
                     if existing_attendance['shift_end_time']:
                         shift_end_time = datetime.datetime.strptime(
@@ -1648,6 +1877,7 @@ class UnifiedAttendanceProcessor:
                     
                     result['action'] = 'check-out-no-checkin'
                     result['message'] = f'Check-out without check-in: {staff_name}'
+                    status = 'absent'
             
             elif verification_type in ['overtime-in', 'overtime-out']:
                 # Handle overtime punches
@@ -1670,10 +1900,19 @@ class UnifiedAttendanceProcessor:
                     result['message'] = f'{verification_type} ignored: No attendance record for today'
                     result['reason'] = 'no_attendance_record'
             
+            if result['action'] != 'ignored':
+                refresh_attendance_daily_summary(school_id, [today], db, commit=False)
+
             # Commit the transaction
             db.commit()
             result['success'] = True
             
+            if result['action'] != 'ignored':
+                attendance_events.publish(school_id, punch_event(
+                    school_id, staff_db_id, user_id, staff_name, department,
+                    result['action'], timestamp, status, previous_status
+                ))
+            
             self.logger.info(
                 f"✓ Punch processed successfully: {staff_name} ({verification_type}) "
                 f"at {current_time} on device {device_name}"
@@ -1688,9 +1927,18 @@ class UnifiedAttendanceProcessor:
         
         return result
     
+    # Staff ids per IN (...) query when resolving a batch of punches
+    BATCH_CHUNK_SIZE = 500
+
     def process_batch_punches(self, device_id: int, punches: List[Dict]) -> Dict:
         """
-        Process multiple attendance punches from a device
+        Process multiple attendance punches from a device in one transaction
+        
+        Staff are resolved and today's attendance rows loaded once for the
+        whole batch; punches are then applied per staff in time order to an
+        in-memory copy of each attendance row, following the same rules as
+        process_attendance_punch() (first check-in / check-out of the day
+        wins), and the result is written with executemany.
         
         Args:
             device_id: Device ID
@@ -1705,33 +1953,272 @@ class UnifiedAttendanceProcessor:
             'ignored': 0,
             'details': []
         }
-        
-        for punch in punches:
-            punch_result = self.process_attendance_punch(
-                device_id=device_id,
-                user_id=punch.get('user_id'),
-                timestamp=punch.get('timestamp'),
-                punch_code=punch.get('punch_code', 0),
-                verification_method=punch.get('verification_method', 'fingerprint')
-            )
-            
-            if punch_result['success']:
-                if punch_result['action'] == 'ignored':
+        if not punches:
+            return result
+
+        outcomes = [None] * len(punches)
+        db = None
+
+        try:
+            from database import get_db
+            db = get_db()
+
+            device = db.execute('''
+                SELECT school_id, device_name, connection_type 
+                FROM biometric_devices 
+                WHERE id = ? AND is_active = 1
+            ''', (device_id,)).fetchone()
+
+            if not device:
+                self.logger.warning(f"Batch rejected: Device {device_id} not found")
+                outcomes = [self._punch_outcome(False, 'rejected', f'Device ID {device_id} not found or inactive',
+                                                'invalid_device') for _ in punches]
+            else:
+                outcomes = self._apply_batch_punches(db, device_id, device[0], device[1], punches)
+
+        except Exception as e:
+            self.logger.error(f"Error processing attendance batch: {str(e)}")
+            if db:
+                db.rollback()
+            outcomes = [self._punch_outcome(False, 'rejected', f'Error processing punch: {str(e)}', 'exception')
+                        for _ in punches]
+
+        for punch, outcome in zip(punches, outcomes):
+            if outcome['success']:
+                if outcome['action'] == 'ignored':
                     result['ignored'] += 1
                 else:
                     result['processed'] += 1
             else:
                 result['rejected'] += 1
-            
+
+            timestamp = punch.get('timestamp')
             result['details'].append({
                 'user_id': punch.get('user_id'),
-                'timestamp': punch.get('timestamp').isoformat() if punch.get('timestamp') else None,
-                'action': punch_result.get('action'),
-                'message': punch_result.get('message'),
-                'reason': punch_result.get('reason')
+                'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else None,
+                'action': outcome.get('action'),
+                'message': outcome.get('message'),
+                'reason': outcome.get('reason')
             })
-        
+
         return result
+
+    @staticmethod
+    def _punch_outcome(success: bool, action: str, message: str, reason: str = '', staff_id: int = None) -> Dict:
+        return {'success': success, 'message': message, 'staff_id': staff_id, 'action': action, 'reason': reason}
+
+    def _resolve_batch_staff(self, db, school_id: int, user_ids: List[str]) -> Dict[str, Dict]:
+        """Map device user ids to staff rows of the device's institution."""
+        staff_by_user = {}
+        for i in range(0, len(user_ids), self.BATCH_CHUNK_SIZE):
+            chunk = user_ids[i:i + self.BATCH_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = db.execute(f'''
+                SELECT id, staff_id, full_name, department, COALESCE(shift_type, 'general') as shift_type
+                FROM staff 
+                WHERE school_id = ? AND staff_id IN ({placeholders})
+            ''', (school_id, *chunk)).fetchall()
+            for row in rows:
+                staff_by_user.setdefault(str(row['staff_id']), dict(row))
+        return staff_by_user
+
+    def _load_batch_attendance(self, db, keys: Set) -> Dict:
+        """Load existing attendance rows for (staff_id, ISO date) keys."""
+        staff_ids = sorted({staff_id for staff_id, _ in keys})
+        dates = [day for _, day in keys]
+        existing = {}
+        for i in range(0, len(staff_ids), self.BATCH_CHUNK_SIZE):
+            chunk = staff_ids[i:i + self.BATCH_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = db.execute(f'''
+                SELECT * FROM attendance
+                WHERE staff_id IN ({placeholders}) AND date BETWEEN ? AND ?
+            ''', (*chunk, min(dates), max(dates))).fetchall()
+            for row in rows:
+                record = dict(row)
+                date_value = record.get('date')
+                day = date_value.isoformat() if hasattr(date_value, 'isoformat') else str(date_value)[:10]
+                if (record['staff_id'], day) in keys:
+                    existing.setdefault((record['staff_id'], day), record)
+        return existing
+
+    def _apply_batch_punches(self, db, device_id: int, school_id: int, device_name: str,
+                             punches: List[Dict]) -> List[Dict]:
+        from shift_management import ShiftManager
+
+        outcomes = [None] * len(punches)
+        user_ids = sorted({str(p.get('user_id')) for p in punches if p.get('user_id') is not None})
+        staff_by_user = self._resolve_batch_staff(db, school_id, user_ids) if user_ids else {}
+
+        # Step 1: firewall and validation, then order each staff member's punches by time
+        accepted = []
+        for index, punch in enumerate(punches):
+            user_id = punch.get('user_id')
+            staff = staff_by_user.get(str(user_id)) if user_id is not None else None
+            if not staff:
+                # Ignore non-matching machine IDs. Process only IDs that exist in this institution.
+                outcomes[index] = self._punch_outcome(
+                    True, 'ignored', f"Ignored unmapped staff ID '{user_id}' for institution {school_id}",
+                    'unknown_staff')
+                continue
+            timestamp = punch.get('timestamp')
+            if not isinstance(timestamp, datetime.datetime):
+                outcomes[index] = self._punch_outcome(
+                    False, 'rejected', f'Error processing punch: invalid timestamp {timestamp!r}',
+                    'exception', staff['id'])
+                continue
+            accepted.append((staff['id'], timestamp, index, staff))
+
+        accepted.sort(key=lambda item: item[:3])
+        if not accepted:
+            return outcomes
+
+        keys = {(staff_id, timestamp.date().isoformat()) for staff_id, timestamp, _, _ in accepted}
+        rows = self._load_batch_attendance(db, keys)
+        # (staff_id, day) -> columns assigned by this batch, in assignment order
+        inserts = {}
+        updates = {}
+        verifications = []
+        events = []
+        shift_manager = None
+
+        # Step 2: fold punches into per-staff-per-day attendance state
+        for staff_db_id, timestamp, index, staff in accepted:
+            punch = punches[index]
+            verification_type = self._map_punch_to_verification_type(punch.get('punch_code', 0))
+            current_time = timestamp.strftime('%H:%M:%S')
+            today = timestamp.date()
+            key = (staff_db_id, today.isoformat())
+            existing_attendance = rows.get(key)
+            staff_name = staff['full_name']
+
+            # Validate and normalize biometric method
+            verification_method = punch.get('verification_method', 'fingerprint')
+            normalized_method = verification_method.lower() if verification_method else 'fingerprint'
+            if normalized_method not in ('fingerprint', 'face', 'card', 'password'):
+                normalized_method = 'fingerprint'
+
+            changes = None
+            outcome = self._punch_outcome(True, verification_type, '', '', staff_db_id)
+            try:
+                if verification_type == 'check-in':
+                    if existing_attendance and existing_attendance['time_in']:
+                        outcome = self._punch_outcome(
+                            False, 'ignored', f'Duplicate check-in blocked (original: {existing_attendance["time_in"]})',
+                            'duplicate_checkin', staff_db_id)
+                    else:
+                        if shift_manager is None:
+                            shift_manager = ShiftManager(school_id)
+                        attendance_result = shift_manager.calculate_attendance_status(
+                            staff['shift_type'], timestamp.time()
+                        )
+                        status = attendance_result['status']
+                        shift_start = attendance_result.get('shift_start_time')
+                        shift_end = attendance_result.get('shift_end_time')
+                        changes = {
+                            'time_in': current_time,
+                            'status': status,
+                            'late_duration_minutes': attendance_result.get('late_duration_minutes', 0),
+                            'shift_start_time': shift_start.strftime('%H:%M:%S') if shift_start else None,
+                            'shift_end_time': shift_end.strftime('%H:%M:%S') if shift_end else None,
+                        }
+                        outcome['message'] = f'Check-in processed: {staff_name} at {current_time} (Status: {status})'
+
+                elif verification_type == 'check-out':
+                    if existing_attendance and existing_attendance['time_out']:
+                        outcome = self._punch_outcome(
+                            False, 'ignored', f'Duplicate check-out blocked (original: {existing_attendance["time_out"]})',
+                            'duplicate_checkout', staff_db_id)
+                    elif existing_attendance:
+                        shift_end_time = None
+                        if existing_attendance['shift_end_time']:
+                            shift_end_time = datetime.datetime.strptime(
+                                existing_attendance['shift_end_time'], '%H:%M:%S'
+                            ).time()
+
+                        early_departure_minutes = 0
+                        if shift_end_time and timestamp.time() < shift_end_time:
+                            time_diff = datetime.datetime.combine(today, shift_end_time) - \
+                                      datetime.datetime.combine(today, timestamp.time())
+                            early_departure_minutes = int(time_diff.total_seconds() / 60)
+
+                        changes = {'time_out': current_time, 'early_departure_minutes': early_departure_minutes}
+                        outcome['message'] = f'Check-out processed: {staff_name} at {current_time}'
+                    else:
+                        # No check-in record - create absent/left record
+                        changes = {'time_out': current_time, 'status': 'absent'}
+                        outcome['action'] = 'check-out-no-checkin'
+                        outcome['message'] = f'Check-out without check-in: {staff_name}'
+
+                elif verification_type in ['overtime-in', 'overtime-out']:
+                    if existing_attendance:
+                        column = 'overtime_in' if verification_type == 'overtime-in' else 'overtime_out'
+                        changes = {column: current_time}
+                        outcome['message'] = f'{verification_type} processed: {staff_name} at {current_time}'
+                    else:
+                        outcome = self._punch_outcome(
+                            True, 'ignored', f'{verification_type} ignored: No attendance record for today',
+                            'no_attendance_record', staff_db_id)
+            except Exception as e:
+                outcomes[index] = self._punch_outcome(
+                    False, 'rejected', f'Error processing punch: {str(e)}', 'exception', staff_db_id)
+                continue
+
+            verifications.append((staff_db_id, school_id, verification_type, timestamp,
+                                  f'Device:{device_id}', normalized_method))
+            if changes:
+                previous_status = existing_attendance.get('status') if existing_attendance else None
+                events.append(punch_event(
+                    school_id, staff_db_id, staff['staff_id'], staff_name, staff['department'],
+                    outcome['action'], timestamp, changes.get('status', previous_status), previous_status
+                ))
+                if existing_attendance is None:
+                    existing_attendance = rows[key] = {'time_in': None, 'time_out': None, 'shift_end_time': None}
+                    inserts[key] = {}
+                existing_attendance.update(changes)
+                (inserts[key] if key in inserts else updates.setdefault(key, {})).update(changes)
+            outcomes[index] = outcome
+
+        # Step 3: write everything in one transaction
+        if verifications:
+            db.executemany('''
+                INSERT INTO biometric_verifications
+                (staff_id, school_id, verification_type, verification_time, 
+                 device_ip, biometric_method, verification_status)
+                VALUES (?, ?, ?, ?, ?, ?, 'success')
+            ''', verifications)
+
+        insert_groups = {}
+        for (staff_db_id, day), columns in inserts.items():
+            insert_groups.setdefault(tuple(columns), []).append(
+                (staff_db_id, school_id, day, *columns.values()))
+        for columns, params in insert_groups.items():
+            db.executemany(f'''
+                INSERT INTO attendance 
+                (staff_id, school_id, date, {', '.join(columns)})
+                VALUES ({', '.join('?' * (len(columns) + 3))})
+            ''', params)
+
+        update_groups = {}
+        for (staff_db_id, day), columns in updates.items():
+            update_groups.setdefault(tuple(columns), []).append((*columns.values(), staff_db_id, day))
+        for columns, params in update_groups.items():
+            db.executemany(f'''
+                UPDATE attendance 
+                SET {', '.join(f'{column} = ?' for column in columns)}
+                WHERE staff_id = ? AND date = ?
+            ''', params)
+
+        refresh_attendance_daily_summary(
+            school_id, {day for _, day in inserts} | {day for _, day in updates}, db, commit=False)
+        db.commit()
+        attendance_events.publish_many(school_id, events)
+
+        self.logger.info(
+            f"✓ Batch processed on device {device_name}: {len(verifications)} punch(es), "
+            f"{len(inserts)} new and {len(updates)} updated attendance record(s)"
+        )
+        return outcomes
     
     def _map_punch_to_verification_type(self, punch_code: int) -> str:
         """Map device punch code to verification type"""
@@ -1744,6 +2231,156 @@ class UnifiedAttendanceProcessor:
         return punch_mapping.get(punch_code, 'check-in')
 
 
+class DeviceSyncScheduler:
+    """
+    Runs Direct LAN device syncs concurrently on a bounded thread pool
+
+    - A cycle never starts while the previous one is still running, and a
+      device whose sync is still in flight (e.g. after a timeout) is skipped.
+    - A device that does not finish within `device_timeout` seconds is
+      reported as failed and the cycle moves on without waiting for it.
+    - Offline devices back off: after n consecutive failures a device sits
+      out 2**(n-1) - 1 cycles (at most `max_backoff_cycles`).
+    """
+
+    def __init__(self, max_workers: int = None, device_timeout: float = None, max_backoff_cycles: int = None):
+        self.max_workers = max_workers or LAN_SYNC_MAX_WORKERS
+        self.device_timeout = device_timeout or LAN_SYNC_DEVICE_TIMEOUT
+        self.max_backoff_cycles = LAN_SYNC_MAX_BACKOFF_CYCLES if max_backoff_cycles is None else max_backoff_cycles
+        self._cycle_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._started = {}    # device_id -> monotonic start time, while its sync runs
+        self._timed_out = set()
+        self._backoff = {}    # device_id -> {'failures': int, 'skip': cycles left to sit out}
+
+    def get_backoff(self, device_id) -> Dict:
+        """Consecutive failures and cycles left to skip for a device"""
+        with self._state_lock:
+            return dict(self._backoff.get(device_id, {'failures': 0, 'skip': 0}))
+
+    def _take_due(self, device_id) -> Optional[str]:
+        """Return why a device must sit out this cycle, or None if it is due"""
+        with self._state_lock:
+            if device_id in self._started:
+                return 'still_running'
+            state = self._backoff.get(device_id)
+            if state and state['skip'] > 0:
+                state['skip'] -= 1
+                return 'backoff'
+            return None
+
+    def _record_result(self, device_id, success: bool) -> int:
+        with self._state_lock:
+            if success:
+                self._backoff.pop(device_id, None)
+                return 0
+            failures = self._backoff.get(device_id, {'failures': 0})['failures'] + 1
+            skip = min(2 ** min(failures - 1, 16) - 1, self.max_backoff_cycles)
+            self._backoff[device_id] = {'failures': failures, 'skip': skip}
+            return failures
+
+    def _run_device(self, device: Dict, sync_device, report) -> Dict:
+        device_id = device['id']
+        try:
+            result = sync_device(device)
+        except Exception as e:
+            logger.error(f"Error syncing device {device.get('device_name', device_id)}: {str(e)}")
+            result = {'success': False, 'error': str(e)}
+
+        with self._state_lock:
+            started = self._started.pop(device_id, time.monotonic())
+            timed_out = device_id in self._timed_out
+            self._timed_out.discard(device_id)
+        result.setdefault('record_count', 0)
+        result['latency_ms'] = int((time.monotonic() - started) * 1000)
+        if not timed_out:
+            # Timed-out syncs were already counted and reported by the cycle
+            result['consecutive_failures'] = self._record_result(device_id, result['success'])
+            if report:
+                report(device, result)
+        return result
+
+    def run_cycle(self, devices: List[Dict], sync_device, report=None) -> Optional[Dict]:
+        """
+        Sync devices concurrently
+
+        Args:
+            devices: Device dicts, each with at least an 'id'
+            sync_device: Callable(device) -> {'success': bool, 'record_count': int, ...}
+            report: Optional callable(device, result) run once per finished or
+                timed-out device; results carry 'latency_ms' and 'consecutive_failures'
+
+        Returns:
+            Dict with per-device results and skipped/timed-out device IDs,
+            or None if the previous cycle is still running
+        """
+        if not self._cycle_lock.acquire(blocking=False):
+            logger.warning("Previous LAN sync cycle still running; skipping this cycle")
+            return None
+
+        summary = {'results': {}, 'skipped': {}, 'timed_out': []}
+        try:
+            due = []
+            for device in devices:
+                reason = self._take_due(device['id'])
+                if reason:
+                    summary['skipped'][device['id']] = reason
+                else:
+                    due.append(device)
+            if not due:
+                return summary
+
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(due)),
+                                          thread_name_prefix='lan-sync')
+            futures = {}
+            for device in due:
+                with self._state_lock:
+                    self._started[device['id']] = None  # queued
+                futures[executor.submit(self._start_device, device, sync_device, report)] = device
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    summary['results'][futures[future]['id']] = future.result()
+                for future in list(pending):
+                    device = futures[future]
+                    if self._check_timeout(device, report):
+                        summary['timed_out'].append(device['id'])
+                        pending.discard(future)
+
+            # Timed-out syncs keep their worker thread until the socket gives up
+            executor.shutdown(wait=False)
+            return summary
+        finally:
+            self._cycle_lock.release()
+
+    def _start_device(self, device: Dict, sync_device, report) -> Dict:
+        with self._state_lock:
+            self._started[device['id']] = time.monotonic()
+        return self._run_device(device, sync_device, report)
+
+    def _check_timeout(self, device: Dict, report) -> bool:
+        device_id = device['id']
+        with self._state_lock:
+            started = self._started.get(device_id)
+            if started is None or time.monotonic() - started < self.device_timeout:
+                return False
+            self._timed_out.add(device_id)
+
+        logger.error(f"Sync of device {device.get('device_name', device_id)} timed out after {self.device_timeout}s")
+        result = {
+            'success': False,
+            'error': 'timeout',
+            'record_count': 0,
+            'latency_ms': int(self.device_timeout * 1000),
+            'consecutive_failures': self._record_result(device_id, False)
+        }
+        if report:
+            report(device, result)
+        return True
+
+
 if __name__ == '__main__':
     # Test the ZK device connection
     result = sync_attendance_from_device()